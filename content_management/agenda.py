@@ -0,0 +1,133 @@
+"""
+Programme (agenda) public d'un événement au format JSON.
+
+Le programme complet (jours, activités, intervenants) est construit en trois
+requêtes, sérialisé une seule fois par version de l'événement et par langue,
+puis mis en cache avec son ETag. Toute modification d'un jour, d'une
+activité, d'un intervenant ou de l'événement invalide le cache (voir
+signals.py). Les filtres par jour et par type d'activité sont appliqués sur
+le programme en cache, sans nouvelle requête.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.utils import timezone, translation
+
+from .models import EventAgenda, EventDay
+
+
+AGENDA_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def agenda_cache_key(event_id, language):
+    return f'event_agenda_{event_id}_{language}'
+
+
+def invalidate_event_agenda(*event_ids):
+    cache.delete_many([
+        agenda_cache_key(event_id, language)
+        for event_id in event_ids
+        for language, _name in settings.LANGUAGES
+    ])
+
+
+def make_etag(content):
+    return '"%s"' % hashlib.md5(content, usedforsecurity=False).hexdigest()
+
+
+def serialize_speaker(intervenant):
+    return {
+        'id': intervenant.pk,
+        'name': intervenant.nom,
+        'profession': intervenant.profession,
+        'photo': intervenant.photo.url if intervenant.photo else None,
+    }
+
+
+def serialize_activity(activity):
+    return {
+        'id': activity.pk,
+        'start_time': activity.start_time.strftime('%H:%M'),
+        'end_time': activity.end_time.strftime('%H:%M'),
+        'title': activity.activity,
+        'description': activity.description,
+        'location': activity.location,
+        'activity_type': activity.activity_type,
+        'activity_type_label': str(activity.get_activity_type_display()),
+        'speakers': [serialize_speaker(intervenant) for intervenant in activity.intervenants.all()],
+    }
+
+
+def build_event_agenda(event):
+    """Programme complet de l'événement (trois requêtes)"""
+    days = EventDay.objects.filter(event=event).order_by('date', 'day_number').prefetch_related(
+        Prefetch(
+            'activities',
+            queryset=EventAgenda.objects.order_by('start_time', 'order').prefetch_related('intervenants'),
+        )
+    )
+    return {
+        'event': {
+            'id': event.pk,
+            'slug': event.slug,
+            'title': event.title,
+            'start_date': event.start_date,
+            'end_date': event.end_date,
+            'location': event.location,
+        },
+        'days': [
+            {
+                'id': day.pk,
+                'day_number': day.day_number,
+                'date': day.date,
+                'title': day.title,
+                'description': day.description,
+                'activities': [serialize_activity(activity) for activity in day.activities.all()],
+            }
+            for day in days
+        ],
+        'activity_types': [
+            {'value': value, 'label': str(label)}
+            for value, label in EventAgenda._meta.get_field('activity_type').choices
+        ],
+    }
+
+
+def get_event_agenda(event):
+    """Retourne {'agenda', 'content', 'etag', 'built_at'} depuis le cache, ou le construit
+
+    content est le JSON du programme complet, prêt à être envoyé.
+    """
+    language = translation.get_language() or settings.LANGUAGE_CODE
+    key = agenda_cache_key(event.pk, language)
+    cached = cache.get(key)
+    if cached is None:
+        agenda = build_event_agenda(event)
+        content = json.dumps(agenda, cls=DjangoJSONEncoder).encode()
+        cached = {
+            'agenda': json.loads(content),
+            'content': content,
+            'etag': make_etag(content),
+            'built_at': timezone.now(),
+        }
+        cache.set(key, cached, AGENDA_CACHE_TIMEOUT)
+    return cached
+
+
+def filter_agenda(agenda, day=None, activity_types=None):
+    """Restreint le programme à un jour (numéro ou date AAAA-MM-JJ) et à des types d'activité"""
+    days = agenda['days']
+    if day:
+        days = [item for item in days if day in (str(item['day_number']), item['date'])]
+    if activity_types:
+        days = [
+            dict(item, activities=[
+                activity for activity in item['activities'] if activity['activity_type'] in activity_types
+            ])
+            for item in days
+        ]
+    return dict(agenda, days=days)
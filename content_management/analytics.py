@@ -0,0 +1,197 @@
+"""
+Statistiques des réponses aux formulaires d'inscription.
+
+Les agrégats sont calculés en SQL (GROUP BY sur FormResponse et sur la table
+intermédiaire des options sélectionnées), mis en cache par formulaire, puis
+complétés de façon incrémentale avec les seules nouvelles inscriptions (id
+supérieur au dernier id agrégé). Une inscription validée après une
+inscription d'id supérieur est déjà derrière ce repère: sa validation
+invalide le cache, comme les changements de statut, suppressions et
+modifications des champs (voir signals.py).
+"""
+from django.core.cache import cache
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import EventRegistration, FormResponse
+
+
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+CHOICE_FIELD_TYPES = ('select', 'radio', 'multiselect')
+STATUS_FUNNEL = ['pending', 'waitlist', 'confirmed', 'cancelled']
+
+
+def analytics_cache_key(form_id):
+    return f'registration_analytics_{form_id}'
+
+
+def invalidate_form_analytics(form_id):
+    cache.delete(analytics_cache_key(form_id))
+
+
+def registration_committed(form_id, registration_id):
+    """Après validation d'une inscription: recalcul si le cache l'a déjà dépassée sans la compter"""
+    aggregates = cache.get(analytics_cache_key(form_id))
+    if aggregates is not None and registration_id <= aggregates['last_registration_id']:
+        invalidate_form_analytics(form_id)
+
+
+def aggregate_registrations(registration_form, after_id=None):
+    """Agrège les inscriptions d'un formulaire (toutes, ou celles d'id > after_id)"""
+    registrations = EventRegistration.objects.filter(form=registration_form)
+    responses = FormResponse.objects.filter(registration__form=registration_form)
+    Through = FormResponse.selected_options.through
+    links = Through.objects.filter(formresponse__registration__form=registration_form)
+    if after_id is not None:
+        registrations = registrations.filter(pk__gt=after_id)
+        responses = responses.filter(registration_id__gt=after_id)
+        links = links.filter(formresponse__registration_id__gt=after_id)
+
+    summary = registrations.aggregate(total=Count('pk'), last_id=Max('pk'))
+
+    options = {
+        str(row['formfieldoption_id']): row['count']
+        for row in links.values('formfieldoption_id').annotate(count=Count('pk'))
+    }
+
+    numbers = {}
+    number_rows = responses.filter(
+        field__field_type='number', number_value__isnull=False
+    ).values('field_id').annotate(
+        count=Count('pk'), total=Sum('number_value'), min=Min('number_value'), max=Max('number_value')
+    )
+    for row in number_rows:
+        numbers[str(row['field_id'])] = {
+            'count': row['count'],
+            'sum': float(row['total']),
+            'min': float(row['min']),
+            'max': float(row['max']),
+        }
+
+    timeline = {
+        row['day'].isoformat(): row['count']
+        for row in registrations.annotate(day=TruncDate('registration_date'))
+        .values('day').annotate(count=Count('pk')).order_by()
+    }
+
+    statuses = {
+        row['status']: row['count']
+        for row in registrations.values('status').annotate(count=Count('pk')).order_by()
+    }
+
+    return {
+        'total': summary['total'],
+        'last_registration_id': summary['last_id'] or after_id or 0,
+        'options': options,
+        'numbers': numbers,
+        'timeline': timeline,
+        'statuses': statuses,
+    }
+
+
+def merge_counts(target, delta):
+    for key, count in delta.items():
+        target[key] = target.get(key, 0) + count
+
+
+def merge_aggregates(base, delta):
+    """Ajoute les agrégats des nouvelles inscriptions aux agrégats en cache"""
+    base['total'] += delta['total']
+    base['last_registration_id'] = max(base['last_registration_id'], delta['last_registration_id'])
+    merge_counts(base['options'], delta['options'])
+    merge_counts(base['timeline'], delta['timeline'])
+    merge_counts(base['statuses'], delta['statuses'])
+    for field_id, stats in delta['numbers'].items():
+        current = base['numbers'].get(field_id)
+        if current is None:
+            base['numbers'][field_id] = stats
+            continue
+        current['count'] += stats['count']
+        current['sum'] += stats['sum']
+        current['min'] = min(current['min'], stats['min'])
+        current['max'] = max(current['max'], stats['max'])
+    return base
+
+
+def get_form_aggregates(registration_form):
+    """Retourne les agrégats du formulaire, depuis le cache si possible"""
+    key = analytics_cache_key(registration_form.pk)
+    aggregates = cache.get(key)
+
+    if aggregates is None:
+        aggregates = aggregate_registrations(registration_form)
+    else:
+        last_id = registration_form.registrations.aggregate(last_id=Max('pk'))['last_id'] or 0
+        if last_id <= aggregates['last_registration_id']:
+            return aggregates
+        delta = aggregate_registrations(registration_form, after_id=aggregates['last_registration_id'])
+        aggregates = merge_aggregates(aggregates, delta)
+
+    aggregates['computed_at'] = timezone.now().isoformat()
+    cache.set(key, aggregates, ANALYTICS_CACHE_TIMEOUT)
+    return aggregates
+
+
+def percentage(count, total):
+    return round(count * 100 / total, 1) if total else 0
+
+
+def build_form_analytics(registration_form):
+    """Prépare les statistiques affichables: histogrammes, résumés numériques, chronologie et entonnoir"""
+    aggregates = get_form_aggregates(registration_form)
+    total = aggregates['total']
+    status_labels = dict(EventRegistration.STATUS_CHOICES)
+
+    choice_fields = []
+    number_fields = []
+    for field in registration_form.fields.prefetch_related('options').order_by('order'):
+        if field.field_type in CHOICE_FIELD_TYPES:
+            field_options = list(field.options.all())
+            answered = sum(aggregates['options'].get(str(option.pk), 0) for option in field_options)
+            choice_fields.append({
+                'field': field,
+                'answered': answered,
+                'options': [
+                    {
+                        'option': option,
+                        'count': aggregates['options'].get(str(option.pk), 0),
+                        'percentage': percentage(aggregates['options'].get(str(option.pk), 0), total),
+                    }
+                    for option in field_options
+                ],
+            })
+        elif field.field_type == 'number':
+            stats = aggregates['numbers'].get(str(field.pk))
+            number_fields.append({
+                'field': field,
+                'count': stats['count'] if stats else 0,
+                'average': round(stats['sum'] / stats['count'], 2) if stats else None,
+                'min': stats['min'] if stats else None,
+                'max': stats['max'] if stats else None,
+                'sum': stats['sum'] if stats else None,
+            })
+
+    timeline = sorted(aggregates['timeline'].items())
+    peak = max((count for _, count in timeline), default=0)
+    funnel = [
+        {
+            'status': status,
+            'label': status_labels[status],
+            'count': aggregates['statuses'].get(status, 0),
+            'percentage': percentage(aggregates['statuses'].get(status, 0), total),
+        }
+        for status in STATUS_FUNNEL
+    ]
+
+    return {
+        'total': total,
+        'choice_fields': choice_fields,
+        'number_fields': number_fields,
+        'timeline': [
+            {'day': day, 'count': count, 'percentage': percentage(count, peak)}
+            for day, count in timeline
+        ],
+        'funnel': funnel,
+        'computed_at': aggregates['computed_at'],
+    }
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ContentManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'content_management'
+
+    def ready(self):
+        """Importer les signaux lors du démarrage de l'application"""
+        import content_management.signals
@@ -0,0 +1,172 @@
+"""
+Disponibilité des salles: une seule structure de périodes bloquées.
+
+Pour chaque salle et chaque mois, le cache partagé (Redis, voir CACHES dans
+les settings) conserve:
+
+- les réservations qui touchent le mois, tous statuts confondus, avec leur
+  organisation;
+- les maintenances planifiées ou en cours (RoomMaintenance);
+- l'indisponibilité déclarée sur la salle (maintenance_until).
+
+La vérification des conflits (conflicts.RoomSchedule), le calendrier
+(room_calendar) et la recherche de créneaux libres (free_slots) lisent
+tous cette structure. Les mois manquants sont lus en trois requêtes, quel
+que soit leur nombre. Le cache d'une salle est versionné: toute
+modification d'une réservation, d'une maintenance ou de la salle elle-même
+renouvelle sa version (signals.py), une fois la transaction validée: un
+mois relu avant la validation l'est sous l'ancienne version. La contrainte
+d'exclusion PostgreSQL (RoomBooking.Meta.constraints) reste la garantie en
+cas de vérification sur un cache en retard.
+"""
+import uuid
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from .models import ConferenceRoom, Int8Range, RoomBooking, RoomMaintenance, TsTzRange
+
+
+AVAILABILITY_CACHE_TIMEOUT = 60 * 60 * 24
+BLOCKING_MAINTENANCE_STATUSES = ('planned', 'in_progress')
+# Début des indisponibilités déclarées par maintenance_until
+SINCE_EVER = datetime.min.replace(tzinfo=dt_timezone.utc)
+
+
+# ----------------------------------------------------------------------------
+# Requêtes
+# ----------------------------------------------------------------------------
+
+def booking_queryset(room_ids, start, end):
+    """Réservations des salles qui chevauchent [start, end), avec leur organisation"""
+    if connection.vendor == 'postgresql':
+        # Mêmes expressions que la contrainte d'exclusion et l'index de période (GiST)
+        bookings = RoomBooking.objects.alias(
+            room_range=Int8Range('room_id', 'room_id', Value('[]')),
+            period=TsTzRange('start_time', 'end_time', Value('[)')),
+        ).filter(period__overlap=TsTzRange(Value(start), Value(end), Value('[)')))
+        if len(room_ids) == 1:
+            bookings = bookings.filter(room_range=Int8Range(Value(room_ids[0]), Value(room_ids[0]), Value('[]')))
+        else:
+            bookings = bookings.filter(room_id__in=room_ids)
+    else:
+        bookings = RoomBooking.objects.filter(room_id__in=room_ids, start_time__lt=end, end_time__gt=start)
+    return bookings.select_related('organization').order_by('start_time', 'pk')
+
+
+def maintenance_queryset(room_ids, start, end):
+    return RoomMaintenance.objects.filter(
+        room_id__in=room_ids, status__in=BLOCKING_MAINTENANCE_STATUSES,
+        start_date__lt=end, end_date__gt=start,
+    ).order_by('start_date', 'pk')
+
+
+# ----------------------------------------------------------------------------
+# Cache versionné par salle
+# ----------------------------------------------------------------------------
+
+def room_version_key(room_id):
+    return f'room_availability_version_{room_id}'
+
+
+def renew_room_versions(room_ids):
+    cache.set_many({room_version_key(room_id): uuid.uuid4().hex for room_id in room_ids}, None)
+
+
+def invalidate_room_availability(*room_ids):
+    """Nouvelle version des salles après validation: leurs mois en cache ne sont plus lus
+
+    Renouvelée avant la validation, la version pourrait être reconstruite
+    par une lecture concurrente à partir des données encore non validées,
+    et ce mois resterait en cache jusqu'à la modification suivante.
+    """
+    room_ids = set(room_ids)
+    if room_ids:
+        transaction.on_commit(lambda: renew_room_versions(room_ids))
+
+
+def room_versions(room_ids):
+    keys = {room_id: room_version_key(room_id) for room_id in room_ids}
+    versions = cache.get_many(keys.values())
+    # Version perdue (cache vidé): en créer une nouvelle plutôt que réutiliser une ancienne
+    missing = {key: uuid.uuid4().hex for key in keys.values() if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {room_id: versions[key] for room_id, key in keys.items()}
+
+
+def month_cache_key(room_id, month, version):
+    return f'room_availability_{room_id}_{month:%Y-%m}_{version}'
+
+
+def next_month(month):
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def months_between(first_day, last_day):
+    month = first_day.replace(day=1)
+    while month <= last_day:
+        yield month
+        month = next_month(month)
+
+
+def month_start(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def local_day_span(start, end):
+    """Premier et dernier jour (heure locale) d'une période dont la fin est exclue"""
+    first_day = timezone.localdate(start)
+    if end <= start:
+        return first_day, first_day
+    return first_day, timezone.localdate(end - timedelta(microseconds=1))
+
+
+def months_of_period(start, end):
+    return list(months_between(*local_day_span(start, end)))
+
+
+def load_room_months(room_ids, months):
+    """{(salle, mois): {'bookings', 'maintenances', 'maintenance_until'}}
+
+    Depuis le cache, ou en trois requêtes pour l'ensemble des mois manquants.
+    """
+    versions = room_versions(room_ids)
+    keys = {
+        (room_id, month): month_cache_key(room_id, month, versions[room_id])
+        for room_id in room_ids
+        for month in months
+    }
+    cached = cache.get_many(keys.values())
+    result = {pair: cached[key] for pair, key in keys.items() if key in cached}
+    missing = [pair for pair in keys if pair not in result]
+    if not missing:
+        return result
+
+    missing_rooms = sorted({room_id for room_id, _month in missing})
+    missing_months = sorted({month for _room_id, month in missing})
+    window_start = month_start(missing_months[0])
+    window_end = month_start(next_month(missing_months[-1]))
+    maintenance_until = dict(
+        ConferenceRoom.objects.filter(pk__in=missing_rooms).values_list('pk', 'maintenance_until')
+    )
+    fetched = {
+        pair: {'bookings': [], 'maintenances': [], 'maintenance_until': maintenance_until.get(pair[0])}
+        for pair in missing
+    }
+    for kind, items, start, end in (
+        ('bookings', booking_queryset(missing_rooms, window_start, window_end), 'start_time', 'end_time'),
+        ('maintenances', maintenance_queryset(missing_rooms, window_start, window_end), 'start_date', 'end_date'),
+    ):
+        for item in items:
+            for month in months_of_period(getattr(item, start), getattr(item, end)):
+                if (item.room_id, month) in fetched:
+                    fetched[(item.room_id, month)][kind].append(item)
+
+    cache.set_many({keys[pair]: entry for pair, entry in fetched.items()}, AVAILABILITY_CACHE_TIMEOUT)
+    result.update(fetched)
+    return result
@@ -0,0 +1,395 @@
+"""
+Badges et attestations de participation des inscrits.
+
+Chaque participant produit une page rendue avec Pillow (texte et QR code
+du billet), compressée en JPEG puis insérée dans un PDF. Le rendu d'une
+page ne dépend que de données simples (dictionnaires): il peut être
+réparti entre processus (ProcessPoolExecutor, commande
+generate_event_documents) ou entre tâches Celery par lots
+(jobs.export_tasks.run_document_job), sans accès à la base.
+
+Deux formats de sortie: un PDF unique prêt à imprimer, ou une archive ZIP
+contenant un PDF par participant. Les pages sont écrites au fil de l'eau:
+la mémoire utilisée ne dépend pas du nombre de participants.
+"""
+import io
+import os
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
+from django.conf import settings
+from django.utils.text import slugify
+
+
+DOCUMENT_KINDS = {
+    'badge': 'Badges',
+    'certificate': 'Attestations de participation',
+}
+DOCUMENT_FORMATS = ('pdf', 'zip')
+DOCUMENT_CHUNK_SIZE = 200
+JPEG_QUALITY = 85
+
+# Taille des pages: (largeur, hauteur) en points PDF et résolution de rendu
+PAGE_SIZES = {
+    'badge': ((297.64, 419.53), 200),        # A6 portrait
+    'certificate': ((841.89, 595.28), 150),  # A4 paysage
+}
+POINTS_PER_INCH = 72
+
+# Polices TrueType recherchées si BADGE_FONT_PATH n'est pas défini. La police
+# intégrée à Pillow n'a pas de caractères accentués: les accents sont alors
+# retirés du texte.
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+)
+BOLD_FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+)
+
+
+def page_pixels(kind):
+    (width, height), dpi = PAGE_SIZES[kind]
+    return round(width * dpi / POINTS_PER_INCH), round(height * dpi / POINTS_PER_INCH)
+
+
+# ----------------------------------------------------------------------------
+# Données des pages (processus principal, accès à la base)
+# ----------------------------------------------------------------------------
+
+def document_queryset(event, kind, checked_in_only=None):
+    """Inscriptions concernées: confirmées, et présentes pour les attestations"""
+    from .models import EventRegistration
+
+    if checked_in_only is None:
+        checked_in_only = kind == 'certificate'
+    queryset = EventRegistration.objects.filter(form__event=event, status='confirmed')
+    if checked_in_only:
+        queryset = queryset.filter(checked_in_at__isnull=False)
+    return queryset.order_by('last_name', 'first_name', 'pk')
+
+
+def document_rows(queryset):
+    """Une ligne par participant, sérialisable (JSON et pickle)"""
+    from .checkin import ticket_code
+
+    return [
+        {
+            'name': f"{first_name} {last_name}".strip(),
+            'registration_id': registration_id,
+            'code': ticket_code(registration_id),
+        }
+        for first_name, last_name, registration_id in queryset.values_list(
+            'first_name', 'last_name', 'registration_id'
+        ).iterator(chunk_size=2000)
+    ]
+
+
+def event_info(event):
+    """Informations de l'événement communes à toutes les pages"""
+    from django.utils.formats import date_format
+
+    dates = date_format(event.start_date, 'j F Y')
+    if event.end_date and event.end_date != event.start_date:
+        dates = f"{date_format(event.start_date, 'j F Y')} - {date_format(event.end_date, 'j F Y')}"
+    registration_form = getattr(event, 'registration_form', None)
+    return {
+        'title': event.title,
+        'dates': dates,
+        'location': event.location,
+        'color': registration_form.primary_color if registration_form else '#667eea',
+        'font_path': getattr(settings, 'BADGE_FONT_PATH', '') or find_font(FONT_CANDIDATES),
+        'bold_font_path': getattr(settings, 'BADGE_BOLD_FONT_PATH', '') or find_font(BOLD_FONT_CANDIDATES),
+    }
+
+
+def find_font(candidates):
+    return next((path for path in candidates if os.path.exists(path)), '')
+
+
+def chunked(rows, size=DOCUMENT_CHUNK_SIZE):
+    return [rows[start:start + size] for start in range(0, len(rows), size)]
+
+
+def document_filename(row):
+    return f"{row['registration_id']}-{slugify(row['name']) or 'participant'}.pdf"
+
+
+# ----------------------------------------------------------------------------
+# Rendu des pages (sans accès à la base)
+# ----------------------------------------------------------------------------
+
+@lru_cache(maxsize=32)
+def load_font(path, size):
+    from PIL import ImageFont
+
+    if path:
+        return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size=size)
+
+
+def printable(info, text):
+    """Retire les accents si aucune police TrueType n'est disponible"""
+    if info['font_path']:
+        return text
+    return unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('ascii')
+
+
+def wrap_text(draw, text, font, max_width):
+    lines = []
+    for word in text.split():
+        if lines and draw.textlength(f"{lines[-1]} {word}", font=font) <= max_width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    return lines or ['']
+
+
+def draw_centered(draw, lines, font, top, width, fill, spacing=1.2):
+    """Écrit des lignes centrées et retourne l'ordonnée sous le texte"""
+    line_height = int(font.size * spacing)
+    for line in lines:
+        draw.text((width / 2, top), line, font=font, fill=fill, anchor='ma')
+        top += line_height
+    return top
+
+
+def qr_image(code, size):
+    import qrcode
+
+    return qrcode.make(code, border=1).get_image().convert('RGB').resize((size, size))
+
+
+def render_badge(info, row):
+    from PIL import Image, ImageDraw
+
+    width, height = page_pixels('badge')
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    regular = lambda size: load_font(info['font_path'], size)
+    bold = lambda size: load_font(info['bold_font_path'] or info['font_path'], size)
+
+    band_height = int(height * 0.24)
+    draw.rectangle((0, 0, width, band_height), fill=info['color'])
+    title_font = bold(44)
+    title_lines = wrap_text(draw, printable(info, info['title']), title_font, width * 0.88)[:3]
+    top = (band_height - len(title_lines) * int(title_font.size * 1.2)) // 2
+    draw_centered(draw, title_lines, title_font, top, width, 'white')
+
+    name_font = bold(72)
+    name_lines = wrap_text(draw, printable(info, row['name']), name_font, width * 0.9)[:2]
+    top = draw_centered(draw, name_lines, name_font, band_height + 70, width, '#212529')
+    top = draw_centered(draw, [row['registration_id']], regular(32), top + 10, width, '#6c757d')
+
+    qr_size = int(width * 0.42)
+    qr_top = height - qr_size - 150
+    image.paste(qr_image(row['code'], qr_size), ((width - qr_size) // 2, qr_top))
+    footer = [printable(info, info['dates']), printable(info, info['location'])]
+    draw_centered(draw, footer, regular(30), qr_top + qr_size + 25, width, '#495057')
+    return image
+
+
+def render_certificate(info, row):
+    from PIL import Image, ImageDraw
+
+    width, height = page_pixels('certificate')
+    image = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(image)
+    regular = lambda size: load_font(info['font_path'], size)
+    bold = lambda size: load_font(info['bold_font_path'] or info['font_path'], size)
+
+    margin = 50
+    draw.rectangle((margin, margin, width - margin, height - margin), outline=info['color'], width=12)
+    draw.rectangle((margin + 25, margin + 25, width - margin - 25, height - margin - 25), outline=info['color'], width=3)
+
+    name_font = bold(80)
+    title_font = bold(50)
+    top = draw_centered(draw, ["ATTESTATION DE PARTICIPATION"], bold(68), 190, width, info['color'])
+    top = draw_centered(draw, ["Le CSIG atteste que"], regular(38), top + 60, width, '#495057')
+    name_lines = wrap_text(draw, printable(info, row['name']), name_font, width * 0.75)[:2]
+    top = draw_centered(draw, name_lines, name_font, top + 30, width, '#212529')
+    top = draw_centered(draw, [printable(info, "a participé à")], regular(38), top + 30, width, '#495057')
+    title_lines = wrap_text(draw, printable(info, info['title']), title_font, width * 0.75)[:3]
+    top = draw_centered(draw, title_lines, title_font, top + 20, width, '#212529')
+    footer = printable(info, f"{info['dates']} - {info['location']}")
+    draw_centered(draw, [footer], regular(34), top + 20, width, '#495057')
+
+    qr_size = 170
+    qr_left = width - margin - 60 - qr_size
+    qr_top = height - margin - 60 - qr_size
+    image.paste(qr_image(row['code'], qr_size), (qr_left, qr_top))
+    draw.text(
+        (qr_left - 20, qr_top + qr_size), f"N° {row['registration_id']}",
+        font=regular(26), fill='#6c757d', anchor='rd',
+    )
+    return image
+
+
+RENDERERS = {
+    'badge': render_badge,
+    'certificate': render_certificate,
+}
+
+
+def render_pages(kind, info, rows):
+    """Rend les pages d'un lot de participants: liste de JPEG (octets)
+
+    Fonction de niveau module: utilisable par ProcessPoolExecutor.
+    """
+    pages = []
+    for row in rows:
+        buffer = io.BytesIO()
+        RENDERERS[kind](info, row).save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        pages.append(buffer.getvalue())
+    return pages
+
+
+# ----------------------------------------------------------------------------
+# Écriture des PDF
+# ----------------------------------------------------------------------------
+
+class PdfImageWriter:
+    """Écrit un PDF dont chaque page est une image JPEG pleine page
+
+    Les pages sont écrites dès leur ajout; seule la table des positions des
+    objets est conservée en mémoire.
+    """
+
+    def __init__(self, fileobj, page_size, image_size):
+        self.fileobj = fileobj
+        self.page_width, self.page_height = page_size
+        self.image_width, self.image_height = image_size
+        self.position = 0
+        # Objets 1 (catalogue) et 2 (arbre des pages) écrits à la fin
+        self.offsets = [None, None]
+        self.page_numbers = []
+        self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.position += len(data)
+
+    def write_object(self, body, number=None):
+        if number is None:
+            self.offsets.append(self.position)
+            number = len(self.offsets)
+        else:
+            self.offsets[number - 1] = self.position
+        self.write(f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+        return number
+
+    def add_page(self, jpeg):
+        image = self.write_object(
+            (
+                f'<< /Type /XObject /Subtype /Image /Width {self.image_width} /Height {self.image_height} '
+                f'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg)} >>\nstream\n'
+            ).encode('ascii') + jpeg + b'\nendstream'
+        )
+        drawing = f'q {self.page_width} 0 0 {self.page_height} 0 0 cm /Im0 Do Q'.encode('ascii')
+        contents = self.write_object(
+            f'<< /Length {len(drawing)} >>\nstream\n'.encode('ascii') + drawing + b'\nendstream'
+        )
+        self.page_numbers.append(self.write_object((
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.page_width} {self.page_height}] '
+            f'/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {contents} 0 R >>'
+        ).encode('ascii')))
+
+    def close(self):
+        kids = ' '.join(f'{number} 0 R' for number in self.page_numbers)
+        self.write_object(b'<< /Type /Catalog /Pages 2 0 R >>', number=1)
+        self.write_object(f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_numbers)} >>'.encode('ascii'), number=2)
+
+        xref_position = self.position
+        size = len(self.offsets) + 1
+        self.write(f'xref\n0 {size}\n0000000000 65535 f \n'.encode('ascii'))
+        self.write(''.join(f'{offset:010d} 00000 n \n' for offset in self.offsets).encode('ascii'))
+        self.write(f'trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n'.encode('ascii'))
+
+
+class DocumentWriter:
+    """Assemble les pages rendues en un PDF unique ou en ZIP d'un PDF par participant"""
+
+    def __init__(self, fileobj, kind, file_format):
+        self.kind = kind
+        self.file_format = file_format
+        self.page_size = PAGE_SIZES[kind][0]
+        self.image_size = page_pixels(kind)
+        if file_format == 'pdf':
+            self.pdf = PdfImageWriter(fileobj, self.page_size, self.image_size)
+        else:
+            # Les JPEG sont déjà compressés: pas de compression ZIP
+            self.archive = zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED)
+
+    def add(self, row, jpeg):
+        if self.file_format == 'pdf':
+            self.pdf.add_page(jpeg)
+            return
+        buffer = io.BytesIO()
+        pdf = PdfImageWriter(buffer, self.page_size, self.image_size)
+        pdf.add_page(jpeg)
+        pdf.close()
+        self.archive.writestr(document_filename(row), buffer.getvalue())
+
+    def close(self):
+        if self.file_format == 'pdf':
+            self.pdf.close()
+        else:
+            self.archive.close()
+
+
+def generate_documents(kind, info, rows, fileobj, file_format='pdf', workers=None, chunk_size=DOCUMENT_CHUNK_SIZE):
+    """Rend et écrit les documents, en parallèle sur `workers` processus
+
+    workers=None utilise tous les cœurs; workers=1 rend dans le processus
+    courant. Les lots sont écrits dans l'ordre dès qu'ils sont prêts.
+    Retourne le nombre de pages écrites.
+    """
+    chunks = chunked(rows, chunk_size)
+    writer = DocumentWriter(fileobj, kind, file_format)
+    count = 0
+    if workers == 1 or len(chunks) <= 1:
+        results = map(render_pages, repeat(kind), repeat(info), chunks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+        results = executor.map(render_pages, repeat(kind), repeat(info), chunks)
+    try:
+        for chunk, pages in zip(chunks, results):
+            for row, jpeg in zip(chunk, pages):
+                writer.add(row, jpeg)
+                count += 1
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    writer.close()
+    return count
+
+
+def write_page_chunk(fileobj, rows, pages):
+    """Lot de pages rendu par une tâche Celery: ZIP des JPEG et des lignes"""
+    import json
+
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_STORED) as archive:
+        archive.writestr('rows.json', json.dumps(rows))
+        for index, jpeg in enumerate(pages):
+            archive.writestr(f'{index:05d}.jpg', jpeg)
+
+
+def read_page_chunk(fileobj):
+    """Itère sur les couples (ligne, JPEG) d'un lot de pages"""
+    import json
+
+    with zipfile.ZipFile(fileobj) as archive:
+        rows = json.loads(archive.read('rows.json'))
+        for index, row in enumerate(rows):
+            yield row, archive.read(f'{index:05d}.jpg')
+
+
+def get_document_filename(event, kind, file_format):
+    return f"{slugify(DOCUMENT_KINDS[kind])}_{slugify(event.title)[:50]}.{file_format}"
@@ -0,0 +1,240 @@
+"""
+Flux iCalendar (ICS) publics: tous les événements, un événement avec son
+programme, et les réservations confirmées d'une salle.
+
+Chaque flux a une version calculée par une requête d'agrégat (dernière
+modification et nombre d'éléments). Elle sert d'ETag et de Last-Modified,
+pour que les clients de calendrier qui interrogent le flux toutes les
+quelques minutes reçoivent un 304. Le contenu est produit ligne à ligne
+en parcourant les objets avec iterator(), envoyé en flux, et mis en cache
+pour cette version une fois la génération terminée.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .agenda import get_event_agenda
+from .models import Event, EventAgenda, StatusChoices
+
+
+ICS_CACHE_TIMEOUT = 60 * 60 * 24
+ICS_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+# Réservations passées conservées dans le flux d'une salle
+ROOM_FEED_HISTORY_DAYS = 90
+ROOM_FEED_STATUSES = ('confirmed', 'completed')
+
+
+class CalendarFeed:
+    """Flux prêt à servir: version (ETag), dernière modification et contenu"""
+
+    def __init__(self, name, title, version, last_modified, lines):
+        self.name = name
+        self.title = title
+        self.version = version
+        self.last_modified = last_modified
+        self.lines = lines
+
+    @property
+    def etag(self):
+        return '"%s"' % hashlib.md5(f'{self.name}:{self.version}'.encode(), usedforsecurity=False).hexdigest()
+
+    @property
+    def cache_key(self):
+        return f'ics_{self.etag.strip(chr(34))}'
+
+    def chunks(self):
+        """Contenu ICS en morceaux, depuis le cache ou généré puis mis en cache"""
+        cached = cache.get(self.cache_key)
+        if cached is not None:
+            yield cached
+            return
+        parts = []
+        for chunk in calendar_chunks(self.title, self.lines()):
+            parts.append(chunk)
+            yield chunk
+        cache.set(self.cache_key, b''.join(parts), ICS_CACHE_TIMEOUT)
+
+
+# ----------------------------------------------------------------------------
+# Format iCalendar (RFC 5545)
+# ----------------------------------------------------------------------------
+
+def escape_text(value):
+    return (
+        str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Coupe une ligne à 75 octets, les suites commençant par une espace"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return data + b'\r\n'
+    parts = []
+    limit = 75
+    while data:
+        cut = min(limit, len(data))
+        # Ne pas couper au milieu d'un caractère UTF-8
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+        limit = 74
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def format_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def calendar_domain():
+    return urlparse(settings.SITE_URL).hostname or 'localhost'
+
+
+def vevent(uid, start, end, summary, description='', location='', url='', last_modified=None):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}@{calendar_domain()}',
+        f'DTSTAMP:{format_datetime(last_modified or timezone.now())}',
+        f'DTSTART:{format_datetime(start)}',
+        f'DTEND:{format_datetime(end)}',
+        f'SUMMARY:{escape_text(summary)}',
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{escape_text(description)}')
+    if location:
+        lines.append(f'LOCATION:{escape_text(location)}')
+    if url:
+        lines.append(f'URL:{url}')
+    if last_modified:
+        lines.append(f'LAST-MODIFIED:{format_datetime(last_modified)}')
+    lines.append('END:VEVENT')
+    return lines
+
+
+def calendar_chunks(title, events_lines, batch_size=200):
+    """Enveloppe VCALENDAR autour des VEVENT, par morceaux de batch_size événements"""
+    header = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//CSIG//{calendar_domain()}//FR',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(title)}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+    ]
+    yield b''.join(fold_line(line) for line in header)
+    batch = []
+    for index, lines in enumerate(events_lines, start=1):
+        batch.extend(fold_line(line) for line in lines)
+        if index % batch_size == 0:
+            yield b''.join(batch)
+            batch = []
+    batch.append(fold_line('END:VCALENDAR'))
+    yield b''.join(batch)
+
+
+# ----------------------------------------------------------------------------
+# Flux
+# ----------------------------------------------------------------------------
+
+def event_bounds(event):
+    start = timezone.make_aware(datetime.combine(event.start_date, event.start_time))
+    end = timezone.make_aware(datetime.combine(event.end_date, event.end_time))
+    return start, max(end, start)
+
+
+def event_lines(event):
+    start, end = event_bounds(event)
+    return vevent(
+        f'event-{event.pk}', start, end, event.title,
+        description=Truncator(event.meta_description or '').chars(500),
+        location=event.full_location,
+        url=settings.SITE_URL + reverse('sfront:event_detail', args=[event.slug]),
+        last_modified=event.updated_at,
+    )
+
+
+def public_events():
+    return Event.objects.filter(status=StatusChoices.PUBLISHED, is_public=True)
+
+
+def events_feed():
+    """Tous les événements publics"""
+    summary = public_events().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+
+    def lines():
+        for event in public_events().order_by('start_date', 'pk').iterator(chunk_size=500):
+            yield event_lines(event)
+
+    return CalendarFeed(
+        'events', "Événements CSIG", f"{summary['count']}:{summary['last_modified']}",
+        summary['last_modified'], lines,
+    )
+
+
+def event_feed(event):
+    """Un événement et les activités de son programme
+
+    La version suit l'ETag du programme en cache (invalidé par les signaux
+    des jours, activités et intervenants). Le programme n'a pas de date de
+    modification: celle de sa mise en cache la remplace.
+    """
+    agenda = get_event_agenda(event)
+
+    def lines():
+        yield event_lines(event)
+        activities = EventAgenda.objects.filter(event_day__event=event).select_related('event_day').order_by(
+            'event_day__date', 'start_time', 'order'
+        )
+        for activity in activities.iterator(chunk_size=500):
+            start = timezone.make_aware(datetime.combine(activity.event_day.date, activity.start_time))
+            end = timezone.make_aware(datetime.combine(activity.event_day.date, activity.end_time))
+            yield vevent(
+                f'event-{event.pk}-activity-{activity.pk}', start, max(start, end),
+                f'{activity.activity} ({event.title})',
+                description=activity.description,
+                location=activity.location or event.location,
+                last_modified=event.updated_at,
+            )
+
+    return CalendarFeed(
+        f'event-{event.pk}', event.title, f"{event.updated_at.isoformat()}:{agenda['etag']}",
+        max(event.updated_at, agenda['built_at']), lines,
+    )
+
+
+def room_feed(room, now=None):
+    """Réservations confirmées d'une salle (sans les informations des organisations)"""
+    now = now or timezone.now()
+    since = now - timedelta(days=ROOM_FEED_HISTORY_DAYS)
+    bookings = room.bookings.filter(status__in=ROOM_FEED_STATUSES, end_time__gte=since)
+    # Une réservation annulée modifie updated_at même si elle sort du flux
+    summary = room.bookings.filter(end_time__gte=since).aggregate(
+        last_modified=Max('updated_at'), count=Count('pk', filter=Q(status__in=ROOM_FEED_STATUSES))
+    )
+
+    def lines():
+        for booking in bookings.order_by('start_time', 'pk').only(
+            'pk', 'event_title', 'start_time', 'end_time', 'updated_at'
+        ).iterator(chunk_size=500):
+            yield vevent(
+                f'booking-{booking.pk}', booking.start_time, booking.end_time, booking.event_title,
+                location=room.name, last_modified=booking.updated_at,
+            )
+
+    return CalendarFeed(
+        f'room-{room.pk}',
+        f"Réservations - {room.name}",
+        f"{since.date()}:{summary['count']}:{summary['last_modified']}:{room.name}",
+        summary['last_modified'] or room.updated_at,
+        lines,
+    )
@@ -0,0 +1,291 @@
+"""
+Envoi des campagnes de newsletter par lots.
+
+Les abonnés ciblés sont parcourus par clé (id > curseur de la campagne) et
+répartis en lots de CAMPAIGN_CHUNK_SIZE destinataires
+(NewsletterCampaignChunk); le curseur est enregistré avec chaque groupe de
+lots. Chaque lot est envoyé par une seule tâche, avec une seule connexion
+SMTP; les tâches des lots forment un chord dont la tâche finale clôt la
+campagne une fois tous les lots traités. 100 000 abonnés font ainsi 1 000
+tâches, pas 100 000.
+
+Le message est rendu une fois par langue avec des marqueurs, remplacés
+ensuite pour chaque abonné (comme les rappels, voir reminders.py). Chaque
+lot enregistre son propre curseur et ses NewsletterLog tous les
+CHUNK_PROGRESS_EVERY emails: une campagne interrompue reprend lot par lot
+là où elle s'était arrêtée (jobs.newsletter_tasks.resume_stalled_campaigns).
+"""
+from datetime import timedelta
+from smtplib import SMTPConnectError, SMTPDataError, SMTPRecipientsRefused, SMTPServerDisconnected
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.template.loader import select_template
+from django.utils import timezone, translation
+
+from .badges import chunked
+from .models import NewsletterCampaign, NewsletterCampaignChunk
+from .reminders import personalize, placeholder
+
+
+CAMPAIGN_CHUNK_SIZE = 100
+# Lots créés par transaction lors de la répartition
+PLANNING_CHUNKS = 100
+CHUNK_PROGRESS_EVERY = 20
+# Un lot « en cours » sans progrès depuis ce délai est considéré interrompu
+CHUNK_STALE_AFTER = timedelta(minutes=30)
+DEFAULT_TEMPLATE_NAME = 'newsletter_campaign'
+UNFINISHED_STATUSES = ('pending', 'sending')
+
+# Champs personnels remplacés après le rendu du message
+PLACEHOLDER_FIELDS = ('first_name', 'last_name', 'email', 'unsubscribe_url')
+
+# Refus propres à un destinataire: l'abonné est noté en échec, le lot continue
+RECIPIENT_ERRORS = (SMTPRecipientsRefused, SMTPDataError)
+# Connexion perdue: le lot est interrompu et repris au curseur (SMTPException hérite d'OSError)
+CONNECTION_ERRORS = (SMTPServerDisconnected, SMTPConnectError, OSError)
+
+
+class CampaignNotSendable(Exception):
+    """La campagne n'est ni prête à partir ni en cours d'envoi"""
+
+
+# ----------------------------------------------------------------------------
+# Répartition en lots
+# ----------------------------------------------------------------------------
+
+def start_campaign(campaign_id, resume=False, now=None):
+    """Passe la campagne en cours d'envoi; avec resume, accepte aussi une campagne interrompue ou échouée"""
+    now = now or timezone.now()
+    ready = NewsletterCampaign.objects.filter(pk=campaign_id, status__in=('draft', 'scheduled')).filter(
+        Q(scheduled_at__isnull=True) | Q(scheduled_at__lte=now)
+    )
+    if ready.update(status='sending', started_at=now, completed_at=None):
+        return NewsletterCampaign.objects.get(pk=campaign_id)
+    if resume and NewsletterCampaign.objects.filter(pk=campaign_id, status__in=('sending', 'failed')).update(
+        status='sending', completed_at=None
+    ):
+        return NewsletterCampaign.objects.get(pk=campaign_id)
+    raise CampaignNotSendable(f"La campagne {campaign_id} ne peut pas être envoyée")
+
+
+def plan_campaign_chunks(campaign, chunk_size=CAMPAIGN_CHUNK_SIZE, planning_chunks=PLANNING_CHUNKS):
+    """Répartit en lots les abonnés qui suivent le curseur de la campagne; retourne le nombre de lots créés"""
+    created = 0
+    batch_size = chunk_size * planning_chunks
+    while True:
+        with transaction.atomic():
+            # Verrou de la campagne: deux répartitions simultanées ne créent pas les mêmes lots
+            campaign = NewsletterCampaign.objects.select_for_update().get(pk=campaign.pk)
+            subscriber_ids = list(
+                campaign.recipients().filter(pk__gt=campaign.last_subscriber_id)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not subscriber_ids:
+                return created
+            next_index = (campaign.chunks.aggregate(index=Max('index'))['index'] or 0) + 1
+            chunks = [
+                NewsletterCampaignChunk(
+                    campaign=campaign,
+                    index=next_index + position,
+                    first_subscriber_id=ids[0],
+                    last_subscriber_id=ids[-1],
+                    recipients_count=len(ids),
+                )
+                for position, ids in enumerate(chunked(subscriber_ids, chunk_size))
+            ]
+            NewsletterCampaignChunk.objects.bulk_create(chunks)
+            NewsletterCampaign.objects.filter(pk=campaign.pk).update(
+                last_subscriber_id=subscriber_ids[-1],
+                recipients_count=F('recipients_count') + len(subscriber_ids),
+            )
+        created += len(chunks)
+        if len(subscriber_ids) < batch_size:
+            return created
+
+
+def unfinished_chunk_ids(campaign):
+    return list(campaign.chunks.exclude(status='sent').order_by('index').values_list('pk', flat=True))
+
+
+# ----------------------------------------------------------------------------
+# Rendu
+# ----------------------------------------------------------------------------
+
+def campaign_templates(campaign, extension):
+    names = [DEFAULT_TEMPLATE_NAME]
+    if campaign.template_name:
+        names.insert(0, campaign.template_name.rsplit('.', 1)[0])
+    return select_template([f'email_templates/{name}.{extension}' for name in names])
+
+
+def render_campaign(campaign, language):
+    """Rend (sujet, HTML, texte) une fois pour une langue, avec des marqueurs personnels"""
+    context = {
+        'campaign': campaign,
+        'subscriber': {name: placeholder(name) for name in PLACEHOLDER_FIELDS},
+        'unsubscribe_url': placeholder('unsubscribe_url'),
+        'current_date': timezone.now(),
+    }
+    with translation.override(language):
+        return (
+            campaign.subject,
+            campaign_templates(campaign, 'html').render(context),
+            campaign_templates(campaign, 'txt').render(context),
+        )
+
+
+def build_campaign_message(subscriber, rendered, connection=None):
+    subject, html_content, text_content = rendered
+    values = {
+        'first_name': subscriber.first_name,
+        'last_name': subscriber.last_name,
+        'email': subscriber.email,
+        'unsubscribe_url': f"{settings.SITE_URL}/newsletter/unsubscribe/{subscriber.pk}/",
+    }
+    email = EmailMultiAlternatives(
+        subject=personalize(subject, values),
+        body=personalize(html_content, values, html=True),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[subscriber.email],
+        reply_to=[settings.DEFAULT_FROM_EMAIL],
+        connection=connection,
+    )
+    email.content_subtype = "html"
+    email.attach_alternative(personalize(text_content, values), "text/plain")
+    return email
+
+
+# ----------------------------------------------------------------------------
+# Envoi d'un lot
+# ----------------------------------------------------------------------------
+
+def claim_chunk(chunk_id, now=None):
+    """Réserve le lot pour un seul worker (en attente, échoué ou interrompu)"""
+    now = now or timezone.now()
+    return NewsletterCampaignChunk.objects.filter(pk=chunk_id).filter(
+        Q(status__in=('pending', 'failed')) | Q(status='sending', updated_at__lt=now - CHUNK_STALE_AFTER)
+    ).update(status='sending', started_at=now, error_message='', updated_at=now)
+
+
+def chunk_recipients(chunk):
+    """Abonnés du lot restant à traiter, toujours ciblés par la campagne, dans l'ordre du curseur"""
+    return chunk.campaign.recipients().filter(
+        pk__gte=chunk.first_subscriber_id, pk__lte=chunk.last_subscriber_id, pk__gt=chunk.cursor,
+    ).order_by('pk').only('pk', 'email', 'first_name', 'last_name', 'language')
+
+
+def record_chunk_progress(chunk, logs):
+    """Enregistre les NewsletterLog et avance le curseur du lot, dans une transaction"""
+    from jobs.models import NewsletterLog
+
+    if not logs:
+        return
+    sent = sum(1 for log in logs if log.status == 'sent')
+    with transaction.atomic():
+        NewsletterLog.objects.bulk_create(logs, ignore_conflicts=True)
+        NewsletterCampaignChunk.objects.filter(pk=chunk.pk).update(
+            cursor=logs[-1].subscriber_id,
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + len(logs) - sent,
+            updated_at=timezone.now(),
+        )
+
+
+def deliver_chunk(chunk_id, progress_every=CHUNK_PROGRESS_EVERY):
+    """Envoie un lot avec une seule connexion SMTP
+
+    Retourne (envoyés, échecs), ou None si le lot est déjà traité ou pris
+    par un autre worker. Seuls les refus propres à un destinataire sont
+    notés en échec; une erreur de connexion est propagée après
+    l'enregistrement des emails déjà envoyés, et la nouvelle tentative
+    reprend au curseur du lot.
+    """
+    from jobs.models import NewsletterLog
+
+    if not claim_chunk(chunk_id):
+        return None
+    chunk = NewsletterCampaignChunk.objects.select_related('campaign').get(pk=chunk_id)
+    rendered = {}
+    logs = []
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for subscriber in chunk_recipients(chunk):
+            if subscriber.language not in rendered:
+                rendered[subscriber.language] = render_campaign(chunk.campaign, subscriber.language)
+            now = timezone.now()
+            try:
+                build_campaign_message(subscriber, rendered[subscriber.language], connection).send()
+                logs.append(NewsletterLog(campaign_id=chunk.campaign_id, subscriber=subscriber, status='sent', sent_at=now))
+                sent += 1
+            except Exception as exc:
+                if isinstance(exc, CONNECTION_ERRORS) and not isinstance(exc, RECIPIENT_ERRORS):
+                    raise
+                logs.append(NewsletterLog(
+                    campaign_id=chunk.campaign_id, subscriber=subscriber, status='failed', error_message=str(exc),
+                ))
+                failed += 1
+            if len(logs) >= progress_every:
+                record_chunk_progress(chunk, logs)
+                logs = []
+    finally:
+        record_chunk_progress(chunk, logs)
+        connection.close()
+
+    NewsletterCampaignChunk.objects.filter(pk=chunk_id).update(
+        status='sent', completed_at=timezone.now(), updated_at=timezone.now()
+    )
+    return sent, failed
+
+
+def fail_chunk(chunk_id, error):
+    NewsletterCampaignChunk.objects.filter(pk=chunk_id).update(
+        status='failed', error_message=str(error), updated_at=timezone.now()
+    )
+
+
+def release_chunk(chunk_id):
+    """Remet le lot en attente pour une nouvelle tentative"""
+    NewsletterCampaignChunk.objects.filter(pk=chunk_id, status='sending').update(
+        status='pending', updated_at=timezone.now()
+    )
+
+
+# ----------------------------------------------------------------------------
+# Clôture et reprise
+# ----------------------------------------------------------------------------
+
+def finalize_campaign(campaign_id, now=None):
+    """Clôt la campagne si tous ses lots sont traités; retourne son statut final ou None"""
+    campaign = NewsletterCampaign.objects.get(pk=campaign_id)
+    if campaign.recipients().filter(pk__gt=campaign.last_subscriber_id).exists():
+        # Répartition interrompue: la reprise créera les lots manquants
+        return None
+    totals = campaign.chunks.aggregate(
+        sent=Sum('sent_count', default=0),
+        failed=Sum('failed_count', default=0),
+        unfinished=Count('pk', filter=Q(status__in=UNFINISHED_STATUSES)),
+        failed_chunks=Count('pk', filter=Q(status='failed')),
+    )
+    if totals['unfinished']:
+        return None
+    status = 'failed' if totals['failed_chunks'] else 'completed'
+    NewsletterCampaign.objects.filter(pk=campaign_id, status='sending').update(
+        status=status, sent_count=totals['sent'], failed_count=totals['failed'],
+        completed_at=now or timezone.now(),
+    )
+    return status
+
+
+def stalled_campaign_ids(now=None):
+    """Campagnes en cours d'envoi sans progrès depuis CHUNK_STALE_AFTER"""
+    threshold = (now or timezone.now()) - CHUNK_STALE_AFTER
+    return list(
+        NewsletterCampaign.objects.filter(status='sending', started_at__lt=threshold).annotate(
+            last_progress=Max('chunks__updated_at')
+        ).filter(Q(last_progress__isnull=True) | Q(last_progress__lt=threshold)).values_list('pk', flat=True)
+    )
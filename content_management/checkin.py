@@ -0,0 +1,184 @@
+"""
+Billets QR et contrôle des entrées aux événements.
+
+Le QR code d'un billet contient l'identifiant d'inscription signé
+(« REG-XXXXXXXX:signature »): il est disponible dès l'inscription et ne peut
+pas être deviné à partir d'un autre billet. Au contrôle, la signature est
+vérifiée puis l'inscription est retrouvée par l'index unique de
+registration_id.
+
+Le pointage est idempotent: seul le premier passage enregistre l'heure
+d'entrée, les suivants renvoient « déjà entré » avec l'heure d'origine. Les
+scanners hors ligne téléchargent la liste compacte des billets de
+l'événement puis envoient leurs pointages par lots (sync_check_ins).
+"""
+from django.core import signing
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import EventRegistration
+
+
+TICKET_SALT = 'content_management.ticket'
+CHECK_IN_STATUSES = ('pending', 'confirmed')
+MAX_SYNC_BATCH = 1000
+
+ticket_signer = signing.Signer(salt=TICKET_SALT)
+
+
+def ticket_code(registration_id):
+    """Contenu du QR code d'un billet"""
+    return ticket_signer.sign(registration_id)
+
+
+def read_ticket_code(code):
+    """Retourne l'identifiant d'inscription d'un billet, ou None si la signature est invalide"""
+    try:
+        return ticket_signer.unsign((code or '').strip())
+    except signing.BadSignature:
+        return None
+
+
+def ticket_qr_svg(code):
+    """QR code du billet au format SVG"""
+    import qrcode
+    from qrcode.image.svg import SvgPathImage
+
+    image = qrcode.make(code, image_factory=SvgPathImage, box_size=10, border=2)
+    return image.to_string(encoding='unicode')
+
+
+def check_in_result(result, registration=None, checked_in_at=None):
+    data = {'result': result}
+    if registration is not None:
+        data.update({
+            'registration_id': registration.registration_id,
+            'name': registration.full_name,
+            'status': registration.status,
+        })
+    if checked_in_at is not None:
+        data['checked_in_at'] = checked_in_at.isoformat()
+    return data
+
+
+def check_in(event, code, user=None, device='', scanned_at=None):
+    """Enregistre l'entrée d'un participant à partir du contenu de son billet
+
+    Résultats possibles: checked_in, already_checked_in, refused (inscription
+    annulée ou en liste d'attente), not_found, invalid (signature incorrecte).
+    """
+    registration_id = read_ticket_code(code)
+    if registration_id is None:
+        return check_in_result('invalid')
+
+    scanned_at = scanned_at or timezone.now()
+    # Un seul UPDATE conditionnel: l'heure d'entrée n'est jamais écrasée
+    updated = EventRegistration.objects.filter(
+        form__event=event,
+        registration_id=registration_id,
+        status__in=CHECK_IN_STATUSES,
+        checked_in_at__isnull=True,
+    ).update(checked_in_at=scanned_at, checked_in_by=user, check_in_device=device)
+
+    registration = EventRegistration.objects.filter(
+        form__event=event, registration_id=registration_id
+    ).only('registration_id', 'first_name', 'last_name', 'status', 'checked_in_at').first()
+    if registration is None:
+        return check_in_result('not_found')
+    if updated:
+        return check_in_result('checked_in', registration, registration.checked_in_at)
+    if registration.checked_in_at is not None:
+        return check_in_result('already_checked_in', registration, registration.checked_in_at)
+    return check_in_result('refused', registration)
+
+
+def sync_check_ins(event, entries, user=None, device=''):
+    """Applique un lot de pointages effectués hors ligne
+
+    entries: liste de {"code": ..., "scanned_at": ISO 8601}. Les billets sont
+    chargés en une requête et verrouillés, puis les nouvelles entrées sont
+    écrites par un seul bulk_update. Pour un billet scanné plusieurs fois, le
+    premier passage est retenu.
+    """
+    now = timezone.now()
+    scans = {}
+    results = []
+    for entry in entries[:MAX_SYNC_BATCH]:
+        code = entry.get('code', '')
+        registration_id = read_ticket_code(code)
+        if registration_id is None:
+            results.append({'code': code, **check_in_result('invalid')})
+            continue
+        scanned_at = parse_datetime(entry.get('scanned_at') or '') or now
+        if timezone.is_naive(scanned_at):
+            scanned_at = timezone.make_aware(scanned_at)
+        # Une heure de passage dans le futur est ramenée à l'heure de réception
+        scanned_at = min(scanned_at, now)
+        if registration_id not in scans or scanned_at < scans[registration_id][1]:
+            scans[registration_id] = (code, scanned_at)
+
+    with transaction.atomic():
+        registrations = {
+            registration.registration_id: registration
+            for registration in EventRegistration.objects.select_for_update().filter(
+                form__event=event, registration_id__in=list(scans)
+            ).only('registration_id', 'first_name', 'last_name', 'status', 'checked_in_at')
+        }
+
+        to_update = []
+        for registration_id, (code, scanned_at) in scans.items():
+            registration = registrations.get(registration_id)
+            if registration is None:
+                results.append({'code': code, **check_in_result('not_found')})
+            elif registration.checked_in_at is not None:
+                results.append({'code': code, **check_in_result(
+                    'already_checked_in', registration, registration.checked_in_at
+                )})
+            elif registration.status not in CHECK_IN_STATUSES:
+                results.append({'code': code, **check_in_result('refused', registration)})
+            else:
+                registration.checked_in_at = scanned_at
+                registration.checked_in_by = user
+                registration.check_in_device = device
+                to_update.append(registration)
+                results.append({'code': code, **check_in_result('checked_in', registration, scanned_at)})
+
+        if to_update:
+            EventRegistration.objects.bulk_update(
+                to_update, ['checked_in_at', 'checked_in_by', 'check_in_device']
+            )
+    return results
+
+
+def build_roster(event):
+    """Liste compacte des billets d'un événement pour les scanners hors ligne
+
+    Chaque ligne: [code du billet, nom complet, statut, heure d'entrée ou None].
+    """
+    rows = EventRegistration.objects.filter(form__event=event).order_by('pk').values_list(
+        'registration_id', 'first_name', 'last_name', 'status', 'checked_in_at'
+    )
+    return {
+        'event': event.pk,
+        'generated_at': timezone.now().isoformat(),
+        'admitted_statuses': list(CHECK_IN_STATUSES),
+        'columns': ['code', 'name', 'status', 'checked_in_at'],
+        'rows': [
+            [
+                ticket_code(registration_id),
+                f"{first_name} {last_name}",
+                status,
+                checked_in_at.isoformat() if checked_in_at else None,
+            ]
+            for registration_id, first_name, last_name, status, checked_in_at in rows.iterator(chunk_size=2000)
+        ],
+    }
+
+
+def check_in_summary(event):
+    registrations = EventRegistration.objects.filter(form__event=event, status__in=CHECK_IN_STATUSES)
+    return {
+        'expected': registrations.count(),
+        'checked_in': registrations.filter(checked_in_at__isnull=False).count(),
+    }
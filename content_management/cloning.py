@@ -0,0 +1,158 @@
+"""
+Duplication complète d'un événement (éditions récurrentes).
+
+Copie l'événement, ses tags, jours, activités (avec leurs intervenants),
+FAQ, organisateurs et son formulaire d'inscription avec champs et options.
+Chaque niveau est inséré en un seul bulk_create; les clés étrangères vers
+les objets copiés sont réaffectées en mémoire à partir des correspondances
+ancien id -> nouvel objet. Les inscriptions ne sont jamais copiées.
+
+Les dates (événement, jours, date limite d'inscription) sont décalées de
+l'écart entre l'ancienne et la nouvelle date de début. Les fichiers
+(images, logos) ne sont pas dupliqués: la copie référence les mêmes.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import (
+    Event, EventAgenda, EventDay, EventFAQ, EventOrganizer, EventRegistrationForm,
+    FormField, FormFieldOption, StatusChoices,
+)
+
+
+COPY_SUFFIX = " (copie)"
+
+
+def copy_instance(instance, **changes):
+    """Copie non enregistrée d'une instance (sans clé primaire)"""
+    values = {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if not field.primary_key
+    }
+    values.update(changes)
+    return type(instance)(**values)
+
+
+def copy_title(event):
+    """« <titre> (copie) », le titre étant raccourci pour tenir dans Event.title"""
+    max_length = Event._meta.get_field('title').max_length
+    return event.title[:max_length - len(COPY_SUFFIX)] + COPY_SUFFIX
+
+
+def unique_event_slug(title):
+    base_slug = slugify(title)[:190] or 'evenement'
+    existing = set(Event.objects.filter(slug__startswith=base_slug).values_list('slug', flat=True))
+    slug = base_slug
+    counter = 2
+    while slug in existing:
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    return slug
+
+
+def clone_event(event, title=None, start_date=None, status=StatusChoices.DRAFT):
+    """Duplique un événement et tout son contenu, retourne le nouvel événement
+
+    title: titre de la copie (par défaut « <titre> (copie) »)
+    start_date: nouvelle date de début; toutes les dates sont décalées d'autant
+    """
+    shift = timedelta(0)
+    if start_date is not None:
+        shift = start_date - event.start_date
+    title = title or copy_title(event)
+
+    with transaction.atomic():
+        new_event = copy_instance(
+            event,
+            title=title,
+            slug=unique_event_slug(title),
+            start_date=event.start_date + shift,
+            end_date=event.end_date + shift,
+            status=status,
+            is_featured=False,
+        )
+        new_event.save()
+
+        tag_ids = list(event.tags.values_list('pk', flat=True))
+        if tag_ids:
+            new_event.tags.add(*tag_ids)
+
+        clone_agenda(event, new_event, shift)
+
+        EventFAQ.objects.bulk_create([
+            copy_instance(faq, event_id=new_event.pk) for faq in event.faqs.all()
+        ])
+        EventOrganizer.objects.bulk_create([
+            copy_instance(organizer, event_id=new_event.pk) for organizer in event.organizers.all()
+        ])
+
+        registration_form = EventRegistrationForm.objects.filter(event=event).first()
+        if registration_form is not None:
+            clone_registration_form(registration_form, new_event, shift)
+
+    return new_event
+
+
+def clone_agenda(event, new_event, shift):
+    """Jours, activités et liens activité-intervenant: une insertion par niveau"""
+    days = list(event.days.all())
+    if not days:
+        return
+    new_days = EventDay.objects.bulk_create([
+        copy_instance(day, event_id=new_event.pk, date=day.date + shift) for day in days
+    ])
+    day_map = {day.pk: new_day for day, new_day in zip(days, new_days)}
+
+    activities = list(EventAgenda.objects.filter(event_day__event=event).order_by('pk'))
+    if not activities:
+        return
+    new_activities = EventAgenda.objects.bulk_create([
+        copy_instance(activity, event_day_id=day_map[activity.event_day_id].pk) for activity in activities
+    ])
+    activity_map = {activity.pk: new_activity for activity, new_activity in zip(activities, new_activities)}
+
+    Through = EventAgenda.intervenants.through
+    Through.objects.bulk_create([
+        Through(eventagenda_id=activity_map[eventagenda_id].pk, eventintervenant_id=eventintervenant_id)
+        for eventagenda_id, eventintervenant_id in Through.objects.filter(
+            eventagenda__event_day__event=event
+        ).values_list('eventagenda_id', 'eventintervenant_id')
+    ])
+
+
+def clone_registration_form(registration_form, new_event, shift):
+    """Formulaire, champs (avec leurs dépendances) et options"""
+    deadline = registration_form.registration_deadline
+    new_form = copy_instance(
+        registration_form,
+        event_id=new_event.pk,
+        registration_deadline=deadline + shift if deadline else None,
+    )
+    # bulk_create évite le signal post_save, sans objet pour un formulaire sans inscription
+    EventRegistrationForm.objects.bulk_create([new_form])
+
+    fields = list(registration_form.fields.order_by('pk'))
+    if not fields:
+        return new_form
+    new_fields = FormField.objects.bulk_create([
+        copy_instance(field, form_id=new_form.pk, depends_on_id=None) for field in fields
+    ])
+    field_map = {field.pk: new_field for field, new_field in zip(fields, new_fields)}
+
+    dependent = []
+    for field in fields:
+        if field.depends_on_id in field_map:
+            new_field = field_map[field.pk]
+            new_field.depends_on_id = field_map[field.depends_on_id].pk
+            dependent.append(new_field)
+    if dependent:
+        FormField.objects.bulk_update(dependent, ['depends_on'])
+
+    FormFieldOption.objects.bulk_create([
+        copy_instance(option, field_id=field_map[option.field_id].pk)
+        for option in FormFieldOption.objects.filter(field__form=registration_form)
+    ])
+    return new_form
@@ -0,0 +1,85 @@
+"""
+Emails de confirmation d'inscription.
+
+L'email n'est jamais envoyé pendant la requête: à la validation de la
+transaction, les inscriptions concernées sont confiées à Celery (file
+« email ») qui rend le message et l'ajoute à jobs.models.EmailQueue.
+L'envoi SMTP est ensuite groupé (jobs.email_tasks.send_pending_emails).
+
+Le contenu provient de l'EmailTemplate « event_registration_confirmation »
+s'il existe et est actif, sinon des gabarits
+email_templates/event_registration_confirmation.{html,txt}.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+
+CONFIRMATION_TEMPLATE_NAME = 'event_registration_confirmation'
+DEFAULT_CONFIRMATION_SUBJECT = "Confirmation de votre inscription : {event}"
+
+
+def schedule_confirmation_email(registration):
+    """Planifie l'email de confirmation après la validation de la transaction"""
+    if not registration.form.send_confirmation_email or not registration.email:
+        return
+    from jobs.email_tasks import send_registration_confirmations
+
+    registration_id = registration.pk
+    transaction.on_commit(lambda: send_registration_confirmations.delay([registration_id]))
+
+
+def get_confirmation_template():
+    from jobs.models import EmailTemplate
+
+    return EmailTemplate.objects.filter(name=CONFIRMATION_TEMPLATE_NAME, is_active=True).first()
+
+
+def confirmation_context(registration):
+    event = registration.form.event
+    return {
+        'registration': registration,
+        'event': event,
+        'registration_form': registration.form,
+        'confirmation_message': registration.form.confirmation_message,
+        'ticket_code': registration.ticket_code,
+        'event_url': settings.SITE_URL + reverse('sfront:event_detail', args=[event.slug]),
+        'current_date': timezone.now(),
+    }
+
+
+def render_confirmation(registration, template=None):
+    """Retourne (sujet, contenu HTML, contenu texte) de l'email de confirmation"""
+    context = confirmation_context(registration)
+    if template is not None:
+        return (
+            template.get_subject(context).strip(),
+            template.get_html_content(context),
+            template.get_text_content(context),
+        )
+    return (
+        DEFAULT_CONFIRMATION_SUBJECT.format(event=context['event'].title),
+        render_to_string('email_templates/event_registration_confirmation.html', context),
+        render_to_string('email_templates/event_registration_confirmation.txt', context),
+    )
+
+
+def build_confirmation_emails(registrations, priority=3):
+    """Emails de confirmation (non enregistrés) pour une liste d'inscriptions"""
+    from jobs.models import EmailQueue
+
+    template = get_confirmation_template()
+    emails = []
+    for registration in registrations:
+        subject, html_content, text_content = render_confirmation(registration, template)
+        emails.append(EmailQueue(
+            to_email=registration.email,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            subject=subject[:200],
+            html_content=html_content,
+            text_content=text_content,
+            priority=priority,
+        ))
+    return emails
@@ -0,0 +1,296 @@
+"""
+Moteur de conflits des réservations de salle.
+
+Les réservations actives (en attente ou confirmées), les maintenances
+planifiées ou en cours et l'indisponibilité déclarée d'une salle
+(maintenance_until) sont lues dans la couche de disponibilité
+(availability.py, mise en cache par salle et par mois), puis rangées dans
+un index d'intervalles trié par heure de début.
+
+L'index conserve aussi le maximum cumulé des heures de fin: deux
+recherches dichotomiques bornent les intervalles pouvant chevaucher un
+créneau. L'existence d'un conflit est ainsi connue en O(log n) et la
+liste des conflits en O(log n + k). Un lot de créneaux candidats
+(check_slots) se vérifie sans nouvelle requête.
+
+Sur PostgreSQL, une contrainte d'exclusion (RoomBooking.Meta.constraints)
+interdit en base deux réservations actives qui se chevauchent dans la même
+salle, même lorsque deux requêtes simultanées passent la vérification.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from itertools import accumulate
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .availability import SINCE_EVER, load_room_months, months_of_period
+
+
+# Statuts couverts par la contrainte roombooking_no_overlap (RoomBooking.Meta.constraints)
+ACTIVE_BOOKING_STATUSES = ('confirmed', 'pending')
+BOOKING_OVERLAP_CONSTRAINT = 'roombooking_no_overlap'
+
+# Indisponibilité déclarée sur la salle, traitée comme une maintenance
+RoomUnavailability = namedtuple('RoomUnavailability', 'start_date end_date title')
+
+
+class BookingConflictError(Exception):
+    """La base a refusé une réservation qui chevauche une réservation active"""
+
+    def __init__(self, booking, conflicts):
+        self.booking = booking
+        self.conflicts = conflicts
+        self.summary = summarize_conflicts(conflicts)
+        super().__init__(self.summary['message'] if conflicts else _("Cette salle est déjà réservée sur ce créneau."))
+
+
+def save_booking(booking, **kwargs):
+    """Enregistre la réservation; BookingConflictError si la contrainte de non-chevauchement la refuse"""
+    try:
+        with transaction.atomic():
+            booking.save(**kwargs)
+    except IntegrityError as error:
+        if BOOKING_OVERLAP_CONSTRAINT not in str(error):
+            raise
+        raise BookingConflictError(booking, booking.get_conflicts_report()) from error
+    return booking
+
+
+def ensure_aware(value):
+    """Les dates sans fuseau horaire sont traitées comme UTC"""
+    if value is not None and timezone.is_naive(value):
+        return timezone.make_aware(value, dt_timezone.utc)
+    return value
+
+
+class IntervalIndex:
+    """Intervalles [début, fin) triés, avec le maximum cumulé des fins"""
+
+    def __init__(self, items, start=lambda item: item.start_time, end=lambda item: item.end_time):
+        self.items = sorted(items, key=start)
+        self.starts = [start(item) for item in self.items]
+        self.ends = [end(item) for item in self.items]
+        self.max_ends = list(accumulate(self.ends, max))
+
+    def __len__(self):
+        return len(self.items)
+
+    def bounds(self, start, end):
+        """Indices [lo, hi) des intervalles pouvant chevaucher [start, end)
+
+        Avant lo, tous les intervalles se terminent au plus tard à start;
+        à partir de hi, tous commencent au plus tôt à end.
+        """
+        return bisect_right(self.max_ends, start), bisect_left(self.starts, end)
+
+    def has_overlap(self, start, end):
+        # L'intervalle lo se termine après start (sinon max_ends[lo] <= start)
+        # et commence avant end si lo < hi: il chevauche le créneau.
+        lo, hi = self.bounds(start, end)
+        return lo < hi
+
+    def overlapping(self, start, end):
+        lo, hi = self.bounds(start, end)
+        return [self.items[index] for index in range(lo, hi) if self.ends[index] > start]
+
+    def overlap_seconds(self, start, end):
+        """Durée cumulée des chevauchements avec [start, end)"""
+        lo, hi = self.bounds(start, end)
+        return sum(
+            (min(end, self.ends[index]) - max(start, self.starts[index])).total_seconds()
+            for index in range(lo, hi)
+            if self.ends[index] > start
+        )
+
+
+class RoomSchedule:
+    """Réservations et maintenances d'une salle sur une période, indexées"""
+
+    def __init__(self, room_id, bookings, maintenances=()):
+        self.room_id = room_id
+        self.bookings = IntervalIndex(bookings)
+        self.maintenances = IntervalIndex(
+            maintenances, start=lambda item: item.start_date, end=lambda item: item.end_date
+        )
+
+    @classmethod
+    def load(cls, room_id, start, end, exclude_booking_id=None, statuses=ACTIVE_BOOKING_STATUSES):
+        """Planning de la salle pour la période [start, end)"""
+        return cls.load_many([room_id], start, end, exclude_booking_id, statuses)[int(room_id)]
+
+    @classmethod
+    def load_many(cls, room_ids, start, end, exclude_booking_id=None, statuses=ACTIVE_BOOKING_STATUSES):
+        """Plusieurs salles à partir des mois en cache: {room_id: RoomSchedule}
+
+        statuses=None garde les réservations de tous statuts.
+        """
+        room_ids = [int(room_id) for room_id in room_ids]
+        start, end = ensure_aware(start), ensure_aware(end)
+        exclude_booking_id = int(exclude_booking_id) if exclude_booking_id else None
+        months = months_of_period(start, end)
+        entries = load_room_months(room_ids, months)
+        schedules = {}
+        for room_id in room_ids:
+            # Une réservation sur plusieurs mois figure dans chacun d'eux
+            bookings, maintenances = {}, {}
+            for month in months:
+                entry = entries[(room_id, month)]
+                for booking in entry['bookings']:
+                    if (
+                        booking.start_time < end and booking.end_time > start
+                        and (statuses is None or booking.status in statuses)
+                        and booking.pk != exclude_booking_id
+                    ):
+                        bookings[booking.pk] = booking
+                for maintenance in entry['maintenances']:
+                    if maintenance.start_date < end and maintenance.end_date > start:
+                        maintenances[maintenance.pk] = maintenance
+            blocks = list(maintenances.values())
+            maintenance_until = entries[(room_id, months[0])]['maintenance_until']
+            if maintenance_until and maintenance_until > start:
+                blocks.append(RoomUnavailability(SINCE_EVER, maintenance_until, _("Salle indisponible")))
+            schedules[room_id] = cls(room_id, bookings.values(), blocks)
+        return schedules
+
+    def has_conflict(self, start, end):
+        start, end = ensure_aware(start), ensure_aware(end)
+        return self.bookings.has_overlap(start, end) or self.maintenances.has_overlap(start, end)
+
+    def overlap_hours(self, start, end):
+        start, end = ensure_aware(start), ensure_aware(end)
+        seconds = self.bookings.overlap_seconds(start, end) + self.maintenances.overlap_seconds(start, end)
+        return seconds / 3600
+
+    def bookings_between(self, start, end):
+        return self.bookings.overlapping(ensure_aware(start), ensure_aware(end))
+
+    def conflicts(self, start, end):
+        """Conflits détaillés avec le créneau, au format de RoomBooking.get_conflicts_report"""
+        start, end = ensure_aware(start), ensure_aware(end)
+        conflicts = []
+        for booking in self.bookings.overlapping(start, end):
+            conflicts.append(overlap_report(
+                start, end, booking.start_time, booking.end_time,
+                conflict_type='overlap',
+                booking=booking,
+                conflicting_event=booking.event_title,
+                conflicting_organization=booking.organization.name if booking.organization else 'N/A',
+            ))
+        for maintenance in self.maintenances.overlapping(start, end):
+            conflicts.append(overlap_report(
+                start, end, maintenance.start_date, maintenance.end_date,
+                conflict_type='maintenance',
+                booking=None,
+                maintenance=maintenance,
+                conflicting_event=maintenance.title,
+                conflicting_organization=_("Maintenance"),
+            ))
+        return conflicts
+
+    def check_slots(self, slots):
+        """Vérifie un lot de créneaux [(début, fin), ...] sans requête supplémentaire"""
+        results = []
+        for start, end in slots:
+            start, end = ensure_aware(start), ensure_aware(end)
+            results.append({
+                'start': start,
+                'end': end,
+                'available': not self.has_conflict(start, end),
+                'overlap_hours': round(self.overlap_hours(start, end), 2),
+            })
+        return results
+
+
+def overlap_report(start, end, other_start, other_end, **details):
+    overlap_start = max(start, other_start)
+    overlap_end = min(end, other_end)
+    overlap_hours = (overlap_end - overlap_start).total_seconds() / 3600
+    return {
+        'overlap_start': overlap_start,
+        'overlap_end': overlap_end,
+        'overlap_hours': round(overlap_hours, 2),
+        'overlap_days': round(overlap_hours / 24, 2),
+        **details,
+    }
+
+
+def summarize_conflicts(conflicts):
+    """Résumé affichable des conflits (voir RoomBooking.get_detailed_conflicts_summary)"""
+    if not conflicts:
+        return {
+            'has_conflicts': False,
+            'message': '✅ Aucun conflit détecté. La réservation peut être confirmée.',
+            'conflicts_count': 0,
+            'total_overlap_hours': 0,
+            'total_overlap_days': 0,
+            'details': []
+        }
+
+    total_overlap_hours = sum(conflict['overlap_hours'] for conflict in conflicts)
+    total_overlap_days = sum(conflict['overlap_days'] for conflict in conflicts)
+
+    details = []
+    for conflict in conflicts:
+        if conflict['conflict_type'] == 'maintenance':
+            detail = f"• Maintenance : {conflict['conflicting_event']} - "
+        else:
+            detail = f"• {conflict['conflicting_event']} ({conflict['conflicting_organization']}) - "
+        detail += f"Conflit de {conflict['overlap_hours']} heures ({conflict['overlap_days']:.1f} jours)"
+        details.append(detail)
+
+    if len(conflicts) == 1:
+        message = "⚠️ Conflit détecté avec 1 réservation existante"
+    else:
+        message = f"⚠️ Conflits détectés avec {len(conflicts)} réservations existantes"
+    if any(conflict['conflict_type'] == 'maintenance' for conflict in conflicts):
+        message += " ou maintenance"
+    if total_overlap_hours > 0:
+        message += f" - Chevauchement total: {total_overlap_hours:.1f} heures"
+
+    return {
+        'has_conflicts': True,
+        'message': message,
+        'conflicts_count': len(conflicts),
+        'total_overlap_hours': total_overlap_hours,
+        'total_overlap_days': total_overlap_days,
+        'conflicts': conflicts,
+        'details': details
+    }
+
+
+def serialize_conflicts_summary(summary):
+    """Version JSON du résumé (réservations et maintenances remplacées par leurs champs utiles)"""
+    data = dict(summary)
+    data['conflicts'] = [
+        {
+            'booking': {
+                'id': conflict['booking'].pk,
+                'event_title': conflict['booking'].event_title,
+                'status': conflict['booking'].status,
+                'organization': {'name': conflict['conflicting_organization']},
+            } if conflict['booking'] else {
+                'id': None,
+                'event_title': conflict['conflicting_event'],
+                'status': 'maintenance',
+                'organization': {'name': conflict['conflicting_organization']},
+            },
+            'overlap_start': conflict['overlap_start'].isoformat(),
+            'overlap_end': conflict['overlap_end'].isoformat(),
+            'overlap_hours': conflict['overlap_hours'],
+            'overlap_days': conflict['overlap_days'],
+            'conflict_type': conflict['conflict_type'],
+            'conflicting_event': conflict['conflicting_event'],
+            'conflicting_organization': str(conflict['conflicting_organization']),
+        }
+        for conflict in summary.get('conflicts', [])
+    ]
+    return data
+
+
+def day_bounds(day):
+    """Début et fin (exclue) d'une journée dans le fuseau du site"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
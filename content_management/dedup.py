@@ -0,0 +1,170 @@
+"""
+Détection et fusion des inscriptions en double.
+
+Lorsqu'un formulaire n'autorise pas les inscriptions multiples, chaque
+inscription reçoit une clé de dédoublonnage (email normalisé). Une
+contrainte unique partielle sur (formulaire, clé), hors inscriptions
+annulées, garantit l'unicité en base; la vérification avant insertion
+utilise l'index (formulaire, LOWER(TRIM(email))).
+
+Les doublons antérieurs sont fusionnés par lots en tâche de fond
+(jobs.registration_tasks.merge_duplicate_registrations), qui attribue
+ensuite la clé aux inscriptions restantes.
+"""
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.db.models.functions import Lower, Trim
+
+from .models import EventRegistration, FormResponse
+
+
+# Ordre de préférence du statut conservé lors d'une fusion
+STATUS_PRIORITY = {'confirmed': 0, 'pending': 1, 'waitlist': 2, 'cancelled': 3}
+MERGE_BATCH_SIZE = 100
+
+
+class DuplicateRegistrationError(Exception):
+    """Une inscription active existe déjà pour cet email"""
+
+    def __init__(self, existing):
+        self.existing = existing
+        super().__init__(f"Inscription déjà existante: {existing.registration_id}")
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+def email_key():
+    """Expression SQL équivalente à normalize_email (index form + LOWER(TRIM(email)))"""
+    return Lower(Trim('email'))
+
+
+def registration_dedup_key(registration_form, email):
+    """Clé de dédoublonnage, ou None si le formulaire accepte les inscriptions multiples"""
+    if registration_form.allow_multiple_registrations:
+        return None
+    return normalize_email(email)
+
+
+def active_registrations_by_email(registration_form, email_keys):
+    """Inscriptions non annulées du formulaire pour des emails normalisés"""
+    return registration_form.registrations.alias(email_key=email_key()).filter(
+        email_key__in=email_keys
+    ).exclude(status='cancelled')
+
+
+def find_existing_registration(registration_form, email):
+    """Vérification avant insertion: inscription active existante pour cet email"""
+    if registration_form.allow_multiple_registrations:
+        return None
+    return active_registrations_by_email(registration_form, [normalize_email(email)]).order_by('pk').first()
+
+
+def duplicate_email_keys(registration_form):
+    """Emails ayant plusieurs inscriptions actives dans le formulaire"""
+    return (
+        registration_form.registrations.exclude(status='cancelled')
+        .annotate(email_key=email_key())
+        .values('email_key')
+        .annotate(count=Count('pk'))
+        .filter(count__gt=1)
+        .order_by('email_key')
+        .values_list('email_key', flat=True)
+    )
+
+
+def choose_survivor(registrations):
+    """Inscription conservée: meilleur statut, puis la plus ancienne"""
+    return min(
+        registrations,
+        key=lambda r: (STATUS_PRIORITY.get(r.status, len(STATUS_PRIORITY)), r.registration_date, r.pk),
+    )
+
+
+def merge_registrations(survivor, duplicates):
+    """Fusionne les doublons dans l'inscription conservée puis les supprime
+
+    Les réponses aux champs absents de l'inscription conservée sont
+    rattachées à celle-ci, les autres informations complètent les siennes.
+    """
+    answered_fields = {response.field_id for response in survivor.responses.all()}
+    moved_responses = []
+    answers = dict(survivor.answers or {})
+    notes = [survivor.internal_notes] if survivor.internal_notes else []
+
+    for duplicate in duplicates:
+        for response in duplicate.responses.all():
+            if response.field_id not in answered_fields:
+                answered_fields.add(response.field_id)
+                moved_responses.append(response.pk)
+        for key, value in (duplicate.answers or {}).items():
+            answers.setdefault(key, value)
+        if not survivor.phone and duplicate.phone:
+            survivor.phone = duplicate.phone
+        if duplicate.checked_in_at and (
+            survivor.checked_in_at is None or duplicate.checked_in_at < survivor.checked_in_at
+        ):
+            survivor.checked_in_at = duplicate.checked_in_at
+            survivor.checked_in_by_id = duplicate.checked_in_by_id
+            survivor.check_in_device = duplicate.check_in_device
+        if duplicate.internal_notes:
+            notes.append(duplicate.internal_notes)
+
+    notes.append("Doublons fusionnés: " + ", ".join(d.registration_id for d in duplicates))
+    survivor.internal_notes = "\n".join(notes)
+    if survivor.answers is not None:
+        survivor.answers = answers
+
+    if moved_responses:
+        FormResponse.objects.filter(pk__in=moved_responses).update(registration=survivor)
+    EventRegistration.objects.filter(pk__in=[d.pk for d in duplicates]).delete()
+    survivor.save(update_fields=[
+        'phone', 'answers', 'internal_notes', 'checked_in_at', 'checked_in_by', 'check_in_device', 'dedup_key',
+    ])
+    return survivor
+
+
+def merge_duplicate_batch(registration_form, email_keys):
+    """Fusionne les doublons d'un lot d'emails dans une transaction"""
+    groups = {}
+    registrations = active_registrations_by_email(registration_form, email_keys).prefetch_related(
+        Prefetch('responses', queryset=FormResponse.objects.only('pk', 'field_id', 'registration_id'))
+    )
+    for registration in registrations:
+        groups.setdefault(normalize_email(registration.email), []).append(registration)
+
+    merged = 0
+    with transaction.atomic():
+        for key, group in groups.items():
+            if len(group) < 2:
+                continue
+            survivor = choose_survivor(group)
+            duplicates = [r for r in group if r.pk != survivor.pk]
+            survivor.dedup_key = key
+            merge_registrations(survivor, duplicates)
+            merged += len(duplicates)
+    return merged
+
+
+def merge_form_duplicates(registration_form, batch_size=MERGE_BATCH_SIZE):
+    """Fusionne tous les doublons d'un formulaire puis attribue les clés manquantes
+
+    Retourne le nombre d'inscriptions supprimées par fusion.
+    """
+    if registration_form.allow_multiple_registrations:
+        return 0
+
+    merged = 0
+    while True:
+        # Les emails fusionnés disparaissent de la requête: on repart du début
+        keys = list(duplicate_email_keys(registration_form)[:batch_size])
+        if not keys:
+            break
+        batch_merged = merge_duplicate_batch(registration_form, keys)
+        if not batch_merged:
+            break
+        merged += batch_merged
+
+    registration_form.registrations.filter(dedup_key__isnull=True).update(dedup_key=email_key())
+    return merged
@@ -0,0 +1,388 @@
+"""
+Moteur d'export des inscriptions, messages et newsletters.
+
+Les lignes sont parcourues par lots avec leurs relations préchargées,
+pivotées en mémoire en lignes de tableau, puis écrites en XLSX (mode
+write-only d'openpyxl) ou diffusées en CSV. La mémoire utilisée reste
+bornée par la taille d'un lot, quel que soit le volume exporté.
+
+Les inscriptions sont lues depuis leur document answers lorsque toutes en
+ont un, sinon depuis les FormResponse (inscriptions non reprises).
+
+Chaque type d'export est décrit par un ExportSpec, utilisé aussi bien pour
+les réponses HTTP directes que pour les exports en tâche de fond
+(jobs.export_tasks).
+"""
+import csv
+import tempfile
+from datetime import date, datetime
+from itertools import chain, islice
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import (
+    ContactMessage, EventRegistrationForm, FormFieldOption, FormResponse, Newsletter,
+    NewsletterCampaign
+)
+
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+BASE_HEADERS = ['ID', 'Prénom', 'Nom', 'Email', 'Téléphone', 'Statut', "Date d'inscription"]
+
+EXPORT_CHUNK_SIZE = 1000
+WIDTH_SAMPLE_SIZE = 200
+MAX_COLUMN_WIDTH = 50
+
+# Au-delà de ce nombre de lignes, l'export est confié à Celery
+EXPORT_ASYNC_THRESHOLD = getattr(settings, 'EXPORT_ASYNC_THRESHOLD', 2000)
+
+
+class Echo:
+    """Pseudo-fichier qui renvoie la valeur écrite au lieu de la stocker"""
+
+    def write(self, value):
+        return value
+
+
+def get_export_fields(registration_form):
+    """Champs personnalisés exportés, dans l'ordre d'affichage"""
+    return list(registration_form.fields.order_by('order'))
+
+
+def get_export_headers(form_fields):
+    return BASE_HEADERS + [field.label for field in form_fields]
+
+
+def get_export_queryset(registration_form):
+    """Inscriptions avec réponses et options sélectionnées préchargées"""
+    return registration_form.registrations.order_by('registration_date').prefetch_related(
+        Prefetch(
+            'responses',
+            queryset=FormResponse.objects.prefetch_related('selected_options'),
+        )
+    )
+
+
+def registration_base_row(registration):
+    return [
+        registration.registration_id,
+        registration.first_name,
+        registration.last_name,
+        registration.email,
+        registration.phone,
+        registration.get_status_display(),
+        timezone.localtime(registration.registration_date).strftime('%d/%m/%Y %H:%M'),
+    ]
+
+
+def registration_row(registration, form_fields, fields_by_id):
+    """Pivote une inscription et ses réponses préchargées en une ligne"""
+    values = {}
+    for response in registration.responses.all():
+        field = fields_by_id.get(response.field_id)
+        if field is None:
+            continue
+        # Évite une requête par réponse pour charger le champ
+        response.field = field
+        values[field.pk] = response.display_value
+
+    row = registration_base_row(registration)
+    row.extend(values.get(field.pk, "") for field in form_fields)
+    return row
+
+
+def get_option_labels(registration_form):
+    """Libellés des options par champ, dans l'ordre d'affichage: {field_pk: {value: label}}"""
+    labels = {}
+    options = FormFieldOption.objects.filter(field__form=registration_form).values_list('field_id', 'value', 'label')
+    for field_id, value, label in options:
+        labels.setdefault(field_id, {})[value] = label
+    return labels
+
+
+def answer_display_value(field, value, option_labels):
+    """Valeur affichable d'une réponse lue dans le document answers"""
+    if value is None or value == "":
+        return ""
+    if isinstance(value, list):
+        chosen = set(value)
+        return ", ".join(label for option, label in option_labels.get(field.pk, {}).items() if option in chosen)
+    if field.field_type == 'checkbox':
+        return "Oui" if value else "Non"
+    if field.field_type == 'number':
+        return f"{value:.2f}"
+    if field.field_type == 'date':
+        return date.fromisoformat(value).strftime('%d/%m/%Y')
+    if field.field_type == 'datetime':
+        return timezone.localtime(datetime.fromisoformat(value)).strftime('%d/%m/%Y %H:%M')
+    return str(value)
+
+
+def answers_row(registration, form_fields, option_labels):
+    """Ligne d'export construite depuis le document answers, sans jointure"""
+    answers = registration.answers or {}
+    row = registration_base_row(registration)
+    row.extend(
+        answer_display_value(field, answers.get(str(field.pk)), option_labels)
+        for field in form_fields
+    )
+    return row
+
+
+def answers_are_complete(registration_form):
+    """Vrai si toutes les inscriptions du formulaire ont un document answers"""
+    return not registration_form.registrations.filter(answers__isnull=True).exists()
+
+
+def iter_registration_rows(registration_form, form_fields=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Génère les lignes d'export lot par lot"""
+    if form_fields is None:
+        form_fields = get_export_fields(registration_form)
+
+    if answers_are_complete(registration_form):
+        option_labels = get_option_labels(registration_form)
+        queryset = registration_form.registrations.order_by('registration_date')
+        for registration in queryset.iterator(chunk_size=chunk_size):
+            yield answers_row(registration, form_fields, option_labels)
+        return
+
+    fields_by_id = {field.pk: field for field in form_fields}
+    queryset = get_export_queryset(registration_form)
+    for registration in queryset.iterator(chunk_size=chunk_size):
+        yield registration_row(registration, form_fields, fields_by_id)
+
+
+def estimate_column_widths(headers, sample_rows, max_width=MAX_COLUMN_WIDTH):
+    """Estime la largeur des colonnes à partir d'un échantillon de lignes"""
+    widths = [len(str(header)) for header in headers]
+    for row in sample_rows:
+        for index, value in enumerate(row):
+            if value is not None:
+                widths[index] = max(widths[index], len(str(value)))
+    return [min(width + 2, max_width) for width in widths]
+
+
+def write_xlsx(fileobj, headers, rows, sheet_title="Export"):
+    """Écrit les lignes dans un classeur openpyxl en mode write-only"""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    rows = iter(rows)
+    sample = list(islice(rows, WIDTH_SAMPLE_SIZE))
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_title)
+
+    # Les largeurs doivent être fixées avant l'écriture de la première ligne
+    for index, width in enumerate(estimate_column_widths(headers, sample), 1):
+        ws.column_dimensions[get_column_letter(index)].width = width
+
+    header_font = Font(bold=True)
+    header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = header_font
+        cell.fill = header_fill
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    count = 0
+    for row in chain(sample, rows):
+        ws.append(row)
+        count += 1
+
+    wb.save(fileobj)
+    return count
+
+
+def write_registrations_xlsx(fileobj, headers, rows):
+    return write_xlsx(fileobj, headers, rows, sheet_title="Inscriptions")
+
+
+def write_csv(fileobj, headers, rows):
+    """Écrit les lignes en CSV dans un fichier texte, ligne par ligne"""
+    fileobj.write('\ufeff')
+    writer = csv.writer(fileobj)
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def xlsx_response(headers, rows, filename, sheet_title="Inscriptions"):
+    """Réponse HTTP XLSX construite sur un fichier temporaire sur disque"""
+    tmp = tempfile.TemporaryFile(suffix='.xlsx')
+    write_xlsx(tmp, headers, rows, sheet_title=sheet_title)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def iter_csv_lines(headers, rows):
+    writer = csv.writer(Echo())
+    # BOM pour qu'Excel détecte l'UTF-8
+    yield '\ufeff'
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def csv_response(headers, rows, filename):
+    """Réponse CSV diffusée ligne par ligne"""
+    response = StreamingHttpResponse(iter_csv_lines(headers, rows), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def format_datetime(value):
+    return timezone.localtime(value).strftime('%d/%m/%Y %H:%M') if value else ""
+
+
+class ExportSpec:
+    """Description d'un export: en-têtes, lignes à parcourir et nom de fichier"""
+
+    def __init__(self, export_type, title, headers, queryset, row, filename, rows=None):
+        self.export_type = export_type
+        self.title = title
+        self.headers = headers
+        self.queryset = queryset
+        self.row = row
+        self.filename = filename
+        self._rows = rows
+
+    def count(self):
+        return self.queryset.count()
+
+    def iter_rows(self, chunk_size=EXPORT_CHUNK_SIZE):
+        if self._rows is not None:
+            return self._rows()
+        return (self.row(obj) for obj in self.queryset.iterator(chunk_size=chunk_size))
+
+    def get_filename(self, file_format):
+        return f'{self.filename}_{timezone.now().strftime("%Y%m%d")}.{file_format}'
+
+    def write(self, fileobj, file_format, rows=None):
+        """Écrit l'export dans un fichier (binaire pour xlsx, texte pour csv)"""
+        if rows is None:
+            rows = self.iter_rows()
+        if file_format == 'xlsx':
+            return write_xlsx(fileobj, self.headers, rows, sheet_title=self.title)
+        return write_csv(fileobj, self.headers, rows)
+
+    def response(self, file_format):
+        filename = self.get_filename(file_format)
+        if file_format == 'xlsx':
+            return xlsx_response(self.headers, self.iter_rows(), filename, sheet_title=self.title)
+        return csv_response(self.headers, self.iter_rows(), filename)
+
+
+def event_registrations_export_spec(params):
+    registration_form = EventRegistrationForm.objects.select_related('event').get(event_id=params['event_pk'])
+    form_fields = get_export_fields(registration_form)
+    return ExportSpec(
+        'event_registrations',
+        "Inscriptions",
+        get_export_headers(form_fields),
+        registration_form.registrations.all(),
+        None,
+        f'inscriptions_{registration_form.event.slug}',
+        rows=lambda: iter_registration_rows(registration_form, form_fields),
+    )
+
+
+def contact_messages_export_spec(params):
+    queryset = ContactMessage.objects.order_by('-created_at')
+    if params.get('search'):
+        search = params['search']
+        queryset = queryset.filter(
+            Q(name__icontains=search) | Q(email__icontains=search) | Q(subject__icontains=search)
+        )
+    if params.get('status') == 'read':
+        queryset = queryset.filter(is_read=True)
+    elif params.get('status') == 'unread':
+        queryset = queryset.filter(is_read=False)
+    return ExportSpec(
+        'contact_messages',
+        "Messages",
+        ['Nom', 'Email', 'Sujet', 'Message', 'Téléphone', 'Lu', 'Date de création'],
+        queryset,
+        lambda msg: [
+            msg.name, msg.email, msg.subject, msg.message, msg.phone,
+            'Oui' if msg.is_read else 'Non', format_datetime(msg.created_at),
+        ],
+        'messages_contact',
+    )
+
+
+def newsletter_subscribers_export_spec(params):
+    queryset = Newsletter.objects.order_by('email')
+    status = params.get('status', 'active')
+    if status == 'active':
+        queryset = queryset.filter(is_active=True)
+    elif status == 'inactive':
+        queryset = queryset.filter(is_active=False)
+    if params.get('search'):
+        search = params['search']
+        queryset = queryset.filter(
+            Q(email__icontains=search) | Q(first_name__icontains=search) | Q(last_name__icontains=search)
+        )
+    return ExportSpec(
+        'newsletter_subscribers',
+        "Abonnés",
+        ['Email', 'Prénom', 'Nom', 'Langue', 'Statut', "Date d'inscription"],
+        queryset,
+        lambda sub: [
+            sub.email, sub.first_name, sub.last_name, sub.language,
+            'Actif' if sub.is_active else 'Inactif', format_datetime(sub.subscription_date),
+        ],
+        'newsletter_abonnes',
+    )
+
+
+def newsletter_campaigns_export_spec(params):
+    queryset = NewsletterCampaign.objects.select_related('created_by').order_by('-created_at')
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('search'):
+        search = params['search']
+        queryset = queryset.filter(Q(title__icontains=search) | Q(subject__icontains=search))
+    return ExportSpec(
+        'newsletter_campaigns',
+        "Campagnes",
+        ['Titre', 'Sujet', 'Statut', 'Langue cible', 'Programmée le', 'Envoyés', 'Échecs',
+         'Ouvertures', 'Clics', 'Créée par', 'Date de création'],
+        queryset,
+        lambda campaign: [
+            campaign.title, campaign.subject, campaign.get_status_display(),
+            campaign.get_target_language_display(), format_datetime(campaign.scheduled_at),
+            campaign.sent_count, campaign.failed_count, campaign.opened_count, campaign.clicked_count,
+            campaign.created_by.get_username() if campaign.created_by else "",
+            format_datetime(campaign.created_at),
+        ],
+        'newsletter_campagnes',
+    )
+
+
+EXPORT_SPECS = {
+    'event_registrations': event_registrations_export_spec,
+    'contact_messages': contact_messages_export_spec,
+    'newsletter_subscribers': newsletter_subscribers_export_spec,
+    'newsletter_campaigns': newsletter_campaigns_export_spec,
+}
+
+
+def get_export_spec(export_type, params=None):
+    """Retourne l'ExportSpec d'un type d'export enregistré"""
+    try:
+        builder = EXPORT_SPECS[export_type]
+    except KeyError:
+        raise ValueError(f"Type d'export inconnu: {export_type}")
+    return builder(params or {})
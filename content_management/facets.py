@@ -0,0 +1,197 @@
+"""
+Navigation publique des événements par facettes.
+
+Facettes: type, domaine scientifique, langue, ville, gratuit/payant et
+période (à venir, en cours, passés). Tous les compteurs proviennent d'une
+seule requête groupée sur l'ensemble des dimensions (la « matrice » des
+facettes: une ligne par combinaison existante avec son nombre
+d'événements). Le compteur d'une valeur tient compte des filtres des autres
+facettes mais pas de la sienne, pour pouvoir élargir une sélection.
+
+Sans recherche texte ni fenêtre de dates, la matrice est mise en cache pour
+la journée et invalidée à chaque modification d'un événement.
+"""
+from django.core.cache import cache
+from django.db.models import Case, Count, Q, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+
+from .models import Event, StatusChoices
+
+
+FACET_MATRIX_CACHE_KEY = 'event_facet_matrix'
+FACET_MATRIX_CACHE_TIMEOUT = 60 * 60 * 24
+
+PRICE_CHOICES = [('free', _('Gratuit')), ('paid', _('Payant'))]
+PERIOD_CHOICES = [('upcoming', _('À venir')), ('ongoing', _('En cours')), ('past', _('Passés'))]
+
+# (paramètre GET, dimension de la matrice, libellé, choix ou None pour les valeurs libres)
+FACETS = [
+    ('period', 'period', _('Période'), PERIOD_CHOICES),
+    ('type', 'event_type', _("Type d'événement"), Event._meta.get_field('event_type').choices),
+    ('field', 'scientific_field', _('Domaine scientifique'), None),
+    ('language', 'language', _('Langue'), Event._meta.get_field('language').choices),
+    ('city', 'city', _('Ville'), None),
+    ('price', 'pricing', _('Tarif'), PRICE_CHOICES),
+]
+
+
+def invalidate_facet_matrix():
+    cache.delete(FACET_MATRIX_CACHE_KEY)
+
+
+def published_events():
+    return Event.objects.filter(status=StatusChoices.PUBLISHED)
+
+
+def parse_browse_params(params):
+    """Filtres demandés: {'facets': {dimension: set(valeurs)}, 'q', 'date_from', 'date_to'}"""
+    facets = {}
+    for param, dimension, _label, _choices in FACETS:
+        values = {value for value in params.getlist(param) if value}
+        if values:
+            facets[dimension] = values
+    return {
+        'facets': facets,
+        'q': params.get('q', '').strip(),
+        'date_from': parse_date_param(params.get('from')),
+        'date_to': parse_date_param(params.get('to')),
+    }
+
+
+def parse_date_param(value):
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def period_q(period, today):
+    """Prédicats sur les dates (index statut + date de début / de fin)"""
+    if period == 'upcoming':
+        return Q(start_date__gt=today)
+    if period == 'past':
+        return Q(end_date__lt=today)
+    return Q(start_date__lte=today, end_date__gte=today)
+
+
+def facet_q(dimension, values, today):
+    if dimension == 'period':
+        query = Q()
+        for period in values:
+            query |= period_q(period, today)
+        return query
+    if dimension == 'pricing':
+        if values == {'free'}:
+            return Q(is_free=True)
+        if values == {'paid'}:
+            return Q(is_free=False)
+        return Q()
+    return Q(**{f'{dimension}__in': values})
+
+
+def base_queryset(filters):
+    """Événements publiés restreints par la recherche et la fenêtre de dates"""
+    queryset = published_events()
+    if filters['q']:
+        queryset = queryset.filter(
+            Q(title__icontains=filters['q']) | Q(location__icontains=filters['q'])
+            | Q(scientific_field__icontains=filters['q'])
+        )
+    if filters['date_from']:
+        queryset = queryset.filter(end_date__gte=filters['date_from'])
+    if filters['date_to']:
+        queryset = queryset.filter(start_date__lte=filters['date_to'])
+    return queryset
+
+
+def build_facet_matrix(queryset, today):
+    """Une ligne par combinaison de facettes avec le nombre d'événements (une requête)"""
+    rows = queryset.annotate(
+        period=Case(
+            When(start_date__gt=today, then=Value('upcoming')),
+            When(end_date__lt=today, then=Value('past')),
+            default=Value('ongoing'),
+        ),
+        pricing=Case(When(is_free=True, then=Value('free')), default=Value('paid')),
+    ).values(*[dimension for _param, dimension, _label, _choices in FACETS]).annotate(
+        count=Count('pk')
+    ).order_by()
+    return list(rows)
+
+
+def get_facet_matrix(filters, today):
+    if filters['q'] or filters['date_from'] or filters['date_to']:
+        return build_facet_matrix(base_queryset(filters), today)
+    cached = cache.get(FACET_MATRIX_CACHE_KEY)
+    if cached is None or cached['date'] != today:
+        cached = {'date': today, 'rows': build_facet_matrix(published_events(), today)}
+        cache.set(FACET_MATRIX_CACHE_KEY, cached, FACET_MATRIX_CACHE_TIMEOUT)
+    return cached['rows']
+
+
+def row_matches(row, selected, skip=None):
+    return all(
+        row[dimension] in values
+        for dimension, values in selected.items()
+        if dimension != skip
+    )
+
+
+def count_facets(rows, selected):
+    """Compteurs de chaque facette (sans son propre filtre) et total des résultats"""
+    counts = {dimension: {} for _param, dimension, _label, _choices in FACETS}
+    total = 0
+    for row in rows:
+        if row_matches(row, selected):
+            total += row['count']
+        for _param, dimension, _label, _choices in FACETS:
+            if row_matches(row, selected, skip=dimension):
+                value = row[dimension]
+                counts[dimension][value] = counts[dimension].get(value, 0) + row['count']
+    return counts, total
+
+
+def browse_events(params, today=None):
+    """Filtre les événements publiés et calcule les facettes
+
+    Retourne {'events': queryset, 'facets': [...], 'total', 'filters'}.
+    """
+    today = today or timezone.localdate()
+    filters = parse_browse_params(params)
+    selected = filters['facets']
+    counts, total = count_facets(get_facet_matrix(filters, today), selected)
+
+    facets = []
+    for param, dimension, label, choices in FACETS:
+        facet_counts = counts[dimension]
+        if choices is None:
+            choices = sorted(
+                ((value, value) for value in facet_counts if value),
+                key=lambda choice: (-facet_counts[choice[0]], choice[0].lower()),
+            )
+        options = [
+            {
+                'value': value,
+                'label': option_label,
+                'count': facet_counts.get(value, 0),
+                'selected': value in selected.get(dimension, ()),
+            }
+            for value, option_label in choices
+        ]
+        facets.append({
+            'param': param,
+            'label': label,
+            'options': [option for option in options if option['count'] or option['selected']],
+        })
+
+    events = base_queryset(filters)
+    for dimension, values in selected.items():
+        events = events.filter(facet_q(dimension, values, today))
+    if selected.get('period') == {'upcoming'}:
+        events = events.order_by('start_date', 'start_time')
+    else:
+        events = events.order_by('-start_date', '-start_time')
+
+    return {'events': events, 'facets': facets, 'total': total, 'filters': filters}
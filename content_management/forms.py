@@ -1,11 +1,18 @@
 from django import forms
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
 from django.utils.translation import gettext_lazy as _
 from .models import (
     Category, Article, Event, Project, ProjectPartner, Program, 
     Partner, Newsletter, NewsletterCampaign, ContactMessage, EventDay, EventAgenda, EventIntervenant, EventFAQ, EventOrganizer, EventTag,
-    EventRegistrationForm, FormField, FormFieldOption, EventRegistration, TeamMember, ConferenceRoom, RoomImage, ExternalOrganization, RoomBooking, BookingPayment, RoomMaintenance, Personna, Blog, AboutPage, CityDistrict, CoreValue, HeroStatistic, Achievement
+    EventRegistrationForm, FormField, FormFieldOption, EventRegistration, TeamMember, ConferenceRoom, RoomImage, ExternalOrganization, RoomBooking, BookingSeries, BookingPayment, RoomMaintenance, Personna, Blog, AboutPage, CityDistrict, CoreValue, HeroStatistic, Achievement
 )
+from django.urls import reverse
 from django.utils import timezone
+from .conflicts import RoomSchedule
+from .recurrence import MAX_OCCURRENCES, expand_occurrences
+from .reminders import parse_reminder_offsets
+from .uploads import get_completed_upload, mark_uploads_attached
 
 
 class MultipleFileInput(forms.FileInput):
@@ -23,6 +30,95 @@ class MultipleFileInput(forms.FileInput):
         return files.get(name)
 
 
+class OrganizationPickerWidget(forms.Select):
+    """Sélecteur d'organisation qui ne rend que l'option choisie
+
+    Les autres organisations sont cherchées à la saisie
+    (external_organization_search): la page ne charge pas tout l'annuaire.
+    """
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-search-url'] = reverse('content_management:external_organization_search')
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        iterator = self.choices
+        selected = [item for item in value if str(item).isdigit()]
+        self.choices = [('', iterator.field.empty_label or '')] + [
+            (organization.pk, str(organization)) for organization in iterator.queryset.filter(pk__in=selected)
+        ]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = iterator
+
+
+class DirectUploadFormMixin:
+    """Accepte, à la place d'un fichier, le jeton d'un envoi direct terminé
+    
+    Pour chaque champ de direct_upload_targets(), un champ caché
+    <nom>_upload reçoit le jeton; la clé du fichier déjà présent dans le
+    stockage est alors affectée au champ, sans transfert par le serveur web.
+    Les formulaires qui ajoutent des champs après __init__ rappellent
+    setup_direct_uploads().
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setup_direct_uploads()
+    
+    def direct_upload_targets(self):
+        """{nom du champ du formulaire: destination de l'envoi}
+        
+        Par défaut, les champs fichier du modèle présents dans le formulaire.
+        """
+        opts = self._meta.model._meta
+        targets = {}
+        for name in self.fields:
+            try:
+                model_field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if isinstance(model_field, models.FileField):
+                targets[name] = f'{opts.model_name}.{name}'
+        return targets
+    
+    def setup_direct_uploads(self):
+        self.direct_uploads = []
+        for name, target in self.direct_upload_targets().items():
+            if name not in self.fields:
+                continue
+            upload_name = f'{name}_upload'
+            self.fields[upload_name] = forms.CharField(required=False, widget=forms.HiddenInput())
+            self.fields[name].widget.attrs.update({
+                'data-direct-upload': target,
+                'data-upload-input': self[upload_name].auto_id,
+                'data-upload-start-url': reverse('content_management:direct_upload_start'),
+            })
+            if self.data.get(self.add_prefix(upload_name)):
+                self.fields[name].required = False
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        for name, target in self.direct_upload_targets().items():
+            token = cleaned_data.get(f'{name}_upload')
+            if not token:
+                continue
+            upload = get_completed_upload(token, target)
+            if upload is None:
+                self.add_error(name, _("Le fichier envoyé est introuvable ou a expiré."))
+                continue
+            cleaned_data[name] = upload.key
+            self.direct_uploads.append(upload)
+        return cleaned_data
+    
+    def save(self, commit=True):
+        instance = super().save(commit=commit)
+        mark_uploads_attached(self.direct_uploads)
+        return instance
+
+
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
@@ -38,7 +134,7 @@ class CategoryForm(forms.ModelForm):
         }
 
 
-class ArticleForm(forms.ModelForm):
+class ArticleForm(DirectUploadFormMixin, forms.ModelForm):
     images = forms.FileField(
         required=False,
         widget=forms.FileInput(attrs={'class': 'form-control'}),
@@ -109,7 +205,7 @@ class ArticleForm(forms.ModelForm):
         self.fields['meta_description'].required = False
 
 
-class EventForm(forms.ModelForm):
+class EventForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour créer/modifier un événement"""
     class Meta:
         model = Event
@@ -234,7 +330,7 @@ class EventAgendaForm(forms.ModelForm):
         return cleaned_data
 
 
-class EventIntervenantForm(forms.ModelForm):
+class EventIntervenantForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour les intervenants d'événement"""
     class Meta:
         model = EventIntervenant
@@ -266,7 +362,7 @@ class EventFAQForm(forms.ModelForm):
         }
 
 
-class EventOrganizerForm(forms.ModelForm):
+class EventOrganizerForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour créer/modifier un organisateur"""
     class Meta:
         model = EventOrganizer
@@ -304,7 +400,7 @@ class EventTagForm(forms.ModelForm):
         }
 
 
-class ProjectForm(forms.ModelForm):
+class ProjectForm(DirectUploadFormMixin, forms.ModelForm):
     class Meta:
         model = Project
         fields = [
@@ -327,7 +423,7 @@ class ProjectForm(forms.ModelForm):
         }
 
 
-class ProgramForm(forms.ModelForm):
+class ProgramForm(DirectUploadFormMixin, forms.ModelForm):
     class Meta:
         model = Program
         fields = [
@@ -369,7 +465,7 @@ class ProgramForm(forms.ModelForm):
         self.fields['end_date'].required = False
 
 
-class PartnerForm(forms.ModelForm):
+class PartnerForm(DirectUploadFormMixin, forms.ModelForm):
     class Meta:
         model = Partner
         fields = ['name', 'logo', 'website', 'contact_email', 'contact_phone', 'description', 'partnership_type', 'is_active', 'order']
@@ -511,6 +607,20 @@ class EventSearchForm(forms.Form):
     )
 
 
+class EventCloneForm(forms.Form):
+    """Nouvelle édition d'un événement existant"""
+    title = forms.CharField(
+        max_length=200,
+        label=_("Titre de la nouvelle édition"),
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    start_date = forms.DateField(
+        label=_("Date de début"),
+        help_text=_("Les jours de l'agenda et la date limite d'inscription sont décalés d'autant"),
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}, format='%Y-%m-%d')
+    )
+
+
 # Formulaires pour la gestion en ligne
 class EventDayInlineFormSet(forms.BaseInlineFormSet):
     """Formset pour gérer les jours d'événement"""
@@ -551,14 +661,14 @@ class EventAgendaInlineFormSet(forms.BaseInlineFormSet):
                     times.append(time_range)
 
 
-class EventRegistrationFormForm(forms.ModelForm):
+class EventRegistrationFormForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour créer/modifier un formulaire d'inscription"""
     class Meta:
         model = EventRegistrationForm
         fields = [
             'title', 'description', 'is_active', 'allow_multiple_registrations',
             'max_registrations', 'registration_deadline', 'send_confirmation_email',
-            'confirmation_message', 'terms_and_conditions', 'require_terms_acceptance',
+            'confirmation_message', 'reminder_offsets', 'terms_and_conditions', 'require_terms_acceptance',
             'primary_color', 'secondary_color', 'logo'
         ]
         widgets = {
@@ -571,6 +681,22 @@ class EventRegistrationFormForm(forms.ModelForm):
             'secondary_color': forms.TextInput(attrs={'class': 'form-control', 'type': 'color'}),
             'logo': forms.FileInput(attrs={'class': 'form-control'}),
         }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Saisie des délais en texte: « 168, 24 »
+        self.fields['reminder_offsets'] = forms.CharField(
+            required=False,
+            label=self.fields['reminder_offsets'].label,
+            widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '168, 24'}),
+        )
+        self.initial['reminder_offsets'] = ', '.join(str(offset) for offset in self.instance.reminder_offsets or [])
+    
+    def clean_reminder_offsets(self):
+        try:
+            return parse_reminder_offsets(self.cleaned_data.get('reminder_offsets') or '')
+        except ValueError as e:
+            raise forms.ValidationError(str(e))
 
 
 class FormFieldForm(forms.ModelForm):
@@ -630,7 +756,7 @@ class FormFieldOptionForm(forms.ModelForm):
         }
 
 
-class EventRegistrationPublicForm(forms.ModelForm):
+class EventRegistrationPublicForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire d'inscription à un événement"""
     class Meta:
         model = EventRegistration
@@ -650,6 +776,15 @@ class EventRegistrationPublicForm(forms.ModelForm):
         for field in self.form_fields:
             if field.is_visible:
                 self.fields[f'field_{field.pk}'] = self.create_dynamic_field(field)
+        
+        self.setup_direct_uploads()
+    
+    def direct_upload_targets(self):
+        return {
+            f'field_{field.pk}': f'registration_field.{field.pk}'
+            for field in self.form_fields
+            if field.is_visible and field.field_type == 'file'
+        }
     
     def create_dynamic_field(self, form_field):
         """Crée un champ de formulaire dynamique selon le type"""
@@ -730,7 +865,7 @@ def get_form_field_option_formset():
     )
 
 
-class ProjectPartnerForm(forms.ModelForm):
+class ProjectPartnerForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour ajouter/modifier un partenaire de projet"""
     class Meta:
         model = ProjectPartner
@@ -764,7 +899,7 @@ class ProjectPartnerForm(forms.ModelForm):
             self.fields['order'].initial = 0
 
 
-class TeamMemberForm(forms.ModelForm):
+class TeamMemberForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour les membres de l'équipe"""
     
     class Meta:
@@ -909,7 +1044,7 @@ class ConferenceRoomForm(forms.ModelForm):
         return ''
 
 
-class RoomImageForm(forms.ModelForm):
+class RoomImageForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour les images de salle"""
     
     class Meta:
@@ -990,7 +1125,7 @@ class RoomBookingForm(forms.ModelForm):
             'room': forms.Select(attrs={
                 'class': 'form-control'
             }),
-            'organization': forms.Select(attrs={
+            'organization': OrganizationPickerWidget(attrs={
                 'class': 'form-control'
             }),
             'event_title': forms.TextInput(attrs={
@@ -1041,25 +1176,137 @@ class RoomBookingForm(forms.ModelForm):
                 if not room.is_available:
                     raise forms.ValidationError("Cette salle n'est pas disponible.")
                 
-                # Vérifier les conflits avec d'autres réservations
-                conflicting_bookings = RoomBooking.objects.filter(
-                    room=room,
-                    status__in=['confirmed', 'pending'],
-                    start_time__lt=end_time,
-                    end_time__gt=start_time
-                )
+                # Vérifier les conflits avec d'autres réservations et les maintenances
+                # (la réservation modifiée elle-même est exclue)
+                conflicts = RoomSchedule.load(
+                    room.pk, start_time, end_time, exclude_booking_id=self.instance.pk
+                ).conflicts(start_time, end_time)
                 
-                if conflicting_bookings.exists():
-                    # Générer un rapport détaillé des conflits
-                    conflicts_count = conflicting_bookings.count()
+                if conflicts:
+                    conflicts_count = len(conflicts)
                     raise forms.ValidationError(
-                        f"Conflit détecté avec {conflicts_count} réservation(s) existante(s). "
+                        f"Conflit détecté avec {conflicts_count} réservation(s) ou maintenance(s) existante(s). "
                         "Veuillez vérifier le calendrier de disponibilité."
                     )
         
         return cleaned_data
 
 
+class BookingSeriesForm(forms.ModelForm):
+    """Réservation récurrente: première occurrence et règle de récurrence"""
+    FREQUENCY_CHOICES = [
+        ('DAILY', _('Tous les jours')),
+        ('WEEKLY', _('Toutes les semaines')),
+        ('MONTHLY', _('Tous les mois')),
+    ]
+    WEEKDAY_CHOICES = [
+        ('MO', _('Lundi')), ('TU', _('Mardi')), ('WE', _('Mercredi')), ('TH', _('Jeudi')),
+        ('FR', _('Vendredi')), ('SA', _('Samedi')), ('SU', _('Dimanche')),
+    ]
+
+    frequency = forms.ChoiceField(
+        choices=FREQUENCY_CHOICES,
+        initial='WEEKLY',
+        label=_("Fréquence"),
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    interval = forms.IntegerField(
+        min_value=1,
+        max_value=52,
+        initial=1,
+        label=_("Intervalle"),
+        help_text=_("Toutes les N périodes (1 = chaque semaine, 2 = une semaine sur deux...)"),
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    weekdays = forms.MultipleChoiceField(
+        choices=WEEKDAY_CHOICES,
+        required=False,
+        label=_("Jours de la semaine"),
+        help_text=_("Pour une fréquence hebdomadaire; par défaut le jour de la première occurrence"),
+        widget=forms.CheckboxSelectMultiple
+    )
+    count = forms.IntegerField(
+        min_value=1,
+        max_value=MAX_OCCURRENCES,
+        required=False,
+        label=_("Nombre d'occurrences"),
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    until = forms.DateField(
+        required=False,
+        label=_("Jusqu'au"),
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}, format='%Y-%m-%d')
+    )
+    skip_conflicts = forms.BooleanField(
+        required=False,
+        label=_("Ignorer les occurrences en conflit"),
+        help_text=_("Créer les autres occurrences au lieu de tout refuser")
+    )
+
+    class Meta:
+        model = BookingSeries
+        fields = [
+            'room', 'organization', 'event_title', 'event_description',
+            'start_time', 'end_time', 'attendees_count', 'special_requirements'
+        ]
+        widgets = {
+            'room': forms.Select(attrs={'class': 'form-control'}),
+            'organization': OrganizationPickerWidget(attrs={'class': 'form-control'}),
+            'event_title': forms.TextInput(attrs={'class': 'form-control'}),
+            'event_description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'start_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'end_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'attendees_count': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'special_requirements': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+    def build_rrule(self, cleaned_data):
+        parts = [f"FREQ={cleaned_data['frequency']}", f"INTERVAL={cleaned_data.get('interval') or 1}"]
+        if cleaned_data['frequency'] == 'WEEKLY' and cleaned_data.get('weekdays'):
+            parts.append(f"BYDAY={','.join(cleaned_data['weekdays'])}")
+        if cleaned_data.get('count'):
+            parts.append(f"COUNT={cleaned_data['count']}")
+        else:
+            parts.append(f"UNTIL={cleaned_data['until']:%Y%m%d}T235959")
+        return ';'.join(parts)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if not start_time or not end_time or not cleaned_data.get('frequency'):
+            return cleaned_data
+        if start_time >= end_time:
+            raise forms.ValidationError("L'heure de fin doit être postérieure à l'heure de début.")
+        if start_time < timezone.now():
+            raise forms.ValidationError("La date de début ne peut pas être dans le passé.")
+        if not cleaned_data.get('count') and not cleaned_data.get('until'):
+            raise forms.ValidationError("Indiquez un nombre d'occurrences ou une date de fin.")
+        if not cleaned_data.get('count') and cleaned_data['until'] < timezone.localtime(start_time).date():
+            raise forms.ValidationError("La date de fin de la série précède la première occurrence.")
+
+        self.instance.rrule = self.build_rrule(cleaned_data)
+        try:
+            self.occurrences = expand_occurrences(start_time, end_time, self.instance.rrule)
+        except ValueError as error:
+            raise forms.ValidationError(str(error))
+        return cleaned_data
+
+
+class BookingSeriesUpdateForm(forms.ModelForm):
+    """Modification d'une série, appliquée à ses occurrences à venir"""
+
+    class Meta:
+        model = BookingSeries
+        fields = ['event_title', 'event_description', 'attendees_count', 'special_requirements']
+        widgets = {
+            'event_title': forms.TextInput(attrs={'class': 'form-control'}),
+            'event_description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'attendees_count': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+            'special_requirements': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+        }
+
+
 class BookingPaymentForm(forms.ModelForm):
     """Formulaire pour les paiements de réservation"""
     
@@ -1244,7 +1491,7 @@ class PersonnaForm(forms.ModelForm):
         return description
 
 
-class BlogForm(forms.ModelForm):
+class BlogForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour les blogs"""
     
     class Meta:
@@ -1301,7 +1548,7 @@ class BlogForm(forms.ModelForm):
         return cleaned_data
 
 
-class CityDistrictForm(forms.ModelForm):
+class CityDistrictForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour les quartiers de la cité"""
     
     class Meta:
@@ -1356,7 +1603,7 @@ class AchievementForm(forms.ModelForm):
         }
 
 
-class AboutPageForm(forms.ModelForm):
+class AboutPageForm(DirectUploadFormMixin, forms.ModelForm):
     """Formulaire pour la page À propos"""
     
     class Meta:
@@ -0,0 +1,122 @@
+"""
+Recherche de créneaux libres dans les salles de conférence.
+
+« Quelles salles d'au moins N places sont libres H heures entre X et Y,
+éventuellement aux heures ouvrées ? » Les périodes bloquées de toutes les
+salles candidates (réservations actives, maintenances, maintenance_until)
+viennent de la couche de disponibilité (conflicts.RoomSchedule), puis sont
+parcourues une seule fois triées par début (balayage): pour chaque salle,
+l'intervalle précédent fusionné donne directement les plages libres. Les
+créneaux proposés sont classés par date de début, prix (price_per_hour /
+price_per_day) puis capacité, pour proposer d'abord la plus petite salle
+suffisante.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .conflicts import RoomSchedule, ensure_aware
+from .models import ConferenceRoom
+
+
+DEFAULT_BUSINESS_HOURS = (time(8, 0), time(18, 0))
+# Les créneaux proposés commencent sur un multiple de SLOT_STEP
+SLOT_STEP = timedelta(minutes=30)
+MAX_SEARCH_DAYS = 92
+MAX_SLOTS_PER_ROOM = 3
+
+
+def candidate_rooms(min_capacity=None):
+    rooms = ConferenceRoom.objects.filter(is_active=True)
+    if min_capacity:
+        rooms = rooms.filter(capacity__gte=min_capacity)
+    return rooms.order_by('capacity', 'name')
+
+
+def blocked_intervals(schedules):
+    """(début, fin, salle) de tout ce qui bloque les salles, triés par début"""
+    intervals = []
+    for room_id, schedule in schedules.items():
+        intervals.extend((item.start_time, item.end_time, room_id) for item in schedule.bookings.items)
+        intervals.extend((item.start_date, item.end_date, room_id) for item in schedule.maintenances.items)
+    intervals.sort(key=lambda interval: interval[0])
+    return intervals
+
+
+def free_gaps(room_ids, intervals, start, end):
+    """Plages libres de chaque salle dans [start, end), en un passage sur les intervalles triés"""
+    free_from = dict.fromkeys(room_ids, start)
+    gaps = defaultdict(list)
+    for blocked_start, blocked_end, room_id in intervals:
+        if blocked_start > free_from[room_id]:
+            gaps[room_id].append((free_from[room_id], min(blocked_start, end)))
+        free_from[room_id] = max(free_from[room_id], blocked_end)
+    for room_id, gap_start in free_from.items():
+        if gap_start < end:
+            gaps[room_id].append((gap_start, end))
+    return gaps
+
+
+def within_business_hours(gap_start, gap_end, business_hours):
+    """Découpe une plage libre selon les heures ouvrées de chaque jour (heure locale)"""
+    opening, closing = business_hours
+    day = timezone.localdate(gap_start)
+    last_day = timezone.localdate(gap_end)
+    while day <= last_day:
+        day_start = timezone.make_aware(datetime.combine(day, opening))
+        day_end = timezone.make_aware(datetime.combine(day, closing))
+        start, end = max(gap_start, day_start), min(gap_end, day_end)
+        if start < end:
+            yield start, end
+        day += timedelta(days=1)
+
+
+def round_up(value, step=SLOT_STEP):
+    epoch = datetime(2000, 1, 1, tzinfo=value.tzinfo)
+    remainder = (value - epoch) % step
+    return value if not remainder else value + step - remainder
+
+
+def find_free_slots(start, end, duration, min_capacity=None, business_hours=None, limit=20, now=None):
+    """Créneaux libres de durée duration entre start et end, classés
+
+    business_hours: (ouverture, fermeture) en heure locale, ou None pour
+    chercher à toute heure. Retourne au plus MAX_SLOTS_PER_ROOM créneaux
+    par salle et limit au total: [{'room', 'start', 'end', 'price'}, ...].
+    """
+    now = now or timezone.now()
+    start = max(ensure_aware(start), now)
+    end = ensure_aware(end)
+    if start >= end or duration <= timedelta(0):
+        return []
+
+    rooms = list(candidate_rooms(min_capacity))
+    if not rooms:
+        return []
+    schedules = RoomSchedule.load_many([room.pk for room in rooms], start, end)
+    gaps = free_gaps([room.pk for room in rooms], blocked_intervals(schedules), start, end)
+
+    options = []
+    for room in rooms:
+        room_options = []
+        for gap_start, gap_end in gaps[room.pk]:
+            windows = within_business_hours(gap_start, gap_end, business_hours) if business_hours else [
+                (gap_start, gap_end)
+            ]
+            for window_start, window_end in windows:
+                slot_start = round_up(window_start)
+                if slot_start + duration <= window_end:
+                    room_options.append({
+                        'room': room,
+                        'start': slot_start,
+                        'end': slot_start + duration,
+                        'free_until': window_end,
+                        'price': room.get_price(slot_start, slot_start + duration),
+                    })
+            if len(room_options) >= MAX_SLOTS_PER_ROOM:
+                break
+        options.extend(room_options[:MAX_SLOTS_PER_ROOM])
+
+    options.sort(key=lambda option: (option['start'], option['price'], option['room'].capacity))
+    return options[:limit]
@@ -0,0 +1,241 @@
+"""
+Grand livre des paiements de réservation.
+
+Chaque réservation tient son solde courant (amount_paid: paiements vérifiés,
+remboursements déduits; amount_pending: paiements à vérifier). Enregistrer
+ou vérifier un paiement met ce solde à jour dans la même transaction, sous
+verrou de la réservation, et note sur le paiement le reste à payer
+(balance_after). Les indicateurs deposit_paid et full_payment_paid sont
+déduits du solde. Ces colonnes ne sont écrites que par ce module, par des
+mises à jour ciblées: le formulaire de réservation ne les contient pas, et
+un changement de prix recalcule full_payment_paid en base (signals.py).
+
+Les créances de chaque organisation (OrganizationReceivable) sont
+recalculées à partir des soldes de ses réservations, jamais à partir de la
+table des paiements: à chaque écriture pour l'organisation concernée, et
+chaque nuit pour toutes (l'ancienneté avance avec la date) par la tâche
+jobs.room_tasks.refresh_receivables. Le rapport des créances par ancienneté
+ne lit que ces agrégats.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, DecimalField, ExpressionWrapper, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BookingPayment, ExternalOrganization, OrganizationReceivable, RoomBooking
+
+
+# Réservations facturées à l'organisation
+BILLED_STATUSES = ('confirmed', 'completed')
+# (champ de OrganizationReceivable, ancienneté minimale et maximale en jours après le début)
+AGING_BUCKETS = [
+    ('overdue_30_amount', 0, 30),
+    ('overdue_60_amount', 31, 60),
+    ('overdue_90_amount', 61, 90),
+    ('overdue_more_amount', 91, None),
+]
+ZERO = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+class PaymentError(Exception):
+    """Paiement refusé par le grand livre"""
+
+
+# ----------------------------------------------------------------------------
+# Solde des réservations
+# ----------------------------------------------------------------------------
+
+def set_payment_flags(booking):
+    """deposit_paid et full_payment_paid suivent le montant encaissé"""
+    booking.deposit_paid = booking.amount_paid > 0
+    booking.full_payment_paid = bool(booking.total_price) and booking.amount_paid >= booking.total_price
+
+
+def refresh_full_payment(booking_id):
+    """Le prix de la réservation a changé: full_payment_paid recalculé en base à partir du solde"""
+    RoomBooking.objects.filter(pk=booking_id).update(full_payment_paid=ExpressionWrapper(
+        Q(total_price__gt=0, amount_paid__gte=F('total_price')), output_field=BooleanField(),
+    ))
+
+
+def apply_to_booking(booking, paid=0, pending=0, payment=None):
+    """Ajoute les montants au solde de la réservation verrouillée (sans signaux)"""
+    booking.amount_paid += paid
+    booking.amount_pending += pending
+    set_payment_flags(booking)
+    RoomBooking.objects.filter(pk=booking.pk).update(
+        amount_paid=booking.amount_paid,
+        amount_pending=booking.amount_pending,
+        deposit_paid=booking.deposit_paid,
+        full_payment_paid=booking.full_payment_paid,
+        updated_at=timezone.now(),
+    )
+    if payment is not None and payment.is_verified:
+        payment.balance_after = booking.balance_due
+        BookingPayment.objects.filter(pk=payment.pk).update(balance_after=payment.balance_after)
+
+
+def lock_receivables(organization_ids):
+    """Verrouille les créances des organisations (créées au besoin), par identifiant croissant"""
+    organization_ids = sorted(set(organization_ids))
+    for organization_id in organization_ids:
+        OrganizationReceivable.objects.get_or_create(organization_id=organization_id)
+    list(OrganizationReceivable.objects.select_for_update().filter(
+        organization_id__in=organization_ids
+    ).order_by('organization_id'))
+    return organization_ids
+
+
+def lock_booking(booking_id):
+    """Verrouille les créances de l'organisation puis la réservation (toujours dans cet ordre)"""
+    lock_receivables([RoomBooking.objects.values_list('organization_id', flat=True).get(pk=booking_id)])
+    return RoomBooking.objects.select_for_update().get(pk=booking_id)
+
+
+def record_payment(payment):
+    """Enregistre un paiement et met à jour le solde de la réservation"""
+    if payment.amount is None or payment.amount <= 0:
+        raise PaymentError("Le montant doit être positif.")
+    with transaction.atomic():
+        booking = lock_booking(payment.booking_id)
+        if payment.is_verified and not payment.verified_at:
+            payment.verified_at = timezone.now()
+        payment.save()
+        if payment.is_verified:
+            apply_to_booking(booking, paid=payment.signed_amount, payment=payment)
+        else:
+            apply_to_booking(booking, pending=payment.signed_amount)
+        refresh_receivables([booking.organization_id])
+    return payment
+
+
+def verify_payment(payment, user=None):
+    """Marque le paiement vérifié: il passe des paiements à vérifier au montant encaissé"""
+    with transaction.atomic():
+        booking = lock_booking(payment.booking_id)
+        current = BookingPayment.objects.select_for_update().get(pk=payment.pk)
+        if current.is_verified:
+            raise PaymentError("Ce paiement est déjà vérifié.")
+        payment.is_verified = True
+        payment.verified_by = user
+        payment.verified_at = timezone.now()
+        payment.save(update_fields=['is_verified', 'verified_by', 'verified_at', 'updated_at'])
+        apply_to_booking(booking, paid=payment.signed_amount, pending=-payment.signed_amount, payment=payment)
+        refresh_receivables([booking.organization_id])
+    return payment
+
+
+def rebuild_booking_balances(booking_ids=None):
+    """Recalcule les soldes à partir des paiements (reprise de données); retourne le nombre de réservations"""
+    signed = Case(
+        When(payment_type='refund', then=F('amount') * -1), default=F('amount'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    payments = BookingPayment.objects.all()
+    bookings = RoomBooking.objects.all()
+    if booking_ids is not None:
+        payments = payments.filter(booking_id__in=booking_ids)
+        bookings = bookings.filter(pk__in=booking_ids)
+    totals = {
+        row.pop('booking_id'): row
+        for row in payments.values('booking_id').annotate(
+            amount_paid=Coalesce(Sum(signed, filter=Q(is_verified=True)), ZERO),
+            amount_pending=Coalesce(Sum(signed, filter=Q(is_verified=False)), ZERO),
+        ).order_by()
+    }
+    if booking_ids is None:
+        # Sans paiement, le solde reste à zéro
+        bookings = bookings.filter(pk__in=totals)
+    updated = []
+    for booking in bookings.only('pk', 'total_price'):
+        row = totals.get(booking.pk, {'amount_paid': 0, 'amount_pending': 0})
+        booking.amount_paid, booking.amount_pending = row['amount_paid'], row['amount_pending']
+        set_payment_flags(booking)
+        updated.append(booking)
+    RoomBooking.objects.bulk_update(
+        updated, ['amount_paid', 'amount_pending', 'deposit_paid', 'full_payment_paid'], batch_size=500
+    )
+    return len(updated)
+
+
+# ----------------------------------------------------------------------------
+# Créances des organisations
+# ----------------------------------------------------------------------------
+
+def receivable_rows(organization_ids=None, today=None):
+    """{organisation: champs de OrganizationReceivable}, en une requête sur les soldes des réservations"""
+    today = today or timezone.localdate()
+    bookings = RoomBooking.objects.filter(status__in=BILLED_STATUSES)
+    if organization_ids is not None:
+        bookings = bookings.filter(organization_id__in=organization_ids)
+    due = Q(balance__gt=0)
+    aging = {
+        field: Coalesce(Sum('balance', filter=due & Q(
+            start_date__lte=today - timedelta(days=low),
+            **({'start_date__gte': today - timedelta(days=high)} if high is not None else {}),
+        )), ZERO)
+        for field, low, high in AGING_BUCKETS
+    }
+    rows = bookings.alias(
+        balance=ExpressionWrapper(
+            Coalesce('total_price', ZERO) - F('amount_paid'), output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+        start_date=F('start_time__date'),
+    ).values('organization_id').annotate(
+        billed_amount=Coalesce(Sum('total_price'), ZERO),
+        paid_amount=Coalesce(Sum('amount_paid'), ZERO),
+        pending_amount=Coalesce(Sum('amount_pending'), ZERO),
+        outstanding_amount=Coalesce(Sum('balance', filter=due), ZERO),
+        not_due_amount=Coalesce(Sum('balance', filter=due & Q(start_date__gt=today)), ZERO),
+        unpaid_bookings=Count('pk', filter=due),
+        **aging,
+    ).order_by()
+    return {row.pop('organization_id'): dict(row, as_of=today) for row in rows}
+
+
+def refresh_receivables(organization_ids=None, today=None):
+    """Met à jour les créances des organisations (toutes si organization_ids est None)"""
+    rows = receivable_rows(organization_ids, today)
+    if organization_ids is None:
+        organization_ids = set(rows) | set(OrganizationReceivable.objects.values_list('organization_id', flat=True))
+    empty = dict.fromkeys(
+        ['billed_amount', 'paid_amount', 'pending_amount', 'outstanding_amount', 'not_due_amount',
+         *(field for field, _low, _high in AGING_BUCKETS)],
+        0,
+    )
+    receivables = [
+        OrganizationReceivable(
+            organization_id=organization_id,
+            **rows.get(organization_id, dict(empty, unpaid_bookings=0, as_of=today or timezone.localdate())),
+        )
+        for organization_id in organization_ids
+    ]
+    fields = [field.name for field in OrganizationReceivable._meta.concrete_fields if field.name not in ('id', 'organization')]
+    OrganizationReceivable.objects.bulk_create(
+        receivables, update_conflicts=True, unique_fields=['organization'], update_fields=fields, batch_size=500,
+    )
+    return len(receivables)
+
+
+def refresh_organization_receivables(*organization_ids):
+    """Recalcule sous verrou les créances des organisations (réservation modifiée ou supprimée)"""
+    # L'organisation a pu être supprimée avec ses réservations
+    organization_ids = ExternalOrganization.objects.filter(pk__in=organization_ids).values_list('pk', flat=True)
+    with transaction.atomic():
+        refresh_receivables(lock_receivables(organization_ids))
+
+
+def aged_receivables(min_outstanding=0):
+    """Rapport des créances par ancienneté: (lignes par organisation, totaux), lus dans les agrégats"""
+    receivables = OrganizationReceivable.objects.filter(
+        outstanding_amount__gt=min_outstanding
+    ).select_related('organization').order_by('-outstanding_amount')
+    totals = receivables.aggregate(
+        outstanding_amount=Coalesce(Sum('outstanding_amount'), ZERO),
+        pending_amount=Coalesce(Sum('pending_amount'), ZERO),
+        not_due_amount=Coalesce(Sum('not_due_amount'), ZERO),
+        **{field: Coalesce(Sum(field), ZERO) for field, _low, _high in AGING_BUCKETS},
+    )
+    return receivables, totals
@@ -0,0 +1,51 @@
+"""
+Recopie les FormResponse existantes dans le document EventRegistration.answers
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Prefetch
+
+from content_management.models import EventRegistration, FormResponse
+from content_management.registrations import build_answers
+
+
+class Command(BaseCommand):
+    help = "Remplit le document JSON answers des inscriptions à partir de leurs réponses"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Nombre d'inscriptions par lot")
+        parser.add_argument('--form', type=int, help="Limiter au formulaire d'inscription indiqué")
+        parser.add_argument('--force', action='store_true', help="Recalculer aussi les documents déjà remplis")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        registrations = EventRegistration.objects.order_by('pk').prefetch_related(
+            Prefetch(
+                'responses',
+                queryset=FormResponse.objects.select_related('field').prefetch_related('selected_options'),
+            )
+        )
+        if options['form']:
+            registrations = registrations.filter(form_id=options['form'])
+        if not options['force']:
+            registrations = registrations.filter(answers__isnull=True)
+
+        # Pagination par clé: chaque lot reprend après le dernier id traité
+        last_pk = 0
+        total = 0
+        while True:
+            batch = list(registrations.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            for registration in batch:
+                registration.answers = build_answers(
+                    (response, list(response.selected_options.all()))
+                    for response in registration.responses.all()
+                )
+            with transaction.atomic():
+                EventRegistration.objects.bulk_update(batch, ['answers'])
+            last_pk = batch[-1].pk
+            total += len(batch)
+            self.stdout.write(f"{total} inscriptions traitées")
+
+        self.stdout.write(self.style.SUCCESS(f"Reprise terminée: {total} inscriptions mises à jour"))
@@ -0,0 +1,52 @@
+"""
+Génère les badges ou attestations d'un événement en utilisant tous les cœurs
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from content_management.badges import (
+    DOCUMENT_CHUNK_SIZE, DOCUMENT_FORMATS, DOCUMENT_KINDS,
+    document_queryset, document_rows, event_info, generate_documents,
+)
+from content_management.models import Event
+
+
+class Command(BaseCommand):
+    help = "Génère les badges ou attestations de participation d'un événement (PDF ou ZIP)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', type=int, help="Identifiant de l'événement")
+        parser.add_argument('output', help="Fichier de sortie")
+        parser.add_argument('--kind', choices=sorted(DOCUMENT_KINDS), default='badge')
+        parser.add_argument('--format', choices=DOCUMENT_FORMATS, default='pdf', dest='file_format')
+        parser.add_argument('--workers', type=int, help="Nombre de processus (par défaut: tous les cœurs)")
+        parser.add_argument('--chunk-size', type=int, default=DOCUMENT_CHUNK_SIZE, help="Participants par lot")
+        parser.add_argument(
+            '--all-confirmed', action='store_true',
+            help="Attestations: inclure les inscrits confirmés non pointés à l'entrée"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.select_related('registration_form').get(pk=options['event'])
+        except Event.DoesNotExist:
+            raise CommandError(f"Événement {options['event']} introuvable")
+
+        kind = options['kind']
+        checked_in_only = False if options['all_confirmed'] else None
+        rows = document_rows(document_queryset(event, kind, checked_in_only))
+        if not rows:
+            raise CommandError("Aucun participant ne correspond à cette génération")
+
+        started = time.monotonic()
+        with open(options['output'], 'wb') as fileobj:
+            count = generate_documents(
+                kind, event_info(event), rows, fileobj,
+                file_format=options['file_format'],
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} documents écrits dans {options['output']} en {time.monotonic() - started:.1f} s"
+        ))
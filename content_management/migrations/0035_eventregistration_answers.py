@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:46
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0034_remove_aboutpage_achievements_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistration',
+            name='answers',
+            field=models.JSONField(blank=True, null=True, verbose_name='Réponses'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['answers'], name='eventreg_answers_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0035_eventregistration_answers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistration',
+            name='check_in_device',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Appareil de contrôle'),
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Heure d'entrée"),
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='checked_in_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='event_check_ins', to=settings.AUTH_USER_MODEL, verbose_name='Entrée validée par'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['form', 'checked_in_at'], name='content_man_form_id_c54f63_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:52
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0036_eventregistration_check_in'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventregistration',
+            name='dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=254, null=True, verbose_name='Clé de dédoublonnage'),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(models.F('form'), django.db.models.functions.text.Lower('email'), name='eventreg_form_email_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventregistration',
+            constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False), models.Q(('status', 'cancelled'), _negated=True)), fields=('form', 'dedup_key'), name='eventreg_unique_active_email'),
+        ),
+    ]
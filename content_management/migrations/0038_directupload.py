@@ -0,0 +1,43 @@
+# Generated by Django 5.2.5 on 2026-10-19 01:55
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0037_eventregistration_dedup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True, verbose_name='Jeton')),
+                ('target', models.CharField(help_text="Champ de destination: 'event.featured_image' ou 'registration_field.<id>'", max_length=100, verbose_name='Destination')),
+                ('filename', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Type de contenu')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Taille (octets)')),
+                ('key', models.CharField(max_length=500, verbose_name='Clé de stockage')),
+                ('backend', models.CharField(choices=[('local', 'Stockage local'), ('s3', 'Amazon S3')], default='local', max_length=10, verbose_name='Stockage')),
+                ('multipart_id', models.CharField(blank=True, max_length=255, verbose_name="ID d'envoi multipart")),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='Taille des morceaux')),
+                ('status', models.CharField(choices=[('pending', 'En cours'), ('completed', 'Terminé'), ('attached', 'Rattaché'), ('failed', 'Échoué')], default='pending', max_length=20, verbose_name='Statut')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin')),
+                ('expires_at', models.DateTimeField(verbose_name="Date d'expiration")),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='direct_uploads', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Envoi direct',
+                'verbose_name_plural': 'Envois directs',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'expires_at'], name='content_man_status_a8af67_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0038_directupload'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offset_hours', models.PositiveIntegerField(verbose_name="Heures avant l'événement")),
+                ('send_at', models.DateTimeField(verbose_name="Date d'envoi prévue")),
+                ('status', models.CharField(choices=[('pending', 'Programmé'), ('sending', "En cours d'envoi"), ('sent', 'Envoyé'), ('skipped', 'Ignoré')], default='pending', max_length=20, verbose_name='Statut')),
+                ('last_registration_id', models.BigIntegerField(default=0, verbose_name='Dernière inscription traitée')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Emails mis en file')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name="Début d'envoi")),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name="Fin d'envoi")),
+            ],
+            options={
+                'verbose_name': "Rappel d'événement",
+                'verbose_name_plural': "Rappels d'événement",
+                'ordering': ['send_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='eventregistration',
+            name='language',
+            field=models.CharField(choices=[('fr', 'Français'), ('en', 'English')], default='fr', max_length=7, verbose_name='Langue'),
+        ),
+        migrations.AddField(
+            model_name='eventregistrationform',
+            name='reminder_offsets',
+            field=models.JSONField(blank=True, default=list, help_text='Exemple: [168, 24] pour un rappel 7 jours puis 1 jour avant', verbose_name="Rappels (heures avant l'événement)"),
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(fields=['form', 'status', 'id'], name='eventreg_form_status_idx'),
+        ),
+        migrations.AddField(
+            model_name='eventreminder',
+            name='form',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='content_management.eventregistrationform', verbose_name="Formulaire d'inscription"),
+        ),
+        migrations.AddIndex(
+            model_name='eventreminder',
+            index=models.Index(fields=['status', 'send_at'], name='content_man_status_f162ba_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='eventreminder',
+            constraint=models.UniqueConstraint(fields=('form', 'offset_hours'), name='eventreminder_unique_offset'),
+        ),
+    ]
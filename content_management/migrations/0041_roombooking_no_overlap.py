@@ -0,0 +1,53 @@
+import content_management.models
+from django.db import migrations, models
+
+
+TABLE = 'content_management_roombooking'
+ACTIVE_STATUSES = "('confirmed', 'pending')"
+
+
+def check_no_overlaps(apps, schema_editor):
+    """Refuse la migration tant que des réservations actives se chevauchent"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT a.id, b.id FROM {TABLE} a JOIN {TABLE} b
+              ON a.room_id = b.room_id AND a.id < b.id
+             AND a.start_time < b.end_time AND b.start_time < a.end_time
+           WHERE a.status IN {ACTIVE_STATUSES} AND b.status IN {ACTIVE_STATUSES}
+           LIMIT 20
+        """)
+        overlaps = cursor.fetchall()
+    if overlaps:
+        raise RuntimeError(
+            "Réservations actives qui se chevauchent, à annuler ou déplacer avant la migration: "
+            + ", ".join(f"{first}/{second}" for first, second in overlaps)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0040_event_browse_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='roombooking',
+            constraint=content_management.models.PostgresExclusionConstraint(
+                condition=models.Q(('status__in', ['confirmed', 'pending'])),
+                expressions=[
+                    (content_management.models.Int8Range('room', 'room', models.Value('[]')), '='),
+                    (content_management.models.TsTzRange('start_time', 'end_time', models.Value('[)')), '&&'),
+                ],
+                name='roombooking_no_overlap',
+                violation_error_message='Cette salle est déjà réservée sur ce créneau.',
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name='roombooking',
+            name='content_man_room_id_a0d9e0_idx',
+        ),
+    ]
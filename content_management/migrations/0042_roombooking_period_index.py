@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+INDEX = 'roombooking_period_gist'
+TABLE = 'content_management_roombooking'
+
+
+def add_period_index(apps, schema_editor):
+    """Index GiST sur la période de toutes les réservations (calendrier)
+
+    La contrainte roombooking_no_overlap n'indexe que les réservations
+    actives; le calendrier affiche aussi les réservations annulées,
+    refusées et terminées.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX} ON {TABLE} USING gist (TSTZRANGE(start_time, end_time, '[)'))"
+    )
+
+
+def remove_period_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0041_roombooking_no_overlap'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_period_index, remove_period_index),
+    ]
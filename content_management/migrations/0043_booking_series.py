@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0042_roombooking_period_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('event_title', models.CharField(max_length=200, verbose_name="Titre de l'événement")),
+                ('event_description', models.TextField(blank=True, verbose_name="Description de l'événement")),
+                ('start_time', models.DateTimeField(verbose_name='Début de la première occurrence')),
+                ('end_time', models.DateTimeField(verbose_name='Fin de la première occurrence')),
+                ('rrule', models.CharField(help_text='Format RRULE (RFC 5545), par exemple FREQ=WEEKLY;BYDAY=MO;COUNT=52', max_length=255, verbose_name='Règle de récurrence')),
+                ('attendees_count', models.PositiveIntegerField(blank=True, null=True, verbose_name='Nombre de participants')),
+                ('special_requirements', models.TextField(blank=True, verbose_name='Exigences spéciales')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_booking_series', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+                ('organization', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to='content_management.externalorganization', verbose_name='Organisation')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_series', to='content_management.conferenceroom', verbose_name='Salle')),
+            ],
+            options={
+                'verbose_name': 'Série de réservations',
+                'verbose_name_plural': 'Séries de réservations',
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='roombooking',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='content_management.bookingseries', verbose_name='Série'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0043_booking_series'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomUsageRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('open_seconds', models.PositiveIntegerField(default=0, verbose_name="Durée d'ouverture (s)")),
+                ('booked_seconds', models.PositiveIntegerField(default=0, help_text="Pendant les heures d'ouverture", verbose_name='Durée réservée (s)')),
+                ('hourly_seconds', models.JSONField(default=list, verbose_name='Durée réservée par heure (s)')),
+                ('bookings_count', models.PositiveIntegerField(default=0, verbose_name='Réservations commençant ce jour')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Revenus')),
+                ('revenue_by_organization', models.JSONField(default=dict, verbose_name='Revenus par organisation')),
+                ('lead_times', models.JSONField(default=dict, verbose_name='Délais de réservation')),
+                ('is_stale', models.BooleanField(default=False, verbose_name='À recalculer')),
+                ('refreshed_at', models.DateTimeField(auto_now=True, verbose_name='Date de calcul')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to='content_management.conferenceroom', verbose_name='Salle')),
+            ],
+            options={
+                'verbose_name': "Agrégat d'occupation de salle",
+                'verbose_name_plural': "Agrégats d'occupation de salle",
+                'ordering': ['room', 'day'],
+                'indexes': [models.Index(fields=['day'], name='content_man_day_4310cf_idx'), models.Index(fields=['is_stale', 'day'], name='content_man_is_stal_bc5fd0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('room', 'day'), name='roomusagerollup_room_day')],
+            },
+        ),
+    ]
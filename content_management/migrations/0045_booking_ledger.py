@@ -0,0 +1,76 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, DecimalField, F, Q, Sum, When
+
+
+def backfill_balances(apps, schema_editor):
+    """Soldes des réservations existantes à partir de leurs paiements
+
+    Les indicateurs deposit_paid et full_payment_paid saisis à la main sont
+    conservés; les créances sont calculées par la tâche refresh_receivables.
+    """
+    BookingPayment = apps.get_model('content_management', 'BookingPayment')
+    RoomBooking = apps.get_model('content_management', 'RoomBooking')
+    signed = Case(
+        When(payment_type='refund', then=F('amount') * -1), default=F('amount'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    rows = BookingPayment.objects.values('booking_id').annotate(
+        paid=Sum(signed, filter=Q(is_verified=True)), pending=Sum(signed, filter=Q(is_verified=False)),
+    ).order_by()
+    for row in rows:
+        RoomBooking.objects.filter(pk=row['booking_id']).update(
+            amount_paid=row['paid'] or 0, amount_pending=row['pending'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0044_room_usage_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingpayment',
+            name='balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text='Reste à payer sur la réservation une fois le paiement vérifié', max_digits=10, null=True, verbose_name='Solde après paiement'),
+        ),
+        migrations.AddField(
+            model_name='roombooking',
+            name='amount_paid',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Paiements vérifiés, remboursements déduits', max_digits=10, verbose_name='Montant encaissé'),
+        ),
+        migrations.AddField(
+            model_name='roombooking',
+            name='amount_pending',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Paiements à vérifier'),
+        ),
+        migrations.CreateModel(
+            name='OrganizationReceivable',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('billed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Montant facturé')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Montant encaissé')),
+                ('pending_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Paiements à vérifier')),
+                ('outstanding_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Reste dû')),
+                ('not_due_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Non échu')),
+                ('overdue_30_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='0 à 30 jours')),
+                ('overdue_60_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='31 à 60 jours')),
+                ('overdue_90_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='61 à 90 jours')),
+                ('overdue_more_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Plus de 90 jours')),
+                ('unpaid_bookings', models.PositiveIntegerField(default=0, verbose_name='Réservations non soldées')),
+                ('as_of', models.DateField(blank=True, null=True, verbose_name='Ancienneté calculée au')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('organization', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='receivable', to='content_management.externalorganization', verbose_name='Organisation')),
+            ],
+            options={
+                'verbose_name': "Créance d'organisation",
+                'verbose_name_plural': 'Créances des organisations',
+                'ordering': ['-outstanding_amount'],
+            },
+        ),
+        migrations.RunPython(backfill_balances, migrations.RunPython.noop),
+    ]
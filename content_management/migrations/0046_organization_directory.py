@@ -0,0 +1,101 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:47
+
+from django.db import DatabaseError, migrations, models, transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.utils import timezone
+
+
+INDEX = 'extorg_name_search'
+TABLE = 'content_management_externalorganization'
+
+
+def add_name_search_index(apps, schema_editor):
+    """Index de recherche sur UPPER(name), l'expression des recherches insensibles à la casse
+
+    Index trigramme (GIN) si l'extension pg_trgm peut être installée,
+    sinon index text_pattern_ops pour les recherches par préfixe.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        trigram = cursor.fetchone() is not None
+    if trigram:
+        try:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except DatabaseError:
+            # Droits insuffisants: l'extension peut être installée plus tard par un administrateur
+            trigram = False
+    if trigram:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON {TABLE} USING gin (UPPER(name::text) gin_trgm_ops)")
+    else:
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {INDEX} ON {TABLE} (UPPER(name::text) text_pattern_ops)")
+
+
+def remove_name_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+
+
+def backfill_stats(apps, schema_editor):
+    """Agrégats des réservations existantes (voir organizations.organization_stats)"""
+    ExternalOrganization = apps.get_model('content_management', 'ExternalOrganization')
+    RoomBooking = apps.get_model('content_management', 'RoomBooking')
+    now = timezone.now()
+    billed = Q(status__in=('confirmed', 'completed'))
+    rows = RoomBooking.objects.filter(status__in=('pending', 'confirmed', 'completed')).values(
+        'organization_id'
+    ).annotate(
+        bookings_count=Count('pk'),
+        confirmed_bookings_count=Count('pk', filter=billed),
+        confirmed_revenue=Sum('total_price', filter=billed),
+        last_booking_at=Max('start_time', filter=Q(start_time__lte=now)),
+        next_booking_at=Min('start_time', filter=Q(start_time__gt=now, status__in=('confirmed', 'pending'))),
+    ).order_by()
+    for row in rows:
+        organization_id = row.pop('organization_id')
+        row['confirmed_revenue'] = row['confirmed_revenue'] or 0
+        ExternalOrganization.objects.filter(pk=organization_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0045_booking_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='externalorganization',
+            name='bookings_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Réservations'),
+        ),
+        migrations.AddField(
+            model_name='externalorganization',
+            name='confirmed_bookings_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Réservations confirmées'),
+        ),
+        migrations.AddField(
+            model_name='externalorganization',
+            name='confirmed_revenue',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name="Chiffre d'affaires confirmé"),
+        ),
+        migrations.AddField(
+            model_name='externalorganization',
+            name='last_booking_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Dernière réservation'),
+        ),
+        migrations.AddField(
+            model_name='externalorganization',
+            name='next_booking_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Prochaine réservation'),
+        ),
+        migrations.AddIndex(
+            model_name='externalorganization',
+            index=models.Index(fields=['next_booking_at'], name='extorg_next_booking_idx'),
+        ),
+        migrations.RunPython(add_name_search_index, remove_name_search_index),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
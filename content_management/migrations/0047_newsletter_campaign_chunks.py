@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0046_organization_directory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettercampaign',
+            name='last_subscriber_id',
+            field=models.BigIntegerField(default=0, verbose_name='Dernier abonné réparti'),
+        ),
+        migrations.AddField(
+            model_name='newslettercampaign',
+            name='recipients_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Destinataires répartis'),
+        ),
+        migrations.CreateModel(
+            name='NewsletterCampaignChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(verbose_name='Numéro du lot')),
+                ('first_subscriber_id', models.BigIntegerField(verbose_name='Premier abonné')),
+                ('last_subscriber_id', models.BigIntegerField(verbose_name='Dernier abonné')),
+                ('recipients_count', models.PositiveIntegerField(default=0, verbose_name='Destinataires')),
+                ('cursor', models.BigIntegerField(default=0, verbose_name='Dernier abonné traité')),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('sending', "En cours d'envoi"), ('sent', 'Envoyé'), ('failed', 'Échoué')], default='pending', max_length=20, verbose_name='Statut')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Emails envoyés')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Échecs')),
+                ('error_message', models.TextField(blank=True, verbose_name='Erreur')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name="Début d'envoi")),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name="Fin d'envoi")),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Date de modification')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='content_management.newslettercampaign', verbose_name='Campagne')),
+            ],
+            options={
+                'verbose_name': 'Lot de campagne newsletter',
+                'verbose_name_plural': 'Lots de campagne newsletter',
+                'ordering': ['campaign', 'index'],
+                'indexes': [models.Index(fields=['campaign', 'status'], name='newsletterchunk_status_idx')],
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'index'), name='newsletterchunk_campaign_index')],
+            },
+        ),
+    ]
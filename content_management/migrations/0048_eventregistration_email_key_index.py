@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:58
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_management', '0047_newsletter_campaign_chunks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='eventregistration',
+            name='eventreg_form_email_idx',
+        ),
+        migrations.AddIndex(
+            model_name='eventregistration',
+            index=models.Index(models.F('form'), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('email')), name='eventreg_form_email_idx'),
+        ),
+    ]
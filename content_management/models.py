@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, connections, models
 from django.conf import settings
+from django.db.models.functions import Lower, Trim
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, DateTimeRangeField, RangeOperators
+from django.contrib.postgres.indexes import GinIndex
 from django.utils.translation import gettext_lazy as _
 from django.utils.text import slugify
 from django.urls import reverse
@@ -207,6 +211,12 @@ class Event(TimeStampedModel):
         verbose_name = _("Événement")
         verbose_name_plural = _("Événements")
         ordering = ['-start_date', '-start_time']
+        indexes = [
+            # Navigation publique par facettes: à venir / passés et filtres courants
+            models.Index(fields=['status', 'start_date'], name='event_status_start_idx'),
+            models.Index(fields=['status', 'end_date'], name='event_status_end_idx'),
+            models.Index(fields=['status', 'event_type', 'start_date'], name='event_status_type_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -645,6 +655,10 @@ class NewsletterCampaign(TimeStampedModel):
         verbose_name=_("Abonnés actifs uniquement")
     )
     
+    # Répartition des destinataires en lots (voir campaigns.py)
+    last_subscriber_id = models.BigIntegerField(default=0, verbose_name=_("Dernier abonné réparti"))
+    recipients_count = models.PositiveIntegerField(default=0, verbose_name=_("Destinataires répartis"))
+    
     class Meta:
         verbose_name = _("Campagne newsletter")
         verbose_name_plural = _("Campagnes newsletter")
@@ -653,9 +667,8 @@ class NewsletterCampaign(TimeStampedModel):
     def __str__(self):
         return self.title
     
-    @property
-    def total_subscribers(self):
-        """Nombre total d'abonnés cibles"""
+    def recipients(self):
+        """Abonnés ciblés par la campagne"""
         queryset = Newsletter.objects.all()
         
         if self.target_active_only:
@@ -664,7 +677,12 @@ class NewsletterCampaign(TimeStampedModel):
         if self.target_language != 'all':
             queryset = queryset.filter(language=self.target_language)
         
-        return queryset.count()
+        return queryset
+    
+    @property
+    def total_subscribers(self):
+        """Nombre total d'abonnés cibles"""
+        return self.recipients().count()
     
     @property
     def success_rate(self):
@@ -682,6 +700,54 @@ class NewsletterCampaign(TimeStampedModel):
         return True
 
 
+class NewsletterCampaignChunk(models.Model):
+    """Lot de destinataires d'une campagne, envoyé par une seule tâche
+
+    Le lot couvre les abonnés d'identifiant first_subscriber_id à
+    last_subscriber_id; cursor est le dernier abonné traité, pour reprendre
+    un envoi interrompu sans doublon.
+    """
+    STATUS_CHOICES = [
+        ('pending', _('En attente')),
+        ('sending', _('En cours d\'envoi')),
+        ('sent', _('Envoyé')),
+        ('failed', _('Échoué')),
+    ]
+    
+    campaign = models.ForeignKey(
+        NewsletterCampaign,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+        verbose_name=_("Campagne")
+    )
+    index = models.PositiveIntegerField(verbose_name=_("Numéro du lot"))
+    first_subscriber_id = models.BigIntegerField(verbose_name=_("Premier abonné"))
+    last_subscriber_id = models.BigIntegerField(verbose_name=_("Dernier abonné"))
+    recipients_count = models.PositiveIntegerField(default=0, verbose_name=_("Destinataires"))
+    cursor = models.BigIntegerField(default=0, verbose_name=_("Dernier abonné traité"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name=_("Statut"))
+    sent_count = models.PositiveIntegerField(default=0, verbose_name=_("Emails envoyés"))
+    failed_count = models.PositiveIntegerField(default=0, verbose_name=_("Échecs"))
+    error_message = models.TextField(blank=True, verbose_name=_("Erreur"))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Début d'envoi"))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Fin d'envoi"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Date de modification"))
+    
+    class Meta:
+        verbose_name = _("Lot de campagne newsletter")
+        verbose_name_plural = _("Lots de campagne newsletter")
+        ordering = ['campaign', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['campaign', 'index'], name='newsletterchunk_campaign_index'),
+        ]
+        indexes = [
+            models.Index(fields=['campaign', 'status'], name='newsletterchunk_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.campaign} - lot {self.index}"
+
+
 class ContactMessage(TimeStampedModel):
     """Messages de contact"""
     name = models.CharField(max_length=100, verbose_name=_("Nom"))
@@ -739,6 +805,12 @@ class EventRegistrationForm(models.Model):
     registration_deadline = models.DateTimeField(null=True, blank=True, verbose_name=_("Date limite d'inscription"))
     send_confirmation_email = models.BooleanField(default=True, verbose_name=_("Envoyer un email de confirmation"))
     confirmation_message = models.TextField(blank=True, verbose_name=_("Message de confirmation"))
+    reminder_offsets = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name=_("Rappels (heures avant l'événement)"),
+        help_text=_("Exemple: [168, 24] pour un rappel 7 jours puis 1 jour avant")
+    )
     terms_and_conditions = models.TextField(blank=True, verbose_name=_("Conditions générales"))
     require_terms_acceptance = models.BooleanField(default=False, verbose_name=_("Exiger l'acceptation des conditions"))
     
@@ -889,11 +961,46 @@ class EventRegistration(models.Model):
     # Métadonnées
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name=_("Adresse IP"))
     user_agent = models.TextField(blank=True, verbose_name=_("User Agent"))
+    language = models.CharField(max_length=7, choices=settings.LANGUAGES, default='fr', verbose_name=_("Langue"))
+    
+    # Copie des réponses en document JSONB: {"<id du champ>": valeur}
+    # Les choix sont stockés en liste de valeurs d'options. NULL tant que
+    # l'inscription n'a pas été reprise par backfill_registration_answers.
+    answers = models.JSONField(null=True, blank=True, verbose_name=_("Réponses"))
+    
+    # Contrôle des entrées (voir checkin.py)
+    checked_in_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Heure d'entrée"))
+    checked_in_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='event_check_ins',
+        verbose_name=_("Entrée validée par")
+    )
+    check_in_device = models.CharField(max_length=100, blank=True, verbose_name=_("Appareil de contrôle"))
+    
+    # Email normalisé, renseigné seulement si le formulaire n'autorise pas
+    # les inscriptions multiples (voir dedup.py)
+    dedup_key = models.CharField(max_length=254, null=True, blank=True, editable=False, verbose_name=_("Clé de dédoublonnage"))
     
     class Meta:
         verbose_name = _("Inscription à l'événement")
         verbose_name_plural = _("Inscriptions à l'événement")
         ordering = ['-registration_date']
+        indexes = [
+            GinIndex(fields=['answers'], name='eventreg_answers_gin', opclasses=['jsonb_path_ops']),
+            models.Index(fields=['form', 'checked_in_at']),
+            models.Index('form', Lower(Trim('email')), name='eventreg_form_email_idx'),
+            models.Index(fields=['form', 'status', 'id'], name='eventreg_form_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['form', 'dedup_key'],
+                condition=models.Q(dedup_key__isnull=False) & ~models.Q(status='cancelled'),
+                name='eventreg_unique_active_email',
+            ),
+        ]
     
     def __str__(self):
         return f"Inscription de {self.first_name} {self.last_name} - {self.form.event.title}"
@@ -909,6 +1016,12 @@ class EventRegistration(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
     
+    @property
+    def ticket_code(self):
+        """Contenu signé du QR code du billet"""
+        from .checkin import ticket_code
+        return ticket_code(self.registration_id)
+    
     @property
     def responses(self):
         """Retourne toutes les réponses de cette inscription"""
@@ -945,9 +1058,8 @@ class FormResponse(models.Model):
     def display_value(self):
         """Retourne la valeur affichable selon le type de champ"""
         if self.field.field_type in ['select', 'multiselect', 'radio', 'checkbox']:
-            if self.selected_options.exists():
-                return ", ".join([opt.label for opt in self.selected_options.all()])
-            return ""
+            # all() profite du cache de prefetch_related('selected_options')
+            return ", ".join([opt.label for opt in self.selected_options.all()])
         elif self.field.field_type == 'file':
             return self.file_value.name if self.file_value else ""
         elif self.field.field_type == 'date':
@@ -1097,14 +1209,21 @@ class ConferenceRoom(TimeStampedModel):
             return False
         return True
     
+    def get_price(self, start_time, end_time):
+        """Prix d'une réservation: à l'heure jusqu'à 8 heures, à la journée au-delà"""
+        from decimal import Decimal
+        duration_hours = (end_time - start_time).total_seconds() / 3600
+        if duration_hours <= 8:  # Moins d'une journée
+            price = self.price_per_hour * Decimal(str(duration_hours))
+        else:  # Plus d'une journée
+            days = (end_time - start_time).days + 1
+            price = self.price_per_day * Decimal(str(days))
+        return price.quantize(Decimal('0.01'))
+    
     def get_availability(self, start_date, end_date):
         """Vérifie la disponibilité pour une période donnée"""
-        conflicting_bookings = self.bookings.filter(
-            models.Q(start_time__lt=end_date) & 
-            models.Q(end_time__gt=start_date) &
-            models.Q(status__in=['confirmed', 'pending'])
-        )
-        return conflicting_bookings.count() == 0
+        from .conflicts import RoomSchedule
+        return not RoomSchedule.load(self.pk, start_date, end_date).has_conflict(start_date, end_date)
 
 
 class RoomImage(TimeStampedModel):
@@ -1145,11 +1264,24 @@ class ExternalOrganization(TimeStampedModel):
     tax_id = models.CharField(max_length=50, blank=True, verbose_name=_("Numéro de TVA"))
     notes = models.TextField(blank=True, verbose_name=_("Notes"))
     is_active = models.BooleanField(default=True, verbose_name=_("Actif"))
+    # Historique des réservations, tenu à jour par organizations.refresh_organization_stats
+    bookings_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Réservations"))
+    confirmed_bookings_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name=_("Réservations confirmées")
+    )
+    confirmed_revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, verbose_name=_("Chiffre d'affaires confirmé")
+    )
+    last_booking_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Dernière réservation"))
+    next_booking_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Prochaine réservation"))
     
     class Meta:
         verbose_name = _("Organisation externe")
         verbose_name_plural = _("Organisations externes")
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['next_booking_at'], name='extorg_next_booking_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -1160,6 +1292,96 @@ class ExternalOrganization(TimeStampedModel):
         super().save(*args, **kwargs)
 
 
+class BookingSeries(TimeStampedModel):
+    """Réservation récurrente: règle de récurrence et modèle des occurrences
+
+    Les occurrences sont des RoomBooking rattachées à la série (voir
+    recurrence.py). start_time et end_time sont ceux de la première.
+    """
+    room = models.ForeignKey(
+        ConferenceRoom,
+        on_delete=models.CASCADE,
+        related_name='booking_series',
+        verbose_name=_("Salle")
+    )
+    organization = models.ForeignKey(
+        ExternalOrganization,
+        on_delete=models.CASCADE,
+        related_name='booking_series',
+        verbose_name=_("Organisation")
+    )
+    event_title = models.CharField(max_length=200, verbose_name=_("Titre de l'événement"))
+    event_description = models.TextField(blank=True, verbose_name=_("Description de l'événement"))
+    start_time = models.DateTimeField(verbose_name=_("Début de la première occurrence"))
+    end_time = models.DateTimeField(verbose_name=_("Fin de la première occurrence"))
+    rrule = models.CharField(
+        max_length=255,
+        verbose_name=_("Règle de récurrence"),
+        help_text=_("Format RRULE (RFC 5545), par exemple FREQ=WEEKLY;BYDAY=MO;COUNT=52")
+    )
+    attendees_count = models.PositiveIntegerField(null=True, blank=True, verbose_name=_("Nombre de participants"))
+    special_requirements = models.TextField(blank=True, verbose_name=_("Exigences spéciales"))
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='created_booking_series',
+        verbose_name=_("Créée par")
+    )
+
+    class Meta:
+        verbose_name = _("Série de réservations")
+        verbose_name_plural = _("Séries de réservations")
+        ordering = ['-start_time']
+
+    def __str__(self):
+        return f"{self.event_title} - {self.room.name} ({self.rrule})"
+
+
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class Int8Range(models.Func):
+    function = 'INT8RANGE'
+    output_field = BigIntegerRangeField()
+
+
+class PostgresExclusionConstraint(ExclusionConstraint):
+    """Contrainte d'exclusion créée et vérifiée sur PostgreSQL seulement
+
+    Les autres bases (SQLite en développement) n'ont pas d'équivalent: la
+    vérification des conflits reste celle de l'application. Comme pour
+    UniqueConstraint, la validation est ignorée lorsque la condition porte
+    sur un champ exclu.
+    """
+
+    def constraint_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return None
+        return super().constraint_sql(model, schema_editor)
+
+    def create_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return None
+        return super().create_sql(model, schema_editor)
+
+    def remove_sql(self, model, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return None
+        return super().remove_sql(model, schema_editor)
+
+    def validate(self, model, instance, exclude=None, using=DEFAULT_DB_ALIAS):
+        if connections[using].vendor != 'postgresql':
+            return
+        # Condition sur un champ exclu (statut absent du formulaire): vérification laissée à la base
+        if exclude and self.condition is not None and set(exclude) & self.condition.referenced_base_fields:
+            return
+        super().validate(model, instance, exclude=exclude, using=using)
+
+
 class RoomBooking(TimeStampedModel):
     """Réservation d'une salle de conférence"""
     room = models.ForeignKey(
@@ -1205,6 +1427,14 @@ class RoomBooking(TimeStampedModel):
     )
     deposit_paid = models.BooleanField(default=False, verbose_name=_("Acompte payé"))
     full_payment_paid = models.BooleanField(default=False, verbose_name=_("Paiement complet"))
+    # Solde courant tenu par le grand livre des paiements (voir ledger.py)
+    amount_paid = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name=_("Montant encaissé"),
+        help_text=_("Paiements vérifiés, remboursements déduits")
+    )
+    amount_pending = models.DecimalField(
+        max_digits=10, decimal_places=2, default=0, verbose_name=_("Paiements à vérifier")
+    )
     special_requirements = models.TextField(blank=True, verbose_name=_("Exigences spéciales"))
     admin_notes = models.TextField(blank=True, verbose_name=_("Notes administrateur"))
     confirmed_by = models.ForeignKey(
@@ -1216,15 +1446,37 @@ class RoomBooking(TimeStampedModel):
         verbose_name=_("Confirmé par")
     )
     confirmed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Date de confirmation"))
+    series = models.ForeignKey(
+        BookingSeries,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences',
+        verbose_name=_("Série")
+    )
     
     class Meta:
         verbose_name = _("Réservation de salle")
         verbose_name_plural = _("Réservations de salle")
         ordering = ['-start_time']
         indexes = [
-            models.Index(fields=['room', 'start_time', 'end_time']),
             models.Index(fields=['status', 'start_time']),
         ]
+        constraints = [
+            # Pas deux réservations actives (voir conflicts.ACTIVE_BOOKING_STATUSES) qui se
+            # chevauchent dans la même salle. INT8RANGE(room_id, room_id, '[]') WITH =
+            # remplace room_id WITH = sans l'extension btree_gist; la contrainte indexe
+            # aussi (salle, période) en GiST.
+            PostgresExclusionConstraint(
+                name='roombooking_no_overlap',
+                expressions=[
+                    (Int8Range('room', 'room', models.Value('[]')), RangeOperators.EQUAL),
+                    (TsTzRange('start_time', 'end_time', models.Value('[)')), RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=['confirmed', 'pending']),
+                violation_error_message=_("Cette salle est déjà réservée sur ce créneau."),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.event_title} - {self.room.name} ({self.start_time.date()})"
@@ -1232,13 +1484,7 @@ class RoomBooking(TimeStampedModel):
     def save(self, *args, **kwargs):
         # Calculer le prix total si pas déjà défini
         if not self.total_price:
-            from decimal import Decimal
-            duration_hours = (self.end_time - self.start_time).total_seconds() / 3600
-            if duration_hours <= 8:  # Moins d'une journée
-                self.total_price = self.room.price_per_hour * Decimal(str(duration_hours))
-            else:  # Plus d'une journée
-                days = (self.end_time - self.start_time).days + 1
-                self.total_price = self.room.price_per_day * Decimal(str(days))
+            self.total_price = self.room.get_price(self.start_time, self.end_time)
         
         # Marquer comme confirmé si le statut change
         if self.status == 'confirmed' and not self.confirmed_at:
@@ -1256,6 +1502,11 @@ class RoomBooking(TimeStampedModel):
         """Durée en jours"""
         return (self.end_time - self.start_time).days + 1
     
+    @property
+    def balance_due(self):
+        """Reste à payer (négatif en cas de trop-perçu)"""
+        return (self.total_price or 0) - self.amount_paid
+    
     @property
     def is_confirmed(self):
         """Vérifie si la réservation est confirmée"""
@@ -1276,80 +1527,18 @@ class RoomBooking(TimeStampedModel):
         """Vérifie si la réservation est terminée"""
         return self.status == 'completed'
     
+    def get_schedule(self):
+        """Planning indexé de la salle sur la période de la réservation (voir conflicts.py)"""
+        from .conflicts import RoomSchedule
+        return RoomSchedule.load(self.room_id, self.start_time, self.end_time, exclude_booking_id=self.pk)
+
     def check_conflicts(self):
-        """Vérifie s'il y a des conflits avec d'autres réservations"""
-        conflicting_bookings = RoomBooking.objects.filter(
-            room=self.room,
-            status__in=['confirmed', 'pending'],
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time
-        ).exclude(pk=self.pk)
-        
-        return conflicting_bookings.exists()
+        """Vérifie s'il y a des conflits avec d'autres réservations ou une maintenance"""
+        return self.get_schedule().has_conflict(self.start_time, self.end_time)
     
     def get_conflicts_report(self):
         """Génère un rapport détaillé des conflits"""
-        from django.utils import timezone
-        from datetime import timezone as dt_timezone
-        
-        # S'assurer que les dates ont le bon fuseau horaire
-        start_time = self.start_time
-        end_time = self.end_time
-        
-        # Si les dates n'ont pas de fuseau horaire, les traiter comme UTC
-        if start_time and timezone.is_naive(start_time):
-            start_time = timezone.make_aware(start_time, dt_timezone.utc)
-        if end_time and timezone.is_naive(end_time):
-            end_time = timezone.make_aware(end_time, dt_timezone.utc)
-        
-        if not self.pk:  # Nouvelle réservation
-            conflicting_bookings = RoomBooking.objects.filter(
-                room=self.room,
-                status__in=['confirmed', 'pending'],
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            )
-        else:
-            conflicting_bookings = RoomBooking.objects.filter(
-                room=self.room,
-                status__in=['confirmed', 'pending'],
-                start_time__lt=end_time,
-                end_time__gt=start_time
-            ).exclude(pk=self.pk)
-        
-        conflicts = []
-        for booking in conflicting_bookings:
-            try:
-                # Calculer la période de chevauchement
-                overlap_start = max(start_time, booking.start_time)
-                overlap_end = min(end_time, booking.end_time)
-                overlap_duration = (overlap_end - overlap_start).total_seconds() / 3600
-                
-                conflicts.append({
-                    'booking': booking,
-                    'overlap_start': overlap_start,
-                    'overlap_end': overlap_end,
-                    'overlap_hours': round(overlap_duration, 2),
-                    'overlap_days': round(overlap_duration / 24, 2),
-                    'conflict_type': 'overlap',
-                    'conflicting_event': booking.event_title,
-                    'conflicting_organization': booking.organization.name if booking.organization else 'N/A'
-                })
-            except Exception as e:
-                # En cas d'erreur de calcul, ajouter un conflit générique
-                conflicts.append({
-                    'booking': booking,
-                    'overlap_start': None,
-                    'overlap_end': None,
-                    'overlap_hours': 0,
-                    'overlap_days': 0,
-                    'conflict_type': 'error',
-                    'error_message': str(e),
-                    'conflicting_event': booking.event_title,
-                    'conflicting_organization': booking.organization.name if booking.organization else 'N/A'
-                })
-        
-        return conflicts
+        return self.get_schedule().conflicts(self.start_time, self.end_time)
     
     def get_duration_info(self):
         """Retourne les informations de durée formatées"""
@@ -1364,53 +1553,8 @@ class RoomBooking(TimeStampedModel):
     
     def get_detailed_conflicts_summary(self):
         """Résumé détaillé des conflits pour l'affichage"""
-        conflicts = self.get_conflicts_report()
-        
-        if not conflicts:
-            return {
-                'has_conflicts': False,
-                'message': '✅ Aucun conflit détecté. La réservation peut être confirmée.',
-                'conflicts_count': 0,
-                'total_overlap_hours': 0,
-                'total_overlap_days': 0,
-                'details': []
-            }
-        
-        # Calculer les totaux en ignorant les erreurs
-        valid_conflicts = [c for c in conflicts if c['conflict_type'] != 'error']
-        total_overlap_hours = sum(c['overlap_hours'] for c in valid_conflicts)
-        total_overlap_days = sum(c['overlap_days'] for c in valid_conflicts)
-        
-        # Créer des détails lisibles pour chaque conflit
-        conflict_details = []
-        for conflict in conflicts:
-            if conflict['conflict_type'] == 'overlap':
-                detail = f"• {conflict['conflicting_event']} ({conflict['conflicting_organization']}) - "
-                detail += f"Conflit de {conflict['overlap_hours']} heures ({conflict['overlap_days']:.1f} jours)"
-                conflict_details.append(detail)
-            elif conflict['conflict_type'] == 'error':
-                detail = f"• {conflict['conflicting_event']} ({conflict['conflicting_organization']}) - "
-                detail += f"Erreur de calcul: {conflict.get('error_message', 'Erreur inconnue')}"
-                conflict_details.append(detail)
-        
-        # Message principal
-        if len(conflicts) == 1:
-            message = f"⚠️ Conflit détecté avec 1 réservation existante"
-        else:
-            message = f"⚠️ Conflits détectés avec {len(conflicts)} réservations existantes"
-        
-        if total_overlap_hours > 0:
-            message += f" - Chevauchement total: {total_overlap_hours:.1f} heures"
-        
-        return {
-            'has_conflicts': True,
-            'message': message,
-            'conflicts_count': len(conflicts),
-            'total_overlap_hours': total_overlap_hours,
-            'total_overlap_days': total_overlap_days,
-            'conflicts': conflicts,
-            'details': conflict_details
-        }
+        from .conflicts import summarize_conflicts
+        return summarize_conflicts(self.get_conflicts_report())
 
 
 class BookingPayment(TimeStampedModel):
@@ -1458,6 +1602,10 @@ class BookingPayment(TimeStampedModel):
         verbose_name=_("Vérifié par")
     )
     verified_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Date de vérification"))
+    balance_after = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, verbose_name=_("Solde après paiement"),
+        help_text=_("Reste à payer sur la réservation une fois le paiement vérifié")
+    )
     
     class Meta:
         verbose_name = _("Paiement de réservation")
@@ -1466,6 +1614,46 @@ class BookingPayment(TimeStampedModel):
     
     def __str__(self):
         return f"Paiement {self.reference} - {self.booking.event_title}"
+    
+    @property
+    def signed_amount(self):
+        """Montant porté au solde de la réservation (négatif pour un remboursement)"""
+        return -self.amount if self.payment_type == 'refund' else self.amount
+
+
+class OrganizationReceivable(models.Model):
+    """Créances d'une organisation sur ses réservations, par ancienneté (voir ledger.py)"""
+    organization = models.OneToOneField(
+        ExternalOrganization,
+        on_delete=models.CASCADE,
+        related_name='receivable',
+        verbose_name=_("Organisation")
+    )
+    billed_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("Montant facturé"))
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("Montant encaissé"))
+    pending_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name=_("Paiements à vérifier")
+    )
+    outstanding_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("Reste dû"))
+    # Reste dû réparti selon le nombre de jours écoulés depuis le début de la réservation
+    not_due_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("Non échu"))
+    overdue_30_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("0 à 30 jours"))
+    overdue_60_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("31 à 60 jours"))
+    overdue_90_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("61 à 90 jours"))
+    overdue_more_amount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, verbose_name=_("Plus de 90 jours")
+    )
+    unpaid_bookings = models.PositiveIntegerField(default=0, verbose_name=_("Réservations non soldées"))
+    as_of = models.DateField(null=True, blank=True, verbose_name=_("Ancienneté calculée au"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Date de modification"))
+    
+    class Meta:
+        verbose_name = _("Créance d'organisation")
+        verbose_name_plural = _("Créances des organisations")
+        ordering = ['-outstanding_amount']
+    
+    def __str__(self):
+        return f"{self.organization.name} - {self.outstanding_amount}"
 
 
 class RoomMaintenance(TimeStampedModel):
@@ -1550,6 +1738,50 @@ class RoomMaintenance(TimeStampedModel):
             duration = self.end_date - self.start_date
             return duration.days
         return 0
+
+
+class RoomUsageRollup(models.Model):
+    """Occupation et revenus précalculés d'une salle pour une journée (voir room_usage.py)"""
+    room = models.ForeignKey(
+        ConferenceRoom,
+        on_delete=models.CASCADE,
+        related_name='usage_rollups',
+        verbose_name=_("Salle")
+    )
+    day = models.DateField(verbose_name=_("Jour"))
+    open_seconds = models.PositiveIntegerField(default=0, verbose_name=_("Durée d'ouverture (s)"))
+    booked_seconds = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Durée réservée (s)"),
+        help_text=_("Pendant les heures d'ouverture")
+    )
+    # Secondes réservées pour chacune des 24 heures (heure locale), pour la carte des heures de pointe
+    hourly_seconds = models.JSONField(default=list, verbose_name=_("Durée réservée par heure (s)"))
+    bookings_count = models.PositiveIntegerField(default=0, verbose_name=_("Réservations commençant ce jour"))
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name=_("Revenus"))
+    revenue_by_organization = models.JSONField(default=dict, verbose_name=_("Revenus par organisation"))
+    lead_times = models.JSONField(default=dict, verbose_name=_("Délais de réservation"))
+    is_stale = models.BooleanField(default=False, verbose_name=_("À recalculer"))
+    refreshed_at = models.DateTimeField(auto_now=True, verbose_name=_("Date de calcul"))
+    
+    class Meta:
+        verbose_name = _("Agrégat d'occupation de salle")
+        verbose_name_plural = _("Agrégats d'occupation de salle")
+        ordering = ['room', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['room', 'day'], name='roomusagerollup_room_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day']),
+            models.Index(fields=['is_stale', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.room.name} - {self.day}"
+    
+    @property
+    def occupancy_rate(self):
+        return self.booked_seconds / self.open_seconds if self.open_seconds else 0
         
 
 
@@ -1797,3 +2029,103 @@ class Achievement(TimeStampedModel):
 
 
 
+
+
+class DirectUpload(models.Model):
+    """Envoi de fichier directement vers le stockage (voir uploads.py)"""
+    
+    STATUS_CHOICES = [
+        ('pending', _('En cours')),
+        ('completed', _('Terminé')),
+        ('attached', _('Rattaché')),
+        ('failed', _('Échoué')),
+    ]
+    
+    BACKEND_CHOICES = [
+        ('local', _('Stockage local')),
+        ('s3', _('Amazon S3')),
+    ]
+    
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False, verbose_name=_("Jeton"))
+    target = models.CharField(
+        max_length=100,
+        verbose_name=_("Destination"),
+        help_text=_("Champ de destination: 'event.featured_image' ou 'registration_field.<id>'")
+    )
+    filename = models.CharField(max_length=255, verbose_name=_("Nom du fichier"))
+    content_type = models.CharField(max_length=100, blank=True, verbose_name=_("Type de contenu"))
+    size = models.PositiveBigIntegerField(verbose_name=_("Taille (octets)"))
+    key = models.CharField(max_length=500, verbose_name=_("Clé de stockage"))
+    backend = models.CharField(max_length=10, choices=BACKEND_CHOICES, default='local', verbose_name=_("Stockage"))
+    multipart_id = models.CharField(max_length=255, blank=True, verbose_name=_("ID d'envoi multipart"))
+    chunk_size = models.PositiveIntegerField(verbose_name=_("Taille des morceaux"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name=_("Statut"))
+    
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='direct_uploads',
+        verbose_name=_("Créé par")
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Date de création"))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Date de fin"))
+    expires_at = models.DateTimeField(verbose_name=_("Date d'expiration"))
+    
+    class Meta:
+        verbose_name = _("Envoi direct")
+        verbose_name_plural = _("Envois directs")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.filename} ({self.get_status_display()})"
+    
+    @property
+    def part_count(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+
+class EventReminder(models.Model):
+    """Envoi d'un rappel aux inscrits confirmés d'un événement (voir reminders.py)"""
+    
+    STATUS_CHOICES = [
+        ('pending', _('Programmé')),
+        ('sending', _('En cours d\'envoi')),
+        ('sent', _('Envoyé')),
+        ('skipped', _('Ignoré')),
+    ]
+    
+    form = models.ForeignKey(
+        EventRegistrationForm,
+        on_delete=models.CASCADE,
+        related_name='reminders',
+        verbose_name=_("Formulaire d'inscription")
+    )
+    offset_hours = models.PositiveIntegerField(verbose_name=_("Heures avant l'événement"))
+    send_at = models.DateTimeField(verbose_name=_("Date d'envoi prévue"))
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name=_("Statut"))
+    
+    # Curseur de l'itération par clé: dernière inscription traitée
+    last_registration_id = models.BigIntegerField(default=0, verbose_name=_("Dernière inscription traitée"))
+    sent_count = models.PositiveIntegerField(default=0, verbose_name=_("Emails mis en file"))
+    
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Début d'envoi"))
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Fin d'envoi"))
+    
+    class Meta:
+        verbose_name = _("Rappel d'événement")
+        verbose_name_plural = _("Rappels d'événement")
+        ordering = ['send_at']
+        constraints = [
+            models.UniqueConstraint(fields=['form', 'offset_hours'], name='eventreminder_unique_offset'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'send_at']),
+        ]
+    
+    def __str__(self):
+        return f"Rappel {self.offset_hours} h - {self.form.event.title}"
@@ -0,0 +1,153 @@
+"""
+Annuaire des organisations externes.
+
+Chaque organisation porte l'historique de ses réservations sous forme
+d'agrégats (nombre de réservations, chiffre d'affaires confirmé, dernière
+et prochaine réservation): la liste et la fiche des organisations n'ont
+aucune requête par organisation. Les agrégats sont recalculés à partir des
+réservations, en une requête groupée:
+
+- après chaque enregistrement ou suppression de réservation (signals.py),
+  pour l'organisation concernée et son ancienne organisation;
+- après la création ou l'annulation d'une série (recurrence.py);
+- chaque heure pour les organisations dont la prochaine réservation a
+  commencé (jobs.room_tasks.refresh_organization_stats).
+
+La recherche par nom du sélecteur d'organisation s'appuie sur l'index
+trigramme de UPPER(name) (migration 0046) lorsque l'extension pg_trgm est
+installée: recherche approchée, classée par similarité. Sinon, les noms
+qui commencent par la saisie (index text_pattern_ops) passent avant ceux
+qui la contiennent.
+"""
+from django.contrib.postgres.lookups import TrigramWordSimilar
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .conflicts import ACTIVE_BOOKING_STATUSES
+from .ledger import BILLED_STATUSES, ZERO
+from .models import ExternalOrganization, RoomBooking
+
+
+# Réservations comptées dans l'historique (les refusées et annulées n'en font pas partie)
+HISTORY_STATUSES = ('pending', 'confirmed', 'completed')
+STATS_FIELDS = [
+    'bookings_count', 'confirmed_bookings_count', 'confirmed_revenue', 'last_booking_at', 'next_booking_at',
+]
+SEARCH_LIMIT = 20
+MIN_SEARCH_LENGTH = 2
+
+_trigram_support = {}
+
+
+# ----------------------------------------------------------------------------
+# Agrégats des réservations
+# ----------------------------------------------------------------------------
+
+def organization_stats(organization_ids=None, now=None):
+    """{organisation: agrégats de ses réservations}, en une requête groupée"""
+    now = now or timezone.now()
+    bookings = RoomBooking.objects.filter(status__in=HISTORY_STATUSES)
+    if organization_ids is not None:
+        bookings = bookings.filter(organization_id__in=organization_ids)
+    billed = Q(status__in=BILLED_STATUSES)
+    rows = bookings.values('organization_id').annotate(
+        bookings_count=Count('pk'),
+        confirmed_bookings_count=Count('pk', filter=billed),
+        confirmed_revenue=Sum('total_price', filter=billed, default=ZERO),
+        last_booking_at=Max('start_time', filter=Q(start_time__lte=now)),
+        next_booking_at=Min('start_time', filter=Q(start_time__gt=now, status__in=ACTIVE_BOOKING_STATUSES)),
+    ).order_by()
+    return {row.pop('organization_id'): row for row in rows}
+
+
+def refresh_organization_stats(organization_ids=None, now=None):
+    """Met à jour les agrégats des organisations (toutes si organization_ids est None)
+
+    Retourne le nombre d'organisations mises à jour.
+    """
+    stats = organization_stats(organization_ids, now)
+    organizations = ExternalOrganization.objects.only('pk', *STATS_FIELDS)
+    if organization_ids is not None:
+        organizations = organizations.filter(pk__in=organization_ids)
+    empty = {
+        'bookings_count': 0, 'confirmed_bookings_count': 0, 'confirmed_revenue': 0,
+        'last_booking_at': None, 'next_booking_at': None,
+    }
+    changed = []
+    for organization in organizations:
+        values = stats.get(organization.pk, empty)
+        if any(getattr(organization, field) != value for field, value in values.items()):
+            for field, value in values.items():
+                setattr(organization, field, value)
+            changed.append(organization)
+    # Sans signaux ni updated_at: seules les réservations ont changé
+    ExternalOrganization.objects.bulk_update(changed, STATS_FIELDS, batch_size=500)
+    return len(changed)
+
+
+def refresh_started_bookings(now=None):
+    """Agrégats des organisations dont la prochaine réservation a commencé"""
+    now = now or timezone.now()
+    organization_ids = list(
+        ExternalOrganization.objects.filter(next_booking_at__lte=now).values_list('pk', flat=True)
+    )
+    if not organization_ids:
+        return 0
+    return refresh_organization_stats(organization_ids, now)
+
+
+# ----------------------------------------------------------------------------
+# Recherche par nom
+# ----------------------------------------------------------------------------
+
+def trigram_search_available(using='default'):
+    """pg_trgm est installée dans la base (vérifié une fois par processus)"""
+    if using not in _trigram_support:
+        connection = connections[using]
+        available = False
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                available = cursor.fetchone() is not None
+        _trigram_support[using] = available
+    return _trigram_support[using]
+
+
+def search_organizations(query, limit=SEARCH_LIMIT, active_only=True):
+    """Organisations dont le nom correspond à la saisie, les plus proches d'abord"""
+    query = ' '.join(query.split())
+    if len(query) < MIN_SEARCH_LENGTH:
+        return []
+    organizations = ExternalOrganization.objects.all()
+    if active_only:
+        organizations = organizations.filter(is_active=True)
+
+    if trigram_search_available(organizations.db):
+        # Mêmes expressions que l'index trigramme: UPPER(name) des deux côtés
+        needle = Upper(Value(query))
+        return list(organizations.filter(
+            Q(TrigramWordSimilar(Upper('name'), needle)) | Q(name__icontains=query)
+        ).annotate(
+            similarity=TrigramWordSimilarity(needle, Upper('name'))
+        ).order_by('-similarity', 'name')[:limit])
+
+    matches = list(organizations.filter(name__istartswith=query).order_by('name')[:limit])
+    if len(matches) < limit:
+        matches += organizations.filter(name__icontains=query).exclude(
+            name__istartswith=query
+        ).order_by('name')[:limit - len(matches)]
+    return matches
+
+
+def serialize_organization(organization):
+    return {
+        'id': organization.pk,
+        'name': organization.name,
+        'type': organization.get_organization_type_display(),
+        'contact_person': organization.contact_person,
+        'bookings_count': organization.bookings_count,
+        'last_booking_at': organization.last_booking_at,
+    }
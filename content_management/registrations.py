@@ -0,0 +1,199 @@
+"""
+Écriture groupée des inscriptions aux événements.
+
+Une soumission du formulaire public produit une EventRegistration, une
+FormResponse par champ et des liens vers les options choisies. Toutes ces
+lignes sont écrites dans une seule transaction avec un nombre de requêtes
+constant, quelle que soit la taille du formulaire.
+
+Les réponses sont aussi recopiées dans le document JSONB
+EventRegistration.answers, qui permet de lire, filtrer et exporter les
+inscriptions sans jointure (voir answers_option_filter et exports.py).
+"""
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import translation
+
+from .confirmations import schedule_confirmation_email
+from .dedup import DuplicateRegistrationError, find_existing_registration, registration_dedup_key
+from .models import EventRegistration, FormResponse
+
+
+CHOICE_FIELD_TYPES = ('select', 'radio')
+VALUE_COLUMNS = {
+    'checkbox': 'boolean_value',
+    'date': 'date_value',
+    'datetime': 'datetime_value',
+    'number': 'number_value',
+    'file': 'file_value',
+}
+
+
+def build_options_map(form_fields):
+    """Indexe les options de chaque champ par valeur: {field_pk: {value: option}}
+
+    Utilise le cache de prefetch_related('options') lorsqu'il est présent.
+    """
+    return {
+        field.pk: {option.value: option for option in field.options.all()}
+        for field in form_fields
+    }
+
+
+def build_responses(registration, form_fields, cleaned_data, options_map=None):
+    """Construit en mémoire les réponses et les options sélectionnées
+
+    Retourne une liste de couples (FormResponse non sauvegardée, [options]).
+    """
+    if options_map is None:
+        options_map = build_options_map(form_fields)
+
+    pending = []
+    for field in form_fields:
+        field_key = f'field_{field.pk}'
+        if field_key not in cleaned_data:
+            continue
+        value = cleaned_data[field_key]
+        field_options = options_map.get(field.pk, {})
+        response = FormResponse(registration=registration, field=field)
+        selected = []
+
+        if field.field_type in CHOICE_FIELD_TYPES:
+            option = field_options.get(value)
+            if option is None:
+                continue
+            response.text_value = value
+            selected.append(option)
+
+        elif field.field_type == 'multiselect':
+            if not value:
+                continue
+            response.text_value = ", ".join(value)
+            selected.extend(field_options[val] for val in value if val in field_options)
+
+        elif field.field_type in VALUE_COLUMNS:
+            setattr(response, VALUE_COLUMNS[field.field_type], value)
+
+        else:
+            # Champs texte
+            response.text_value = str(value) if value else ""
+
+        pending.append((response, selected))
+    return pending
+
+
+def answer_value(response, selected):
+    """Valeur JSON d'une réponse pour le document answers"""
+    field_type = response.field.field_type
+    if field_type in CHOICE_FIELD_TYPES or field_type == 'multiselect':
+        return [option.value for option in selected]
+    if field_type == 'checkbox':
+        return response.boolean_value
+    if field_type == 'number':
+        return float(response.number_value) if response.number_value is not None else None
+    if field_type == 'date':
+        return response.date_value.isoformat() if response.date_value else None
+    if field_type == 'datetime':
+        return response.datetime_value.isoformat() if response.datetime_value else None
+    if field_type == 'file':
+        return response.file_value.name if response.file_value else None
+    return response.text_value
+
+
+def build_answers(pending):
+    """Construit le document answers à partir des couples (réponse, [options])"""
+    return {
+        str(response.field_id): answer_value(response, selected)
+        for response, selected in pending
+    }
+
+
+def commit_uploaded_files(pending):
+    """Enregistre les fichiers envoyés pour connaître leur nom définitif"""
+    for response, _ in pending:
+        value = response.file_value
+        if value and not value._committed:
+            value.save(value.name, value.file, save=False)
+
+
+def bulk_save_responses(pending):
+    """Enregistre les réponses en deux requêtes d'insertion
+
+    Les réponses sont créées par un seul bulk_create, puis les liens vers les
+    options sélectionnées par un seul bulk_create sur la table intermédiaire.
+    """
+    if not pending:
+        return []
+
+    responses = FormResponse.objects.bulk_create([response for response, _ in pending])
+
+    Through = FormResponse.selected_options.through
+    links = [
+        Through(formresponse_id=response.pk, formfieldoption_id=option.pk)
+        for response, (_, selected) in zip(responses, pending)
+        for option in selected
+    ]
+    if links:
+        Through.objects.bulk_create(links)
+    return responses
+
+
+def registration_language(language):
+    """Langue du site la plus proche (emails de rappel), sinon la langue par défaut"""
+    try:
+        return translation.get_supported_language_variant(language or settings.LANGUAGE_CODE)
+    except LookupError:
+        return settings.LANGUAGE_CODE
+
+
+def create_registration(registration_form, form_fields, cleaned_data, ip_address=None, user_agent='', language=None):
+    """Crée une inscription et toutes ses réponses dans une seule transaction
+
+    Les réponses sont construites avant l'insertion de l'inscription afin
+    d'écrire le document answers dans la même requête. Lève
+    DuplicateRegistrationError si la contrainte d'unicité par email refuse
+    l'inscription (soumissions simultanées). L'email de confirmation n'est
+    préparé qu'après la validation de la transaction, par Celery.
+    """
+    registration = EventRegistration(
+        form=registration_form,
+        first_name=cleaned_data['first_name'],
+        last_name=cleaned_data['last_name'],
+        email=cleaned_data['email'],
+        phone=cleaned_data.get('phone', ''),
+        ip_address=ip_address,
+        user_agent=user_agent,
+        language=registration_language(language),
+        dedup_key=registration_dedup_key(registration_form, cleaned_data['email']),
+    )
+    pending = build_responses(registration, form_fields, cleaned_data)
+    try:
+        with transaction.atomic():
+            commit_uploaded_files(pending)
+            registration.answers = build_answers(pending)
+            registration.save()
+            bulk_save_responses(pending)
+            schedule_confirmation_email(registration)
+    except IntegrityError:
+        existing = find_existing_registration(registration_form, registration.email)
+        if existing is None:
+            raise
+        raise DuplicateRegistrationError(existing)
+    return registration
+
+
+def answers_option_filter(field, option_value):
+    """Condition « a choisi l'option » sur le document answers
+
+    Sur PostgreSQL, le test de contenance @> utilise l'index GIN
+    jsonb_path_ops; les inscriptions dont le document n'est pas encore
+    rempli (answers NULL) sont lues dans les réponses. Les autres bases
+    passent par les réponses.
+    """
+    by_responses = Q(pk__in=FormResponse.objects.filter(
+        field=field, selected_options__value=option_value
+    ).values('registration_id'))
+    if connection.features.supports_json_field_contains:
+        return Q(answers__contains={str(field.pk): [option_value]}) | (Q(answers__isnull=True) & by_responses)
+    return by_responses
@@ -0,0 +1,215 @@
+"""
+Rappels envoyés aux inscrits confirmés avant un événement.
+
+Chaque formulaire d'inscription définit ses délais de rappel en heures
+(reminder_offsets, par exemple [168, 24]). La tâche périodique
+jobs.registration_tasks.send_due_reminders crée un EventReminder par délai
+puis lance une tâche par rappel dû: jamais une tâche par inscrit.
+
+Le rappel parcourt les inscriptions confirmées par clé (id > curseur, index
+formulaire + statut + id) et ajoute les emails à EmailQueue par lots d'un
+seul bulk_create. Le message est rendu une fois par langue avec des
+marqueurs, remplacés ensuite pour chaque inscrit. Le curseur est enregistré
+avec chaque lot: un envoi interrompu reprend sans doublon.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.html import escape
+
+from .checkin import ticket_code
+from .models import EventRegistration, EventRegistrationForm, EventReminder
+
+
+REMINDER_TEMPLATE_NAME = 'event_registration_reminder'
+REMINDER_BATCH_SIZE = 500
+MAX_REMINDER_OFFSET = 24 * 90
+DEFAULT_REMINDER_SUBJECT = "Rappel : {event}"
+
+# Champs personnels remplacés après le rendu du message
+PLACEHOLDER_FIELDS = ('first_name', 'last_name', 'registration_id', 'ticket_code')
+
+
+def placeholder(name):
+    return f'[[{name}]]'
+
+
+def parse_reminder_offsets(value):
+    """Délais en heures, sans doublon, du plus grand au plus petit
+
+    Accepte une liste ou une chaîne « 168, 24 ». Lève ValueError si un délai
+    n'est pas un entier entre 1 et MAX_REMINDER_OFFSET.
+    """
+    if isinstance(value, str):
+        value = [part for part in value.replace(';', ',').split(',') if part.strip()]
+    offsets = {int(str(offset).strip()) for offset in value or []}
+    if any(offset < 1 or offset > MAX_REMINDER_OFFSET for offset in offsets):
+        raise ValueError(f"Les délais doivent être compris entre 1 et {MAX_REMINDER_OFFSET} heures")
+    return sorted(offsets, reverse=True)
+
+
+def event_start(event):
+    """Date et heure de début de l'événement dans le fuseau du site"""
+    return timezone.make_aware(datetime.combine(event.start_date, event.start_time))
+
+
+def sync_form_reminders(registration_form, now=None):
+    """Aligne les EventReminder d'un formulaire sur ses délais et la date de l'événement
+
+    Un rappel dont l'heure est déjà passée lors de sa création est ignoré.
+    """
+    now = now or timezone.now()
+    start = event_start(registration_form.event)
+    offsets = parse_reminder_offsets(registration_form.reminder_offsets)
+
+    registration_form.reminders.filter(status='pending').exclude(offset_hours__in=offsets).delete()
+    existing = {reminder.offset_hours: reminder for reminder in registration_form.reminders.all()}
+    to_create = []
+    to_update = []
+    for offset in offsets:
+        send_at = start - timedelta(hours=offset)
+        reminder = existing.get(offset)
+        if reminder is None:
+            to_create.append(EventReminder(
+                form=registration_form,
+                offset_hours=offset,
+                send_at=send_at,
+                status='pending' if send_at > now else 'skipped',
+            ))
+        elif reminder.status == 'pending' and reminder.send_at != send_at:
+            # L'événement a été déplacé
+            reminder.send_at = send_at
+            to_update.append(reminder)
+    EventReminder.objects.bulk_create(to_create, ignore_conflicts=True)
+    if to_update:
+        EventReminder.objects.bulk_update(to_update, ['send_at'])
+
+
+def sync_upcoming_reminders(now=None):
+    """Synchronise les rappels des formulaires dont l'événement n'a pas commencé"""
+    now = now or timezone.now()
+    forms = EventRegistrationForm.objects.filter(
+        event__start_date__gte=timezone.localdate(now)
+    ).exclude(reminder_offsets=[]).select_related('event')
+    for registration_form in forms:
+        sync_form_reminders(registration_form, now)
+
+
+def due_reminders(now=None):
+    """Rappels à envoyer maintenant
+
+    Si plusieurs rappels d'un même formulaire sont dus (tâche périodique
+    arrêtée), seul le plus proche de l'événement est envoyé, les autres
+    sont ignorés.
+    """
+    now = now or timezone.now()
+    due = {}
+    skipped = []
+    for reminder in EventReminder.objects.filter(status='pending', send_at__lte=now).order_by('form_id', 'offset_hours'):
+        if reminder.form_id in due:
+            skipped.append(reminder.pk)
+        else:
+            due[reminder.form_id] = reminder
+    if skipped:
+        EventReminder.objects.filter(pk__in=skipped, status='pending').update(status='skipped')
+    return list(due.values())
+
+
+def get_reminder_template(language):
+    """EmailTemplate propre à la langue, sinon le modèle commun, sinon None"""
+    from jobs.models import EmailTemplate
+
+    templates = {
+        template.name: template
+        for template in EmailTemplate.objects.filter(
+            name__in=[f'{REMINDER_TEMPLATE_NAME}_{language}', REMINDER_TEMPLATE_NAME], is_active=True
+        )
+    }
+    return templates.get(f'{REMINDER_TEMPLATE_NAME}_{language}') or templates.get(REMINDER_TEMPLATE_NAME)
+
+
+def render_reminder(reminder, language):
+    """Rend (sujet, HTML, texte) une fois pour une langue, avec des marqueurs personnels"""
+    event = reminder.form.event
+    context = {
+        'registration': {name: placeholder(name) for name in PLACEHOLDER_FIELDS},
+        'ticket_code': placeholder('ticket_code'),
+        'event': event,
+        'registration_form': reminder.form,
+        'offset_hours': reminder.offset_hours,
+        'offset_days': reminder.offset_hours // 24,
+        'event_url': settings.SITE_URL + reverse('sfront:event_detail', args=[event.slug]),
+        'current_date': timezone.now(),
+    }
+    template = get_reminder_template(language)
+    with translation.override(language):
+        if template is not None:
+            return (
+                template.get_subject(context).strip(),
+                template.get_html_content(context),
+                template.get_text_content(context),
+            )
+        return (
+            DEFAULT_REMINDER_SUBJECT.format(event=event.title),
+            render_to_string('email_templates/event_registration_reminder.html', context),
+            render_to_string('email_templates/event_registration_reminder.txt', context),
+        )
+
+
+def personalize(content, values, html=False):
+    for name, value in values.items():
+        content = content.replace(placeholder(name), escape(value) if html else value)
+    return content
+
+
+def reminder_recipients(reminder):
+    """Inscriptions confirmées restant à traiter, dans l'ordre du curseur"""
+    return EventRegistration.objects.filter(
+        form_id=reminder.form_id,
+        status='confirmed',
+        pk__gt=reminder.last_registration_id,
+    ).order_by('pk').only('pk', 'first_name', 'last_name', 'email', 'registration_id', 'language')
+
+
+def queue_reminder_batch(reminder, rendered, batch_size=REMINDER_BATCH_SIZE, priority=2):
+    """Ajoute à EmailQueue le lot suivant du rappel et avance le curseur
+
+    rendered: cache {langue: (sujet, HTML, texte)} partagé entre les lots.
+    Retourne le nombre d'emails ajoutés (0 quand le rappel est terminé).
+    """
+    from jobs.models import EmailQueue
+
+    registrations = list(reminder_recipients(reminder)[:batch_size])
+    if not registrations:
+        return 0
+
+    emails = []
+    for registration in registrations:
+        if registration.language not in rendered:
+            rendered[registration.language] = render_reminder(reminder, registration.language)
+        subject, html_content, text_content = rendered[registration.language]
+        values = {
+            'first_name': registration.first_name,
+            'last_name': registration.last_name,
+            'registration_id': registration.registration_id,
+            'ticket_code': ticket_code(registration.registration_id),
+        }
+        emails.append(EmailQueue(
+            to_email=registration.email,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            subject=personalize(subject, values)[:200],
+            html_content=personalize(html_content, values, html=True),
+            text_content=personalize(text_content, values),
+            priority=priority,
+        ))
+
+    with transaction.atomic():
+        EmailQueue.objects.bulk_create(emails)
+        reminder.last_registration_id = registrations[-1].pk
+        reminder.sent_count += len(emails)
+        reminder.save(update_fields=['last_registration_id', 'sent_count'])
+    return len(emails)
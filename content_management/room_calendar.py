@@ -0,0 +1,83 @@
+"""
+Calendrier des réservations de salle.
+
+Les réservations et maintenances de la fenêtre de dates viennent de la
+couche de disponibilité (availability.py): mois en cache par salle, mois
+manquants lus en une requête de chevauchement de périodes (index GiST sur
+PostgreSQL, migration 0042), y compris les réservations qui commencent
+avant la fenêtre ou se terminent après. Elles sont ensuite réparties en un
+seul passage par (salle, jour).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.urls import reverse
+
+from .availability import load_room_months, local_day_span, months_between, next_month
+
+
+# Fenêtre maximale acceptée par l'API JSON
+MAX_CALENDAR_DAYS = 366
+
+
+def serialize_booking(booking):
+    return {
+        'id': booking.pk,
+        'room_id': booking.room_id,
+        'event_title': booking.event_title,
+        'organization_name': booking.organization.name if booking.organization else '',
+        'status': booking.status,
+        'start': booking.start_time,
+        'end': booking.end_time,
+        'url': reverse('content_management:room_booking_detail', args=[booking.pk]),
+    }
+
+
+def serialize_maintenance(maintenance):
+    return {
+        'id': maintenance.pk,
+        'room_id': maintenance.room_id,
+        'title': maintenance.title,
+        'status': maintenance.status,
+        'start': maintenance.start_date,
+        'end': maintenance.end_date,
+    }
+
+
+def spread_by_day(days, room_id, item, start, end, first_day, last_day):
+    """Ajoute item à chaque jour de [start, end) compris dans [first_day, last_day]"""
+    start_day, end_day = local_day_span(start, end)
+    day, end_day = max(start_day, first_day), min(end_day, last_day)
+    if day > end_day:
+        return False
+    while day <= end_day:
+        days[(room_id, day)].append(item)
+        day += timedelta(days=1)
+    return True
+
+
+def build_room_calendar(room_ids, first_day, last_day):
+    """Réservations et maintenances de la fenêtre [first_day, last_day] par (salle, jour)
+
+    Retourne {'bookings': {id: réservation}, 'days': {(room_id, jour): [réservations]},
+    'maintenances': {(room_id, jour): [maintenances]}}.
+    """
+    months = list(months_between(first_day, last_day))
+    bookings = {}
+    days = defaultdict(list)
+    maintenance_days = defaultdict(list)
+    for (room_id, month), entry in load_room_months(list(room_ids), months).items():
+        # Un élément sur plusieurs mois figure dans chacun: on ne garde que
+        # ses jours du mois courant pour ne pas le répartir deux fois
+        month_first = max(first_day, month)
+        month_last = min(last_day, next_month(month) - timedelta(days=1))
+        for booking in entry['bookings']:
+            data = bookings.get(booking.pk) or serialize_booking(booking)
+            if spread_by_day(days, room_id, data, booking.start_time, booking.end_time, month_first, month_last):
+                bookings[booking.pk] = data
+        for maintenance in entry['maintenances']:
+            spread_by_day(
+                maintenance_days, room_id, serialize_maintenance(maintenance),
+                maintenance.start_date, maintenance.end_date, month_first, month_last,
+            )
+    return {'bookings': bookings, 'days': days, 'maintenances': maintenance_days}
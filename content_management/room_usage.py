@@ -0,0 +1,349 @@
+"""
+Occupation et revenus des salles de conférence.
+
+Le tableau de bord lit des agrégats journaliers précalculés
+(RoomUsageRollup) au lieu d'interroger les réservations. Les agrégats sont
+recalculés par salle et par mois:
+
+1. les lignes des mois à recalculer sont créées si besoin (à recalculer),
+   puis verrouillées;
+2. les réservations confirmées ou terminées de tous ces mois sont lues en
+   une seule requête, sous ce verrou;
+3. la durée réservée avant chaque borne (début de chaque heure, ouverture
+   et fermeture de chaque jour) est calculée en un seul passage: pour une
+   borne t, chaque réservation compte min(max(t - début, 0), durée), calculé
+   avec NumPy sur la matrice bornes × réservations. Les durées par heure et
+   pendant les heures d'ouverture sont les différences entre bornes;
+4. les lignes sont mises à jour sur place.
+
+Toute modification de réservation marque les jours concernés (signals.py),
+de nouveau après validation: un marquage concurrent d'un recalcul attend
+le verrou et s'applique aux lignes recalculées, il n'est jamais perdu. La
+tâche jobs.room_tasks.refresh_room_usage_rollups ne recalcule que les mois
+marqués ou absents de la fenêtre suivie.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from .availability import local_day_span, months_between, months_of_period, next_month
+from .free_slots import DEFAULT_BUSINESS_HOURS
+from .models import ConferenceRoom, ExternalOrganization, RoomBooking, RoomUsageRollup
+
+
+# Réservations comptées dans l'occupation et les revenus
+USAGE_STATUSES = ('confirmed', 'completed')
+# Fenêtre suivie par le recalcul périodique, en mois autour du mois courant
+PAST_MONTHS = 12
+FUTURE_MONTHS = 6
+# (clé, libellé, borne supérieure en jours) du délai entre la demande et le début
+LEAD_TIME_BUCKETS = [
+    ('0-1', _("Moins d'un jour"), 1),
+    ('1-7', _("1 à 7 jours"), 7),
+    ('7-30', _("1 à 4 semaines"), 30),
+    ('30-90', _("1 à 3 mois"), 90),
+    ('90+', _("Plus de 3 mois"), None),
+]
+# Fenêtre maximale acceptée par l'API JSON
+MAX_USAGE_DAYS = 731
+# Champs écrits par le recalcul
+ROLLUP_FIELDS = [
+    'open_seconds', 'booked_seconds', 'hourly_seconds', 'bookings_count', 'revenue',
+    'revenue_by_organization', 'lead_times', 'is_stale', 'refreshed_at',
+]
+PERIODS = {
+    'day': F('day'),
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+}
+
+
+# ----------------------------------------------------------------------------
+# Calcul
+# ----------------------------------------------------------------------------
+
+def booked_seconds_until(starts, ends, points):
+    """Durée réservée cumulée avant chaque borne (en secondes depuis l'epoch), en tableau NumPy"""
+    starts = np.asarray(starts, dtype=float)
+    durations = np.asarray(ends, dtype=float) - starts
+    points = np.asarray(points, dtype=float)
+    return np.clip(points[:, None] - starts, 0, durations).sum(axis=1)
+
+
+def lead_time_bucket(start_time, created_at):
+    days = (start_time - created_at).total_seconds() / 86400
+    for key, _label, limit in LEAD_TIME_BUCKETS:
+        if limit is None or days < limit:
+            return key
+
+
+def month_days(month):
+    return [month + timedelta(days=offset) for offset in range((next_month(month) - month).days)]
+
+
+def local_timestamp(day, at):
+    return timezone.make_aware(datetime.combine(day, at)).timestamp()
+
+
+def month_rollups(room_id, month, bookings, business_hours=DEFAULT_BUSINESS_HOURS):
+    """Agrégats des jours du mois pour une salle
+
+    bookings: (organisation, début, fin, date de demande, prix) des
+    réservations de la salle qui touchent le mois.
+    """
+    days = month_days(month)
+    opening, closing = business_hours
+    # Début de chaque heure du mois, minuit suivant, puis ouverture et fermeture de chaque jour
+    hour_points = [local_timestamp(day, time(hour)) for day in days for hour in range(24)]
+    hour_points.append(local_timestamp(next_month(month), time.min))
+    open_points = [local_timestamp(day, opening) for day in days]
+    close_points = [local_timestamp(day, closing) for day in days]
+
+    booked = booked_seconds_until(
+        [booking[1].timestamp() for booking in bookings],
+        [booking[2].timestamp() for booking in bookings],
+        hour_points + open_points + close_points,
+    )
+    hourly = np.rint(np.diff(booked[:len(hour_points)])).astype(int).tolist()
+    opened = booked[len(hour_points):len(hour_points) + len(days)]
+    closed = booked[len(hour_points) + len(days):]
+    booked_open = np.rint(closed - opened).astype(int).tolist()
+
+    started = defaultdict(list)
+    for booking in bookings:
+        started[timezone.localdate(booking[1])].append(booking)
+
+    rollups = []
+    for index, day in enumerate(days):
+        revenue_by_organization = defaultdict(Decimal)
+        lead_times = defaultdict(int)
+        for organization_id, start_time, _end_time, created_at, price in started[day]:
+            revenue_by_organization[str(organization_id)] += price or 0
+            lead_times[lead_time_bucket(start_time, created_at)] += 1
+        rollups.append(RoomUsageRollup(
+            room_id=room_id,
+            day=day,
+            open_seconds=round(close_points[index] - open_points[index]),
+            booked_seconds=booked_open[index],
+            hourly_seconds=hourly[index * 24:(index + 1) * 24],
+            bookings_count=len(started[day]),
+            revenue=sum(revenue_by_organization.values(), Decimal(0)),
+            revenue_by_organization={key: str(value) for key, value in revenue_by_organization.items()},
+            lead_times=dict(lead_times),
+        ))
+    return rollups
+
+
+# ----------------------------------------------------------------------------
+# Recalcul incrémental
+# ----------------------------------------------------------------------------
+
+def tracked_months(now=None):
+    current = timezone.localdate(now or timezone.now()).replace(day=1)
+    first = current
+    for _index in range(PAST_MONTHS):
+        first = (first - timedelta(days=1)).replace(day=1)
+    last = current
+    for _index in range(FUTURE_MONTHS):
+        last = next_month(last)
+    return list(months_between(first, last))
+
+
+def mark_room_usage_stale(room_id, start, end):
+    """Marque à recalculer les jours de la salle touchés par [start, end)
+
+    Dans une transaction, le marquage est répété après la validation: un
+    recalcul qui a lu les réservations avant celle-ci a verrouillé les
+    lignes, et le second marquage s'applique à ses résultats.
+    """
+    days = RoomUsageRollup.objects.filter(room_id=room_id, day__range=local_day_span(start, end))
+    days.update(is_stale=True)
+    if not transaction.get_autocommit():
+        transaction.on_commit(lambda: days.update(is_stale=True))
+
+
+def months_to_refresh(room_ids, months):
+    """(salle, mois) dont les agrégats sont marqués ou incomplets"""
+    fresh = {
+        (row['room_id'], row['month']): row['days']
+        for row in RoomUsageRollup.objects.filter(
+            room_id__in=room_ids, day__gte=months[0], day__lt=next_month(months[-1]), is_stale=False,
+        ).annotate(month=TruncMonth('day')).values('room_id', 'month').annotate(days=Count('pk')).order_by()
+    }
+    return [
+        (room_id, month)
+        for room_id in room_ids
+        for month in months
+        if fresh.get((room_id, month)) != (next_month(month) - month).days
+    ]
+
+
+def refresh_room_usage(room_ids=None, months=None, full=False, now=None):
+    """Recalcule les agrégats marqués ou manquants; retourne le nombre de (salle, mois) recalculés"""
+    months = sorted(months or tracked_months(now))
+    if room_ids is None:
+        room_ids = list(ConferenceRoom.objects.values_list('pk', flat=True))
+    if not room_ids or not months:
+        return 0
+    pending = [(room_id, month) for room_id in room_ids for month in months] if full else \
+        months_to_refresh(room_ids, months)
+    if not pending:
+        return 0
+
+    months_filter = reduce(or_, (
+        Q(room_id=room_id, day__gte=month, day__lt=next_month(month)) for room_id, month in pending
+    ))
+    # Lignes des mois jamais calculés: sans elles, un marquage concurrent n'aurait rien à verrouiller
+    RoomUsageRollup.objects.bulk_create([
+        RoomUsageRollup(room_id=room_id, day=day, is_stale=True)
+        for room_id, month in pending
+        for day in month_days(month)
+    ], batch_size=500, ignore_conflicts=True)
+
+    window_start = timezone.make_aware(datetime.combine(min(month for _room, month in pending), time.min))
+    window_end = timezone.make_aware(datetime.combine(next_month(max(month for _room, month in pending)), time.min))
+    pending_set = set(pending)
+    with transaction.atomic():
+        # Une modification de réservation validée pendant le recalcul attend ce verrou pour marquer ses jours
+        list(RoomUsageRollup.objects.select_for_update().filter(months_filter).values_list('pk', flat=True))
+        bookings = defaultdict(list)
+        rows = RoomBooking.objects.filter(
+            room_id__in={room_id for room_id, _month in pending}, status__in=USAGE_STATUSES,
+            start_time__lt=window_end, end_time__gt=window_start,
+        ).values_list('room_id', 'organization_id', 'start_time', 'end_time', 'created_at', 'total_price')
+        for room_id, *booking in rows:
+            for month in months_of_period(booking[1], booking[2]):
+                if (room_id, month) in pending_set:
+                    bookings[(room_id, month)].append(booking)
+
+        rollups = [
+            rollup
+            for room_id, month in pending
+            for rollup in month_rollups(room_id, month, bookings[(room_id, month)])
+        ]
+        # Mise à jour sur place: un marquage en attente du verrou porte sur les mêmes lignes
+        RoomUsageRollup.objects.bulk_create(
+            rollups, batch_size=500, update_conflicts=True, unique_fields=['room', 'day'], update_fields=ROLLUP_FIELDS,
+        )
+    return len(pending)
+
+
+# ----------------------------------------------------------------------------
+# Lecture des séries précalculées
+# ----------------------------------------------------------------------------
+
+def rollups_between(first_day, last_day, room_ids=None):
+    rollups = RoomUsageRollup.objects.filter(day__range=(first_day, last_day))
+    if room_ids:
+        rollups = rollups.filter(room_id__in=room_ids)
+    return rollups
+
+
+def occupancy_series(first_day, last_day, period='day', room_ids=None):
+    """[{'room_id', 'period', 'occupancy_rate', 'revenue', 'bookings_count'}, ...] par salle et période"""
+    rows = rollups_between(first_day, last_day, room_ids).annotate(period=PERIODS[period]).values(
+        'room_id', 'period'
+    ).annotate(
+        open_seconds=Sum('open_seconds'), booked_seconds=Sum('booked_seconds'),
+        revenue=Sum('revenue'), bookings_count=Sum('bookings_count'),
+    ).order_by('room_id', 'period')
+    return [
+        {
+            'room_id': row['room_id'],
+            'period': row['period'],
+            'occupancy_rate': round(row['booked_seconds'] / row['open_seconds'], 4) if row['open_seconds'] else 0,
+            'revenue': row['revenue'],
+            'bookings_count': row['bookings_count'],
+        }
+        for row in rows
+    ]
+
+
+def peak_hours(first_day, last_day, room_ids=None):
+    """Taux d'occupation par jour de semaine (lundi = 0) et heure locale: [[taux] * 24] * 7"""
+    booked = [[0] * 24 for _weekday in range(7)]
+    counted = [0] * 7
+    for day, hourly_seconds in rollups_between(first_day, last_day, room_ids).values_list('day', 'hourly_seconds'):
+        counted[day.weekday()] += 1
+        for hour, seconds in enumerate(hourly_seconds):
+            booked[day.weekday()][hour] += seconds
+    return [
+        [round(seconds / (counted[weekday] * 3600), 4) if counted[weekday] else 0 for seconds in hours]
+        for weekday, hours in enumerate(booked)
+    ]
+
+
+def revenue_by_organization(first_day, last_day, room_ids=None, limit=10):
+    """[(organisation, revenus), ...] par revenus décroissants"""
+    totals = defaultdict(Decimal)
+    for revenues in rollups_between(first_day, last_day, room_ids).exclude(
+        revenue_by_organization={}
+    ).values_list('revenue_by_organization', flat=True):
+        for organization_id, amount in revenues.items():
+            totals[int(organization_id)] += Decimal(amount)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+    organizations = ExternalOrganization.objects.in_bulk([organization_id for organization_id, _total in ranked])
+    return [
+        (organizations[organization_id], total)
+        for organization_id, total in ranked
+        if organization_id in organizations
+    ]
+
+
+def lead_time_distribution(first_day, last_day, room_ids=None):
+    """[(libellé, nombre de réservations), ...] dans l'ordre des tranches"""
+    counts = defaultdict(int)
+    for lead_times in rollups_between(first_day, last_day, room_ids).exclude(
+        lead_times={}
+    ).values_list('lead_times', flat=True):
+        for key, count in lead_times.items():
+            counts[key] += count
+    return [(label, counts[key]) for key, label, _limit in LEAD_TIME_BUCKETS]
+
+
+def room_usage_dashboard(days=30, now=None):
+    """Séries du tableau de bord des salles, lues dans les agrégats"""
+    today = timezone.localdate(now or timezone.now())
+    first_day = today - timedelta(days=days - 1)
+    year_start = (today.replace(day=1) - timedelta(days=335)).replace(day=1)
+
+    totals = {
+        row['room_id']: row
+        for row in rollups_between(first_day, today).values('room_id').annotate(
+            open_seconds=Sum('open_seconds'), booked_seconds=Sum('booked_seconds'), revenue=Sum('revenue'),
+        ).order_by()
+    }
+    occupancy = []
+    for room in ConferenceRoom.objects.filter(is_active=True).order_by('name'):
+        row = totals.get(room.pk, {'open_seconds': 0, 'booked_seconds': 0, 'revenue': 0})
+        occupancy.append({
+            'room': room,
+            'occupancy_rate': row['booked_seconds'] / row['open_seconds'] if row['open_seconds'] else 0,
+            'revenue': row['revenue'],
+        })
+    occupancy.sort(key=lambda row: row['occupancy_rate'], reverse=True)
+
+    monthly_revenue = defaultdict(Decimal)
+    for row in occupancy_series(year_start, today, period='month'):
+        monthly_revenue[row['period']] += row['revenue']
+
+    return {
+        'first_day': first_day,
+        'last_day': today,
+        'occupancy': occupancy,
+        'monthly_revenue': sorted(monthly_revenue.items()),
+        'max_monthly_revenue': max(monthly_revenue.values(), default=0),
+        'heatmap': peak_hours(first_day, today),
+        'top_organizations': revenue_by_organization(first_day, today),
+        'lead_times': lead_time_distribution(first_day, today),
+        'refreshed_at': RoomUsageRollup.objects.aggregate(last=Max('refreshed_at'))['last'],
+    }
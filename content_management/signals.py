@@ -0,0 +1,157 @@
+"""
+Signaux de l'application content_management
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .agenda import invalidate_event_agenda
+from .analytics import invalidate_form_analytics, registration_committed
+from .availability import invalidate_room_availability
+from .facets import invalidate_facet_matrix
+from .ledger import refresh_full_payment, refresh_organization_receivables
+from .models import (
+    Event, EventAgenda, EventDay, EventIntervenant, EventRegistration, EventRegistrationForm,
+    ConferenceRoom, ExternalOrganization, FormField, FormFieldOption, RoomBooking, RoomMaintenance,
+)
+from .organizations import refresh_organization_stats
+from .room_usage import mark_room_usage_stale
+
+
+@receiver(post_save, sender=EventRegistration)
+def registration_saved(sender, instance, created, **kwargs):
+    """Les nouvelles inscriptions sont ajoutées au cache de façon incrémentale,
+    une modification (changement de statut) impose un recalcul"""
+    if created:
+        # Validée après une inscription d'id supérieur, elle échapperait au calcul incrémental
+        transaction.on_commit(lambda: registration_committed(instance.form_id, instance.pk))
+    else:
+        invalidate_form_analytics(instance.form_id)
+
+
+@receiver(post_delete, sender=EventRegistration)
+def registration_deleted(sender, instance, **kwargs):
+    invalidate_form_analytics(instance.form_id)
+
+
+@receiver([post_save, post_delete], sender=FormField)
+def form_field_changed(sender, instance, **kwargs):
+    invalidate_form_analytics(instance.form_id)
+
+
+@receiver([post_save, post_delete], sender=FormFieldOption)
+def form_field_option_changed(sender, instance, **kwargs):
+    invalidate_form_analytics(instance.field.form_id)
+
+
+@receiver(post_save, sender=EventRegistrationForm)
+def registration_form_saved(sender, instance, **kwargs):
+    """Applique le réglage allow_multiple_registrations aux inscriptions existantes"""
+    registrations = instance.registrations.all()
+    if instance.allow_multiple_registrations:
+        registrations.filter(dedup_key__isnull=False).update(dedup_key=None)
+    elif registrations.filter(dedup_key__isnull=True).exists():
+        from jobs.registration_tasks import merge_duplicate_registrations
+        transaction.on_commit(lambda: merge_duplicate_registrations.delay(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Event)
+def event_changed(sender, instance, **kwargs):
+    invalidate_event_agenda(instance.pk)
+    invalidate_facet_matrix()
+
+
+@receiver([post_save, post_delete], sender=EventDay)
+def event_day_changed(sender, instance, **kwargs):
+    invalidate_event_agenda(instance.event_id)
+
+
+@receiver([post_save, post_delete], sender=EventAgenda)
+def event_activity_changed(sender, instance, **kwargs):
+    event_ids = EventDay.objects.filter(pk=instance.event_day_id).values_list('event_id', flat=True)
+    invalidate_event_agenda(*event_ids)
+
+
+@receiver(m2m_changed, sender=EventAgenda.intervenants.through)
+def event_activity_intervenants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Avant un clear, pour retrouver encore les activités concernées
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        activities = EventAgenda.objects.filter(pk=instance.pk)
+    elif pk_set:
+        activities = EventAgenda.objects.filter(pk__in=pk_set)
+    else:
+        activities = EventAgenda.objects.filter(intervenants=instance)
+    invalidate_event_agenda(*set(activities.values_list('event_day__event_id', flat=True)))
+
+
+@receiver([post_save, pre_delete], sender=EventIntervenant)
+def event_intervenant_changed(sender, instance, **kwargs):
+    """Un intervenant peut figurer au programme de plusieurs événements"""
+    event_ids = EventAgenda.objects.filter(intervenants=instance).values_list('event_day__event_id', flat=True)
+    invalidate_event_agenda(*set(event_ids))
+
+
+@receiver(pre_save, sender=RoomBooking)
+def room_booking_moving(sender, instance, **kwargs):
+    """Une réservation déplacée libère aussi son ancienne salle et ses anciens jours"""
+    if instance._state.adding:
+        return
+    previous = RoomBooking.objects.filter(pk=instance.pk).values(
+        'room_id', 'organization_id', 'start_time', 'end_time', 'total_price'
+    ).first()
+    if previous is None:
+        return
+    if previous['total_price'] != instance.total_price:
+        instance._price_changed = True
+    if previous['organization_id'] != instance.organization_id:
+        instance._previous_organization_id = previous['organization_id']
+    if previous['room_id'] != instance.room_id:
+        invalidate_room_availability(previous['room_id'])
+    if (previous['room_id'], previous['start_time'], previous['end_time']) != (
+        instance.room_id, instance.start_time, instance.end_time
+    ):
+        # Marqués après l'enregistrement, comme les nouveaux jours (voir room_usage.py)
+        instance._previous_span = (previous['room_id'], previous['start_time'], previous['end_time'])
+
+
+@receiver([post_save, post_delete], sender=RoomBooking)
+def room_booking_changed(sender, instance, **kwargs):
+    invalidate_room_availability(instance.room_id)
+    mark_room_usage_stale(instance.room_id, instance.start_time, instance.end_time)
+    previous_span = instance.__dict__.pop('_previous_span', None)
+    if previous_span:
+        mark_room_usage_stale(*previous_span)
+    if instance.__dict__.pop('_price_changed', False):
+        refresh_full_payment(instance.pk)
+    # Prix, statut ou organisation changent les créances et l'historique; recalcul après validation
+    organization_ids = {instance.organization_id, getattr(instance, '_previous_organization_id', None)} - {None}
+    transaction.on_commit(lambda: refresh_organization_receivables(*organization_ids))
+    transaction.on_commit(lambda: refresh_organization_stats(organization_ids))
+
+
+@receiver(pre_save, sender=RoomMaintenance)
+def room_maintenance_moving(sender, instance, **kwargs):
+    """Une maintenance changée de salle libère aussi l'ancienne"""
+    if not instance._state.adding:
+        previous = RoomMaintenance.objects.filter(pk=instance.pk).exclude(room_id=instance.room_id)
+        invalidate_room_availability(*previous.values_list('room_id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=RoomMaintenance)
+def room_maintenance_changed(sender, instance, **kwargs):
+    invalidate_room_availability(instance.room_id)
+
+
+@receiver(post_save, sender=ConferenceRoom)
+def conference_room_saved(sender, instance, **kwargs):
+    """maintenance_until fait partie de la disponibilité de la salle"""
+    invalidate_room_availability(instance.pk)
+
+
+@receiver(post_save, sender=ExternalOrganization)
+def organization_saved(sender, instance, created, **kwargs):
+    """Le nom de l'organisation figure dans les conflits et le calendrier des salles"""
+    if not created:
+        invalidate_room_availability(*set(instance.bookings.values_list('room_id', flat=True)))
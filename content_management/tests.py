@@ -1,3 +1,1801 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+from unittest import mock
 
-# Create your tests here.
+from celery.exceptions import TimeLimitExceeded
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.mail.backends import locmem
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.email_tasks import EMAIL_DISPATCH_LOCK, schedule_email_dispatch, send_pending_emails
+from jobs.newsletter_tasks import resume_stalled_campaigns
+from jobs.export_tasks import (
+    cleanup_expired_exports, document_chunk_dir, fail_document_job, run_document_job, run_export_job,
+)
+from jobs.registration_tasks import send_due_reminders, send_event_reminder
+from jobs.models import EmailQueue, EmailTemplate, ExportJob, NewsletterLog
+from jobs.tasks import send_bulk_newsletter
+
+from .models import (
+    BookingPayment, BookingSeries, ConferenceRoom, ContactMessage, DirectUpload, Event, EventAgenda, EventDay, EventFAQ, EventIntervenant, EventOrganizer,
+    EventRegistration, EventReminder, EventRegistrationForm, EventTag, ExternalOrganization, FormField, FormFieldOption,
+    FormResponse, Newsletter, NewsletterCampaign, NewsletterCampaignChunk, OrganizationReceivable, RoomBooking,
+    RoomMaintenance, RoomUsageRollup
+)
+from .analytics import aggregate_registrations, analytics_cache_key, build_form_analytics, get_form_aggregates
+from .dedup import DuplicateRegistrationError, find_existing_registration
+from .agenda import agenda_cache_key
+from .calendars import fold_line
+from .campaigns import deliver_chunk, plan_campaign_chunks, release_chunk
+from .cloning import clone_event
+from .conflicts import BookingConflictError, IntervalIndex, RoomSchedule, save_booking
+from .facets import browse_events
+from .ledger import PaymentError, rebuild_booking_balances, record_payment, refresh_receivables, verify_payment
+from .organizations import refresh_organization_stats, refresh_started_bookings, search_organizations
+from .recurrence import SeriesConflictError, cancel_series, create_series, update_series
+from .free_slots import DEFAULT_BUSINESS_HOURS, find_free_slots
+from .room_calendar import build_room_calendar
+from .room_usage import month_rollups, refresh_room_usage, room_usage_dashboard
+from .checkin import build_roster, check_in, check_in_summary, read_ticket_code, sync_check_ins
+from .exports import get_export_fields, get_export_headers, iter_registration_rows, write_registrations_xlsx
+from .forms import EventRegistrationFormForm, EventRegistrationPublicForm, PartnerForm, RoomBookingForm
+from .registrations import answers_option_filter, create_registration
+from . import badges, reminders, uploads
+
+
+class RegistrationTestMixin:
+    """Crée un événement avec un formulaire d'inscription"""
+
+    def create_registration_form(self):
+        event = Event.objects.create(
+            title="Conférence test",
+            slug="conference-test",
+            description="Description",
+            start_date=date(2026, 1, 10),
+            end_date=date(2026, 1, 11),
+            location="Conakry",
+        )
+        return EventRegistrationForm.objects.create(event=event, title="Inscription")
+
+    def add_field(self, form, field_type, options=(), order=0):
+        field = FormField.objects.create(
+            form=form, label=f"Champ {field_type}", field_type=field_type,
+            has_options=bool(options), order=order,
+        )
+        for index, value in enumerate(options):
+            FormFieldOption.objects.create(field=field, label=value.title(), value=value, order=index)
+        return field
+
+
+class RoomBookingTestMixin:
+    """Crée des salles, des organisations et leurs réservations"""
+
+    def create_room(self, name, slug, capacity=30, area=50, price_per_hour=100, price_per_day=500):
+        return ConferenceRoom.objects.create(
+            name=name, slug=slug, capacity=capacity, area=area,
+            price_per_hour=price_per_hour, price_per_day=price_per_day,
+        )
+
+    def create_organization(self, name, slug, organization_type='company', **kwargs):
+        return ExternalOrganization.objects.create(
+            name=name, slug=slug, organization_type=organization_type, contact_person="Contact",
+            email=f'{slug}@example.com', phone='600000000', **kwargs
+        )
+
+    def at(self, year, month, day, hour=0):
+        return timezone.make_aware(datetime(year, month, day, hour))
+
+    def book(self, title, start, end, status='confirmed', room=None, organization=None):
+        return RoomBooking.objects.create(
+            room=room or self.room, organization=organization or self.organization,
+            event_title=title, status=status, start_time=start, end_time=end,
+        )
+
+
+class BatchedRegistrationWriterTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.radio = self.add_field(self.form, 'radio', ['a', 'b'], order=1)
+        self.multi = self.add_field(self.form, 'multiselect', ['x', 'y', 'z'], order=2)
+        self.number = self.add_field(self.form, 'number', order=3)
+        self.text = self.add_field(self.form, 'text', order=4)
+
+    def cleaned_data(self):
+        return {
+            'first_name': 'Awa',
+            'last_name': 'Camara',
+            'email': 'awa@example.com',
+            'phone': '',
+            f'field_{self.radio.pk}': 'b',
+            f'field_{self.multi.pk}': ['x', 'z'],
+            f'field_{self.number.pk}': 12,
+            f'field_{self.text.pk}': 'Bonjour',
+        }
+
+    def test_responses_and_options_are_saved(self):
+        fields = list(self.form.fields.prefetch_related('options'))
+        registration = create_registration(self.form, fields, self.cleaned_data())
+
+        responses = {r.field_id: r for r in registration.responses.all()}
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(
+            list(responses[self.radio.pk].selected_options.values_list('value', flat=True)), ['b']
+        )
+        self.assertEqual(
+            sorted(responses[self.multi.pk].selected_options.values_list('value', flat=True)), ['x', 'z']
+        )
+        self.assertEqual(responses[self.number.pk].number_value, 12)
+        self.assertEqual(responses[self.text.pk].text_value, 'Bonjour')
+
+    def test_query_count_does_not_grow_with_form_size(self):
+        fields = list(self.form.fields.prefetch_related('options'))
+        # savepoint + inscription + réponses + liens vers les options
+        with self.assertNumQueries(5):
+            create_registration(self.form, fields, self.cleaned_data())
+
+    def test_answers_document_is_written_with_the_registration(self):
+        fields = list(self.form.fields.prefetch_related('options'))
+        registration = create_registration(self.form, fields, self.cleaned_data())
+        registration.refresh_from_db()
+        self.assertEqual(registration.answers, {
+            str(self.radio.pk): ['b'],
+            str(self.multi.pk): ['x', 'z'],
+            str(self.number.pk): 12.0,
+            str(self.text.pk): 'Bonjour',
+        })
+
+    def test_filter_by_option_uses_answers(self):
+        fields = list(self.form.fields.prefetch_related('options'))
+        registration = create_registration(self.form, fields, self.cleaned_data())
+        data = self.cleaned_data()
+        data.update({'email': 'autre@example.com', f'field_{self.multi.pk}': ['y']})
+        create_registration(self.form, fields, data)
+
+        matches = EventRegistration.objects.filter(answers_option_filter(self.multi, 'z'))
+        self.assertEqual(list(matches), [registration])
+
+        # Inscription antérieure au document answers: lue dans ses réponses
+        EventRegistration.objects.filter(pk=registration.pk).update(answers=None)
+        self.assertEqual(list(EventRegistration.objects.filter(answers_option_filter(self.multi, 'z'))), [registration])
+
+    def test_unknown_choice_is_ignored(self):
+        fields = list(self.form.fields.prefetch_related('options'))
+        data = self.cleaned_data()
+        data[f'field_{self.radio.pk}'] = 'inconnue'
+        registration = create_registration(self.form, fields, data)
+        self.assertFalse(
+            FormResponse.objects.filter(registration=registration, field=self.radio).exists()
+        )
+
+
+class RegistrationExportTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.multi = self.add_field(self.form, 'multiselect', ['x', 'y'], order=1)
+        self.text = self.add_field(self.form, 'text', order=2)
+        fields = list(self.form.fields.prefetch_related('options'))
+        for index in range(5):
+            create_registration(self.form, fields, {
+                'first_name': f'Prénom {index}',
+                'last_name': 'Diallo',
+                'email': f'p{index}@example.com',
+                f'field_{self.multi.pk}': ['x', 'y'],
+                f'field_{self.text.pk}': f'texte {index}',
+            })
+
+    def test_rows_are_read_from_answers_with_constant_queries(self):
+        fields = get_export_fields(self.form)
+        # vérification des documents + libellés des options + inscriptions
+        with self.assertNumQueries(3):
+            rows = list(iter_registration_rows(self.form, fields))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0][-2:], ['X, Y', 'texte 0'])
+
+    def test_rows_fall_back_to_responses_until_backfilled(self):
+        fields = get_export_fields(self.form)
+        expected = list(iter_registration_rows(self.form, fields))
+        self.form.registrations.update(answers=None)
+
+        # vérification des documents + inscriptions + réponses + options sélectionnées
+        with self.assertNumQueries(4):
+            self.assertEqual(list(iter_registration_rows(self.form, fields)), expected)
+
+        call_command('backfill_registration_answers', batch_size=2, stdout=io.StringIO())
+        self.assertFalse(self.form.registrations.filter(answers__isnull=True).exists())
+        self.assertEqual(list(iter_registration_rows(self.form, fields)), expected)
+
+    def test_xlsx_is_written_in_write_only_mode(self):
+        fields = get_export_fields(self.form)
+        output = io.BytesIO()
+        count = write_registrations_xlsx(output, get_export_headers(fields), iter_registration_rows(self.form, fields))
+        self.assertEqual(count, 5)
+        output.seek(0)
+        sheet = openpyxl.load_workbook(output).active
+        self.assertEqual(sheet.max_row, 6)
+        self.assertEqual(sheet.cell(row=1, column=8).value, self.multi.label)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExportJobTests(TestCase):
+    def setUp(self):
+        ContactMessage.objects.bulk_create([
+            ContactMessage(name=f"Nom {i}", email=f"m{i}@example.com", subject="Sujet", message="Texte", is_read=i % 2 == 0)
+            for i in range(4)
+        ])
+
+    def test_export_job_writes_file_and_counts_rows(self):
+        job = ExportJob.objects.create(export_type='contact_messages', file_format='csv', params={'status': 'read'})
+        self.assertTrue(run_export_job.apply(args=[job.pk]).get())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.row_count, 2)
+        self.assertTrue(job.is_ready)
+        self.assertIsNotNone(job.expires_at)
+        with job.file.open('rb') as fileobj:
+            lines = fileobj.read().decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 3)
+
+    def test_transient_storage_error_is_retried(self):
+        job = ExportJob.objects.create(export_type='contact_messages', file_format='csv')
+        failures = [OSError("Stockage indisponible")]
+
+        def flaky_file(fileobj):
+            if failures:
+                raise failures.pop()
+            return File(fileobj)
+
+        with mock.patch('jobs.export_tasks.File', side_effect=flaky_file) as wrapped:
+            self.assertTrue(run_export_job.apply(args=[job.pk]).get())
+        self.assertEqual(wrapped.call_count, 2)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.row_count), ('completed', 4))
+
+    def test_expired_exports_stay_visible_until_retention_ends(self):
+        job = ExportJob.objects.create(export_type='contact_messages', file_format='csv')
+        run_export_job.apply(args=[job.pk])
+        ExportJob.objects.filter(pk=job.pk).update(
+            expires_at=timezone.now() - timedelta(days=1), updated_at=timezone.now() - timedelta(days=30)
+        )
+        self.assertEqual(cleanup_expired_exports(), {'expired': 1, 'deleted': 0})
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.file.name), ('expired', ''))
+
+    def test_unknown_export_type_marks_job_as_failed(self):
+        job = ExportJob.objects.create(export_type='inconnu')
+        self.assertFalse(run_export_job.apply(args=[job.pk]).get())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+
+class FormAnalyticsTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.form = self.create_registration_form()
+        self.radio = self.add_field(self.form, 'radio', ['a', 'b'], order=1)
+        self.number = self.add_field(self.form, 'number', order=2)
+        self.fields = list(self.form.fields.prefetch_related('options'))
+
+    def register(self, index, choice, number):
+        return create_registration(self.form, self.fields, {
+            'first_name': 'Prénom', 'last_name': 'Nom', 'email': f'a{index}@example.com',
+            f'field_{self.radio.pk}': choice,
+            f'field_{self.number.pk}': number,
+        })
+
+    def test_histograms_numbers_and_funnel(self):
+        self.register(1, 'a', 10)
+        self.register(2, 'a', 20)
+        self.register(3, 'b', 30)
+
+        analytics = build_form_analytics(self.form)
+        counts = {row['option'].value: row['count'] for row in analytics['choice_fields'][0]['options']}
+        self.assertEqual(counts, {'a': 2, 'b': 1})
+        self.assertEqual(analytics['number_fields'][0]['average'], 20)
+        self.assertEqual(analytics['number_fields'][0]['max'], 30)
+        self.assertEqual(analytics['funnel'][0]['count'], 3)
+
+    def test_new_registrations_are_merged_incrementally(self):
+        self.register(1, 'a', 5)
+        get_form_aggregates(self.form)
+        self.register(2, 'b', 15)
+
+        aggregates = get_form_aggregates(self.form)
+        self.assertEqual(aggregates['total'], 2)
+        self.assertEqual(aggregates['numbers'][str(self.number.pk)]['min'], 5)
+        self.assertEqual(aggregates['numbers'][str(self.number.pk)]['max'], 15)
+
+        # Sans nouvelle inscription, seule la vérification du dernier id est exécutée
+        with self.assertNumQueries(1):
+            get_form_aggregates(self.form)
+
+    def test_registration_committed_out_of_order_is_counted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            late = self.register(1, 'a', 5)
+            self.register(2, 'b', 15)
+            # Cache calculé alors que la première inscription n'était pas encore validée
+            cache.set(analytics_cache_key(self.form.pk), aggregate_registrations(self.form, after_id=late.pk))
+        self.assertEqual(get_form_aggregates(self.form)['total'], 2)
+
+    def test_status_change_invalidates_cache(self):
+        registration = self.register(1, 'a', 5)
+        get_form_aggregates(self.form)
+        registration.status = 'confirmed'
+        registration.save()
+        self.assertEqual(get_form_aggregates(self.form)['statuses'], {'confirmed': 1})
+
+
+class CheckInTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.event = self.form.event
+        self.registrations = [
+            create_registration(self.form, [], {
+                'first_name': 'Prénom', 'last_name': f'Nom {index}', 'email': f'c{index}@example.com',
+            })
+            for index in range(3)
+        ]
+
+    def test_ticket_code_is_signed(self):
+        registration = self.registrations[0]
+        self.assertEqual(read_ticket_code(registration.ticket_code), registration.registration_id)
+        self.assertIsNone(read_ticket_code(registration.registration_id + ':faux'))
+        self.assertEqual(check_in(self.event, registration.registration_id)['result'], 'invalid')
+
+    def test_check_in_is_idempotent(self):
+        code = self.registrations[0].ticket_code
+        first = check_in(self.event, code, device='porte-1')
+        second = check_in(self.event, code, device='porte-2')
+
+        self.assertEqual(first['result'], 'checked_in')
+        self.assertEqual(second['result'], 'already_checked_in')
+        self.assertEqual(second['checked_in_at'], first['checked_in_at'])
+        self.registrations[0].refresh_from_db()
+        self.assertEqual(self.registrations[0].check_in_device, 'porte-1')
+
+    def test_cancelled_registration_is_refused(self):
+        registration = self.registrations[1]
+        EventRegistration.objects.filter(pk=registration.pk).update(status='cancelled')
+        self.assertEqual(check_in(self.event, registration.ticket_code)['result'], 'refused')
+
+    def test_offline_sync_keeps_first_scan(self):
+        first, second, third = self.registrations
+        check_in(self.event, third.ticket_code)
+        results = sync_check_ins(self.event, [
+            {'code': first.ticket_code, 'scanned_at': '2026-01-10T09:05:00+00:00'},
+            {'code': first.ticket_code, 'scanned_at': '2026-01-10T09:00:00+00:00'},
+            {'code': second.ticket_code, 'scanned_at': '2026-01-10T09:01:00+00:00'},
+            {'code': third.ticket_code, 'scanned_at': '2026-01-10T09:02:00+00:00'},
+            {'code': 'inconnu'},
+        ])
+
+        by_result = sorted(result['result'] for result in results)
+        self.assertEqual(by_result, ['already_checked_in', 'checked_in', 'checked_in', 'invalid'])
+        first.refresh_from_db()
+        self.assertEqual(first.checked_in_at.isoformat(), '2026-01-10T09:00:00+00:00')
+        self.assertEqual(check_in_summary(self.event), {'expected': 3, 'checked_in': 3})
+
+    def test_roster_lists_ticket_codes(self):
+        roster = build_roster(self.event)
+        self.assertEqual([row[0] for row in roster['rows']], [r.ticket_code for r in self.registrations])
+
+    def test_scan_endpoint(self):
+        user = get_user_model().objects.create_user('controle', 'controle@example.com', 'secret')
+        self.client.force_login(user)
+        url = reverse('content_management:event_check_in_scan', args=[self.event.pk])
+        response = self.client.post(
+            url, {'code': self.registrations[0].ticket_code, 'device': 'porte-1'}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['result'], 'checked_in')
+        self.assertEqual(EventRegistration.objects.get(pk=self.registrations[0].pk).checked_in_by, user)
+
+
+class DuplicateRegistrationTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.text = self.add_field(self.form, 'text', order=1)
+        self.number = self.add_field(self.form, 'number', order=2)
+        self.fields = list(self.form.fields.prefetch_related('options'))
+
+    def register(self, email, **answers):
+        data = {'first_name': 'Awa', 'last_name': 'Camara', 'email': email}
+        data.update({f'field_{getattr(self, name).pk}': value for name, value in answers.items()})
+        return create_registration(self.form, self.fields, data)
+
+    def test_duplicate_is_detected_before_and_at_insert(self):
+        first = self.register('awa@example.com')
+        self.assertEqual(find_existing_registration(self.form, ' AWA@example.com'), first)
+        with self.assertRaises(DuplicateRegistrationError) as error:
+            self.register('Awa@Example.com')
+        self.assertEqual(error.exception.existing, first)
+
+    def test_cancelled_registration_does_not_block(self):
+        first = self.register('awa@example.com')
+        EventRegistration.objects.filter(pk=first.pk).update(status='cancelled')
+        self.assertIsNone(find_existing_registration(self.form, 'awa@example.com'))
+        self.register('awa@example.com')
+
+    def test_multiple_registrations_allowed(self):
+        self.form.allow_multiple_registrations = True
+        self.form.save()
+        self.register('awa@example.com')
+        second = self.register('awa@example.com')
+        self.assertIsNone(second.dedup_key)
+        self.assertIsNone(find_existing_registration(self.form, 'awa@example.com'))
+
+    def test_existing_duplicates_are_merged_when_multiples_are_disallowed(self):
+        self.form.allow_multiple_registrations = True
+        self.form.save()
+        first = self.register('awa@example.com', text='Bonjour')
+        confirmed = self.register('AWA@example.com', number=3)
+        self.register('awa@example.com')
+        other = self.register('autre@example.com')
+        EventRegistration.objects.filter(pk=confirmed.pk).update(status='confirmed')
+
+        self.form.allow_multiple_registrations = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.save()
+
+        remaining = list(self.form.registrations.order_by('pk'))
+        self.assertEqual([r.pk for r in remaining], [confirmed.pk, other.pk])
+        survivor = remaining[0]
+        self.assertEqual(survivor.dedup_key, 'awa@example.com')
+        self.assertEqual(EventRegistration.objects.get(pk=other.pk).dedup_key, 'autre@example.com')
+        self.assertEqual(
+            sorted(survivor.responses.values_list('field_id', flat=True)), [self.text.pk, self.number.pk]
+        )
+        self.assertEqual(survivor.answers, {str(self.number.pk): 3.0, str(self.text.pk): 'Bonjour'})
+        self.assertIn(first.registration_id, survivor.internal_notes)
+
+    def test_duplicates_differing_by_surrounding_spaces_are_merged(self):
+        self.form.allow_multiple_registrations = True
+        self.form.save()
+        first = self.register('awa@example.com')
+        second = self.register('awa@example.com')
+        EventRegistration.objects.filter(pk=second.pk).update(email=' Awa@example.com ')
+
+        self.form.allow_multiple_registrations = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.form.save()
+
+        remaining = list(self.form.registrations.all())
+        self.assertEqual([r.pk for r in remaining], [first.pk])
+        self.assertEqual(remaining[0].dedup_key, 'awa@example.com')
+        self.assertEqual(find_existing_registration(self.form, 'AWA@example.com '), remaining[0])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DirectUploadTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.field = self.add_field(self.form, 'file', order=1)
+        FormField.objects.filter(pk=self.field.pk).update(allowed_file_types='pdf, txt')
+        self.target = f'registration_field.{self.field.pk}'
+        patcher = mock.patch.multiple(uploads, DIRECT_UPLOAD_CHUNK_SIZE=4, DIRECT_UPLOAD_TEMP_DIR=tempfile.mkdtemp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start(self, content=b'0123456789', filename='programme.txt', target=None, content_type='text/plain'):
+        response = self.client.post(reverse('content_management:direct_upload_start'), {
+            'target': target or self.target, 'filename': filename,
+            'content_type': content_type, 'size': len(content),
+        }, content_type='application/json')
+        return response.json()
+
+    def put_parts(self, session, content, numbers=None):
+        for part in session['parts']:
+            if numbers is None or part['number'] in numbers:
+                start = (part['number'] - 1) * session['chunk_size']
+                chunk = content[start:start + session['chunk_size']]
+                response = self.client.generic('PUT', part['url'], chunk, content_type='application/octet-stream')
+                self.assertEqual(response.json(), {'success': True, 'number': part['number'], 'size': len(chunk)})
+
+    def test_chunked_upload_can_be_resumed(self):
+        content = b'0123456789'
+        session = self.start(content)
+        self.assertEqual(session['method'], 'put')
+        self.assertEqual(len(session['parts']), 3)
+
+        self.put_parts(session, content, numbers=[1, 3])
+        self.assertFalse(self.client.post(session['complete_url']).json()['success'])
+        self.assertEqual(self.client.get(session['status_url']).json()['uploaded_parts'], [1, 3])
+
+        self.put_parts(session, content, numbers=[2])
+        completed = self.client.post(session['complete_url']).json()
+        self.assertTrue(completed['success'])
+        with uploads.default_storage.open(completed['key']) as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertFalse(os.path.exists(uploads.LocalUploadBackend().parts_dir(DirectUpload.objects.get())))
+
+    def test_part_size_is_checked(self):
+        session = self.start()
+        response = self.client.generic('PUT', session['parts'][0]['url'], b'012345', content_type='text/plain')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(session['status_url']).json()['uploaded_parts'], [])
+
+    def test_targets_are_validated(self):
+        self.assertIn('Type de fichier', self.start(filename='script.exe')['error'])
+        self.assertFalse(self.start(target='registration_field.999999')['success'])
+        self.assertEqual(self.client.post(reverse('content_management:direct_upload_start'), {
+            'target': 'event.featured_image', 'filename': 'a.png', 'content_type': 'image/png', 'size': 4,
+        }, content_type='application/json').status_code, 403)
+
+    def test_registration_form_uses_uploaded_key(self):
+        content = b'programme'
+        session = self.start(content)
+        self.put_parts(session, content)
+        key = self.client.post(session['complete_url']).json()['key']
+
+        fields = list(self.form.fields.prefetch_related('options'))
+        data = {
+            'first_name': 'Awa', 'last_name': 'Camara', 'email': 'awa@example.com',
+            f'field_{self.field.pk}_upload': session['token'],
+        }
+        public_form = EventRegistrationPublicForm(data, form_fields=fields)
+        self.assertTrue(public_form.is_valid(), public_form.errors)
+        registration = create_registration(self.form, fields, public_form.cleaned_data)
+        uploads.mark_uploads_attached(public_form.direct_uploads)
+
+        self.assertEqual(registration.responses.get().file_value.name, key)
+        self.assertEqual(registration.answers, {str(self.field.pk): key})
+        self.assertEqual(DirectUpload.objects.get().status, 'attached')
+        self.assertFalse(EventRegistrationPublicForm(data, form_fields=fields).is_valid())
+
+    def test_model_forms_use_uploaded_key(self):
+        user = get_user_model().objects.create_user('medias', 'medias@example.com', 'secret')
+        self.client.force_login(user)
+        self.assertEqual(str(PartnerForm()['logo']).count('data-direct-upload="partner.logo"'), 1)
+
+        content = b'logo'
+        session = self.start(content, filename='logo.png', target='partner.logo', content_type='image/png')
+        self.put_parts(session, content)
+        key = self.client.post(session['complete_url']).json()['key']
+        partner_form = PartnerForm({
+            'name': "Université", 'partnership_type': 'academic', 'order': 0, 'logo_upload': session['token'],
+        })
+        self.assertTrue(partner_form.is_valid(), partner_form.errors)
+        self.assertEqual(partner_form.save().logo.name, key)
+        self.assertEqual(DirectUpload.objects.get().status, 'attached')
+
+    @override_settings(
+        AWS_STORAGE_BUCKET_NAME='csig-test', AWS_S3_REGION_NAME='eu-west-3',
+        AWS_ACCESS_KEY_ID='test', AWS_SECRET_ACCESS_KEY='test',
+        STORAGES={'default': {'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage'}},
+    )
+    def test_s3_small_file_uses_presigned_post(self):
+        upload, instructions = uploads.start_upload(
+            self.target, 'programme.pdf', 'application/pdf', 3, backend='s3'
+        )
+        self.assertEqual(instructions['method'], 'post')
+        self.assertEqual(instructions['fields']['key'], upload.key)
+        self.assertTrue(upload.key.startswith('events/registrations/files/'))
+
+        # Les morceaux ne passent pas par les workers web en production
+        with self.assertRaises(ImproperlyConfigured):
+            uploads.start_upload(self.target, 'programme.pdf', 'application/pdf', 3, backend='local')
+
+    def test_s3_backend_requires_s3_default_storage(self):
+        with self.assertRaises(ImproperlyConfigured):
+            uploads.start_upload(self.target, 'programme.pdf', 'application/pdf', 3, backend='s3')
+        self.assertFalse(DirectUpload.objects.exists())
+
+
+class ConfirmationEmailTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.form = self.create_registration_form()
+
+    def register(self, email):
+        return create_registration(self.form, [], {'first_name': 'Awa', 'last_name': 'Camara', 'email': email})
+
+    def test_confirmation_is_queued_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            registration = self.register('awa@example.com')
+        self.assertFalse(EmailQueue.objects.exists())
+        self.assertEqual(len(mail.outbox), 0)
+
+        for callback in callbacks:
+            callback()
+        queued = EmailQueue.objects.get()
+        self.assertEqual(queued.status, 'sent')
+        self.assertEqual(queued.to_email, 'awa@example.com')
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(registration.ticket_code, mail.outbox[0].body)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/plain')
+
+    def test_confirmation_uses_email_template(self):
+        EmailTemplate.objects.create(
+            name='event_registration_confirmation',
+            subject_template="Inscription {{ registration.registration_id }}",
+            html_template="<p>{{ event.title }}</p>",
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            registration = self.register('awa@example.com')
+        self.assertEqual(mail.outbox[0].subject, f"Inscription {registration.registration_id}")
+        self.assertEqual(mail.outbox[0].body, "<p>Conférence test</p>")
+
+    def test_disabled_confirmation_is_not_queued(self):
+        self.form.send_confirmation_email = False
+        self.form.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('awa@example.com')
+        self.assertFalse(EmailQueue.objects.exists())
+
+    def test_emails_wait_for_scheduled_dispatch(self):
+        cache.set(EMAIL_DISPATCH_LOCK, True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('a@example.com')
+            self.register('b@example.com')
+        self.assertEqual(EmailQueue.objects.filter(status='pending').count(), 2)
+
+        cache.delete(EMAIL_DISPATCH_LOCK)
+        schedule_email_dispatch()
+        self.assertEqual(EmailQueue.objects.filter(status='sent').count(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_unsent_emails_are_retried(self):
+        cache.set(EMAIL_DISPATCH_LOCK, True)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.register('a@example.com')
+            self.register('b@example.com')
+        with mock.patch('jobs.email_tasks.get_connection') as get_connection:
+            get_connection.return_value.open.side_effect = ConnectionRefusedError("SMTP indisponible")
+            self.assertEqual(send_pending_emails(), {'sent': 0, 'failed': 2})
+        # Remis en attente pour une nouvelle tentative, pas échoués
+        self.assertEqual(set(EmailQueue.objects.values_list('status', 'retry_count')), {('pending', 1)})
+        self.assertEqual(send_pending_emails(), {'sent': 0, 'failed': 0})
+
+        # Nouvelle tentative après le délai; un email abandonné en cours par un worker arrêté est repris
+        EmailQueue.objects.update(scheduled_at=timezone.now())
+        EmailQueue.objects.filter(to_email='b@example.com').update(
+            status='processing', updated_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(send_pending_emails(), {'sent': 2, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class EventReminderTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        cache.set(EMAIL_DISPATCH_LOCK, True)
+        self.addCleanup(cache.delete, EMAIL_DISPATCH_LOCK)
+        self.form = self.create_registration_form()
+        self.form.event.start_date = timezone.localdate() + timedelta(days=3)
+        self.form.event.save()
+        self.form.reminder_offsets = [24, 168]
+        self.form.save()
+        self.form = EventRegistrationForm.objects.select_related('event').get(pk=self.form.pk)
+        self.registrations = [
+            create_registration(self.form, [], {
+                'first_name': f'Prénom {index}', 'last_name': 'Nom', 'email': f'r{index}@example.com',
+            }, language=language)
+            for index, language in enumerate(['fr', 'en', 'fr', 'en-us', 'fr'])
+        ]
+        EventRegistration.objects.filter(pk__in=[r.pk for r in self.registrations[:4]]).update(status='confirmed')
+
+    def test_offsets_are_synced_with_event_date(self):
+        reminders.sync_form_reminders(self.form)
+        by_offset = {reminder.offset_hours: reminder for reminder in self.form.reminders.all()}
+        self.assertEqual(by_offset[168].status, 'skipped')
+        self.assertEqual(by_offset[24].status, 'pending')
+        self.assertEqual(by_offset[24].send_at, reminders.event_start(self.form.event) - timedelta(hours=24))
+
+        self.form.reminder_offsets = [48]
+        self.form.save()
+        reminders.sync_form_reminders(self.form)
+        self.assertEqual(sorted(self.form.reminders.values_list('offset_hours', flat=True)), [48, 168])
+
+    def test_reminder_is_queued_in_keyset_batches(self):
+        reminders.sync_form_reminders(self.form)
+        reminder = self.form.reminders.get(offset_hours=24)
+        EventReminder.objects.filter(pk=reminder.pk).update(send_at=timezone.now() - timedelta(minutes=1))
+
+        with mock.patch.object(reminders, 'render_reminder', wraps=reminders.render_reminder) as render:
+            self.assertEqual(send_event_reminder(reminder.pk, batch_size=3), 4)
+        self.assertEqual(render.call_count, 2)
+
+        reminder.refresh_from_db()
+        self.assertEqual(reminder.status, 'sent')
+        self.assertEqual(reminder.sent_count, 4)
+        self.assertEqual(reminder.last_registration_id, self.registrations[3].pk)
+        emails = EmailQueue.objects.order_by('to_email')
+        self.assertEqual([email.to_email for email in emails], [f'r{index}@example.com' for index in range(4)])
+        self.assertIn('Prénom 1', emails[1].html_content)
+        self.assertIn(self.registrations[1].ticket_code, emails[1].text_content)
+        self.assertNotIn('[[', emails[1].html_content)
+
+        # Un rappel déjà envoyé n'est pas relancé
+        self.assertEqual(send_due_reminders(), [])
+        self.assertEqual(EmailQueue.objects.count(), 4)
+
+    def test_reminder_form_parses_offsets(self):
+        form = EventRegistrationFormForm(instance=self.form)
+        self.assertEqual(form['reminder_offsets'].initial, '24, 168')
+        self.assertEqual(reminders.parse_reminder_offsets('24; 168, 24'), [168, 24])
+        with self.assertRaises(ValueError):
+            reminders.parse_reminder_offsets('0')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BadgeDocumentTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.event = self.form.event
+        self.registrations = [
+            create_registration(self.form, [], {
+                'first_name': 'Aïssatou', 'last_name': f'Nom {index}', 'email': f'b{index}@example.com',
+            })
+            for index in range(3)
+        ]
+        EventRegistration.objects.filter(form=self.form).update(status='confirmed')
+        EventRegistration.objects.filter(pk=self.registrations[0].pk).update(checked_in_at=timezone.now())
+
+    def rows(self, kind):
+        return badges.document_rows(badges.document_queryset(self.event, kind))
+
+    def assertValidPdf(self, content, pages):
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertEqual(content.count(b'/Type /Page '), pages)
+        startxref = int(content.rsplit(b'startxref', 1)[1].split()[0])
+        entries = content[startxref:].split(b'\n')[3:]
+        for number, entry in enumerate(entries[:pages * 3], start=1):
+            offset = int(entry[:10])
+            self.assertTrue(content[offset:].startswith(f'{number} 0 obj'.encode()))
+
+    def test_merged_pdf_has_one_page_per_attendee(self):
+        output = io.BytesIO()
+        count = badges.generate_documents('badge', badges.event_info(self.event), self.rows('badge'), output, workers=1)
+        self.assertEqual(count, 3)
+        self.assertValidPdf(output.getvalue(), 3)
+
+    def test_zip_and_process_pool(self):
+        output = io.BytesIO()
+        badges.generate_documents(
+            'badge', badges.event_info(self.event), self.rows('badge'), output,
+            file_format='zip', workers=2, chunk_size=1,
+        )
+        with zipfile.ZipFile(output) as archive:
+            names = archive.namelist()
+            self.assertEqual(len(names), 3)
+            self.assertTrue(all(name.endswith('.pdf') for name in names))
+            self.assertValidPdf(archive.read(names[0]), 1)
+
+    def test_certificates_only_for_checked_in_attendees(self):
+        rows = self.rows('certificate')
+        self.assertEqual([row['registration_id'] for row in rows], [self.registrations[0].registration_id])
+        self.assertEqual(len(badges.document_rows(badges.document_queryset(self.event, 'certificate', False))), 3)
+
+    def test_view_generates_document_in_background(self):
+        user = get_user_model().objects.create_user('badges', 'badges@example.com', 'secret')
+        self.client.force_login(user)
+        with mock.patch.object(badges, 'DOCUMENT_CHUNK_SIZE', 2), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('content_management:event_documents_generate', args=[self.event.pk]),
+                {'document': 'badge:pdf'},
+            )
+        self.assertRedirects(response, reverse('content_management:export_job_list'), fetch_redirect_response=False)
+
+        job = ExportJob.objects.get(export_type='event_badges')
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.row_count, 3)
+        with job.file.open('rb') as fileobj:
+            self.assertValidPdf(fileobj.read(), 3)
+        self.assertEqual(default_storage.listdir(document_chunk_dir(job.pk))[1], [])
+
+    def test_failed_chunk_fails_job_and_discards_chunks(self):
+        job = ExportJob.objects.create(
+            export_type='event_badges', file_format='pdf',
+            params={'event_pk': self.event.pk, 'kind': 'badge', 'chunk_size': 1},
+        )
+        render_pages = badges.render_pages
+
+        def failing_last_chunk(kind, info, rows):
+            if rows[0]['registration_id'] == self.registrations[2].registration_id:
+                raise RuntimeError("Police introuvable")
+            return render_pages(kind, info, rows)
+
+        with mock.patch.object(badges, 'render_pages', side_effect=failing_last_chunk):
+            run_document_job.apply(args=[job.pk])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error_message), ('failed', "Police introuvable"))
+        self.assertFalse(job.file)
+        self.assertEqual(default_storage.listdir(document_chunk_dir(job.pk))[1], [])
+
+        # Errback du chord sur les workers
+        job.status = 'processing'
+        job.save()
+        default_storage.save(f'{document_chunk_dir(job.pk)}/00000.zip', io.BytesIO(b'lot'))
+        fail_document_job(None, TimeLimitExceeded(300), None, job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(default_storage.listdir(document_chunk_dir(job.pk))[1], [])
+
+
+class EventCloneTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        self.form = self.create_registration_form()
+        self.form.registration_deadline = timezone.make_aware(datetime(2026, 1, 5, 18, 0))
+        self.form.save()
+        self.event = self.form.event
+        self.event.tags.add(EventTag.objects.create(name="Géomatique"))
+        speakers = [EventIntervenant.objects.create(nom=f"Intervenant {index}") for index in range(2)]
+        for day_number in (1, 2):
+            day = EventDay.objects.create(
+                event=self.event, date=self.event.start_date + timedelta(days=day_number - 1), day_number=day_number
+            )
+            for order in range(3):
+                activity = EventAgenda.objects.create(
+                    event_day=day, start_time=f'{9 + order}:00', end_time=f'{10 + order}:00',
+                    activity=f"Session {day_number}.{order}", order=order,
+                )
+                activity.intervenants.set(speakers[:order])
+        EventFAQ.objects.create(event=self.event, question="Question ?", answer="Réponse")
+        EventOrganizer.objects.create(event=self.event, name="CSIG")
+        country = self.add_field(self.form, 'select', options=['gn', 'sn'])
+        city = self.add_field(self.form, 'text', order=1)
+        city.depends_on = country
+        city.show_when_value = 'gn'
+        city.save()
+        create_registration(self.form, [], {'first_name': 'A', 'last_name': 'B', 'email': 'a@example.com'})
+
+    def test_clone_copies_every_level_in_few_queries(self):
+        # Nombre de requêtes constant, quelle que soit la taille du programme
+        with self.assertNumQueries(24):
+            new_event = clone_event(self.event, title="Conférence 2027", start_date=date(2027, 1, 9))
+
+        self.assertEqual(new_event.slug, 'conference-2027')
+        self.assertEqual(new_event.status, 'draft')
+        self.assertEqual((new_event.start_date, new_event.end_date), (date(2027, 1, 9), date(2027, 1, 10)))
+        self.assertEqual(list(new_event.tags.values_list('name', flat=True)), ["Géomatique"])
+        self.assertEqual(list(new_event.days.values_list('date', flat=True)), [date(2027, 1, 9), date(2027, 1, 10)])
+
+        activities = EventAgenda.objects.filter(event_day__event=new_event)
+        self.assertEqual(activities.count(), 6)
+        self.assertEqual(
+            sorted(activities.annotate(speakers=Count('intervenants')).values_list('speakers', flat=True)),
+            [0, 0, 1, 1, 2, 2],
+        )
+        self.assertEqual(new_event.faqs.count(), 1)
+        self.assertEqual(new_event.organizers.count(), 1)
+
+        new_form = new_event.registration_form
+        self.assertEqual(new_form.registration_deadline, timezone.make_aware(datetime(2027, 1, 4, 18, 0)))
+        self.assertEqual(new_form.registrations.count(), 0)
+        country, city = new_form.fields.order_by('order')
+        self.assertEqual(city.depends_on, country)
+        self.assertEqual(list(country.options.values_list('value', flat=True)), ['gn', 'sn'])
+
+        # Le modèle n'est pas modifié
+        self.assertEqual(EventAgenda.objects.filter(event_day__event=self.event).count(), 6)
+
+    def test_clone_view(self):
+        user = get_user_model().objects.create_user('clone', 'clone@example.com', 'secret')
+        self.client.force_login(user)
+        url = reverse('content_management:event_clone', args=[self.event.pk])
+        self.assertContains(self.client.get(url), "Conférence test (copie)")
+
+        response = self.client.post(url, {'title': "Conférence test", 'start_date': '2027-01-09'})
+        new_event = Event.objects.exclude(pk=self.event.pk).get()
+        self.assertRedirects(response, reverse('content_management:event_detail', args=[new_event.pk]), fetch_redirect_response=False)
+        self.assertEqual(new_event.slug, 'conference-test-2')
+
+    def test_default_title_fits_long_titles(self):
+        self.event.title = "Rencontre " * 20
+        self.event.save()
+        new_event = clone_event(self.event)
+        self.assertEqual(new_event.title, ("Rencontre " * 20)[:192] + " (copie)")
+
+
+class EventAgendaApiTests(RegistrationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = self.create_registration_form().event
+        self.event.status = 'published'
+        self.event.save()
+        self.speaker = EventIntervenant.objects.create(nom="Mariama Camara", profession="Géographe")
+        for day_number in (1, 2):
+            day = EventDay.objects.create(
+                event=self.event, date=self.event.start_date + timedelta(days=day_number - 1), day_number=day_number
+            )
+            EventAgenda.objects.create(
+                event_day=day, start_time='09:00', end_time='10:00', activity=f"Plénière {day_number}", activity_type='keynote'
+            ).intervenants.add(self.speaker)
+            EventAgenda.objects.create(
+                event_day=day, start_time='10:00', end_time='10:30', activity="Pause", activity_type='break'
+            )
+        self.url = reverse('sfront:event_agenda_api', args=[self.event.slug])
+
+    def test_agenda_is_cached_and_served_with_etag(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        data = response.json()
+        self.assertEqual([day['day_number'] for day in data['days']], [1, 2])
+        keynote = data['days'][0]['activities'][0]
+        self.assertEqual((keynote['start_time'], keynote['activity_type']), ('09:00', 'keynote'))
+        self.assertEqual(keynote['speakers'][0]['name'], "Mariama Camara")
+
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        filtered = self.client.get(self.url, {'day': '2', 'type': 'keynote'})
+        self.assertNotEqual(filtered['ETag'], etag)
+        self.assertEqual(
+            [(day['day_number'], [a['title'] for a in day['activities']]) for day in filtered.json()['days']],
+            [(2, ["Plénière 2"])],
+        )
+
+    def test_changes_invalidate_the_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        self.speaker.profession = "Cartographe"
+        self.speaker.save()
+        self.assertIsNone(cache.get(agenda_cache_key(self.event.pk, 'fr')))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['days'][0]['activities'][0]['speakers'][0]['profession'], "Cartographe")
+
+        EventAgenda.objects.filter(activity="Pause").first().intervenants.add(self.speaker)
+        self.assertIsNone(cache.get(agenda_cache_key(self.event.pk, 'fr')))
+
+    def test_unpublished_event_is_not_found(self):
+        Event.objects.filter(pk=self.event.pk).update(status='draft')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class EventBrowseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.today = date(2026, 3, 15)
+        specs = [
+            ('Atelier SIG', 'workshop', 'Conakry', True, date(2026, 4, 1)),
+            ('Conférence climat', 'conference', 'Conakry', False, date(2026, 5, 1)),
+            ('Conférence eau', 'conference', 'Kindia', True, date(2026, 3, 15)),
+            ('Symposium 2025', 'symposium', 'Conakry', True, date(2025, 6, 1)),
+        ]
+        for title, event_type, city, is_free, start in specs:
+            Event.objects.create(
+                title=title, description="Description", start_date=start, end_date=start, location="Centre",
+                city=city, event_type=event_type, is_free=is_free, status='published',
+            )
+        Event.objects.create(
+            title="Brouillon", description="Description", start_date=date(2026, 4, 2), end_date=date(2026, 4, 2),
+            location="Centre", status='draft',
+        )
+
+    def browse(self, query=''):
+        return browse_events(QueryDict(query), today=self.today)
+
+    def facet_counts(self, browse, param):
+        facet = next(facet for facet in browse['facets'] if facet['param'] == param)
+        return {option['value']: option['count'] for option in facet['options']}
+
+    def test_facet_counts_come_from_one_grouped_query(self):
+        with self.assertNumQueries(1):
+            browse = self.browse()
+        self.assertEqual(browse['total'], 4)
+        self.assertEqual(self.facet_counts(browse, 'period'), {'upcoming': 2, 'ongoing': 1, 'past': 1})
+        self.assertEqual(self.facet_counts(browse, 'city'), {'Conakry': 3, 'Kindia': 1})
+
+        # Matrice en cache: aucune requête pour les compteurs
+        with self.assertNumQueries(0):
+            self.browse('type=conference')
+
+    def test_filters_exclude_their_own_facet_from_counts(self):
+        browse = self.browse('type=conference&city=Conakry')
+        self.assertEqual(browse['total'], 1)
+        self.assertEqual([event.title for event in browse['events']], ['Conférence climat'])
+        self.assertEqual(self.facet_counts(browse, 'type'), {'workshop': 1, 'conference': 1, 'symposium': 1})
+        self.assertEqual(self.facet_counts(browse, 'city'), {'Conakry': 1, 'Kindia': 1})
+
+        upcoming = self.browse('period=upcoming&price=free')
+        self.assertEqual([event.title for event in upcoming['events']], ['Atelier SIG'])
+        searched = self.browse('q=conf%C3%A9rence&period=ongoing')
+        self.assertEqual([event.title for event in searched['events']], ['Conférence eau'])
+
+    def test_events_page_renders_facets(self):
+        response = self.client.get(reverse('sfront:events'), {'type': 'conference'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_events'], 2)
+        self.assertContains(response, 'Conférence climat')
+        self.assertNotContains(response, 'Atelier SIG</a>')
+
+
+class CalendarFeedTests(RegistrationTestMixin, RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.event = self.create_registration_form().event
+        self.event.status = 'published'
+        self.event.save()
+        day = EventDay.objects.create(event=self.event, date=self.event.start_date, day_number=1)
+        EventAgenda.objects.create(event_day=day, start_time='09:00', end_time='10:00', activity="Ouverture")
+
+        self.room = self.create_room("Salle A", 'salle-a')
+        self.organization = self.create_organization("Société X", 'societe-x')
+        start = timezone.now() + timedelta(days=2)
+        self.bookings = [
+            self.book(title, start + timedelta(hours=index * 3), start + timedelta(hours=index * 3 + 2), status)
+            for index, (title, status) in enumerate([("Atelier privé", 'confirmed'), ("Option", 'pending')])
+        ]
+
+    def get(self, url, **headers):
+        response = self.client.get(url, **headers)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_events_feed_is_cached_and_conditional(self):
+        url = reverse('sfront:events_ics')
+        response = self.get(url)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertTrue(response.body.startswith(b'BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:event-{self.event.pk}@localhost'.encode(), response.body)
+        self.assertIn('SUMMARY:Conférence test'.encode(), response.body)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(url).body, response.body)
+
+        self.event.title = "Conférence modifiée"
+        self.event.save()
+        changed = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn(b'Conf\xc3\xa9rence modifi\xc3\xa9e', changed.body)
+
+    def test_event_feed_includes_programme(self):
+        response = self.get(reverse('sfront:event_ics', args=[self.event.slug]))
+        self.assertEqual(response.body.count(b'BEGIN:VEVENT'), 2)
+        self.assertIn(b'SUMMARY:Ouverture (Conf', response.body)
+        self.assertIn(b'DTSTART:20260110T090000Z', response.body)
+
+        EventAgenda.objects.update(activity="Allocution")
+        EventAgenda.objects.first().save()
+        updated = self.get(reverse('sfront:event_ics', args=[self.event.slug]), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(updated.status_code, 200)
+        self.assertIn(b'SUMMARY:Allocution', updated.body)
+
+    def test_room_feed_lists_confirmed_bookings_only(self):
+        url = reverse('sfront:room_ics', args=[self.room.slug])
+        response = self.get(url)
+        self.assertIn(b'SUMMARY:Atelier priv', response.body)
+        self.assertNotIn(b'Option', response.body)
+        self.assertNotIn('Société X'.encode(), response.body)
+
+        self.bookings[0].status = 'cancelled'
+        self.bookings[0].save()
+        updated = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(updated.status_code, 200)
+        self.assertNotIn(b'BEGIN:VEVENT', updated.body)
+
+    def test_long_lines_are_folded_on_character_boundaries(self):
+        folded = fold_line('SUMMARY:' + 'é' * 60)
+        lines = folded.split(b'\r\n ')
+        self.assertTrue(all(len(line) <= 75 for line in lines))
+        self.assertEqual(b''.join(lines).decode(), 'SUMMARY:' + 'é' * 60 + '\r\n')
+
+
+class BookingConflictEngineTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = self.create_room("Salle B", 'salle-b')
+        self.organization = self.create_organization("Société Y", 'societe-y')
+        self.start = (timezone.now() + timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+        self.existing = self.book("Séminaire", self.start, self.start + timedelta(hours=4))
+        self.book("Annulée", self.start + timedelta(hours=2), self.start + timedelta(hours=6), status='cancelled')
+        RoomMaintenance.objects.create(
+            room=self.room, title="Climatisation", description="Révision", maintenance_type='preventive',
+            start_date=self.start + timedelta(hours=5), end_date=self.start + timedelta(hours=7),
+        )
+
+    def test_interval_index_matches_brute_force(self):
+        rng = random.Random(41)
+        origin = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+        intervals = []
+        for _index in range(200):
+            start = origin + timedelta(minutes=rng.randrange(0, 10000))
+            intervals.append((start, start + timedelta(minutes=rng.randrange(1, 600))))
+        index = IntervalIndex(intervals, start=lambda item: item[0], end=lambda item: item[1])
+        for _index in range(300):
+            start = origin + timedelta(minutes=rng.randrange(-500, 10500))
+            end = start + timedelta(minutes=rng.randrange(1, 300))
+            expected = [item for item in intervals if item[0] < end and item[1] > start]
+            self.assertEqual(sorted(index.overlapping(start, end)), sorted(expected))
+            self.assertEqual(index.has_overlap(start, end), bool(expected))
+            self.assertEqual(index.overlap_seconds(start, end), sum(
+                (min(end, item[1]) - max(start, item[0])).total_seconds() for item in expected
+            ))
+
+    def test_summary_covers_bookings_and_maintenance_in_one_load(self):
+        candidate = RoomBooking(
+            room=self.room, start_time=self.start + timedelta(hours=3), end_time=self.start + timedelta(hours=6)
+        )
+        # Salle, réservations et maintenances du mois
+        with self.assertNumQueries(3):
+            summary = candidate.get_detailed_conflicts_summary()
+            self.assertEqual(summary['details'][0], "• Séminaire (Société Y) - Conflit de 1.0 heures (0.0 jours)")
+        self.assertEqual(summary['conflicts_count'], 2)
+        self.assertEqual(summary['total_overlap_hours'], 2)
+        self.assertEqual([conflict['conflict_type'] for conflict in summary['conflicts']], ['overlap', 'maintenance'])
+
+        # Une réservation ne se bloque pas elle-même
+        self.assertFalse(self.existing.check_conflicts())
+        self.assertFalse(self.room.get_availability(self.start + timedelta(hours=4), self.start + timedelta(hours=6)))
+        self.assertTrue(self.room.get_availability(self.start + timedelta(hours=7), self.start + timedelta(hours=8)))
+
+        schedule = RoomSchedule.load(self.room.pk, self.start, self.start + timedelta(hours=10))
+        with self.assertNumQueries(0):
+            slots = schedule.check_slots([
+                (self.start + timedelta(hours=hour), self.start + timedelta(hours=hour + 1)) for hour in range(10)
+            ])
+        self.assertEqual(
+            [slot['available'] for slot in slots], [False] * 4 + [True] + [False] * 2 + [True] * 3
+        )
+
+    def test_availability_cache_follows_maintenance_and_room_changes(self):
+        free = (self.start + timedelta(hours=8), self.start + timedelta(hours=9))
+        self.assertTrue(self.room.get_availability(*free))
+        with self.assertNumQueries(0):
+            self.assertTrue(self.room.get_availability(*free))
+
+        # La version de la salle n'est renouvelée qu'à la validation
+        with self.captureOnCommitCallbacks(execute=True):
+            maintenance = RoomMaintenance.objects.create(
+                room=self.room, title="Électricité", description="Contrôle", maintenance_type='corrective',
+                start_date=free[0], end_date=free[1],
+            )
+            self.assertTrue(self.room.get_availability(*free))
+        self.assertFalse(self.room.get_availability(*free))
+        maintenance.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            maintenance.save()
+        self.assertTrue(self.room.get_availability(*free))
+
+        # maintenance_until bloque la salle comme une maintenance
+        self.room.maintenance_until = free[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save()
+        conflicts = RoomSchedule.load(self.room.pk, *free).conflicts(*free)
+        self.assertEqual([conflict['conflict_type'] for conflict in conflicts], ['maintenance'])
+        self.assertEqual(conflicts[0]['overlap_start'], free[0])
+        self.assertEqual(conflicts[0]['conflicting_event'], "Salle indisponible")
+
+    def test_database_rejects_overlapping_active_booking(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest("Contrainte d'exclusion PostgreSQL")
+        # Réservation concurrente qui n'est pas passée par la vérification
+        overlapping = RoomBooking(
+            room=self.room, organization=self.organization, event_title="Doublon", status='pending',
+            start_time=self.start + timedelta(hours=3), end_time=self.start + timedelta(hours=5),
+        )
+        with self.assertRaises(BookingConflictError) as raised:
+            save_booking(overlapping)
+        self.assertEqual(raised.exception.conflicts[0]['booking'], self.existing)
+        self.assertIsNone(overlapping.pk)
+        # Contrainte déclarée sur le modèle: aussi vérifiée par full_clean
+        with self.assertRaises(ValidationError):
+            overlapping.validate_constraints()
+
+        # Les réservations inactives et les créneaux contigus restent acceptés
+        overlapping.status = 'rejected'
+        save_booking(overlapping)
+        self.book("Suite", self.start + timedelta(hours=4), self.start + timedelta(hours=5))
+        self.assertEqual(RoomBooking.objects.filter(room=self.room).count(), 4)
+
+    def test_check_booking_conflicts_returns_serializable_report(self):
+        user = get_user_model().objects.create_user('salles', 'salles@example.com', 'secret')
+        self.client.force_login(user)
+        slots = [
+            {'start': (self.start + timedelta(hours=hour)).isoformat(),
+             'end': (self.start + timedelta(hours=hour + 1)).isoformat()}
+            for hour in (4, 6)
+        ]
+        response = self.client.post(reverse('content_management:check_booking_conflicts'), {
+            'room': self.room.pk,
+            'start_time': (self.start + timedelta(hours=1)).isoformat(),
+            'end_time': (self.start + timedelta(hours=2)).isoformat(),
+            'slots': json.dumps(slots),
+        })
+        data = response.json()
+        self.assertTrue(data['success'])
+        conflict = data['conflicts_summary']['conflicts'][0]
+        self.assertEqual(conflict['booking']['event_title'], "Séminaire")
+        self.assertEqual(conflict['booking']['organization']['name'], "Société Y")
+        self.assertEqual([slot['available'] for slot in data['slots']], [True, False])
+
+        # Créneau qui n'est pas un objet, date impossible ou créneau inversé
+        invalid_slots = [
+            ['2030-01-01'],
+            [{'start': '2030-02-30T09:00', 'end': '2030-02-30T10:00'}],
+            [slots[0], {'start': slots[1]['end'], 'end': slots[1]['start']}],
+        ]
+        for invalid in invalid_slots:
+            response = self.client.post(reverse('content_management:check_booking_conflicts'), {
+                'room': self.room.pk,
+                'start_time': (self.start + timedelta(hours=1)).isoformat(),
+                'end_time': (self.start + timedelta(hours=2)).isoformat(),
+                'slots': json.dumps(invalid),
+            })
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(response.json()['success'])
+
+        response = self.client.post(reverse('content_management:check_booking_conflicts'), {
+            'room': self.room.pk,
+            'start_time': self.existing.start_time.isoformat(),
+            'end_time': self.existing.end_time.isoformat(),
+            'booking_id': self.existing.pk,
+        })
+        self.assertFalse(response.json()['conflicts_summary']['has_conflicts'])
+
+        month = self.start.strftime('%Y-%m')
+        response = self.client.get(reverse('content_management:room_booking_calendar'), {'month': month})
+        self.assertContains(response, "Séminaire")
+
+
+class RoomCalendarTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rooms = [self.create_room(f"Salle {letter}", f'salle-{letter}') for letter in 'cd']
+        self.organization = self.create_organization("Société Z", 'societe-z')
+        # Du 30 octobre 9h au 2 novembre midi, à cheval sur deux mois
+        self.spanning = self.book("Congrès", self.at(2030, 10, 30, 9), self.at(2030, 11, 2, 12), room=self.rooms[0])
+        self.book(
+            "Réunion", self.at(2030, 11, 2, 8), self.at(2030, 11, 2, 10), status='cancelled', room=self.rooms[1]
+        )
+
+    def test_bookings_are_bucketed_by_room_and_day_and_cached_per_month(self):
+        room_ids = [room.pk for room in self.rooms]
+        with self.assertNumQueries(3):
+            november = build_room_calendar(room_ids, date(2030, 11, 1), date(2030, 11, 30))
+        self.assertEqual(
+            sorted(day for room_id, day in november['days'] if room_id == self.rooms[0].pk),
+            [date(2030, 11, 1), date(2030, 11, 2)],
+        )
+        self.assertEqual(november['days'][(self.rooms[1].pk, date(2030, 11, 2))][0]['status'], 'cancelled')
+
+        # Octobre est lu en base, novembre vient du cache
+        with self.assertNumQueries(3):
+            window = build_room_calendar(room_ids, date(2030, 10, 28), date(2030, 11, 3))
+        self.assertEqual(len([key for key in window['days'] if key[0] == self.rooms[0].pk]), 4)
+        with self.assertNumQueries(0):
+            build_room_calendar(room_ids, date(2030, 10, 28), date(2030, 11, 3))
+
+        # Déplacer la réservation renouvelle les deux salles
+        self.spanning.room = self.rooms[1]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.spanning.save()
+        window = build_room_calendar(room_ids, date(2030, 10, 28), date(2030, 11, 3))
+        self.assertFalse([key for key in window['days'] if key[0] == self.rooms[0].pk])
+        self.assertEqual(len(window['days'][(self.rooms[1].pk, date(2030, 11, 2))]), 2)
+
+    def test_calendar_views(self):
+        user = get_user_model().objects.create_user('agenda', 'agenda@example.com', 'secret')
+        self.client.force_login(user)
+        response = self.client.get(reverse('content_management:room_booking_calendar'), {'month': '2030-11'})
+        self.assertContains(response, "Congrès - Société Z")
+
+        url = reverse('content_management:room_booking_calendar_data')
+        data = self.client.get(url, {'start': '2030-10-27', 'end': '2030-11-02', 'room': self.rooms[0].pk}).json()
+        self.assertEqual([room['id'] for room in data['rooms']], [self.rooms[0].pk])
+        self.assertEqual(list(data['rooms'][0]['days']), [
+            '2030-10-30', '2030-10-31', '2030-11-01', '2030-11-02'
+        ])
+        self.assertEqual(data['bookings'][str(self.spanning.pk)]['event_title'], "Congrès")
+
+        self.assertEqual(self.client.get(url, {'start': '2030-01-01', 'end': '2031-06-01'}).status_code, 400)
+
+
+class FreeSlotFinderTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        self.small = self.create_room("Petite salle", 'petite-salle', capacity=20, price_per_hour=50)
+        self.large = self.create_room(
+            "Grande salle", 'grande-salle', capacity=100, area=200, price_per_hour=200, price_per_day=1200
+        )
+        self.organization = self.create_organization("Société W", 'societe-w')
+        self.day = date(2030, 3, 12)
+        self.book("Forum", self.at(2030, 3, 12, 9), self.at(2030, 3, 12, 12), room=self.large)
+        RoomMaintenance.objects.create(
+            room=self.small, title="Peinture", description="Travaux", maintenance_type='scheduled',
+            start_date=self.at(2030, 3, 12), end_date=self.at(2030, 3, 12, 16),
+        )
+
+    def test_slots_are_ranked_from_merged_gaps(self):
+        now = self.at(2030, 3, 11)
+        day, next_day = self.at(2030, 3, 12), self.at(2030, 3, 13)
+        with self.assertNumQueries(4):
+            slots = find_free_slots(
+                day, next_day, timedelta(hours=2),
+                min_capacity=10, business_hours=DEFAULT_BUSINESS_HOURS, now=now,
+            )
+        self.assertEqual(
+            [(slot['room'], slot['start'], slot['end']) for slot in slots],
+            [(self.large, self.at(2030, 3, 12, 12), self.at(2030, 3, 12, 14)),
+             (self.small, self.at(2030, 3, 12, 16), self.at(2030, 3, 12, 18))],
+        )
+        self.assertEqual(slots[0]['price'], 400)
+
+        slots = find_free_slots(day, next_day, timedelta(hours=2), min_capacity=50, now=now)
+        self.assertEqual([(slot['room'], slot['start']) for slot in slots], [(self.large, day), (self.large, self.at(2030, 3, 12, 12))])
+
+    def test_free_slots_api(self):
+        user = get_user_model().objects.create_user('dispo', 'dispo@example.com', 'secret')
+        self.client.force_login(user)
+        url = reverse('content_management:room_free_slots')
+        self.assertEqual(self.client.get(url, {'hours': 2}).status_code, 400)
+
+        data = self.client.get(url, {
+            'start': self.day.isoformat(), 'end': self.day.isoformat(), 'hours': 3, 'capacity': 80,
+            'business_hours': '1',
+        }).json()
+        self.assertTrue(data['success'])
+        slot = data['slots'][0]
+        self.assertEqual(slot['room']['id'], self.large.pk)
+        self.assertEqual(slot['price'], '600.00')
+        self.assertIn('start_time=2030-03-12T12%3A00', slot['booking_url'])
+
+
+class RecurringBookingTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.room = self.create_room("Salle E", 'salle-e')
+        self.organization = self.create_organization("Association V", 'association-v', organization_type='association')
+        # Un lundi, de 9h à 11h
+        self.first = self.at(2031, 1, 6, 9)
+
+    def series(self, rule='FREQ=WEEKLY;COUNT=52'):
+        return BookingSeries(
+            room=self.room, organization=self.organization, event_title="Atelier hebdomadaire",
+            start_time=self.first, end_time=self.first + timedelta(hours=2), rrule=rule,
+        )
+
+    def test_year_of_weekly_bookings_in_one_operation(self):
+        series = self.series()
+        # Planning (salle, réservations, maintenances), série et occurrences
+        # (insérées en deux lots sous la limite de variables de SQLite), puis
+        # historique de l'organisation
+        with self.assertNumQueries(11 if connection.vendor == 'sqlite' else 10):
+            bookings, skipped = create_series(series)
+        self.assertEqual((len(bookings), skipped), (52, []))
+        occurrences = series.occurrences.order_by('start_time')
+        self.assertEqual(occurrences.count(), 52)
+        self.assertEqual(occurrences.last().start_time, self.first + timedelta(weeks=51))
+        self.assertEqual({booking.total_price for booking in occurrences}, {200})
+
+    def test_conflicts_are_checked_for_every_occurrence(self):
+        self.book("Conférence", self.first + timedelta(weeks=2, hours=1), self.first + timedelta(weeks=2, hours=3))
+        with self.assertRaises(SeriesConflictError) as raised:
+            create_series(self.series('FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10'))
+        self.assertEqual([item['start'] for item in raised.exception.conflicting], [self.first + timedelta(weeks=2)])
+        self.assertFalse(BookingSeries.objects.exists())
+
+        bookings, skipped = create_series(self.series('FREQ=WEEKLY;BYDAY=MO,WE;COUNT=10'), skip_conflicts=True)
+        self.assertEqual((len(bookings), len(skipped)), (9, 1))
+
+    def test_future_occurrences_are_managed_as_a_series(self):
+        series = self.series('FREQ=DAILY;COUNT=5')
+        create_series(series)
+        now = self.first + timedelta(days=2)
+        self.assertEqual(update_series(series, {'event_title': "Atelier renommé"}, now=now), 3)
+        self.assertEqual(series.occurrences.filter(event_title="Atelier renommé").count(), 3)
+        self.assertEqual(cancel_series(series, now=now), 3)
+        self.assertEqual(
+            list(series.occurrences.order_by('start_time').values_list('status', flat=True)),
+            ['pending', 'pending', 'cancelled', 'cancelled', 'cancelled'],
+        )
+
+    def test_series_form_view(self):
+        user = get_user_model().objects.create_user('series', 'series@example.com', 'secret')
+        self.client.force_login(user)
+        response = self.client.post(reverse('content_management:room_booking_series_create'), {
+            'room': self.room.pk, 'organization': self.organization.pk, 'event_title': "Cours",
+            'start_time': '2031-01-06T09:00', 'end_time': '2031-01-06T11:00',
+            'frequency': 'WEEKLY', 'interval': 2, 'weekdays': ['MO', 'TH'], 'until': '2031-03-31',
+        })
+        series = BookingSeries.objects.get()
+        self.assertRedirects(response, reverse('content_management:room_booking_series_detail', args=[series.pk]))
+        self.assertEqual(series.rrule, 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;UNTIL=20310331T235959')
+        self.assertEqual(series.occurrences.count(), 13)
+        self.assertContains(self.client.get(response.url), "Cours")
+
+
+class RoomUsageRollupTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        self.room = self.create_room("Salle F", 'salle-f', price_per_day=600)
+        self.organization = self.create_organization("Société U", 'societe-u')
+        self.month = date(2030, 4, 1)
+        # Lundi 8 avril, 9h-12h
+        self.morning = self.book("Formation", self.at(2030, 4, 8, 9), self.at(2030, 4, 8, 12))
+        # Du mardi 17h au mercredi 10h
+        self.book("Nuit du code", self.at(2030, 4, 9, 17), self.at(2030, 4, 10, 10))
+        self.book("Demande", self.at(2030, 4, 8, 14), self.at(2030, 4, 8, 16), status='pending')
+
+    def rollup(self, day):
+        return RoomUsageRollup.objects.get(room=self.room, day=day)
+
+    def test_interval_math_matches_brute_force(self):
+        rng = random.Random(47)
+        origin = self.at(2030, 4, 1)
+        bookings = []
+        for _index in range(40):
+            start = origin + timedelta(minutes=rng.randrange(0, 30 * 24 * 60))
+            bookings.append((self.organization.pk, start, start + timedelta(minutes=rng.randrange(15, 2000)), start, 0))
+        rollups = month_rollups(self.room.pk, self.month, bookings)
+        self.assertEqual(len(rollups), 30)
+        for rollup in rollups:
+            for hour, seconds in enumerate(rollup.hourly_seconds):
+                hour_start = self.at(rollup.day.year, rollup.day.month, rollup.day.day, hour)
+                hour_end = hour_start + timedelta(hours=1)
+                expected = sum(
+                    max((min(end, hour_end) - max(start, hour_start)).total_seconds(), 0)
+                    for _organization, start, end, _created, _price in bookings
+                )
+                self.assertEqual(seconds, expected)
+            self.assertEqual(rollup.booked_seconds, sum(rollup.hourly_seconds[8:18]))
+
+    def test_rollups_are_refreshed_incrementally(self):
+        self.assertEqual(refresh_room_usage([self.room.pk], [self.month]), 1)
+        monday = self.rollup(date(2030, 4, 8))
+        self.assertEqual((monday.booked_seconds, monday.open_seconds), (3 * 3600, 10 * 3600))
+        self.assertEqual(monday.occupancy_rate, 0.3)
+        self.assertEqual(monday.revenue, 300)
+        self.assertEqual(monday.revenue_by_organization, {str(self.organization.pk): '300.00'})
+        self.assertEqual(monday.lead_times, {'90+': 1})
+        self.assertEqual(self.rollup(date(2030, 4, 9)).booked_seconds, 3600)
+        self.assertEqual(self.rollup(date(2030, 4, 10)).hourly_seconds[:11], [3600] * 10 + [0])
+
+        # Rien à recalculer
+        with self.assertNumQueries(1):
+            self.assertEqual(refresh_room_usage([self.room.pk], [self.month]), 0)
+
+        # Une annulation marque le jour; seul ce mois est recalculé
+        self.morning.status = 'cancelled'
+        self.morning.save()
+        self.assertTrue(self.rollup(date(2030, 4, 8)).is_stale)
+        self.assertEqual(refresh_room_usage([self.room.pk], [date(2030, 3, 1), self.month]), 2)
+        self.assertEqual(self.rollup(date(2030, 4, 8)).booked_seconds, 0)
+        self.assertEqual(RoomUsageRollup.objects.filter(is_stale=True).count(), 0)
+
+        # Déplacer une réservation marque aussi ses anciens jours
+        self.morning.status = 'confirmed'
+        self.morning.start_time = self.at(2030, 4, 15, 9)
+        self.morning.end_time = self.at(2030, 4, 15, 12)
+        self.morning.save()
+        self.assertEqual(
+            set(RoomUsageRollup.objects.filter(is_stale=True).values_list('day', flat=True)),
+            {date(2030, 4, 8), date(2030, 4, 15)},
+        )
+
+        # Recalcul concurrent qui a lu les réservations avant la validation: les jours sont marqués de nouveau
+        refresh_room_usage([self.room.pk], [self.month])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.morning.status = 'cancelled'
+            self.morning.save()
+            RoomUsageRollup.objects.update(is_stale=False)
+        self.assertTrue(self.rollup(date(2030, 4, 15)).is_stale)
+
+    def test_dashboard_reads_rollups(self):
+        refresh_room_usage([self.room.pk], [self.month])
+        usage = room_usage_dashboard(now=self.at(2030, 4, 20, 12))
+        self.assertEqual(usage['occupancy'][0]['room'], self.room)
+        self.assertEqual(usage['top_organizations'], [(self.organization, 900)])
+        # Réservé à 9h un lundi sur trois (1er, 8 et 15 avril)
+        self.assertEqual(usage['heatmap'][0][9], 0.3333)
+
+        user = get_user_model().objects.create_user('occupation', 'occupation@example.com', 'secret')
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('content_management:dashboard_rooms')), "Salle F")
+        data = self.client.get(reverse('content_management:room_usage_data'), {
+            'start': '2030-04-01', 'end': '2030-04-30', 'period': 'week',
+        }).json()
+        self.assertEqual([row['bookings_count'] for row in data['series']], [0, 2, 0, 0, 0])
+        self.assertEqual(data['lead_times'][-1]['count'], 2)
+        self.assertEqual(
+            self.client.get(reverse('content_management:room_usage_data'), {'period': 'hour'}).status_code, 400
+        )
+
+
+class BookingLedgerTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        self.room = self.create_room("Salle G", 'salle-g')
+        self.organization = self.create_organization("Société T", 'societe-t')
+        # Terminée il y a 45 jours: 3 heures à 100
+        start = (timezone.now() - timedelta(days=45)).replace(hour=9, minute=0, second=0, microsecond=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking = self.book("Assemblée", start, start + timedelta(hours=3), status='completed')
+
+    def pay(self, amount, payment_type='partial', **kwargs):
+        return record_payment(BookingPayment(
+            booking=self.booking, amount=amount, payment_type=payment_type, payment_method='cash', **kwargs
+        ))
+
+    def receivable(self):
+        return OrganizationReceivable.objects.get(organization=self.organization)
+
+    def test_balances_follow_payments_and_verification(self):
+        self.assertEqual(
+            (self.receivable().outstanding_amount, self.receivable().overdue_60_amount), (300, 300)
+        )
+        deposit = self.pay(100, 'deposit')
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.amount_paid, self.booking.amount_pending), (0, 100))
+        self.assertFalse(self.booking.deposit_paid)
+        self.assertEqual(self.receivable().pending_amount, 100)
+
+        verify_payment(deposit)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.amount_paid, self.booking.amount_pending), (100, 0))
+        self.assertEqual(BookingPayment.objects.get(pk=deposit.pk).balance_after, 200)
+        self.assertTrue(self.booking.deposit_paid)
+        self.assertEqual(self.receivable().outstanding_amount, 200)
+        with self.assertRaises(PaymentError):
+            verify_payment(deposit)
+
+        self.assertEqual(self.pay(250, 'full_payment', is_verified=True).balance_after, -50)
+        self.assertEqual(self.pay(50, 'refund', is_verified=True).balance_after, 0)
+        self.booking.refresh_from_db()
+        self.assertTrue(self.booking.full_payment_paid)
+        receivable = self.receivable()
+        self.assertEqual((receivable.outstanding_amount, receivable.paid_amount, receivable.unpaid_bookings), (0, 300, 0))
+
+        # Les soldes tenus au fil de l'eau correspondent à un recalcul depuis les paiements
+        RoomBooking.objects.update(amount_paid=0, amount_pending=0)
+        self.assertEqual(rebuild_booking_balances(), 1)
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.amount_paid, self.booking.amount_pending), (300, 0))
+
+    def test_full_payment_follows_price(self):
+        self.assertFalse(set(RoomBookingForm.base_fields) & {
+            'amount_paid', 'amount_pending', 'deposit_paid', 'full_payment_paid',
+        })
+        self.pay(300, 'full_payment', is_verified=True)
+        self.booking.refresh_from_db()
+        self.assertTrue(self.booking.full_payment_paid)
+
+        self.booking.total_price = 400
+        self.booking.save()
+        self.booking.refresh_from_db()
+        self.assertEqual((self.booking.amount_paid, self.booking.full_payment_paid), (300, False))
+
+    def test_aged_receivables_are_served_from_rollups(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book("Séminaire", timezone.now() + timedelta(days=10), timezone.now() + timedelta(days=10, hours=2))
+        # L'ancienneté avance sans nouvelle écriture
+        self.assertEqual(refresh_receivables(today=timezone.localdate() + timedelta(days=20)), 1)
+        receivable = self.receivable()
+        self.assertEqual((receivable.overdue_30_amount, receivable.overdue_90_amount), (200, 300))
+        refresh_receivables()
+
+        user = get_user_model().objects.create_user('finance', 'finance@example.com', 'secret')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('content_management:receivables_report'))
+        self.assertContains(response, "Société T")
+        self.assertEqual(response.context['totals']['not_due_amount'], 200)
+        self.assertFalse([query for query in queries if 'roombooking' in query['sql'] or 'bookingpayment' in query['sql']])
+
+        # Une réservation annulée ne reste pas due
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.status = 'cancelled'
+            self.booking.save()
+        self.assertEqual(self.receivable().outstanding_amount, 200)
+
+    def test_payment_views(self):
+        user = get_user_model().objects.create_user('caisse', 'caisse@example.com', 'secret')
+        self.client.force_login(user)
+        url = reverse('content_management:booking_payment_create', args=[self.booking.pk])
+        self.assertEqual(self.client.get(url).context['form'].initial['amount'], 300)
+        response = self.client.post(url, {'amount': '120', 'payment_type': 'deposit', 'payment_method': 'cash'})
+        self.assertRedirects(response, reverse('content_management:room_booking_detail', args=[self.booking.pk]))
+        payment = self.booking.payments.get()
+        self.client.post(reverse('content_management:booking_payment_verify', args=[payment.pk]))
+        payment.refresh_from_db()
+        self.assertEqual((payment.is_verified, payment.verified_by, payment.balance_after), (True, user, 180))
+        self.assertContains(self.client.get(response.url), "Solde après paiement")
+
+
+class OrganizationDirectoryTests(RoomBookingTestMixin, TestCase):
+    def setUp(self):
+        self.room = self.create_room("Salle H", 'salle-h')
+        self.organization = self.create_organization("Banque Centrale", 'banque-centrale')
+        self.other = self.create_organization("Centre Hospitalier", 'centre-hospitalier')
+
+    def book_in(self, days, status='confirmed', organization=None):
+        start = (timezone.now() + timedelta(days=days)).replace(hour=9, minute=0, second=0, microsecond=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.book("Réunion", start, start + timedelta(hours=2), status, organization=organization)
+
+    def test_stats_follow_booking_changes(self):
+        past = self.book_in(-10, 'completed')
+        upcoming = self.book_in(5, 'pending')
+        self.book_in(8, 'rejected')
+        self.organization.refresh_from_db()
+        self.assertEqual(
+            (self.organization.bookings_count, self.organization.confirmed_bookings_count,
+             self.organization.confirmed_revenue),
+            (2, 1, 200),
+        )
+        self.assertEqual(self.organization.last_booking_at, past.start_time)
+        self.assertEqual(self.organization.next_booking_at, upcoming.start_time)
+
+        # Réservation confiée à une autre organisation: les deux sont recalculées
+        with self.captureOnCommitCallbacks(execute=True):
+            upcoming.organization = self.other
+            upcoming.status = 'confirmed'
+            upcoming.save()
+        self.organization.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.organization.bookings_count, self.organization.next_booking_at), (1, None))
+        self.assertEqual((self.other.confirmed_revenue, self.other.next_booking_at), (200, upcoming.start_time))
+
+        # La prochaine réservation commence: la tâche horaire la fait passer en dernière
+        self.assertEqual(refresh_started_bookings(now=upcoming.start_time + timedelta(hours=1)), 1)
+        self.other.refresh_from_db()
+        self.assertEqual((self.other.last_booking_at, self.other.next_booking_at), (upcoming.start_time, None))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            past.delete()
+        self.organization.refresh_from_db()
+        self.assertEqual((self.organization.bookings_count, self.organization.confirmed_revenue), (0, 0))
+        # Rien à changer: le recalcul complet n'écrit rien
+        self.assertEqual(refresh_organization_stats(now=upcoming.start_time + timedelta(hours=1)), 0)
+
+    def test_directory_reads_aggregates(self):
+        for index in range(5):
+            organization = self.create_organization(f"Cabinet {index}", f'cabinet-{index}')
+            self.book_in(index + 1, organization=organization)
+        user = get_user_model().objects.create_user('annuaire', 'annuaire@example.com', 'secret')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('content_management:external_organization_list'), {'sort': 'next_booking'})
+        self.assertFalse([query for query in queries if 'roombooking' in query['sql']])
+        names = [organization.name for organization in response.context['organizations']]
+        self.assertEqual(names[:2], ["Cabinet 0", "Cabinet 1"])
+        self.assertEqual(response.context['total_organizations'], 7)
+
+        response = self.client.get(reverse('content_management:external_organization_detail', args=['cabinet-2']))
+        self.assertEqual(response.context['booking_stats']['total_revenue'], 200)
+        self.assertContains(response, "Prochaine réservation")
+
+    def test_name_search_and_picker(self):
+        self.create_organization("Ancienne Banque", 'ancienne-banque', is_active=False)
+        self.create_organization("Crédit Rural", 'credit-rural')
+        names = [organization.name for organization in search_organizations("cent")]
+        # Les noms qui commencent par la saisie d'abord
+        self.assertEqual(names[0], "Centre Hospitalier")
+        self.assertIn("Banque Centrale", names)
+        self.assertEqual(search_organizations("b"), [])
+        self.assertNotIn("Ancienne Banque", [organization.name for organization in search_organizations("banque")])
+
+        user = get_user_model().objects.create_user('picker', 'picker@example.com', 'secret')
+        self.client.force_login(user)
+        response = self.client.get(reverse('content_management:external_organization_search'), {'q': 'crédit'})
+        self.assertEqual([result['name'] for result in response.json()['results']], ["Crédit Rural"])
+
+        # Le sélecteur ne rend que l'organisation choisie
+        html = str(RoomBookingForm(initial={'organization': self.other.pk})['organization'])
+        self.assertIn("Centre Hospitalier", html)
+        self.assertNotIn("Banque Centrale", html)
+        self.assertIn(reverse('content_management:external_organization_search'), html)
+
+
+class FlakySMTPBackend(locmem.EmailBackend):
+    """Boîte locale qui refuse certains destinataires et perd la connexion après drop_after envois"""
+    drop_after = None
+    refused = ()
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.to[0] in self.refused:
+                raise SMTPRecipientsRefused({message.to[0]: (550, b"Utilisateur inconnu")})
+            if self.drop_after is not None and len(mail.outbox) >= self.drop_after:
+                raise SMTPServerDisconnected("Connexion interrompue")
+        return super().send_messages(messages)
+
+
+class NewsletterCampaignDispatchTests(TestCase):
+    def setUp(self):
+        Newsletter.objects.bulk_create(
+            [Newsletter(email=f'abonne{index}@example.com', first_name=f'Abonné{index}') for index in range(250)]
+            + [Newsletter(email='inactif@example.com', is_active=False)]
+            + [Newsletter(email='reader@example.com', language='en')]
+        )
+        self.campaign = NewsletterCampaign.objects.create(
+            title="Lettre de juin", subject="Nouvelles de la CSIG", content="<p>Programme du mois</p>",
+            target_language='fr',
+        )
+
+    def test_campaign_is_sent_in_chunks(self):
+        result = send_bulk_newsletter(self.campaign.pk)
+        # 250 destinataires: 3 lots de 100 au plus, pas 250 tâches
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(len(mail.outbox), 250)
+        self.assertNotIn('inactif@example.com', {message.to[0] for message in mail.outbox})
+        self.assertNotIn('reader@example.com', {message.to[0] for message in mail.outbox})
+        first = Newsletter.objects.get(email='abonne0@example.com')
+        message = next(message for message in mail.outbox if message.to == [first.email])
+        self.assertIn("Abonné0", message.body)
+        self.assertIn(f"/newsletter/unsubscribe/{first.pk}/", message.alternatives[0][0])
+
+        self.campaign.refresh_from_db()
+        self.assertEqual(
+            (self.campaign.status, self.campaign.sent_count, self.campaign.recipients_count), ('completed', 250, 250)
+        )
+        self.assertEqual(set(self.campaign.chunks.values_list('status', flat=True)), {'sent'})
+        self.assertEqual(NewsletterLog.objects.filter(campaign=self.campaign, status='sent').count(), 250)
+        # Une campagne terminée ne repart pas
+        self.assertFalse(send_bulk_newsletter(self.campaign.pk)['success'])
+
+    def test_interrupted_campaign_resumes_where_it_stopped(self):
+        NewsletterCampaign.objects.filter(pk=self.campaign.pk).update(status='sending')
+        plan_campaign_chunks(self.campaign, chunk_size=40, planning_chunks=2)
+        chunks = list(self.campaign.chunks.order_by('index'))
+        self.assertEqual([chunk.recipients_count for chunk in chunks], [40] * 6 + [10])
+
+        # Répartition interrompue après le deuxième lot; 15 emails du deuxième lot déjà envoyés
+        second = chunks[1]
+        self.campaign.chunks.filter(index__gt=2).delete()
+        NewsletterCampaign.objects.filter(pk=self.campaign.pk).update(
+            last_subscriber_id=second.last_subscriber_id, recipients_count=80,
+            started_at=timezone.now() - timedelta(hours=2),
+        )
+        sent_before = list(Newsletter.objects.filter(
+            pk__gte=second.first_subscriber_id, is_active=True, language='fr'
+        ).order_by('pk')[:15])
+        NewsletterCampaignChunk.objects.filter(pk=second.pk).update(
+            status='sending', cursor=sent_before[-1].pk, sent_count=15, updated_at=timezone.now() - timedelta(hours=1)
+        )
+        NewsletterCampaignChunk.objects.filter(pk=chunks[0].pk).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(resume_stalled_campaigns(), [self.campaign.pk])
+        recipients = [message.to[0] for message in mail.outbox]
+        self.assertEqual(len(recipients), 235)
+        self.assertEqual(len(set(recipients)), 235)
+        self.assertFalse({subscriber.email for subscriber in sent_before} & set(recipients))
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.sent_count), ('completed', 250))
+        self.assertEqual(resume_stalled_campaigns(), [])
+
+    @override_settings(EMAIL_BACKEND='content_management.tests.FlakySMTPBackend')
+    def test_dropped_connection_keeps_chunk_for_retry(self):
+        NewsletterCampaign.objects.filter(pk=self.campaign.pk).update(status='sending')
+        plan_campaign_chunks(self.campaign, chunk_size=50)
+        chunk = self.campaign.chunks.order_by('index').first()
+        refused = Newsletter.objects.filter(pk__gte=chunk.first_subscriber_id).order_by('pk')[3].email
+
+        with mock.patch.object(FlakySMTPBackend, 'refused', (refused,)), \
+                mock.patch.object(FlakySMTPBackend, 'drop_after', 30):
+            with self.assertRaises(SMTPServerDisconnected):
+                deliver_chunk(chunk.pk, progress_every=7)
+        chunk.refresh_from_db()
+        # Seul le destinataire refusé est en échec; le lot reste à reprendre au curseur
+        self.assertEqual((chunk.status, chunk.sent_count, chunk.failed_count), ('sending', 30, 1))
+        self.assertEqual(NewsletterLog.objects.filter(campaign=self.campaign, status='failed').count(), 1)
+        self.assertEqual(NewsletterLog.objects.filter(campaign=self.campaign).count(), 31)
+
+        release_chunk(chunk.pk)
+        with mock.patch.object(FlakySMTPBackend, 'refused', (refused,)):
+            self.assertEqual(deliver_chunk(chunk.pk), (19, 0))
+        chunk.refresh_from_db()
+        self.assertEqual((chunk.status, chunk.sent_count, chunk.failed_count), ('sent', 49, 1))
+        recipients = [message.to[0] for message in mail.outbox]
+        self.assertEqual(len(recipients), len(set(recipients)))
+        self.assertNotIn(refused, recipients)
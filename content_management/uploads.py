@@ -0,0 +1,364 @@
+"""
+Envoi direct des fichiers vers le stockage.
+
+Le navigateur demande une session d'envoi (DirectUpload), envoie le fichier
+sans passer par les workers web, puis demande la finalisation; la clé
+obtenue est ensuite rattachée au champ du modèle (DirectUploadFormMixin).
+
+- Backend « s3 »: POST pré-signé pour les petits fichiers, envoi multipart
+  avec une URL pré-signée par morceau au-delà de DIRECT_UPLOAD_CHUNK_SIZE.
+- Backend « local »: remplaçant pour le développement et les tests, les
+  morceaux sont reçus par Django puis assemblés dans le stockage par défaut.
+  Il est refusé en production (stockage S3 sans DEBUG): les morceaux
+  passeraient par les workers web, dans un répertoire propre à chaque
+  serveur.
+
+Les clés sont ensuite lues par le stockage par défaut: le backend « s3 »
+exige que ce stockage soit le même bucket (STORAGES['default']).
+
+Dans les deux cas l'envoi est reprenable: uploaded_parts() indique les
+morceaux déjà reçus.
+"""
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, PermissionDenied, ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .models import DirectUpload, FormField, FormResponse
+
+
+DIRECT_UPLOAD_BACKEND = getattr(settings, 'DIRECT_UPLOAD_BACKEND', 'local')
+# S3 impose au moins 5 Mo par morceau (sauf le dernier)
+DIRECT_UPLOAD_CHUNK_SIZE = getattr(settings, 'DIRECT_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+DIRECT_UPLOAD_MAX_SIZE = getattr(settings, 'DIRECT_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+DIRECT_UPLOAD_EXPIRY_HOURS = 24
+DIRECT_UPLOAD_TEMP_DIR = getattr(
+    settings, 'DIRECT_UPLOAD_TEMP_DIR', os.path.join(tempfile.gettempdir(), 'direct_uploads')
+)
+PRESIGNED_URL_EXPIRES = 60 * 60
+REGISTRATION_MAX_FILE_SIZE = 10 * 1024 * 1024
+
+
+class UploadError(Exception):
+    """Demande d'envoi refusée ou envoi incomplet"""
+
+
+class UploadTarget:
+    """Champ de destination d'un envoi et ses limites"""
+
+    def __init__(self, prefix, max_size, extensions=(), images_only=False):
+        self.prefix = prefix
+        self.max_size = max_size
+        self.extensions = extensions
+        self.images_only = images_only
+
+    def validate(self, filename, content_type, size):
+        if size <= 0 or size > self.max_size:
+            raise UploadError(f"Taille de fichier invalide (maximum {self.max_size // (1024 * 1024)} Mo)")
+        extension = os.path.splitext(filename)[1].lower().lstrip('.')
+        if self.extensions and extension not in self.extensions:
+            raise UploadError(f"Type de fichier non autorisé: {', '.join(self.extensions)}")
+        if self.images_only and not content_type.startswith('image/'):
+            raise UploadError("Seules les images sont acceptées pour ce champ")
+
+
+def upload_prefix(model_field):
+    upload_to = model_field.upload_to
+    if callable(upload_to):
+        return 'uploads/'
+    return timezone.now().strftime(upload_to)
+
+
+def resolve_upload_target(target, user):
+    """Vérifie la destination demandée et retourne son UploadTarget
+
+    'registration_field.<id>': champ fichier d'un formulaire d'inscription
+    actif (ouvert au public). '<modèle>.<champ>': champ fichier d'un modèle
+    de content_management (utilisateurs connectés).
+    """
+    name, _, field_name = target.partition('.')
+    if name == 'registration_field':
+        form_field = FormField.objects.filter(
+            pk=field_name if field_name.isdigit() else None, field_type='file', form__is_active=True
+        ).first()
+        if form_field is None:
+            raise UploadError("Champ de formulaire inconnu")
+        max_size = (form_field.max_file_size * 1024 * 1024) if form_field.max_file_size else REGISTRATION_MAX_FILE_SIZE
+        extensions = tuple(
+            ext.strip().lower().lstrip('.') for ext in form_field.allowed_file_types.split(',') if ext.strip()
+        )
+        return UploadTarget(upload_prefix(FormResponse._meta.get_field('file_value')), max_size, extensions)
+
+    if not user.is_authenticated:
+        raise PermissionDenied
+    try:
+        model = apps.get_model('content_management', name)
+        model_field = model._meta.get_field(field_name)
+    except (LookupError, FieldDoesNotExist):
+        raise UploadError("Destination inconnue")
+    if not isinstance(model_field, models.FileField):
+        raise UploadError("Ce champ n'accepte pas de fichier")
+    return UploadTarget(
+        upload_prefix(model_field),
+        DIRECT_UPLOAD_MAX_SIZE,
+        images_only=isinstance(model_field, models.ImageField),
+    )
+
+
+def build_key(prefix, filename):
+    """Clé unique sous le répertoire du champ de destination"""
+    return os.path.join(prefix, uuid.uuid4().hex, get_valid_filename(os.path.basename(filename)))
+
+
+class LocalUploadBackend:
+    """Remplaçant local de S3: les morceaux transitent par Django"""
+
+    name = 'local'
+
+    def parts_dir(self, upload):
+        return os.path.join(DIRECT_UPLOAD_TEMP_DIR, str(upload.token))
+
+    def part_path(self, upload, number):
+        return os.path.join(self.parts_dir(upload), f'{number:05d}.part')
+
+    def start(self, upload):
+        return {
+            'method': 'put',
+            'chunk_size': upload.chunk_size,
+            'parts': [
+                {
+                    'number': number,
+                    'url': reverse('content_management:direct_upload_part', args=[upload.token, number]),
+                }
+                for number in range(1, upload.part_count + 1)
+            ],
+        }
+
+    def store_part(self, upload, number, stream):
+        """Écrit un morceau reçu, par blocs, sans le charger en mémoire"""
+        if not 1 <= number <= upload.part_count:
+            raise UploadError("Numéro de morceau invalide")
+        os.makedirs(self.parts_dir(upload), exist_ok=True)
+        expected = min(upload.chunk_size, upload.size - (number - 1) * upload.chunk_size)
+        tmp_path = self.part_path(upload, number) + '.tmp'
+        written = 0
+        with open(tmp_path, 'wb') as part:
+            for block in iter(lambda: stream.read(64 * 1024), b''):
+                written += len(block)
+                if written > expected:
+                    break
+                part.write(block)
+        if written != expected:
+            os.unlink(tmp_path)
+            raise UploadError(f"Morceau {number}: {written} octets reçus, {expected} attendus")
+        os.replace(tmp_path, self.part_path(upload, number))
+        return {'number': number, 'size': written}
+
+    def uploaded_parts(self, upload):
+        if not os.path.isdir(self.parts_dir(upload)):
+            return []
+        return sorted(
+            int(name.split('.')[0]) for name in os.listdir(self.parts_dir(upload)) if name.endswith('.part')
+        )
+
+    def complete(self, upload):
+        """Assemble les morceaux et enregistre le fichier dans le stockage par défaut"""
+        missing = set(range(1, upload.part_count + 1)) - set(self.uploaded_parts(upload))
+        if missing:
+            raise UploadError(f"Morceaux manquants: {sorted(missing)}")
+        with tempfile.TemporaryFile() as assembled:
+            for number in range(1, upload.part_count + 1):
+                with open(self.part_path(upload, number), 'rb') as part:
+                    shutil.copyfileobj(part, assembled)
+            if assembled.tell() != upload.size:
+                raise UploadError("Taille du fichier assemblé incorrecte")
+            assembled.seek(0)
+            key = default_storage.save(upload.key, File(assembled, name=upload.filename))
+        self.discard(upload)
+        return key
+
+    def discard(self, upload, delete_file=False):
+        shutil.rmtree(self.parts_dir(upload), ignore_errors=True)
+        if delete_file and upload.status in ('completed', 'attached'):
+            default_storage.delete(upload.key)
+
+
+class S3UploadBackend:
+    """Envoi direct vers S3 par URL pré-signées"""
+
+    name = 's3'
+
+    def __init__(self):
+        import boto3
+
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.client = boto3.client(
+            's3',
+            region_name=settings.AWS_S3_REGION_NAME,
+            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+        )
+
+    def start(self, upload):
+        if upload.part_count == 1:
+            post = self.client.generate_presigned_post(
+                Bucket=self.bucket,
+                Key=upload.key,
+                Fields={'Content-Type': upload.content_type},
+                Conditions=[
+                    {'Content-Type': upload.content_type},
+                    ['content-length-range', upload.size, upload.size],
+                ],
+                ExpiresIn=PRESIGNED_URL_EXPIRES,
+            )
+            return {'method': 'post', 'url': post['url'], 'fields': post['fields']}
+
+        if not upload.multipart_id:
+            response = self.client.create_multipart_upload(
+                Bucket=self.bucket, Key=upload.key, ContentType=upload.content_type
+            )
+            upload.multipart_id = response['UploadId']
+            upload.save(update_fields=['multipart_id'])
+        return {
+            'method': 'put',
+            'chunk_size': upload.chunk_size,
+            'parts': [
+                {
+                    'number': number,
+                    'url': self.client.generate_presigned_url(
+                        'upload_part',
+                        Params={
+                            'Bucket': self.bucket, 'Key': upload.key,
+                            'UploadId': upload.multipart_id, 'PartNumber': number,
+                        },
+                        ExpiresIn=PRESIGNED_URL_EXPIRES,
+                    ),
+                }
+                for number in range(1, upload.part_count + 1)
+            ],
+        }
+
+    def list_parts(self, upload):
+        parts = []
+        paginator = self.client.get_paginator('list_parts')
+        for page in paginator.paginate(Bucket=self.bucket, Key=upload.key, UploadId=upload.multipart_id):
+            parts.extend(page.get('Parts', []))
+        return parts
+
+    def uploaded_parts(self, upload):
+        if not upload.multipart_id:
+            return []
+        return sorted(part['PartNumber'] for part in self.list_parts(upload))
+
+    def complete(self, upload):
+        """Termine l'envoi multipart puis vérifie la taille de l'objet
+
+        La liste des morceaux est relue sur S3: un navigateur qui a repris
+        l'envoi n'a pas besoin de connaître les ETag des morceaux précédents.
+        """
+        if upload.multipart_id:
+            parts = sorted(self.list_parts(upload), key=lambda part: part['PartNumber'])
+            if len(parts) != upload.part_count:
+                raise UploadError(f"{len(parts)} morceaux reçus sur {upload.part_count}")
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=upload.key,
+                UploadId=upload.multipart_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': part['PartNumber'], 'ETag': part['ETag']} for part in parts
+                ]},
+            )
+        head = self.client.head_object(Bucket=self.bucket, Key=upload.key)
+        if head['ContentLength'] != upload.size:
+            raise UploadError("Taille de l'objet envoyé incorrecte")
+        return upload.key
+
+    def discard(self, upload, delete_file=False):
+        if upload.multipart_id and upload.status == 'pending':
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=upload.key, UploadId=upload.multipart_id)
+        if delete_file and upload.status in ('completed', 'attached'):
+            self.client.delete_object(Bucket=self.bucket, Key=upload.key)
+
+
+UPLOAD_BACKENDS = {
+    'local': LocalUploadBackend,
+    's3': S3UploadBackend,
+}
+
+
+def get_upload_backend(name=None):
+    return UPLOAD_BACKENDS[name or DIRECT_UPLOAD_BACKEND]()
+
+
+def default_storage_is_s3():
+    return getattr(default_storage, 'bucket_name', None) == settings.AWS_STORAGE_BUCKET_NAME
+
+
+def check_upload_backend(backend):
+    """Le backend d'envoi doit écrire là où le stockage par défaut lit les fichiers"""
+    if backend.name == 's3' and not default_storage_is_s3():
+        raise ImproperlyConfigured(
+            "Envoi direct S3: STORAGES['default'] doit être le stockage S3 du bucket AWS_STORAGE_BUCKET_NAME"
+        )
+    if backend.name == 'local' and not settings.DEBUG and default_storage_is_s3():
+        raise ImproperlyConfigured(
+            "Envoi direct 'local' refusé en production: utiliser DIRECT_UPLOAD_BACKEND = 's3'"
+        )
+
+
+def start_upload(target, filename, content_type, size, user=None, backend=None):
+    """Crée une session d'envoi et retourne (DirectUpload, instructions pour le navigateur)"""
+    upload_target = resolve_upload_target(target, user)
+    upload_target.validate(filename, content_type, size)
+    backend = get_upload_backend(backend)
+    check_upload_backend(backend)
+    upload = DirectUpload.objects.create(
+        target=target,
+        filename=os.path.basename(filename)[:255],
+        content_type=content_type[:100],
+        size=size,
+        key=build_key(upload_target.prefix, filename),
+        backend=backend.name,
+        chunk_size=DIRECT_UPLOAD_CHUNK_SIZE,
+        created_by=user if user is not None and user.is_authenticated else None,
+        expires_at=timezone.now() + timedelta(hours=DIRECT_UPLOAD_EXPIRY_HOURS),
+    )
+    return upload, backend.start(upload)
+
+
+def complete_upload(upload):
+    """Finalise l'envoi: le fichier est dans le stockage, sa clé peut être rattachée"""
+    if upload.status == 'completed':
+        return upload
+    if upload.status != 'pending':
+        raise UploadError("Cet envoi ne peut plus être finalisé")
+    backend = get_upload_backend(upload.backend)
+    upload.key = backend.complete(upload)
+    upload.status = 'completed'
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['key', 'status', 'completed_at'])
+    return upload
+
+
+def get_completed_upload(token, target):
+    """Envoi terminé et non encore rattaché pour cette destination, ou None"""
+    try:
+        return DirectUpload.objects.get(token=token, target=target, status='completed')
+    except (DirectUpload.DoesNotExist, ValidationError):
+        return None
+
+
+def mark_uploads_attached(uploads):
+    if uploads:
+        DirectUpload.objects.filter(pk__in=[upload.pk for upload in uploads]).update(status='attached')
@@ -31,6 +31,7 @@ urlpatterns = [
     path('events/<int:pk>/', views.event_detail, name='event_detail'),
     path('events/<int:pk>/edit/', views.event_edit, name='event_edit'),
     path('events/<int:pk>/delete/', views.event_delete, name='event_delete'),
+    path('events/<int:pk>/clone/', views.event_clone, name='event_clone'),
     
     # Gestion des composants d'événements
     path('events/<int:pk>/agenda/', views.event_manage_agenda, name='event_manage_agenda'),
@@ -60,6 +61,19 @@ urlpatterns = [
     path('events/<int:event_pk>/registrations/<int:registration_pk>/status/', views.event_registration_status_change, name='event_registration_status_change'),
     path('events/<int:event_pk>/registrations/bulk-action/', views.event_registrations_bulk_action, name='event_registrations_bulk_action'),
     path('events/<int:event_pk>/registrations/export/', views.event_registrations_export, name='event_registrations_export'),
+    path('events/<int:event_pk>/registrations/documents/', views.event_documents_generate, name='event_documents_generate'),
+    path('events/<int:event_pk>/registrations/analytics/', views.event_registration_analytics, name='event_registration_analytics'),
+    path('events/<int:event_pk>/registrations/<int:registration_pk>/ticket.svg', views.event_registration_ticket, name='event_registration_ticket'),
+    path('events/<int:event_pk>/check-in/', views.event_check_in, name='event_check_in'),
+    path('events/<int:event_pk>/check-in/scan/', views.event_check_in_scan, name='event_check_in_scan'),
+    path('events/<int:event_pk>/check-in/roster/', views.event_check_in_roster, name='event_check_in_roster'),
+    path('events/<int:event_pk>/check-in/sync/', views.event_check_in_sync, name='event_check_in_sync'),
+    
+    # Envois directs vers le stockage
+    path('uploads/', views.direct_upload_start, name='direct_upload_start'),
+    path('uploads/<uuid:token>/', views.direct_upload_status, name='direct_upload_status'),
+    path('uploads/<uuid:token>/parts/<int:number>/', views.direct_upload_part, name='direct_upload_part'),
+    path('uploads/<uuid:token>/complete/', views.direct_upload_complete, name='direct_upload_complete'),
     
     # URLs publiques pour l'inscription (redirigées vers sfront)
     # path('events/<int:event_pk>/register/', views.event_registration_public, name='event_registration_public'),
@@ -128,6 +142,7 @@ urlpatterns = [
     path('newsletters/<int:pk>/send/', views.newsletter_send, name='newsletter_send'),
     path('newsletters/bulk-action/', views.bulk_newsletter_action, name='bulk_newsletter_action'),
     path('newsletters/export/', views.newsletter_export, name='newsletter_export'),
+    path('newsletters/export/all/', views.export_newsletters, name='export_newsletters'),
     
     # Nouvelles fonctionnalités de gestion des newsletters
     path('newsletters/subscribers/', views.newsletter_subscribers_management, name='newsletter_subscribers_management'),
@@ -140,6 +155,12 @@ urlpatterns = [
     path('contact-messages/<int:pk>/', views.contact_message_detail, name='contact_message_detail'),
     path('contact-messages/<int:pk>/delete/', views.contact_message_delete, name='contact_message_delete'),
     path('contact-messages/bulk-action/', views.bulk_contact_message_action, name='bulk_contact_message_action'),
+    path('contact-messages/export/', views.export_messages, name='export_messages'),
+    
+    # Exports en arrière-plan
+    path('exports/', views.export_job_list, name='export_job_list'),
+    path('exports/<int:pk>/status/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:pk>/download/', views.export_job_download, name='export_job_download'),
     
     # Paramètres du site
     path('site-settings/', views.site_settings, name='site_settings'),
@@ -184,6 +205,7 @@ urlpatterns = [
     # ===== ORGANISATIONS EXTERNES =====
     path('organisations/', views.external_organization_list, name='external_organization_list'),
     path('organisations/creer/', views.external_organization_create, name='external_organization_create'),
+    path('organisations/recherche/', views.external_organization_search, name='external_organization_search'),
     path('organisations/<slug:slug>/', views.external_organization_detail, name='external_organization_detail'),
     path('organisations/<slug:slug>/modifier/', views.external_organization_edit, name='external_organization_edit'),
     path('organisations/<slug:slug>/supprimer/', views.external_organization_delete, name='external_organization_delete'),
@@ -196,7 +218,15 @@ urlpatterns = [
     path('reservations/<int:pk>/supprimer/', views.room_booking_delete, name='room_booking_delete'),
     path('reservations/<int:pk>/toggle-status/', views.room_booking_toggle_status, name='room_booking_toggle_status'),
     path('reservations/calendrier/', views.room_booking_calendar, name='room_booking_calendar'),
+    path('reservations/calendrier/donnees/', views.room_booking_calendar_data, name='room_booking_calendar_data'),
+    path('reservations/disponibilites/', views.room_free_slots, name='room_free_slots'),
+    path('reservations/series/nouvelle/', views.room_booking_series_create, name='room_booking_series_create'),
+    path('reservations/series/<int:pk>/', views.room_booking_series_detail, name='room_booking_series_detail'),
+    path('reservations/series/<int:pk>/annuler/', views.room_booking_series_cancel, name='room_booking_series_cancel'),
     path('reservations/verifier-conflits/', views.check_booking_conflicts, name='check_booking_conflicts'),
+    path('reservations/<int:pk>/paiements/nouveau/', views.booking_payment_create, name='booking_payment_create'),
+    path('paiements/<int:pk>/verifier/', views.booking_payment_verify, name='booking_payment_verify'),
+    path('paiements/creances/', views.receivables_report, name='receivables_report'),
     
     # ===== MAINTENANCE DES SALLES =====
     path('maintenance/', views.room_maintenance_list, name='room_maintenance_list'),
@@ -207,6 +237,7 @@ urlpatterns = [
     
     # ===== TABLEAU DE BORD DES SALLES =====
     path('dashboard-salles/', views.dashboard_rooms, name='dashboard_rooms'),
+    path('dashboard-salles/occupation/', views.room_usage_data, name='room_usage_data'),
 
     # ============================================================================
     # GESTION DES PERSONNAS
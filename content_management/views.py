@@ -1,10 +1,10 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.core.paginator import Paginator
 from django.db.models import Q, Count
-from django.utils.translation import gettext as _
+from django.utils.translation import gettext as _, get_language
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import get_user_model
@@ -21,22 +21,56 @@ from .forms import (
     PersonnaForm, BlogForm, AboutPageForm, CityDistrictForm, CoreValueForm, HeroStatisticForm, AchievementForm
 )
 import json
-from django.db import models
+import os
+from collections import defaultdict
+from django.db import models, transaction, IntegrityError
+from django.core.exceptions import PermissionDenied
+from django.core.files.storage import FileSystemStorage
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.forms import inlineformset_factory
 from .forms import (
     EventForm, EventDayForm, EventAgendaForm, EventIntervenantForm, 
-    EventFAQForm, EventOrganizerForm, EventTagForm,
+    EventFAQForm, EventOrganizerForm, EventTagForm, EventCloneForm,
     EventDayInlineFormSet, EventAgendaInlineFormSet,
     EventRegistrationFormForm, FormFieldForm, FormFieldOptionForm, EventRegistrationPublicForm,
-    BookingSearchForm
+    BookingSearchForm, BookingSeriesForm, BookingSeriesUpdateForm, BookingPaymentForm
 )
 from .models import (
     Event, EventDay, EventAgenda, EventIntervenant, 
     EventFAQ, EventOrganizer, EventTag, EventRegistrationForm,
-    FormField, FormFieldOption, EventRegistration, FormResponse
+    FormField, FormFieldOption, EventRegistration, DirectUpload, BookingSeries, BookingPayment
 )
+from .registrations import create_registration, answers_option_filter
+from .cloning import clone_event, copy_title
+from .conflicts import (
+    BookingConflictError, RoomSchedule, ensure_aware, save_booking, serialize_conflicts_summary,
+    summarize_conflicts
+)
+from .dedup import DuplicateRegistrationError, find_existing_registration
+from .ledger import PaymentError, aged_receivables, record_payment, verify_payment
+from .organizations import search_organizations, serialize_organization
+from .recurrence import SeriesConflictError, cancel_series, create_series, update_series
+from .free_slots import DEFAULT_BUSINESS_HOURS, MAX_SEARCH_DAYS, find_free_slots
+from .availability import next_month
+from .room_calendar import MAX_CALENDAR_DAYS, build_room_calendar
+from .room_usage import (
+    MAX_USAGE_DAYS, PERIODS as USAGE_PERIODS, lead_time_distribution, occupancy_series, peak_hours,
+    revenue_by_organization, room_usage_dashboard,
+)
+from .exports import get_export_spec, EXPORT_ASYNC_THRESHOLD
+from .badges import DOCUMENT_FORMATS, DOCUMENT_KINDS, document_queryset
+from .analytics import build_form_analytics, invalidate_form_analytics
+from .uploads import (
+    UploadError, complete_upload, get_upload_backend, mark_uploads_attached, start_upload
+)
+from .checkin import (
+    build_roster, check_in, check_in_summary, sync_check_ins, ticket_qr_svg, MAX_SYNC_BATCH
+)
+from jobs.models import ExportJob
+from jobs.export_tasks import run_document_job, run_export_job, EXPORT_RETENTION_DAYS
 
 # Formset factories
 EventDayFormSet = inlineformset_factory(
@@ -293,6 +327,36 @@ def event_delete(request, pk):
     return render(request, 'content_management/event_confirm_delete.html', context)
 
 
+@login_required
+def event_clone(request, pk):
+    """Créer une nouvelle édition d'un événement avec son programme et son formulaire"""
+    event = get_object_or_404(Event, pk=pk)
+    
+    if request.method == 'POST':
+        form = EventCloneForm(request.POST)
+        if form.is_valid():
+            new_event = clone_event(
+                event,
+                title=form.cleaned_data['title'],
+                start_date=form.cleaned_data['start_date'],
+            )
+            messages.success(request, _("Événement dupliqué avec succès ! La copie est enregistrée comme brouillon."))
+            return redirect('content_management:event_detail', pk=new_event.pk)
+    else:
+        form = EventCloneForm(initial={
+            'title': copy_title(event),
+            'start_date': event.start_date,
+        })
+    
+    context = {
+        'form': form,
+        'event': event,
+        'days_count': event.days.count(),
+        'activities_count': EventAgenda.objects.filter(event_day__event=event).count(),
+    }
+    return render(request, 'content_management/event_clone.html', context)
+
+
 @login_required
 def event_manage_agenda(request, pk):
     """Gérer l'agenda d'un événement"""
@@ -1379,13 +1443,12 @@ def newsletter_list(request):
 
 @login_required
 def newsletter_export(request):
-    """Exporter la liste des emails"""
-    subscribers = Newsletter.objects.filter(is_active=True)
-    emails = [sub.email for sub in subscribers]
-    
-    response = HttpResponse('\n'.join(emails), content_type='text/plain')
-    response['Content-Disposition'] = 'attachment; filename="newsletter_emails.txt"'
-    return response
+    """Exporter les abonnés à la newsletter"""
+    params = {
+        'search': request.GET.get('search', ''),
+        'status': request.GET.get('status') or 'active',
+    }
+    return start_export(request, 'newsletter_subscribers', params)
 
 
 # Messages de contact
@@ -1667,26 +1730,11 @@ def bulk_message_action(request):
 @login_required
 def export_messages(request):
     """Exporter les messages de contact"""
-    messages_list = ContactMessage.objects.all().order_by('-created_at')
-    
-    # Créer un fichier CSV simple
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Nom', 'Email', 'Sujet', 'Message', 'Téléphone', 'Lu', 'Date de création'])
-    
-    for msg in messages_list:
-        writer.writerow([
-            msg.name, msg.email, msg.subject, msg.message, 
-            msg.phone, 'Oui' if msg.is_read else 'Non', 
-            msg.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="messages_contact.csv"'
-    return response
+    params = {
+        'search': request.GET.get('search', ''),
+        'status': request.GET.get('status', ''),
+    }
+    return start_export(request, 'contact_messages', params)
 
 
 # Vues manquantes pour les newsletters
@@ -1821,27 +1869,12 @@ def bulk_newsletter_action(request):
 
 @login_required
 def export_newsletters(request):
-    """Exporter la liste des newsletters"""
-    subscribers = Newsletter.objects.all().order_by('-subscription_date')
-    
-    # Créer un fichier CSV simple
-    import csv
-    from io import StringIO
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['Email', 'Prénom', 'Nom', 'Langue', 'Actif', 'Date d\'inscription'])
-    
-    for sub in subscribers:
-        writer.writerow([
-            sub.email, sub.first_name, sub.last_name, 
-            sub.language, 'Oui' if sub.is_active else 'Non',
-            sub.subscription_date.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = 'attachment; filename="newsletter_abonnes.csv"'
-    return response
+    """Exporter la liste complète des abonnés"""
+    params = {
+        'search': request.GET.get('search', ''),
+        'status': request.GET.get('status') or 'all',
+    }
+    return start_export(request, 'newsletter_subscribers', params)
 
 # Vues pour la gestion des organisateurs d'événements
 @login_required
@@ -2572,12 +2605,24 @@ def event_registrations_list(request, event_pk):
     # Filtres
     status_filter = request.GET.get('status', '')
     search_query = request.GET.get('search', '')
+    option_filter = request.GET.get('option', '')
     
     registrations = registration_form.registrations.all()
     
     if status_filter:
         registrations = registrations.filter(status=status_filter)
     
+    # Filtre « a choisi l'option » (valeur: <id du champ>:<valeur de l'option>)
+    choice_options = FormFieldOption.objects.filter(
+        field__form=registration_form,
+        field__field_type__in=['select', 'radio', 'multiselect'],
+    ).select_related('field').order_by('field__order', 'order')
+    if option_filter:
+        field_pk, _, option_value = option_filter.partition(':')
+        option_field = registration_form.fields.filter(pk=field_pk).first() if field_pk.isdigit() else None
+        if option_field:
+            registrations = registrations.filter(answers_option_filter(option_field, option_value))
+    
     if search_query:
         registrations = registrations.filter(
             Q(first_name__icontains=search_query) |
@@ -2599,6 +2644,8 @@ def event_registrations_list(request, event_pk):
         'is_paginated': page_obj.has_other_pages(),
         'status_filter': status_filter,
         'search_query': search_query,
+        'option_filter': option_filter,
+        'choice_options': choice_options,
         'total_registrations': registrations.count(),
         'pending_count': registrations.filter(status='pending').count(),
         'confirmed_count': registrations.filter(status='confirmed').count(),
@@ -2607,6 +2654,22 @@ def event_registrations_list(request, event_pk):
     return render(request, 'content_management/event_registrations_list.html', context)
 
 
+@login_required
+def event_registration_analytics(request, event_pk):
+    """Statistiques des réponses au formulaire d'inscription"""
+    event = get_object_or_404(Event, pk=event_pk)
+    registration_form = get_object_or_404(EventRegistrationForm, event=event)
+    
+    analytics = build_form_analytics(registration_form)
+    
+    context = {
+        'event': event,
+        'registration_form': registration_form,
+        'analytics': analytics,
+    }
+    return render(request, 'content_management/event_registration_analytics.html', context)
+
+
 @login_required
 def event_registration_detail(request, event_pk, registration_pk):
     """Détail d'une inscription à un événement"""
@@ -2663,6 +2726,11 @@ def event_registration_status_change(request, event_pk, registration_pk):
                     'error': 'Statut invalide'
                 }, status=400)
                 
+        except IntegrityError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Une autre inscription active existe déjà pour cet email'
+            }, status=400)
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -2672,80 +2740,71 @@ def event_registration_status_change(request, event_pk, registration_pk):
     return JsonResponse({'success': False, 'error': 'Méthode non autorisée'}, status=405)
 
 
+def start_export(request, export_type, params=None, default_format='csv'):
+    """Exporte directement les petits volumes, confie les gros exports à Celery"""
+    file_format = request.GET.get('format', default_format)
+    if file_format not in ('csv', 'xlsx'):
+        file_format = default_format
+    params = params or {}
+    spec = get_export_spec(export_type, params)
+    
+    total_rows = spec.count()
+    if total_rows <= EXPORT_ASYNC_THRESHOLD:
+        return spec.response(file_format)
+    
+    job = ExportJob.objects.create(
+        export_type=export_type,
+        file_format=file_format,
+        params=params,
+        total_rows=total_rows,
+        created_by=request.user,
+    )
+    transaction.on_commit(lambda: run_export_job.delay(job.pk))
+    messages.info(
+        request,
+        _("L'export de %(count)s lignes a été lancé en arrière-plan. Le fichier sera disponible dans la liste des exports.")
+        % {'count': total_rows}
+    )
+    return redirect('content_management:export_job_list')
+
+
 @login_required
 def event_registrations_export(request, event_pk):
-    """Exporter les inscriptions d'un événement"""
+    """Exporter les inscriptions d'un événement (Excel par défaut, CSV avec ?format=csv)"""
     event = get_object_or_404(Event, pk=event_pk)
-    registration_form = get_object_or_404(EventRegistrationForm, event=event)
-    
-    # Récupérer toutes les inscriptions
-    registrations = registration_form.registrations.all().order_by('registration_date')
-    
-    # Créer le fichier Excel
-    import openpyxl
-    from openpyxl.styles import Font, PatternFill
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Inscriptions"
-    
-    # En-têtes
-    headers = ['ID', 'Prénom', 'Nom', 'Email', 'Téléphone', 'Statut', 'Date d\'inscription']
-    
-    # Ajouter les champs personnalisés
-    form_fields = registration_form.fields.all().order_by('order')
-    for field in form_fields:
-        headers.append(field.label)
-    
-    # Appliquer le style aux en-têtes
-    header_font = Font(bold=True)
-    header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
-    for col, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-    
-    # Données
-    for row, registration in enumerate(registrations, 2):
-        ws.cell(row=row, column=1, value=registration.registration_id)
-        ws.cell(row=row, column=2, value=registration.first_name)
-        ws.cell(row=row, column=3, value=registration.last_name)
-        ws.cell(row=row, column=4, value=registration.email)
-        ws.cell(row=row, column=5, value=registration.phone)
-        ws.cell(row=row, column=6, value=registration.get_status_display())
-        ws.cell(row=row, column=7, value=registration.registration_date.strftime('%d/%m/%Y %H:%M'))
-        
-        # Réponses aux champs personnalisés
-        for col, field in enumerate(form_fields, 8):
-            try:
-                response = registration.responses.get(field=field)
-                ws.cell(row=row, column=col, value=response.display_value)
-            except FormResponse.DoesNotExist:
-                ws.cell(row=row, column=col, value="")
-    
-    # Ajuster la largeur des colonnes
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Créer la réponse HTTP
-    from django.http import HttpResponse
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    get_object_or_404(EventRegistrationForm, event=event)
+    return start_export(request, 'event_registrations', {'event_pk': event.pk}, default_format='xlsx')
+
+
+@login_required
+@require_http_methods(["POST"])
+def event_documents_generate(request, event_pk):
+    """Générer les badges ou attestations des participants en arrière-plan"""
+    event = get_object_or_404(Event, pk=event_pk)
+    kind, _sep, file_format = request.POST.get('document', '').partition(':')
+    if kind not in DOCUMENT_KINDS or file_format not in DOCUMENT_FORMATS:
+        messages.error(request, _("Type de document inconnu."))
+        return redirect('content_management:event_registrations_list', event_pk=event.pk)
+    
+    total_rows = document_queryset(event, kind).count()
+    if not total_rows:
+        messages.warning(request, _("Aucun participant confirmé (et présent, pour les attestations) pour cet événement."))
+        return redirect('content_management:event_registrations_list', event_pk=event.pk)
+    
+    job = ExportJob.objects.create(
+        export_type=f'event_{kind}s',
+        file_format=file_format,
+        params={'event_pk': event.pk, 'kind': kind},
+        total_rows=total_rows,
+        created_by=request.user,
     )
-    response['Content-Disposition'] = f'attachment; filename="inscriptions_{event.slug}_{timezone.now().strftime("%Y%m%d")}.xlsx"'
-    
-    wb.save(response)
-    return response
+    transaction.on_commit(lambda: run_document_job.delay(job.pk))
+    messages.info(
+        request,
+        _("La génération de %(count)s documents a été lancée en arrière-plan. Le fichier sera disponible dans la liste des exports.")
+        % {'count': total_rows}
+    )
+    return redirect('content_management:export_job_list')
 
 
 @login_required
@@ -2791,8 +2850,16 @@ def event_registrations_bulk_action(request, event_pk):
             else:
                 return JsonResponse({'success': False, 'error': 'Action non reconnue'})
             
-            return JsonResponse({'success': True, 'message': message, 'count': count})
+            # update() ne déclenche pas les signaux: recalculer les statistiques
+            invalidate_form_analytics(event.registration_form.pk)
             
+            return JsonResponse({'success': True, 'message': message, 'count': count})
+        
+        except IntegrityError:
+            return JsonResponse({
+                'success': False,
+                'error': 'Certaines inscriptions ont déjà une inscription active avec le même email'
+            })
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)})
     
@@ -2823,100 +2890,27 @@ def event_registration_public(request, event_pk):
         messages.error(request, _("Aucun formulaire d'inscription disponible pour cet événement."))
         return redirect('content_management:event_detail', pk=event.pk)
     
-    # Récupérer les champs du formulaire
-    form_fields = registration_form.fields.filter(is_visible=True).order_by('order')
+    # Récupérer les champs du formulaire avec leurs options en une requête
+    form_fields = registration_form.fields.filter(is_visible=True).prefetch_related('options').order_by('order')
     
     if request.method == 'POST':
         form = EventRegistrationPublicForm(request.POST, request.FILES, form_fields=form_fields)
+        # Vérification des doublons avant insertion (index formulaire + email)
+        if form.is_valid() and find_existing_registration(registration_form, form.cleaned_data['email']):
+            form.add_error('email', _("Une inscription existe déjà pour cette adresse email."))
         if form.is_valid():
             try:
-                # Créer l'inscription
-                registration = EventRegistration.objects.create(
-                    form=registration_form,
-                    first_name=form.cleaned_data['first_name'],
-                    last_name=form.cleaned_data['last_name'],
-                    email=form.cleaned_data['email'],
-                    phone=form.cleaned_data.get('phone', ''),
+                # Créer l'inscription et ses réponses en une seule transaction
+                registration = create_registration(
+                    registration_form,
+                    form_fields,
+                    form.cleaned_data,
                     ip_address=request.META.get('REMOTE_ADDR'),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')
+                    user_agent=request.META.get('HTTP_USER_AGENT', ''),
+                    language=get_language()
                 )
                 
-                # Créer les réponses aux champs personnalisés
-                for field in form_fields:
-                    field_key = f'field_{field.pk}'
-                    if field_key in form.cleaned_data:
-                        value = form.cleaned_data[field_key]
-                        
-                        if field.field_type in ['select', 'radio']:
-                            # Trouver l'option correspondante
-                            try:
-                                option = field.options.get(value=value)
-                                response = FormResponse.objects.create(
-                                    registration=registration,
-                                    field=field,
-                                    text_value=value
-                                )
-                                response.selected_options.add(option)
-                            except FormFieldOption.DoesNotExist:
-                                pass
-                        
-                        elif field.field_type == 'multiselect':
-                            # Créer une réponse pour chaque option sélectionnée
-                            if value:
-                                response = FormResponse.objects.create(
-                                    registration=registration,
-                                    field=field,
-                                    text_value=", ".join(value)
-                                )
-                                for val in value:
-                                    try:
-                                        option = field.options.get(value=val)
-                                        response.selected_options.add(option)
-                                    except FormFieldOption.DoesNotExist:
-                                        pass
-                        
-                        elif field.field_type == 'checkbox':
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                boolean_value=value
-                            )
-                        
-                        elif field.field_type == 'date':
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                date_value=value
-                            )
-                        
-                        elif field.field_type == 'datetime':
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                datetime_value=value
-                            )
-                        
-                        elif field.field_type == 'number':
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                number_value=value
-                            )
-                        
-                        elif field.field_type == 'file':
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                file_value=value
-                            )
-                        
-                        else:
-                            # Champs texte
-                            response = FormResponse.objects.create(
-                                registration=registration,
-                                field=field,
-                                text_value=str(value) if value else ""
-                            )
+                mark_uploads_attached(form.direct_uploads)
                 
                 messages.success(request, _("Votre inscription a été enregistrée avec succès !"))
                 
@@ -2925,6 +2919,9 @@ def event_registration_public(request, event_pk):
                     return redirect('content_management:event_registration_confirmation', event_pk=event.pk, registration_pk=registration.pk)
                 else:
                     return redirect('content_management:event_detail', pk=event.pk)
+            
+            except DuplicateRegistrationError:
+                form.add_error('email', _("Une inscription existe déjà pour cette adresse email."))
                     
             except Exception as e:
                 messages.error(request, _("Une erreur est survenue lors de l'inscription. Veuillez réessayer."))
@@ -3162,24 +3159,11 @@ def newsletter_delete(request, pk):
 @login_required
 def newsletter_export(request):
     """Exporter les abonnés à la newsletter"""
-    from django.http import HttpResponse
-    import csv
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="newsletter_subscribers.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Email', 'Date d\'inscription', 'Statut'])
-    
-    subscribers = Newsletter.objects.filter(is_active=True).order_by('email')
-    for subscriber in subscribers:
-        writer.writerow([
-            subscriber.email,
-            subscriber.created_at.strftime('%d/%m/%Y %H:%M'),
-            'Actif' if subscriber.is_active else 'Inactif'
-        ])
-    
-    return response
+    params = {
+        'search': request.GET.get('search', ''),
+        'status': request.GET.get('status') or 'active',
+    }
+    return start_export(request, 'newsletter_subscribers', params)
 
 
 # ============================================================================
@@ -5187,12 +5171,18 @@ def conference_room_delete(request, slug):
 
 @login_required
 def external_organization_list(request):
-    """Liste des organisations externes"""
-    organizations = ExternalOrganization.objects.all().order_by('name')
+    """Liste des organisations externes
+    
+    L'historique des réservations (nombre, chiffre d'affaires, dernière et
+    prochaine réservation) est lu dans les agrégats de chaque organisation.
+    """
+    organizations = ExternalOrganization.objects.all()
     
     # Filtres
     search_query = request.GET.get('search')
     type_filter = request.GET.get('type')
+    status_filter = request.GET.get('status')
+    sort = request.GET.get('sort')
     
     if search_query:
         organizations = organizations.filter(
@@ -5204,20 +5194,48 @@ def external_organization_list(request):
     if type_filter:
         organizations = organizations.filter(organization_type=type_filter)
     
+    if status_filter in ('active', 'inactive'):
+        organizations = organizations.filter(is_active=status_filter == 'active')
+    
+    sort_orders = {
+        'revenue': [models.F('confirmed_revenue').desc(), 'name'],
+        'bookings': [models.F('bookings_count').desc(), 'name'],
+        'last_booking': [models.F('last_booking_at').desc(nulls_last=True), 'name'],
+        'next_booking': [models.F('next_booking_at').asc(nulls_last=True), 'name'],
+    }
+    organizations = organizations.order_by(*sort_orders.get(sort, ['name']))
+    
     # Pagination
     paginator = Paginator(organizations, 15)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
+    month_start = timezone.localdate().replace(day=1)
+    counts = ExternalOrganization.objects.aggregate(
+        total=Count('pk'),
+        active=Count('pk', filter=Q(is_active=True)),
+        recent=Count('pk', filter=Q(created_at__date__gte=month_start)),
+    )
+    
     context = {
         'organizations': page_obj,
-        'total_organizations': organizations.count(),
-        'active_organizations': organizations.filter(is_active=True).count(),
+        'total_organizations': counts['total'],
+        'active_organizations_count': counts['active'],
+        'inactive_organizations_count': counts['total'] - counts['active'],
+        'recent_organizations_count': counts['recent'],
+        'sort': sort if sort in sort_orders else '',
     }
     
     return render(request, 'content_management/external_organization_list.html', context)
 
 
+@login_required
+def external_organization_search(request):
+    """API JSON du sélecteur d'organisation: organisations actives dont le nom correspond à q"""
+    organizations = search_organizations(request.GET.get('q', ''))
+    return JsonResponse({'results': [serialize_organization(organization) for organization in organizations]})
+
+
 @login_required
 def external_organization_create(request):
     """Créer une nouvelle organisation externe"""
@@ -5248,22 +5266,17 @@ def external_organization_detail(request, slug):
         messages.error(request, _("Organisation externe introuvable."))
         return redirect('content_management:external_organization_list')
     
-    # Réservations de cette organisation
-    bookings = organization.bookings.all().order_by('-start_time')
-    
-    # Statistiques
-    total_bookings = bookings.count()
-    confirmed_bookings = bookings.filter(status='confirmed').count()
-    total_spent = bookings.filter(status='confirmed').aggregate(
-        total=models.Sum('total_price')
-    )['total'] or 0
-    
+    # Historique: agrégats tenus à jour par organizations.refresh_organization_stats
     context = {
         'organization': organization,
-        'bookings': bookings[:10],  # 10 dernières réservations
-        'total_bookings': total_bookings,
-        'confirmed_bookings': confirmed_bookings,
-        'total_spent': total_spent,
+        'recent_bookings': organization.bookings.select_related('room').order_by('-start_time')[:10],
+        'booking_stats': {
+            'total_bookings': organization.bookings_count,
+            'confirmed_bookings': organization.confirmed_bookings_count,
+            'total_revenue': organization.confirmed_revenue,
+            'last_booking_at': organization.last_booking_at,
+            'next_booking_at': organization.next_booking_at,
+        },
     }
     
     return render(request, 'content_management/external_organization_detail.html', context)
@@ -5420,8 +5433,9 @@ def room_booking_create(request):
                         }
                         return render(request, 'content_management/room_booking_form.html', context)
                     else:
-                        # Aucun conflit, enregistrer la réservation
-                        booking.save()
+                        # Aucun conflit, enregistrer la réservation (la base refuse
+                        # encore un chevauchement créé entre-temps)
+                        save_booking(booking)
                         
                         messages.success(request, "✅ Réservation créée avec succès !")
                         messages.info(request, f"📅 Événement : {booking.event_title}")
@@ -5429,6 +5443,19 @@ def room_booking_create(request):
                         messages.info(request, f"📅 Date : {booking.start_time.strftime('%d/%m/%Y')} de {booking.start_time.strftime('%H:%M')} à {booking.end_time.strftime('%H:%M')}")
                         
                         return redirect('content_management:room_booking_detail', pk=booking.pk)
+                
+                except BookingConflictError as conflict:
+                    # Réservation concurrente enregistrée entre la vérification et l'insertion
+                    messages.error(request, str(conflict))
+                    for detail in conflict.summary.get('details', []):
+                        messages.warning(request, detail)
+                    context = {
+                        'form': form,
+                        'title': _("Créer une réservation"),
+                        'submit_text': _("Créer la réservation"),
+                        'conflicts_summary': conflict.summary
+                    }
+                    return render(request, 'content_management/room_booking_form.html', context)
                         
                 except Exception as conflict_error:
                     # Erreur lors de la vérification des conflits
@@ -5436,7 +5463,7 @@ def room_booking_create(request):
                     messages.info(request, "💡 La réservation a été créée avec succès. Veuillez vérifier manuellement le calendrier de disponibilité.")
                     
                     # Enregistrer quand même la réservation
-                    booking.save()
+                    save_booking(booking)
                     return redirect('content_management:room_booking_detail', pk=booking.pk)
                     
             except Exception as e:
@@ -5486,6 +5513,11 @@ def room_booking_create(request):
             except (ValueError, TypeError):
                 pass
         
+        # Créneau proposé par la recherche de disponibilités
+        for field_name in ('start_time', 'end_time'):
+            if request.GET.get(field_name):
+                initial_data[field_name] = request.GET[field_name]
+        
         form = RoomBookingForm(initial=initial_data)
     
     context = {
@@ -5517,6 +5549,66 @@ def room_booking_detail(request, pk):
     return render(request, 'content_management/room_booking_detail.html', context)
 
 
+@login_required
+def booking_payment_create(request, pk):
+    """Enregistrer un paiement sur une réservation (solde mis à jour par le grand livre)"""
+    booking = get_object_or_404(RoomBooking.objects.select_related('room', 'organization'), pk=pk)
+    
+    if request.method == 'POST':
+        form = BookingPaymentForm(request.POST)
+        if form.is_valid():
+            payment = form.save(commit=False)
+            payment.booking = booking
+            try:
+                record_payment(payment)
+            except PaymentError as error:
+                form.add_error('amount', str(error))
+            else:
+                messages.success(request, _("Paiement de %(amount)s GNF enregistré.") % {'amount': payment.amount})
+                return redirect('content_management:room_booking_detail', pk=booking.pk)
+    else:
+        remaining = booking.balance_due - booking.amount_pending
+        form = BookingPaymentForm(initial={'amount': remaining if remaining > 0 else None})
+    
+    context = {
+        'form': form,
+        'booking': booking,
+    }
+    return render(request, 'content_management/booking_payment_form.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def booking_payment_verify(request, pk):
+    """Vérifier un paiement: il est alors porté au montant encaissé de la réservation"""
+    payment = get_object_or_404(BookingPayment, pk=pk)
+    try:
+        verify_payment(payment, request.user)
+    except PaymentError as error:
+        messages.warning(request, str(error))
+    else:
+        messages.success(request, _("Paiement vérifié. Reste à payer: %(balance)s GNF.") % {
+            'balance': payment.balance_after
+        })
+    return redirect('content_management:room_booking_detail', pk=payment.booking_id)
+
+
+@login_required
+def receivables_report(request):
+    """Créances des organisations par ancienneté, lues dans les agrégats (voir ledger.py)"""
+    receivables, totals = aged_receivables()
+    
+    paginator = Paginator(receivables, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'page_obj': page_obj,
+        'totals': totals,
+        'as_of': receivables.values_list('as_of', flat=True).first(),
+    }
+    return render(request, 'content_management/receivables_report.html', context)
+
+
 @login_required
 def room_booking_edit(request, pk):
     """Modifier une réservation de salle"""
@@ -5529,9 +5621,13 @@ def room_booking_edit(request, pk):
     if request.method == 'POST':
         form = RoomBookingForm(request.POST, instance=booking)
         if form.is_valid():
-            form.save()
-            messages.success(request, _("Réservation modifiée avec succès."))
-            return redirect('content_management:room_booking_detail', pk=booking.pk)
+            try:
+                save_booking(form.save(commit=False))
+            except BookingConflictError as conflict:
+                form.add_error(None, str(conflict))
+            else:
+                messages.success(request, _("Réservation modifiée avec succès."))
+                return redirect('content_management:room_booking_detail', pk=booking.pk)
     else:
         form = RoomBookingForm(instance=booking)
     
@@ -5628,14 +5724,48 @@ def check_booking_conflicts(request):
             temp_booking.end_time = end_dt
             temp_booking.pk = booking_id  # Pour exclure la réservation actuelle en cas de modification
             
+            # Créneaux candidats supplémentaires (JSON [{"start": ..., "end": ...}]),
+            # vérifiés sur le même planning chargé une seule fois
+            candidate_slots = []
+            try:
+                slots = json.loads(request.POST.get('slots') or '[]')
+                if not isinstance(slots, list):
+                    raise ValueError(slots)
+                for slot in slots[:100]:
+                    if not isinstance(slot, dict):
+                        raise ValueError(slot)
+                    # parse_datetime lève ValueError pour une date bien formée mais impossible
+                    slot_start = ensure_aware(parse_datetime(str(slot.get('start') or '')))
+                    slot_end = ensure_aware(parse_datetime(str(slot.get('end') or '')))
+                    if not slot_start or not slot_end or slot_start >= slot_end:
+                        raise ValueError(slot)
+                    candidate_slots.append((slot_start, slot_end))
+            except ValueError:
+                return JsonResponse({
+                    'success': False,
+                    'error': '❌ Créneaux invalides : chaque créneau doit avoir un début et une fin valides.'
+                }, status=400)
+            
             # Obtenir le rapport des conflits
             try:
-                conflicts_summary = temp_booking.get_detailed_conflicts_summary()
+                period_start = min([start_dt] + [slot[0] for slot in candidate_slots])
+                period_end = max([end_dt] + [slot[1] for slot in candidate_slots])
+                schedule = RoomSchedule.load(room_id, period_start, period_end, exclude_booking_id=booking_id)
+                conflicts_summary = summarize_conflicts(schedule.conflicts(start_dt, end_dt))
                 duration_info = temp_booking.get_duration_info()
                 
                 return JsonResponse({
                     'success': True,
-                    'conflicts_summary': conflicts_summary,
+                    'conflicts_summary': serialize_conflicts_summary(conflicts_summary),
+                    'slots': [
+                        {
+                            'start': slot['start'].isoformat(),
+                            'end': slot['end'].isoformat(),
+                            'available': slot['available'],
+                            'overlap_hours': slot['overlap_hours'],
+                        }
+                        for slot in schedule.check_slots(candidate_slots)
+                    ],
                     'duration_info': duration_info,
                     'formatted_start': start_dt.strftime('%d/%m/%Y à %H:%M'),
                     'formatted_end': end_dt.strftime('%d/%m/%Y à %H:%M')
@@ -5693,7 +5823,13 @@ def room_booking_toggle_status(request, pk):
                     booking.confirmed_by = request.user
                     booking.confirmed_at = timezone.now()
                 
-                booking.save()
+                try:
+                    save_booking(booking)
+                except BookingConflictError as conflict:
+                    if request.headers.get('Content-Type') == 'application/json':
+                        return JsonResponse({'success': False, 'error': str(conflict)})
+                    messages.error(request, str(conflict))
+                    return redirect('content_management:room_booking_detail', pk=pk)
                 
                 status_display = dict(RoomBooking._meta.get_field('status').choices)[new_status]
                 
@@ -5780,7 +5916,7 @@ def room_booking_calendar(request):
         next_month = current_month.replace(month=current_month.month + 1)
     
     # Récupérer toutes les salles
-    rooms = ConferenceRoom.objects.filter(is_active=True)
+    rooms = list(ConferenceRoom.objects.filter(is_active=True))
     
     # Récupérer les réservations pour le mois demandé
     start_of_month = current_month
@@ -5789,15 +5925,14 @@ def room_booking_calendar(request):
     else:
         end_of_month = current_month.replace(month=current_month.month + 1, day=1) - timedelta(days=1)
     
-    bookings = RoomBooking.objects.filter(
-        start_time__date__gte=start_of_month,
-        end_time__date__lte=end_of_month,
-        status__in=['confirmed', 'pending', 'cancelled', 'completed', 'rejected']
-    ).select_related('room', 'organization')
+    # Réservations du mois réparties par (salle, jour), y compris celles qui
+    # commencent avant le mois ou se terminent après
+    room_calendar = build_room_calendar([room.pk for room in rooms], start_of_month, end_of_month)
     
     # Organiser les réservations par salle et par date
     calendar_data = {}
     today = timezone.now().date()
+    month_calendar = monthcalendar(current_month.year, current_month.month)
     
     for room in rooms:
         calendar_data[room.id] = {
@@ -5805,9 +5940,6 @@ def room_booking_calendar(request):
             'weeks': []
         }
         
-        # Générer le calendrier du mois
-        month_calendar = monthcalendar(current_month.year, current_month.month)
-        
         for week in month_calendar:
             week_data = []
             for day in week:
@@ -5821,20 +5953,11 @@ def room_booking_calendar(request):
                     })
                 else:
                     current_date = date(current_month.year, current_month.month, day)
-                    is_today = current_date == today
-                    
-                    # Récupérer les réservations pour cette date
-                    day_bookings = []
-                    for booking in bookings:
-                        if (booking.room_id == room.id and 
-                            current_date >= booking.start_time.date() and 
-                            current_date <= booking.end_time.date()):
-                            day_bookings.append(booking)
-                    
                     week_data.append({
                         'date': current_date,
-                        'bookings': day_bookings,
-                        'is_today': is_today,
+                        'bookings': room_calendar['days'].get((room.id, current_date), []),
+                        'maintenances': room_calendar['maintenances'].get((room.id, current_date), []),
+                        'is_today': current_date == today,
                         'is_other_month': False
                     })
             
@@ -5853,6 +5976,203 @@ def room_booking_calendar(request):
     return render(request, 'content_management/room_booking_calendar.html', context)
 
 
+@login_required
+def room_booking_series_create(request):
+    """Créer une réservation récurrente (toutes les occurrences en une opération)"""
+    conflicting = []
+    if request.method == 'POST':
+        form = BookingSeriesForm(request.POST)
+        if form.is_valid():
+            series = form.save(commit=False)
+            series.created_by = request.user
+            try:
+                bookings, skipped = create_series(series, skip_conflicts=form.cleaned_data['skip_conflicts'])
+            except SeriesConflictError as error:
+                conflicting = error.conflicting
+                messages.error(request, _("%(count)s occurrence(s) sur %(total)s sont en conflit.") % {
+                    'count': len(conflicting), 'total': len(form.occurrences)
+                })
+            else:
+                messages.success(request, _("%(count)s réservation(s) créée(s).") % {'count': len(bookings)})
+                if skipped:
+                    messages.warning(request, _("%(count)s occurrence(s) en conflit ignorée(s).") % {'count': len(skipped)})
+                return redirect('content_management:room_booking_series_detail', pk=series.pk)
+    else:
+        form = BookingSeriesForm(initial={
+            key: request.GET[key] for key in ('room', 'organization') if request.GET.get(key)
+        })
+    
+    context = {
+        'form': form,
+        'conflicting': conflicting,
+        'title': _("Réservation récurrente"),
+    }
+    return render(request, 'content_management/room_booking_series_form.html', context)
+
+
+@login_required
+def room_booking_series_detail(request, pk):
+    """Série de réservations: occurrences et modification des occurrences à venir"""
+    series = get_object_or_404(BookingSeries.objects.select_related('room', 'organization'), pk=pk)
+    
+    if request.method == 'POST':
+        form = BookingSeriesUpdateForm(request.POST, instance=series)
+        if form.is_valid():
+            updated = update_series(series, form.cleaned_data)
+            messages.success(request, _("Série modifiée: %(count)s occurrence(s) à venir mise(s) à jour.") % {
+                'count': updated
+            })
+            return redirect('content_management:room_booking_series_detail', pk=series.pk)
+    else:
+        form = BookingSeriesUpdateForm(instance=series)
+    
+    occurrences = series.occurrences.order_by('start_time')
+    status_labels = dict(RoomBooking._meta.get_field('status').choices)
+    context = {
+        'series': series,
+        'form': form,
+        'occurrences': occurrences,
+        'status_counts': [
+            (status_labels.get(status, status), count)
+            for status, count in occurrences.order_by().values_list('status').annotate(count=Count('pk'))
+        ],
+        'now': timezone.now(),
+    }
+    return render(request, 'content_management/room_booking_series_detail.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def room_booking_series_cancel(request, pk):
+    """Annuler toutes les occurrences à venir d'une série"""
+    series = get_object_or_404(BookingSeries, pk=pk)
+    cancelled = cancel_series(series)
+    messages.success(request, _("%(count)s occurrence(s) à venir annulée(s).") % {'count': cancelled})
+    return redirect('content_management:room_booking_series_detail', pk=series.pk)
+
+
+@login_required
+def room_free_slots(request):
+    """Recherche de créneaux libres (JSON)
+    
+    Paramètres GET: start et end (date ou date-heure), hours (durée),
+    capacity (places minimum), business_hours=1 pour se limiter aux heures
+    ouvrées, limit (nombre de propositions).
+    """
+    from django.utils.dateparse import parse_date, parse_datetime
+    
+    def parse_bound(value, end_of_day=False):
+        # Une date seule couvre toute la journée
+        day = parse_date(value or '')
+        if day is not None:
+            moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, datetime.min.time())
+        else:
+            moment = parse_datetime(value or '')
+            if moment is None:
+                return None
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+    
+    try:
+        start = parse_bound(request.GET.get('start'))
+        end = parse_bound(request.GET.get('end'), end_of_day=True)
+        duration = timedelta(hours=float(request.GET.get('hours') or 1))
+        capacity = int(request.GET.get('capacity') or 0)
+        limit = min(int(request.GET.get('limit') or 20), 100)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': _("Paramètres de recherche invalides.")}, status=400)
+    if not start or not end or start >= end or duration <= timedelta(0):
+        return JsonResponse({
+            'success': False,
+            'error': _("Indiquez une période (start, end) et une durée (hours) valides.")
+        }, status=400)
+    if (end - start).days > MAX_SEARCH_DAYS:
+        return JsonResponse({
+            'success': False,
+            'error': _("La période de recherche est limitée à %(days)s jours.") % {'days': MAX_SEARCH_DAYS}
+        }, status=400)
+    
+    business_hours = DEFAULT_BUSINESS_HOURS if request.GET.get('business_hours') in ('1', 'true', 'on') else None
+    options = find_free_slots(start, end, duration, min_capacity=capacity, business_hours=business_hours, limit=limit)
+    
+    return JsonResponse({
+        'success': True,
+        'slots': [
+            {
+                'room': {
+                    'id': option['room'].pk,
+                    'name': option['room'].name,
+                    'slug': option['room'].slug,
+                    'capacity': option['room'].capacity,
+                },
+                'start': option['start'],
+                'end': option['end'],
+                'free_until': option['free_until'],
+                'price': option['price'],
+                'booking_url': reverse('content_management:room_booking_create') + '?' + urlencode({
+                    'room': option['room'].pk,
+                    'start_time': timezone.localtime(option['start']).strftime('%Y-%m-%dT%H:%M'),
+                    'end_time': timezone.localtime(option['end']).strftime('%Y-%m-%dT%H:%M'),
+                }),
+            }
+            for option in options
+        ],
+    })
+
+
+@login_required
+def room_booking_calendar_data(request):
+    """Réservations des salles sur une période, en JSON (semaine, mois, vue par salle)
+    
+    Paramètres GET: start et end (AAAA-MM-JJ, inclus; mois courant par
+    défaut) et room (identifiant, répétable; toutes les salles actives sinon).
+    """
+    from django.utils.dateparse import parse_date
+    
+    today = timezone.localdate()
+    try:
+        first_day = parse_date(request.GET.get('start') or '') or today.replace(day=1)
+        last_day = parse_date(request.GET.get('end') or '') or next_month(first_day) - timedelta(days=1)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': _("Format de date invalide (AAAA-MM-JJ).")}, status=400)
+    if last_day < first_day or (last_day - first_day).days >= MAX_CALENDAR_DAYS:
+        return JsonResponse({
+            'success': False,
+            'error': _("La période doit compter entre 1 et %(days)s jours.") % {'days': MAX_CALENDAR_DAYS}
+        }, status=400)
+    
+    rooms = ConferenceRoom.objects.filter(is_active=True).order_by('name')
+    room_ids = [room_id for room_id in request.GET.getlist('room') if room_id.isdigit()]
+    if room_ids:
+        rooms = rooms.filter(pk__in=room_ids)
+    rooms = list(rooms.only('pk', 'name', 'slug', 'maintenance_until'))
+    room_calendar = build_room_calendar([room.pk for room in rooms], first_day, last_day)
+    
+    days_by_room = defaultdict(dict)
+    for (room_id, day), bookings in sorted(room_calendar['days'].items()):
+        days_by_room[room_id][day.isoformat()] = [booking['id'] for booking in bookings]
+    maintenances_by_room = defaultdict(dict)
+    for (room_id, day), maintenances in sorted(room_calendar['maintenances'].items()):
+        maintenances_by_room[room_id][day.isoformat()] = maintenances
+    
+    return JsonResponse({
+        'success': True,
+        'start': first_day,
+        'end': last_day,
+        'rooms': [
+            {
+                'id': room.pk,
+                'name': room.name,
+                'slug': room.slug,
+                'maintenance_until': room.maintenance_until,
+                'days': days_by_room.get(room.pk, {}),
+                'maintenances': maintenances_by_room.get(room.pk, {}),
+            }
+            for room in rooms
+        ],
+        'bookings': room_calendar['bookings'],
+    })
+
+
 @login_required
 def room_maintenance_list(request):
     """Liste des maintenances de salle"""
@@ -5972,70 +6292,121 @@ def room_maintenance_delete(request, pk):
 
 @login_required
 def dashboard_rooms(request):
-    """Tableau de bord des salles de conférence"""
-    # Statistiques générales
-    total_rooms = ConferenceRoom.objects.count()
-    available_rooms = ConferenceRoom.objects.filter(is_active=True).count()
-    
-    # Réservations
-    total_bookings = RoomBooking.objects.count()
-    pending_bookings = RoomBooking.objects.filter(status='pending').count()
-    confirmed_bookings = RoomBooking.objects.filter(status='confirmed').count()
-    today_bookings = RoomBooking.objects.filter(
-        start_time__date=timezone.now().date(),
-        status__in=['confirmed', 'pending']
-    ).count()
+    """Tableau de bord des salles de conférence
     
-    # Revenus
-    total_revenue = RoomBooking.objects.filter(status='confirmed').aggregate(
-        total=models.Sum('total_price')
-    )['total'] or 0
+    Les compteurs sont calculés en une requête par modèle; l'occupation, les
+    revenus et les délais de réservation viennent des agrégats précalculés
+    (room_usage.py).
+    """
+    now = timezone.now()
+    active = ['confirmed', 'pending']
     
-    monthly_revenue = RoomBooking.objects.filter(
-        status='confirmed',
-        start_time__month=timezone.now().month,
-        start_time__year=timezone.now().year
-    ).aggregate(total=models.Sum('total_price'))['total'] or 0
+    # Statistiques générales
+    room_stats = ConferenceRoom.objects.aggregate(
+        total=Count('pk'), available=Count('pk', filter=Q(is_active=True))
+    )
     
-    # Organisations
-    total_organizations = ExternalOrganization.objects.count()
-    active_organizations = ExternalOrganization.objects.filter(is_active=True).count()
+    # Réservations et revenus
+    booking_stats = RoomBooking.objects.aggregate(
+        total=Count('pk'),
+        pending=Count('pk', filter=Q(status='pending')),
+        confirmed=Count('pk', filter=Q(status='confirmed')),
+        today=Count('pk', filter=Q(start_time__date=timezone.localdate(now), status__in=active)),
+        revenue=models.Sum('total_price', filter=Q(status='confirmed')),
+        monthly_revenue=models.Sum('total_price', filter=Q(
+            status='confirmed', start_time__month=now.month, start_time__year=now.year
+        )),
+    )
     
-    # Maintenances
-    active_maintenances = RoomMaintenance.objects.filter(status='in_progress').count()
-    planned_maintenances = RoomMaintenance.objects.filter(status='planned').count()
+    # Organisations et maintenances
+    organization_stats = ExternalOrganization.objects.aggregate(
+        total=Count('pk'), active=Count('pk', filter=Q(is_active=True))
+    )
+    maintenance_stats = RoomMaintenance.objects.aggregate(
+        active=Count('pk', filter=Q(status='in_progress')), planned=Count('pk', filter=Q(status='planned'))
+    )
     
     # Réservations à venir (prochaines 7 jours)
     upcoming_bookings = RoomBooking.objects.filter(
-        start_time__gte=timezone.now(),
-        start_time__lte=timezone.now() + timedelta(days=7),
-        status__in=['confirmed', 'pending']
-    ).order_by('start_time')[:10]
+        start_time__gte=now,
+        start_time__lte=now + timedelta(days=7),
+        status__in=active
+    ).select_related('room', 'organization').order_by('start_time')[:10]
     
     # Salles les plus populaires
     popular_rooms = ConferenceRoom.objects.annotate(
         booking_count=models.Count('bookings', filter=models.Q(bookings__status='confirmed'))
     ).order_by('-booking_count')[:5]
     
+    usage = room_usage_dashboard(now=now)
+    
     context = {
-        'total_rooms': total_rooms,
-        'available_rooms': available_rooms,
-        'total_bookings': total_bookings,
-        'pending_bookings': pending_bookings,
-        'confirmed_bookings': confirmed_bookings,
-        'today_bookings': today_bookings,
-        'total_revenue': total_revenue,
-        'monthly_revenue': monthly_revenue,
-        'total_organizations': total_organizations,
-        'active_organizations': active_organizations,
-        'active_maintenances': active_maintenances,
-        'planned_maintenances': planned_maintenances,
+        'total_rooms': room_stats['total'],
+        'available_rooms': room_stats['available'],
+        'total_bookings': booking_stats['total'],
+        'pending_bookings': booking_stats['pending'],
+        'confirmed_bookings': booking_stats['confirmed'],
+        'today_bookings': booking_stats['today'],
+        'total_revenue': booking_stats['revenue'] or 0,
+        'monthly_revenue': booking_stats['monthly_revenue'] or 0,
+        'total_organizations': organization_stats['total'],
+        'active_organizations': organization_stats['active'],
+        'active_maintenances': maintenance_stats['active'],
+        'planned_maintenances': maintenance_stats['planned'],
         'upcoming_bookings': upcoming_bookings,
         'popular_rooms': popular_rooms,
+        'usage': usage,
+        'heatmap_rows': list(zip(
+            [_("Lun"), _("Mar"), _("Mer"), _("Jeu"), _("Ven"), _("Sam"), _("Dim")], usage['heatmap']
+        )),
+        'hours': range(24),
     }
     
     return render(request, 'content_management/dashboard_rooms.html', context)
 
+
+@login_required
+def room_usage_data(request):
+    """Séries d'occupation et de revenus des salles, en JSON (agrégats précalculés)
+    
+    Paramètres GET: start et end (AAAA-MM-JJ, inclus; 30 derniers jours par
+    défaut), period (day, week ou month) et room (identifiant, répétable).
+    """
+    from django.utils.dateparse import parse_date
+    
+    today = timezone.localdate()
+    try:
+        last_day = parse_date(request.GET.get('end') or '') or today
+        first_day = parse_date(request.GET.get('start') or '') or last_day - timedelta(days=29)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': _("Format de date invalide (AAAA-MM-JJ).")}, status=400)
+    period = request.GET.get('period', 'day')
+    if period not in USAGE_PERIODS:
+        return JsonResponse({'success': False, 'error': _("Période inconnue.")}, status=400)
+    if last_day < first_day or (last_day - first_day).days >= MAX_USAGE_DAYS:
+        return JsonResponse({
+            'success': False,
+            'error': _("La période doit compter entre 1 et %(days)s jours.") % {'days': MAX_USAGE_DAYS}
+        }, status=400)
+    room_ids = [int(room_id) for room_id in request.GET.getlist('room') if room_id.isdigit()]
+    
+    return JsonResponse({
+        'success': True,
+        'start': first_day,
+        'end': last_day,
+        'period': period,
+        'series': occupancy_series(first_day, last_day, period, room_ids),
+        'peak_hours': peak_hours(first_day, last_day, room_ids),
+        'organizations': [
+            {'id': organization.pk, 'name': organization.name, 'revenue': revenue}
+            for organization, revenue in revenue_by_organization(first_day, last_day, room_ids)
+        ],
+        'lead_times': [
+            {'label': label, 'count': count}
+            for label, count in lead_time_distribution(first_day, last_day, room_ids)
+        ],
+    })
+
 # ============================================================================
 # GESTION DES PERSONNAS
 # ============================================================================
@@ -6813,9 +7184,16 @@ def newsletter_campaign_send(request, pk):
     """Envoyer une campagne de newsletter"""
     if request.method == 'POST':
         campaign = get_object_or_404(NewsletterCampaign, pk=pk)
-        # TODO: Implémenter l'envoi de campagne
-        messages.success(request, 'Fonctionnalité d\'envoi de campagne à implémenter !')
-        return JsonResponse({'success': True, 'message': 'Campagne envoyée avec succès !'})
+        if not campaign.can_be_sent():
+            return JsonResponse({
+                'success': False,
+                'message': f"La campagne ne peut pas être envoyée (statut : {campaign.get_status_display()})."
+            })
+        # Répartition en lots et envoi en tâche de fond (voir campaigns.py)
+        from jobs.tasks import send_bulk_newsletter
+        send_bulk_newsletter.delay(campaign.pk)
+        messages.success(request, _("Campagne mise en file d'attente pour envoi."))
+        return JsonResponse({'success': True, 'message': "Campagne mise en file d'attente pour envoi."})
     
     return JsonResponse({'success': False, 'message': 'Méthode non autorisée'})
 
@@ -6879,6 +7257,214 @@ def bulk_newsletter_campaign_action(request):
 @login_required
 def export_newsletter_campaigns(request):
     """Exporter les campagnes de newsletter"""
-    # TODO: Implémenter l'export des campagnes
-    messages.info(request, 'Fonctionnalité d\'export à implémenter !')
-    return redirect('content_management:newsletter_campaign_list')
+    params = {
+        'search': request.GET.get('search', ''),
+        'status': request.GET.get('status', ''),
+    }
+    return start_export(request, 'newsletter_campaigns', params)
+
+
+# ============================================================================
+# EXPORTS EN ARRIÈRE-PLAN
+# ============================================================================
+
+@login_required
+def export_job_list(request):
+    """Liste des exports lancés par l'utilisateur"""
+    jobs = ExportJob.objects.filter(created_by=request.user)
+    
+    paginator = Paginator(jobs, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    
+    context = {
+        'jobs': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': page_obj.has_other_pages(),
+        'retention_days': EXPORT_RETENTION_DAYS,
+    }
+    return render(request, 'content_management/export_job_list.html', context)
+
+
+@login_required
+def export_job_status(request, pk):
+    """Statut d'un export (AJAX)"""
+    job = get_object_or_404(ExportJob, pk=pk, created_by=request.user)
+    return JsonResponse({
+        'success': True,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'row_count': job.row_count,
+        'total_rows': job.total_rows,
+        'progress': job.progress,
+        'download_url': reverse('content_management:export_job_download', args=[job.pk]) if job.is_ready else None,
+        'error': job.error_message,
+    })
+
+
+@login_required
+def export_job_download(request, pk):
+    """Télécharger le fichier d'un export terminé"""
+    job = get_object_or_404(ExportJob, pk=pk, created_by=request.user)
+    if not job.is_ready:
+        messages.error(request, _("Ce fichier d'export n'est pas disponible."))
+        return redirect('content_management:export_job_list')
+    
+    # Les stockages distants (S3) servent le fichier directement
+    if not isinstance(job.file.storage, FileSystemStorage):
+        return redirect(job.file.url)
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
+
+
+
+# ============================================================================
+# BILLETS ET CONTRÔLE DES ENTRÉES
+# ============================================================================
+
+@login_required
+def event_registration_ticket(request, event_pk, registration_pk):
+    """QR code du billet d'une inscription (SVG)"""
+    registration = get_object_or_404(EventRegistration, pk=registration_pk, form__event_id=event_pk)
+    response = HttpResponse(ticket_qr_svg(registration.ticket_code), content_type='image/svg+xml')
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+@login_required
+def event_check_in(request, event_pk):
+    """Page de contrôle des entrées (scanner)"""
+    event = get_object_or_404(Event, pk=event_pk)
+    
+    context = {
+        'event': event,
+        'summary': check_in_summary(event),
+    }
+    return render(request, 'content_management/event_check_in.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def event_check_in_scan(request, event_pk):
+    """Pointage d'un billet scanné (AJAX)"""
+    event = get_object_or_404(Event, pk=event_pk)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON invalide'}, status=400)
+    
+    result = check_in(event, data.get('code', ''), user=request.user, device=str(data.get('device', ''))[:100])
+    return JsonResponse({'success': result['result'] in ('checked_in', 'already_checked_in'), **result})
+
+
+@login_required
+def event_check_in_roster(request, event_pk):
+    """Liste compacte des billets pour les scanners hors ligne"""
+    event = get_object_or_404(Event, pk=event_pk)
+    return JsonResponse(build_roster(event))
+
+
+@login_required
+@require_http_methods(["POST"])
+def event_check_in_sync(request, event_pk):
+    """Synchronisation d'un lot de pointages effectués hors ligne"""
+    event = get_object_or_404(Event, pk=event_pk)
+    try:
+        data = json.loads(request.body)
+        entries = [entry for entry in data.get('check_ins', []) if isinstance(entry, dict)]
+    except (ValueError, AttributeError, TypeError):
+        return JsonResponse({'success': False, 'error': 'JSON invalide'}, status=400)
+    
+    if len(entries) > MAX_SYNC_BATCH:
+        return JsonResponse({
+            'success': False,
+            'error': f'Lot trop volumineux (maximum {MAX_SYNC_BATCH} pointages)'
+        }, status=400)
+    
+    results = sync_check_ins(event, entries, user=request.user, device=str(data.get('device', ''))[:100])
+    return JsonResponse({
+        'success': True,
+        'results': results,
+        'summary': check_in_summary(event),
+    })
+
+
+
+# ============================================================================
+# ENVOIS DIRECTS VERS LE STOCKAGE
+# ============================================================================
+
+def get_direct_upload(request, token):
+    """Session d'envoi accessible à l'utilisateur (le jeton suffit pour les envois anonymes)"""
+    upload = get_object_or_404(DirectUpload, token=token)
+    if upload.created_by_id and upload.created_by_id != request.user.pk:
+        raise PermissionDenied
+    return upload
+
+
+@require_http_methods(["POST"])
+def direct_upload_start(request):
+    """Crée une session d'envoi et retourne les URL d'envoi (AJAX)"""
+    try:
+        data = json.loads(request.body)
+        size = int(data.get('size', 0))
+    except (ValueError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Requête invalide'}, status=400)
+    
+    try:
+        upload, instructions = start_upload(
+            str(data.get('target', '')),
+            str(data.get('filename', '')),
+            str(data.get('content_type', '')),
+            size,
+            user=request.user,
+        )
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'token': str(upload.token),
+        'status_url': reverse('content_management:direct_upload_status', args=[upload.token]),
+        'complete_url': reverse('content_management:direct_upload_complete', args=[upload.token]),
+        **instructions,
+    })
+
+
+def direct_upload_status(request, token):
+    """Morceaux déjà reçus, pour reprendre un envoi interrompu (AJAX)"""
+    upload = get_direct_upload(request, token)
+    parts = get_upload_backend(upload.backend).uploaded_parts(upload) if upload.status == 'pending' else []
+    return JsonResponse({
+        'success': True,
+        'status': upload.status,
+        'part_count': upload.part_count,
+        'uploaded_parts': parts,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["PUT"])
+def direct_upload_part(request, token, number):
+    """Réception d'un morceau (stockage local uniquement, en remplacement de S3)
+    
+    Comme les URL pré-signées S3, l'URL du morceau suffit à l'autoriser.
+    """
+    upload = get_object_or_404(DirectUpload, token=token, backend='local', status='pending')
+    if upload.expires_at < timezone.now():
+        return JsonResponse({'success': False, 'error': 'Envoi expiré'}, status=410)
+    try:
+        part = get_upload_backend('local').store_part(upload, number, request)
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    return JsonResponse({'success': True, **part})
+
+
+@require_http_methods(["POST"])
+def direct_upload_complete(request, token):
+    """Finalise un envoi; sa clé peut ensuite être rattachée à un formulaire (AJAX)"""
+    upload = get_direct_upload(request, token)
+    try:
+        upload = complete_upload(upload)
+    except UploadError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    return JsonResponse({'success': True, 'token': str(upload.token), 'key': upload.key})
@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -137,8 +138,6 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -157,7 +156,25 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 AWS_STORAGE_BUCKET_NAME = 'csigs3'
 AWS_S3_REGION_NAME = 'eu-north-1'
 
-DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
+# Fichiers envoyés sur S3 dès que les identifiants AWS sont fournis (production),
+# sur le disque sinon. Django 5 ne lit plus DEFAULT_FILE_STORAGE ni STATICFILES_STORAGE.
+# Les fichiers statiques gardent le stockage que Django utilisait jusqu'ici: le
+# stockage à manifeste de WhiteNoise exige un collectstatic avant chaque rendu.
+USE_S3_STORAGE = bool(AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY)
+STORAGES = {
+    'default': {
+        'BACKEND': 'storages.backends.s3boto3.S3Boto3Storage' if USE_S3_STORAGE
+        else 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Envois directs vers le stockage ('s3': URL pré-signées, 'local': développement)
+DIRECT_UPLOAD_BACKEND = os.getenv('DIRECT_UPLOAD_BACKEND', 's3' if USE_S3_STORAGE else 'local')
+DIRECT_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024  # 8 Mo (minimum S3: 5 Mo)
+DIRECT_UPLOAD_MAX_SIZE = 500 * 1024 * 1024  # 500 Mo
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 SECURE_SSL_REDIRECT = True
@@ -298,11 +315,49 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
+# Cache partagé par les workers gunicorn et Celery: versions de disponibilité
+# des salles, agrégats et programmes invalidés par signaux, verrou d'envoi des
+# emails. Un cache par processus (LocMemCache) ne serait invalidé que dans le
+# processus qui a fait la modification. Redis du broker, base distincte.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_CACHE_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'csig',
+    }
+}
+if TESTING:
+    # La suite de tests tourne sans serveur Redis: cache local, et les tâches
+    # lancées par les callbacks on_commit s'exécutent sur place (les nouveaux
+    # essais aussi, ce que la propagation des exceptions empêcherait)
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    CELERY_TASK_ALWAYS_EAGER = True
+
 # Configuration des tâches Celery
 CELERY_TASK_ROUTES = {
     'jobs.tasks.send_newsletter_email': {'queue': 'newsletter'},
     'jobs.tasks.send_bulk_newsletter': {'queue': 'newsletter'},
     'jobs.tasks.send_scheduled_newsletter': {'queue': 'newsletter'},
+    'jobs.newsletter_tasks.send_bulk_newsletter': {'queue': 'newsletter'},
+    'jobs.newsletter_tasks.send_newsletter_chunk': {'queue': 'newsletter'},
+    'jobs.newsletter_tasks.finalize_newsletter_campaign': {'queue': 'newsletter'},
+    'jobs.newsletter_tasks.resume_stalled_campaigns': {'queue': 'maintenance'},
+    'jobs.email_tasks.send_registration_confirmations': {'queue': 'email'},
+    'jobs.email_tasks.send_pending_emails': {'queue': 'email'},
+    'jobs.export_tasks.run_export_job': {'queue': 'exports'},
+    'jobs.export_tasks.run_document_job': {'queue': 'exports'},
+    'jobs.export_tasks.render_document_chunk': {'queue': 'exports'},
+    'jobs.export_tasks.assemble_document_job': {'queue': 'exports'},
+    'jobs.export_tasks.fail_document_job': {'queue': 'exports'},
+    'jobs.export_tasks.cleanup_expired_exports': {'queue': 'maintenance'},
+    'jobs.registration_tasks.merge_duplicate_registrations': {'queue': 'maintenance'},
+    'jobs.registration_tasks.send_due_reminders': {'queue': 'email'},
+    'jobs.registration_tasks.send_event_reminder': {'queue': 'email'},
+    'jobs.upload_tasks.cleanup_direct_uploads': {'queue': 'maintenance'},
+    'jobs.room_tasks.refresh_room_usage_rollups': {'queue': 'maintenance'},
+    'jobs.room_tasks.refresh_receivables': {'queue': 'maintenance'},
+    'jobs.room_tasks.refresh_organization_stats': {'queue': 'maintenance'},
 }
 
 # Configuration des workers
@@ -311,6 +366,10 @@ CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 CELERY_TASK_TIME_LIMIT = 3600  # 1 heure
 CELERY_TASK_SOFT_TIME_LIMIT = 3000  # 50 minutes
 
+# Exports: au-delà de ce nombre de lignes, l'export est généré par Celery
+EXPORT_ASYNC_THRESHOLD = 2000
+EXPORT_RETENTION_DAYS = 7  # Conservation des fichiers d'export
+
 # ============================================================================
 # CONFIGURATION EMAIL (GMAIL)
 # ============================================================================
@@ -331,6 +390,10 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'support@csig.edu.gn'
 EMAIL_HOST_PASSWORD = 'yhmffdfjgqgkyltg'
 
+# Emails en file d'attente: envoi groupé après ce délai (secondes)
+EMAIL_DISPATCH_DELAY = 5
+EMAIL_BATCH_SIZE = 100
+
 # Configuration du site
 SITE_URL = 'http://localhost:8000'  # À modifier selon votre configuration
 
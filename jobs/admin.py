@@ -60,7 +60,7 @@ class NewsletterCampaignAdmin(admin.ModelAdmin):
     def send_campaign(self, request, queryset):
         """Action pour envoyer une campagne"""
         for campaign in queryset:
-            if campaign.can_be_sent:
+            if campaign.can_be_sent():
                 send_bulk_newsletter.delay(campaign.id)
                 self.message_user(
                     request, 
@@ -16,6 +16,14 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Charger automatiquement les tâches depuis tous les fichiers `tasks.py` enregistrés
 app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 
+# Modules de tâches de l'application jobs qui ne s'appellent pas `tasks.py`
+app.autodiscover_tasks(['jobs'], related_name='email_tasks')
+app.autodiscover_tasks(['jobs'], related_name='export_tasks')
+app.autodiscover_tasks(['jobs'], related_name='newsletter_tasks')
+app.autodiscover_tasks(['jobs'], related_name='registration_tasks')
+app.autodiscover_tasks(['jobs'], related_name='room_tasks')
+app.autodiscover_tasks(['jobs'], related_name='upload_tasks')
+
 # Configuration des tâches périodiques (beat)
 app.conf.beat_schedule = {
     'test-email-connection-daily': {
@@ -27,6 +35,42 @@ app.conf.beat_schedule = {
         'schedule': 604800.0,  # 7 jours
         'args': (30,),  # Nettoyer les logs de plus de 30 jours
     },
+    'cleanup-expired-exports-daily': {
+        'task': 'jobs.export_tasks.cleanup_expired_exports',
+        'schedule': 86400.0,  # 24 heures
+    },
+    'merge-duplicate-registrations-daily': {
+        'task': 'jobs.registration_tasks.merge_duplicate_registrations',
+        'schedule': 86400.0,  # 24 heures
+    },
+    'send-event-reminders-every-15-minutes': {
+        'task': 'jobs.registration_tasks.send_due_reminders',
+        'schedule': 900.0,  # 15 minutes
+    },
+    'cleanup-direct-uploads-hourly': {
+        'task': 'jobs.upload_tasks.cleanup_direct_uploads',
+        'schedule': 3600.0,  # 1 heure
+    },
+    'refresh-room-usage-rollups-hourly': {
+        'task': 'jobs.room_tasks.refresh_room_usage_rollups',
+        'schedule': 3600.0,  # 1 heure
+    },
+    'refresh-receivables-daily': {
+        'task': 'jobs.room_tasks.refresh_receivables',
+        'schedule': 86400.0,  # 24 heures
+    },
+    'resume-stalled-campaigns-every-15-minutes': {
+        'task': 'jobs.newsletter_tasks.resume_stalled_campaigns',
+        'schedule': 900.0,  # 15 minutes
+    },
+    'send-pending-emails-every-5-minutes': {
+        'task': 'jobs.email_tasks.send_pending_emails',
+        'schedule': 300.0,  # 5 minutes
+    },
+    'refresh-organization-stats-hourly': {
+        'task': 'jobs.room_tasks.refresh_organization_stats',
+        'schedule': 3600.0,  # 1 heure
+    },
 }
 
 # Configuration des tâches
@@ -56,6 +100,24 @@ app.conf.update(
         'jobs.tasks.send_newsletter_email': {'queue': 'newsletter'},
         'jobs.tasks.send_bulk_newsletter': {'queue': 'newsletter'},
         'jobs.tasks.send_scheduled_newsletter': {'queue': 'newsletter'},
+        'jobs.newsletter_tasks.send_bulk_newsletter': {'queue': 'newsletter'},
+        'jobs.newsletter_tasks.send_newsletter_chunk': {'queue': 'newsletter'},
+        'jobs.newsletter_tasks.finalize_newsletter_campaign': {'queue': 'newsletter'},
+        'jobs.newsletter_tasks.resume_stalled_campaigns': {'queue': 'maintenance'},
+        'jobs.email_tasks.send_registration_confirmations': {'queue': 'email'},
+        'jobs.email_tasks.send_pending_emails': {'queue': 'email'},
+        'jobs.export_tasks.run_export_job': {'queue': 'exports'},
+        'jobs.export_tasks.run_document_job': {'queue': 'exports'},
+        'jobs.export_tasks.render_document_chunk': {'queue': 'exports'},
+        'jobs.export_tasks.assemble_document_job': {'queue': 'exports'},
+        'jobs.export_tasks.cleanup_expired_exports': {'queue': 'maintenance'},
+        'jobs.registration_tasks.merge_duplicate_registrations': {'queue': 'maintenance'},
+        'jobs.registration_tasks.send_due_reminders': {'queue': 'email'},
+        'jobs.registration_tasks.send_event_reminder': {'queue': 'email'},
+        'jobs.upload_tasks.cleanup_direct_uploads': {'queue': 'maintenance'},
+        'jobs.room_tasks.refresh_room_usage_rollups': {'queue': 'maintenance'},
+        'jobs.room_tasks.refresh_receivables': {'queue': 'maintenance'},
+        'jobs.room_tasks.refresh_organization_stats': {'queue': 'maintenance'},
     },
     
     # Configuration des workers
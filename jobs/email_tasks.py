@@ -3,16 +3,41 @@ Tâches Celery pour la gestion des emails généraux
 """
 import logging
 from celery import shared_task
-from django.core.mail import EmailMessage, get_connection
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.utils import timezone
 from .models import EmailQueue, EmailTemplate
 from datetime import datetime, timedelta
-from django.db import models
+from django.db import models, transaction
 
 logger = logging.getLogger(__name__)
 
+# Envoi groupé: les emails arrivés pendant ce délai partagent une connexion SMTP
+EMAIL_DISPATCH_DELAY = getattr(settings, 'EMAIL_DISPATCH_DELAY', 5)
+EMAIL_BATCH_SIZE = getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+EMAIL_DISPATCH_LOCK = 'jobs:email_dispatch_scheduled'
+# Délai avant une nouvelle tentative d'un email dont l'envoi a échoué
+EMAIL_RETRY_DELAY = timedelta(minutes=5)
+# Un email « en cours » depuis ce délai a été abandonné par un worker arrêté
+EMAIL_PROCESSING_TIMEOUT = timedelta(minutes=30)
+
+def build_queued_message(email_queue, connection=None):
+    """Message à envoyer pour un email de la file d'attente"""
+    email = EmailMultiAlternatives(
+        subject=email_queue.subject,
+        body=email_queue.html_content,
+        from_email=email_queue.from_email,
+        to=[email_queue.to_email],
+        reply_to=[email_queue.from_email],
+        connection=connection,
+    )
+    email.content_subtype = "html"
+    if email_queue.text_content:
+        email.attach_alternative(email_queue.text_content, "text/plain")
+    return email
+
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def send_email_from_queue(self, email_id):
     """
@@ -28,21 +53,8 @@ def send_email_from_queue(self, email_id):
         # Marquer comme en cours de traitement
         email_queue.mark_as_processing()
         
-        # Créer l'email
-        email = EmailMessage(
-            subject=email_queue.subject,
-            body=email_queue.html_content,
-            from_email=email_queue.from_email,
-            to=[email_queue.to_email],
-            reply_to=[email_queue.from_email],
-        )
-        
-        email.content_subtype = "html"
-        if email_queue.text_content:
-            email.attach_alternative(email_queue.text_content, "text/plain")
-        
-        # Envoyer l'email
-        email.send()
+        # Créer et envoyer l'email
+        build_queued_message(email_queue).send()
         
         # Marquer comme envoyé
         email_queue.mark_as_sent()
@@ -208,3 +220,119 @@ def send_bulk_template_emails(template_name, context_list, from_email=None, prio
     except Exception as e:
         logger.error(f"Erreur lors de la création des emails en masse: {str(e)}")
         raise
+
+def schedule_email_dispatch():
+    """
+    Programme un envoi groupé dans EMAIL_DISPATCH_DELAY secondes, sauf si
+    un envoi est déjà programmé: les emails ajoutés entre-temps partent
+    avec lui
+    """
+    if cache.add(EMAIL_DISPATCH_LOCK, True, EMAIL_DISPATCH_DELAY * 10):
+        send_pending_emails.apply_async(countdown=EMAIL_DISPATCH_DELAY)
+
+def claim_pending_emails(batch_size):
+    """
+    Réserve un lot d'emails prêts (les workers concurrents prennent d'autres
+    lignes), y compris ceux laissés en cours par un worker arrêté
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            EmailQueue.objects.select_for_update(skip_locked=True).filter(
+                models.Q(status='pending') |
+                models.Q(status='processing', updated_at__lt=now - EMAIL_PROCESSING_TIMEOUT),
+                retry_count__lt=models.F('max_retries'),
+            ).filter(
+                models.Q(scheduled_at__isnull=True) |
+                models.Q(scheduled_at__lte=now)
+            ).order_by('-priority', 'created_at')[:batch_size]
+        )
+        if batch:
+            EmailQueue.objects.filter(pk__in=[email.pk for email in batch]).update(
+                status='processing', updated_at=now
+            )
+    return batch
+
+def release_failed_emails(email_ids, error):
+    """
+    Remet en attente, après EMAIL_RETRY_DELAY, les emails qui n'ont pas
+    atteint leur nombre maximal de tentatives; les autres sont échoués
+    """
+    now = timezone.now()
+    return EmailQueue.objects.filter(pk__in=email_ids, status='processing').update(
+        status=models.Case(
+            models.When(retry_count__lt=models.F('max_retries') - 1, then=models.Value('pending')),
+            default=models.Value('failed'),
+        ),
+        scheduled_at=now + EMAIL_RETRY_DELAY,
+        error_message=str(error),
+        retry_count=models.F('retry_count') + 1,
+        updated_at=now,
+    )
+
+@shared_task
+def send_pending_emails(batch_size=EMAIL_BATCH_SIZE):
+    """
+    Envoie les emails en attente par lots, avec une seule connexion SMTP
+    par lot
+    """
+    cache.delete(EMAIL_DISPATCH_LOCK)
+    sent_count = 0
+    failed_count = 0
+    
+    while True:
+        batch = claim_pending_emails(batch_size)
+        if not batch:
+            break
+        
+        sent_ids = []
+        connection = get_connection()
+        try:
+            connection.open()
+            for email_queue in batch:
+                try:
+                    build_queued_message(email_queue, connection=connection).send()
+                    sent_ids.append(email_queue.pk)
+                except Exception as e:
+                    logger.error(f"Erreur lors de l'envoi de l'email {email_queue.id}: {str(e)}")
+                    release_failed_emails([email_queue.pk], e)
+                    failed_count += 1
+        except Exception as e:
+            # Connexion impossible: le reste du lot sera retenté
+            logger.error(f"Erreur de connexion SMTP: {str(e)}")
+            failed_count += release_failed_emails(
+                [email.pk for email in batch if email.pk not in sent_ids], e
+            )
+        finally:
+            connection.close()
+        
+        now = timezone.now()
+        EmailQueue.objects.filter(pk__in=sent_ids).update(status='sent', sent_at=now, updated_at=now)
+        sent_count += len(sent_ids)
+    
+    logger.info(f"Envoi groupé terminé: {sent_count} envoyés, {failed_count} échoués")
+    return {'sent': sent_count, 'failed': failed_count}
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_registration_confirmations(self, registration_ids):
+    """
+    Rend les emails de confirmation d'un lot d'inscriptions, les ajoute à
+    la file d'attente en une insertion puis programme l'envoi groupé
+    """
+    from content_management.confirmations import build_confirmation_emails
+    from content_management.models import EventRegistration
+    
+    try:
+        registrations = EventRegistration.objects.filter(
+            pk__in=registration_ids, form__send_confirmation_email=True
+        ).select_related('form__event')
+        emails = EmailQueue.objects.bulk_create(build_confirmation_emails(registrations))
+        
+        if emails:
+            schedule_email_dispatch()
+        logger.info(f"{len(emails)} email(s) de confirmation d'inscription mis en file d'attente")
+        return len(emails)
+        
+    except Exception as exc:
+        logger.error(f"Erreur lors de la préparation des confirmations d'inscription: {str(exc)}")
+        raise self.retry(exc=exc)
@@ -0,0 +1,273 @@
+"""
+Tâches Celery pour les exports volumineux
+"""
+import logging
+import os
+import tempfile
+from datetime import timedelta
+from celery import chord, shared_task
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import InterfaceError, OperationalError
+from django.db.models import F
+from django.utils import timezone
+from .models import ExportJob
+
+logger = logging.getLogger(__name__)
+
+# Durée de conservation des fichiers d'export (en jours)
+EXPORT_RETENTION_DAYS = getattr(settings, 'EXPORT_RETENTION_DAYS', 7)
+
+# Fréquence de mise à jour du compteur de lignes pendant l'écriture
+PROGRESS_EVERY = 1000
+
+# Base ou stockage momentanément indisponible: l'export est relancé
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, OSError)
+
+
+def counted_rows(job, rows):
+    """Itère sur les lignes en enregistrant la progression par paliers"""
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if count % PROGRESS_EVERY == 0:
+            ExportJob.objects.filter(pk=job.pk).update(row_count=count)
+    job.row_count = count
+
+
+def open_export_file(path, file_format):
+    """Ouvre le fichier temporaire en binaire (xlsx) ou en texte (csv)"""
+    if file_format == 'xlsx':
+        return open(path, 'wb')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=60)
+def run_export_job(self, job_id):
+    """
+    Génère le fichier d'un export et l'enregistre dans le stockage
+    """
+    from content_management.exports import get_export_spec
+
+    try:
+        job = ExportJob.objects.get(id=job_id)
+    except ExportJob.DoesNotExist:
+        logger.error(f"Export {job_id} non trouvé")
+        return False
+
+    # Un nouvel essai reprend l'export laissé en cours par l'essai précédent
+    resumable = ('pending', 'processing') if self.request.retries else ('pending',)
+    if job.status not in resumable:
+        logger.warning(f"Export {job_id} ignoré (statut: {job.status})")
+        return False
+
+    job.task_id = self.request.id or ''
+    job.mark_as_processing()
+
+    fd, path = tempfile.mkstemp(suffix=f'.{job.file_format}')
+    os.close(fd)
+    try:
+        spec = get_export_spec(job.export_type, job.params)
+        job.total_rows = spec.count()
+        ExportJob.objects.filter(pk=job.pk).update(total_rows=job.total_rows, task_id=job.task_id)
+
+        # Le fichier est écrit sur disque lot par lot puis envoyé au stockage
+        with open_export_file(path, job.file_format) as fileobj:
+            spec.write(fileobj, job.file_format, rows=counted_rows(job, spec.iter_rows()))
+
+        with open(path, 'rb') as fileobj:
+            job.file.save(spec.get_filename(job.file_format), File(fileobj), save=False)
+        job.file_size = os.path.getsize(path)
+        job.mark_as_completed(EXPORT_RETENTION_DAYS)
+
+        logger.info(f"Export {job_id} terminé: {job.row_count} lignes")
+        return True
+
+    except Exception as exc:
+        if isinstance(exc, TRANSIENT_ERRORS) and self.request.retries < self.max_retries:
+            logger.warning(f"Export {job_id} interrompu, nouvel essai: {str(exc)}")
+            raise self.retry(exc=exc)
+        logger.error(f"Erreur lors de l'export {job_id}: {str(exc)}")
+        job.mark_as_failed(str(exc))
+        return False
+
+    finally:
+        os.unlink(path)
+
+
+def document_chunk_dir(job_id):
+    return f'exports/tmp/{job_id}'
+
+
+def discard_document_chunks(job_id):
+    """Supprime les lots de pages intermédiaires d'un export de documents"""
+    directory = document_chunk_dir(job_id)
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(f'{directory}/{name}')
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=60)
+def run_document_job(self, job_id):
+    """
+    Génère les badges ou attestations d'un événement: le rendu est réparti
+    en tâches par lots de participants (chord), puis assemblé en un fichier
+    """
+    from content_management.badges import (
+        DOCUMENT_CHUNK_SIZE, chunked, document_queryset, document_rows, event_info,
+    )
+    from content_management.models import Event
+
+    try:
+        job = ExportJob.objects.get(id=job_id)
+    except ExportJob.DoesNotExist:
+        logger.error(f"Export {job_id} non trouvé")
+        return False
+
+    if job.status != 'pending':
+        logger.warning(f"Export {job_id} ignoré (statut: {job.status})")
+        return False
+
+    job.task_id = self.request.id or ''
+    job.mark_as_processing()
+
+    try:
+        event = Event.objects.select_related('registration_form').get(pk=job.params['event_pk'])
+        kind = job.params['kind']
+        rows = document_rows(document_queryset(event, kind, job.params.get('checked_in_only')))
+        if not rows:
+            raise ValueError("Aucun participant ne correspond à cette génération")
+        ExportJob.objects.filter(pk=job.pk).update(total_rows=len(rows), task_id=job.task_id)
+
+        info = event_info(event)
+        chunk_size = job.params.get('chunk_size', DOCUMENT_CHUNK_SIZE)
+        # Un lot en échec (exception, limite de temps, worker perdu) n'appelle pas
+        # l'assemblage: l'errback marque l'export échoué et supprime ses lots
+        chord(
+            render_document_chunk.s(job.pk, index, kind, info, chunk)
+            for index, chunk in enumerate(chunked(rows, chunk_size))
+        )(assemble_document_job.s(job.pk).on_error(fail_document_job.s(job.pk)))
+        return True
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de la génération des documents {job_id}: {str(exc)}")
+        job.mark_as_failed(str(exc))
+        # Chord exécuté sur place (mode eager): les lots déjà rendus sont supprimés ici
+        discard_document_chunks(job_id)
+        return False
+
+
+@shared_task
+def render_document_chunk(job_id, index, kind, info, rows):
+    """
+    Rend un lot de pages et l'enregistre dans le stockage pour l'assemblage
+    """
+    from content_management.badges import render_pages, write_page_chunk
+
+    try:
+        buffer = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+        write_page_chunk(buffer, rows, render_pages(kind, info, rows))
+        buffer.seek(0)
+        # Un autre lot a déjà fait échouer l'export: ses lots ont été supprimés
+        if ExportJob.objects.filter(pk=job_id, status='failed').exists():
+            return None
+        path = default_storage.save(f'{document_chunk_dir(job_id)}/{index:05d}.zip', File(buffer))
+        ExportJob.objects.filter(pk=job_id).update(row_count=F('row_count') + len(rows))
+        return path
+
+    except Exception as exc:
+        logger.error(f"Erreur lors du rendu du lot {index} de l'export {job_id}: {str(exc)}")
+        raise
+
+
+@shared_task
+def fail_document_job(request, exc, traceback, job_id):
+    """
+    Errback du chord des documents: marque l'export échoué et supprime ses lots
+    """
+    logger.error(f"Échec d'un lot de l'export {job_id}: {str(exc)}")
+    ExportJob.objects.filter(pk=job_id, status__in=['pending', 'processing']).update(
+        status='failed', error_message=str(exc), completed_at=timezone.now(), updated_at=timezone.now()
+    )
+    discard_document_chunks(job_id)
+
+
+@shared_task
+def assemble_document_job(chunk_paths, job_id):
+    """
+    Assemble les lots de pages, dans l'ordre, en un PDF ou une archive ZIP
+    """
+    from content_management.badges import DocumentWriter, get_document_filename, read_page_chunk
+    from content_management.models import Event
+
+    job = ExportJob.objects.get(id=job_id)
+    fd, path = tempfile.mkstemp(suffix=f'.{job.file_format}')
+    os.close(fd)
+    try:
+        with open(path, 'wb') as fileobj:
+            writer = DocumentWriter(fileobj, job.params['kind'], job.file_format)
+            for chunk_path in chunk_paths:
+                with default_storage.open(chunk_path, 'rb') as chunk:
+                    for row, jpeg in read_page_chunk(chunk):
+                        writer.add(row, jpeg)
+            writer.close()
+
+        event = Event.objects.get(pk=job.params['event_pk'])
+        with open(path, 'rb') as fileobj:
+            job.file.save(get_document_filename(event, job.params['kind'], job.file_format), File(fileobj), save=False)
+        job.file_size = os.path.getsize(path)
+        job.row_count = job.total_rows
+        job.mark_as_completed(EXPORT_RETENTION_DAYS)
+
+        logger.info(f"Export {job_id} terminé: {job.row_count} documents")
+        return True
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de l'assemblage des documents {job_id}: {str(exc)}")
+        job.mark_as_failed(str(exc))
+        return False
+
+    finally:
+        os.unlink(path)
+        discard_document_chunks(job_id)
+
+
+@shared_task
+def cleanup_expired_exports(batch_size=200):
+    """
+    Supprime les fichiers des exports expirés et les exports échoués anciens
+    """
+    now = timezone.now()
+    expired_count = 0
+
+    try:
+        expired = ExportJob.objects.filter(status='completed', expires_at__lt=now)
+        while True:
+            batch = list(expired.order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for job in batch:
+                if job.file:
+                    job.file.delete(save=False)
+            ExportJob.objects.filter(pk__in=[job.pk for job in batch]).update(
+                status='expired', file='', file_size=0, updated_at=now
+            )
+            expired_count += len(batch)
+
+        # Les exports échoués n'ont pas de fichier, on supprime les lignes
+        cutoff_date = now - timedelta(days=EXPORT_RETENTION_DAYS)
+        deleted_count, _ = ExportJob.objects.filter(
+            status__in=['failed', 'expired'], updated_at__lt=cutoff_date
+        ).delete()
+
+        logger.info(f"Nettoyage des exports: {expired_count} expirés, {deleted_count} supprimés")
+        return {'expired': expired_count, 'deleted': deleted_count}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du nettoyage des exports: {str(e)}")
+        return {'expired': expired_count, 'error': str(e)}
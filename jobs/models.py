@@ -1,4 +1,6 @@
+from datetime import timedelta
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -201,3 +203,91 @@ class EmailQueue(models.Model):
             self.save()
             return True
         return False
+
+class ExportJob(models.Model):
+    """
+    Modèle pour suivre les exports exécutés en tâche de fond
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('processing', 'En cours de traitement'),
+        ('completed', 'Terminé'),
+        ('failed', 'Échoué'),
+        ('expired', 'Expiré'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+        ('pdf', 'PDF'),
+        ('zip', 'Archive ZIP'),
+    ]
+    
+    export_type = models.CharField(max_length=50)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_rows = models.PositiveIntegerField(default=0)
+    row_count = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    file_size = models.PositiveBigIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    task_id = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='export_jobs'
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Export"
+        verbose_name_plural = "Exports"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', '-created_at']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.export_type} ({self.get_status_display()})"
+    
+    @property
+    def is_ready(self):
+        """Vérifie si le fichier est disponible au téléchargement"""
+        return self.status == 'completed' and bool(self.file)
+    
+    @property
+    def progress(self):
+        """Pourcentage de lignes écrites"""
+        if self.status == 'completed':
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, int(self.row_count * 100 / self.total_rows))
+    
+    def mark_as_processing(self):
+        """Marque l'export comme en cours de traitement"""
+        self.status = 'processing'
+        self.started_at = timezone.now()
+        self.save(update_fields=['status', 'started_at', 'updated_at'])
+    
+    def mark_as_completed(self, retention_days):
+        """Marque l'export comme terminé et fixe sa date d'expiration"""
+        self.status = 'completed'
+        self.completed_at = timezone.now()
+        self.expires_at = self.completed_at + timedelta(days=retention_days)
+        self.save()
+    
+    def mark_as_failed(self, error_message=""):
+        """Marque l'export comme échoué"""
+        self.status = 'failed'
+        self.error_message = error_message
+        self.completed_at = timezone.now()
+        self.save()
@@ -2,7 +2,7 @@
 Tâches Celery spécifiques pour la gestion des newsletters
 """
 import logging
-from celery import shared_task
+from celery import chord, shared_task
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.conf import settings
@@ -75,80 +75,106 @@ def send_newsletter_email(self, campaign_id, subscriber_email, subscriber_name=N
         # Retry avec backoff exponentiel
         raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
 
-@shared_task(bind=True, max_retries=3, default_retry_delay=300)
-def send_bulk_newsletter(self, campaign_id):
+def dispatch_campaign(campaign_id, resume=False):
     """
-    Envoie une newsletter en masse à tous les abonnés actifs
+    Répartit les abonnés de la campagne en lots et lance un chord: une tâche
+    par lot, puis la clôture de la campagne quand tous les lots sont traités
     """
+    from content_management.campaigns import (
+        CampaignNotSendable, finalize_campaign, plan_campaign_chunks, start_campaign, unfinished_chunk_ids,
+    )
+
     try:
-        campaign = NewsletterCampaign.objects.get(id=campaign_id)
-        
-        if not campaign.can_be_sent:
-            logger.warning(f"Campagne {campaign.title} ne peut pas être envoyée")
-            return False
-        
-        # Marquer la campagne comme en cours d'envoi
-        campaign.status = 'sending'
-        campaign.started_at = timezone.now()
-        campaign.save()
-        
-        # Récupérer tous les abonnés actifs
-        subscribers = Newsletter.objects.filter(is_active=True)
-        
-        if campaign.target_language:
-            subscribers = subscribers.filter(language=campaign.target_language)
-        
-        if campaign.target_active_only:
-            subscribers = subscribers.filter(is_active=True)
-        
-        total_subscribers = subscribers.count()
-        sent_count = 0
-        failed_count = 0
-        
-        logger.info(f"Début de l'envoi de la campagne {campaign.title} à {total_subscribers} abonnés")
-        
-        # Envoyer les emails par petits lots pour éviter la surcharge
-        batch_size = 50
-        for i in range(0, total_subscribers, batch_size):
-            batch = subscribers[i:i + batch_size]
-            
-            for subscriber in batch:
-                try:
-                    # Créer une tâche individuelle pour chaque email
-                    send_newsletter_email.delay(campaign_id, subscriber.email, subscriber.name)
-                    sent_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Erreur lors de l'envoi à {subscriber.email}: {str(e)}")
-                    failed_count += 1
-            
-            # Pause entre les lots pour éviter la surcharge
-            if i + batch_size < total_subscribers:
-                import time
-                time.sleep(1)
-        
-        # Mettre à jour les statistiques finales
-        campaign.sent_count = sent_count
-        campaign.failed_count = failed_count
-        campaign.status = 'completed'
-        campaign.completed_at = timezone.now()
-        campaign.save()
-        
-        logger.info(f"Campagne {campaign.title} terminée: {sent_count} envoyés, {failed_count} échecs")
-        return True
-        
+        campaign = start_campaign(campaign_id, resume=resume)
     except NewsletterCampaign.DoesNotExist:
         logger.error(f"Campagne {campaign_id} non trouvée")
-        raise
+        return None
+    except CampaignNotSendable as exc:
+        logger.warning(str(exc))
+        return None
+
+    created = plan_campaign_chunks(campaign)
+    chunk_ids = unfinished_chunk_ids(campaign)
+    logger.info(
+        f"Campagne {campaign.title}: {created} lot(s) créé(s), {len(chunk_ids)} lot(s) à envoyer"
+    )
+    if not chunk_ids:
+        # Aucun destinataire, ou tous les lots déjà envoyés
+        finalize_campaign(campaign_id)
+        return 0
+    chord(send_newsletter_chunk.si(chunk_id) for chunk_id in chunk_ids)(
+        finalize_newsletter_campaign.si(campaign_id)
+    )
+    return len(chunk_ids)
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def send_bulk_newsletter(self, campaign_id, resume=False):
+    """
+    Envoie une newsletter à tous les abonnés ciblés, par lots (voir
+    content_management.campaigns); resume reprend une campagne interrompue
+    """
+    try:
+        return dispatch_campaign(campaign_id, resume=resume)
+
     except Exception as exc:
-        logger.error(f"Erreur lors de l'envoi en masse de la campagne {campaign_id}: {str(exc)}")
-        # Marquer la campagne comme échouée
-        try:
-            campaign.status = 'failed'
-            campaign.save()
-        except:
-            pass
-        raise self.retry(exc=exc, countdown=300 * (2 ** self.request.retries))
+        logger.error(f"Erreur lors de la répartition de la campagne {campaign_id}: {str(exc)}")
+        # Le curseur de répartition est conservé: la nouvelle tentative reprend au lot suivant
+        raise self.retry(exc=exc, args=(campaign_id,), kwargs={'resume': True})
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_newsletter_chunk(self, chunk_id):
+    """
+    Envoie un lot de destinataires avec une seule connexion SMTP. Le lot est
+    marqué échoué après la dernière tentative, sans interrompre le chord
+    """
+    from content_management.campaigns import deliver_chunk, fail_chunk, release_chunk
+
+    try:
+        result = deliver_chunk(chunk_id)
+        if result is not None:
+            logger.info(f"Lot {chunk_id}: {result[0]} envoyé(s), {result[1]} échec(s)")
+        return result
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de l'envoi du lot {chunk_id}: {str(exc)}")
+        if self.request.retries >= self.max_retries:
+            fail_chunk(chunk_id, exc)
+            return None
+        release_chunk(chunk_id)
+        raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+
+
+@shared_task
+def finalize_newsletter_campaign(campaign_id):
+    """
+    Clôt la campagne une fois tous ses lots traités: statistiques, statut
+    et date de fin
+    """
+    from content_management.campaigns import finalize_campaign
+
+    status = finalize_campaign(campaign_id)
+    if status:
+        logger.info(f"Campagne {campaign_id} clôturée: {status}")
+    return status
+
+
+@shared_task
+def resume_stalled_campaigns():
+    """
+    Reprend les campagnes en cours d'envoi dont aucun lot n'a progressé
+    depuis CHUNK_STALE_AFTER (worker arrêté, message perdu)
+    """
+    from content_management.campaigns import stalled_campaign_ids
+
+    campaign_ids = stalled_campaign_ids()
+    for campaign_id in campaign_ids:
+        send_bulk_newsletter.delay(campaign_id, resume=True)
+    if campaign_ids:
+        logger.info(f"{len(campaign_ids)} campagne(s) interrompue(s) reprise(s)")
+    return campaign_ids
+
 
 @shared_task
 def send_scheduled_newsletter():
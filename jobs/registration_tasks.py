@@ -0,0 +1,114 @@
+"""
+Tâches Celery liées aux inscriptions aux événements
+"""
+import logging
+from datetime import timedelta
+from celery import shared_task
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Un rappel « en cours d'envoi » depuis plus longtemps est repris au curseur
+REMINDER_STALE_AFTER = timedelta(hours=1)
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=300)
+def merge_duplicate_registrations(self, form_id=None, batch_size=100):
+    """
+    Fusionne par lots les inscriptions en double des formulaires qui
+    n'autorisent pas les inscriptions multiples
+    """
+    from content_management.dedup import merge_form_duplicates
+    from content_management.models import EventRegistrationForm
+
+    # Seuls les formulaires ayant des inscriptions sans clé peuvent contenir des doublons
+    forms = EventRegistrationForm.objects.filter(
+        allow_multiple_registrations=False,
+        registrations__dedup_key__isnull=True,
+    ).distinct()
+    if form_id is not None:
+        forms = forms.filter(pk=form_id)
+
+    results = {}
+    try:
+        for registration_form in forms:
+            merged = merge_form_duplicates(registration_form, batch_size=batch_size)
+            results[registration_form.pk] = merged
+            if merged:
+                logger.info(f"Formulaire {registration_form.pk}: {merged} inscription(s) en double fusionnée(s)")
+        return results
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de la fusion des doublons: {str(exc)}")
+        raise self.retry(exc=exc)
+
+
+
+@shared_task
+def send_due_reminders():
+    """
+    Synchronise les rappels des événements à venir et lance une tâche par
+    rappel dû (et non par inscrit)
+    """
+    from content_management.models import EventReminder
+    from content_management.reminders import due_reminders, sync_upcoming_reminders
+
+    now = timezone.now()
+    sync_upcoming_reminders(now)
+    reminder_ids = [reminder.pk for reminder in due_reminders(now)]
+    # Envois interrompus (worker arrêté): reprise au curseur
+    reminder_ids += list(EventReminder.objects.filter(
+        status='sending', started_at__lt=now - REMINDER_STALE_AFTER
+    ).values_list('pk', flat=True))
+
+    for reminder_id in reminder_ids:
+        send_event_reminder.delay(reminder_id)
+    if reminder_ids:
+        logger.info(f"{len(reminder_ids)} rappel(s) d'événement lancé(s)")
+    return reminder_ids
+
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=300)
+def send_event_reminder(self, reminder_id, batch_size=500):
+    """
+    Ajoute à la file d'attente les emails d'un rappel, par lots d'inscrits
+    confirmés, puis programme l'envoi groupé
+    """
+    from content_management.models import EventReminder
+    from content_management.reminders import event_start, queue_reminder_batch
+    from jobs.email_tasks import schedule_email_dispatch
+
+    now = timezone.now()
+    # Réservation du rappel: un seul worker le traite
+    claimed = EventReminder.objects.filter(pk=reminder_id).filter(
+        Q(status='pending') | Q(status='sending', started_at__lt=now - REMINDER_STALE_AFTER)
+    ).update(status='sending', started_at=now)
+    if not claimed:
+        return 0
+
+    reminder = EventReminder.objects.select_related('form__event').get(pk=reminder_id)
+    if event_start(reminder.form.event) <= now:
+        EventReminder.objects.filter(pk=reminder_id).update(status='skipped', completed_at=now)
+        return 0
+
+    try:
+        rendered = {}
+        queued = 0
+        while True:
+            count = queue_reminder_batch(reminder, rendered, batch_size=batch_size)
+            if not count:
+                break
+            queued += count
+            # Les emails partent pendant que les lots suivants sont préparés
+            schedule_email_dispatch()
+
+        EventReminder.objects.filter(pk=reminder_id).update(status='sent', completed_at=timezone.now())
+        logger.info(f"Rappel {reminder_id}: {reminder.sent_count} email(s) mis en file d'attente")
+        return queued
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de l'envoi du rappel {reminder_id}: {str(exc)}")
+        # Le curseur est conservé: la nouvelle tentative reprend au lot suivant
+        EventReminder.objects.filter(pk=reminder_id).update(status='pending')
+        raise self.retry(exc=exc)
@@ -0,0 +1,63 @@
+"""
+Tâches Celery liées aux salles de conférence
+"""
+import logging
+from celery import shared_task
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=300)
+def refresh_room_usage_rollups(self, room_ids=None, full=False):
+    """
+    Recalcule les agrégats d'occupation et de revenus des salles marqués
+    ou manquants (tous ceux de la fenêtre suivie si full)
+    """
+    from content_management.room_usage import refresh_room_usage
+
+    try:
+        refreshed = refresh_room_usage(room_ids, full=full)
+        if refreshed:
+            logger.info(f"Agrégats d'occupation recalculés pour {refreshed} mois de salle")
+        return refreshed
+
+    except Exception as exc:
+        logger.error(f"Erreur lors du recalcul des agrégats d'occupation: {str(exc)}")
+        raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=300)
+def refresh_receivables(self):
+    """
+    Recalcule les créances de toutes les organisations: l'ancienneté des
+    soldes avance chaque jour même sans nouveau paiement
+    """
+    from content_management.ledger import refresh_receivables as refresh
+
+    try:
+        refreshed = refresh()
+        logger.info(f"Créances recalculées pour {refreshed} organisation(s)")
+        return refreshed
+
+    except Exception as exc:
+        logger.error(f"Erreur lors du recalcul des créances: {str(exc)}")
+        raise self.retry(exc=exc)
+
+
+@shared_task(bind=True, max_retries=2, default_retry_delay=300)
+def refresh_organization_stats(self, full=False):
+    """
+    Met à jour l'historique des organisations dont la prochaine réservation
+    a commencé (toutes si full)
+    """
+    from content_management.organizations import refresh_organization_stats as refresh, refresh_started_bookings
+
+    try:
+        refreshed = refresh() if full else refresh_started_bookings()
+        if refreshed:
+            logger.info(f"Historique des réservations mis à jour pour {refreshed} organisation(s)")
+        return refreshed
+
+    except Exception as exc:
+        logger.error(f"Erreur lors de la mise à jour de l'historique des organisations: {str(exc)}")
+        raise self.retry(exc=exc)
@@ -3,6 +3,7 @@ from celery import shared_task
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import models
 from django.utils import timezone
 from content_management.models import Newsletter, NewsletterCampaign
 from datetime import datetime, timedelta
@@ -145,77 +146,29 @@ def send_user_creation_email(self, user_id, password):
 
 
 @shared_task(bind=True)
-def send_bulk_newsletter(self, campaign_id, template_name='newsletter_default.html'):
+def send_bulk_newsletter(self, campaign_id, template_name=None, resume=False):
     """
-    Envoyer une newsletter en masse à tous les abonnés actifs
+    Envoyer une newsletter en masse à tous les abonnés ciblés: la campagne
+    est répartie en lots envoyés par jobs.newsletter_tasks (chord), et
+    n'est marquée terminée qu'une fois tous les lots traités
     """
+    from .newsletter_tasks import dispatch_campaign
+
     try:
-        campaign = NewsletterCampaign.objects.get(id=campaign_id)
-        
-        # Récupérer tous les abonnés actifs
-        active_newsletters = Newsletter.objects.filter(is_active=True)
-        
-        total_subscribers = active_newsletters.count()
-        sent_count = 0
-        failed_count = 0
-        
-        logger.info(f"Début de l'envoi en masse pour la campagne {campaign.title} à {total_subscribers} abonnés")
-        
-        # Mettre à jour le statut de la campagne
-        campaign.status = 'sending'
-        campaign.started_at = timezone.now()
-        campaign.save()
-        
-        # Envoyer à chaque abonné
-        for newsletter in active_newsletters:
-            try:
-                # Utiliser la tâche individuelle
-                result = send_newsletter_email.delay(
-                    newsletter.id, 
-                    campaign.id, 
-                    template_name
-                )
-                
-                if result.get('success'):
-                    sent_count += 1
-                else:
-                    failed_count += 1
-                    
-            except Exception as e:
-                logger.error(f"Erreur lors de l'envoi à {newsletter.email}: {e}")
-                failed_count += 1
-        
-        # Mettre à jour le statut final de la campagne
-        campaign.status = 'completed'
-        campaign.completed_at = timezone.now()
-        campaign.sent_count = sent_count
-        campaign.failed_count = failed_count
-        campaign.save()
-        
-        logger.info(f"Campagne {campaign.title} terminée: {sent_count} envoyés, {failed_count} échecs")
-        
+        chunks = dispatch_campaign(campaign_id, resume=resume)
+        if chunks is None:
+            return {'success': False, 'error': "La campagne ne peut pas être envoyée"}
         return {
             'success': True,
             'campaign_id': campaign_id,
-            'total_subscribers': total_subscribers,
-            'sent_count': sent_count,
-            'failed_count': failed_count,
-            'completed_at': timezone.now().isoformat()
+            'chunks': chunks,
+            'dispatched_at': timezone.now().isoformat()
         }
         
-    except NewsletterCampaign.DoesNotExist:
-        logger.error(f"Campagne newsletter {campaign_id} non trouvée")
-        return {'success': False, 'error': 'Campagne non trouvée'}
-        
     except Exception as exc:
         logger.error(f"Erreur lors de l'envoi en masse: {exc}")
-        # Mettre à jour le statut en cas d'erreur
-        try:
-            campaign = NewsletterCampaign.objects.get(id=campaign_id)
-            campaign.status = 'failed'
-            campaign.save()
-        except:
-            pass
+        # Le curseur de répartition est conservé: la campagne peut être reprise (resume=True)
+        NewsletterCampaign.objects.filter(id=campaign_id, status='sending').update(status='failed')
         return {'success': False, 'error': str(exc)}
 
 
@@ -232,9 +185,9 @@ def send_scheduled_newsletter(self, campaign_id):
             logger.info(f"Envoi de la newsletter programmée: {campaign.title}")
             
             # Utiliser la tâche d'envoi en masse
-            result = send_bulk_newsletter.delay(campaign_id, campaign.template_name)
+            result = send_bulk_newsletter.delay(campaign_id)
             
-            return result
+            return {'success': True, 'task_id': result.id}
         else:
             logger.info(f"Newsletter {campaign.title} pas encore programmée pour l'envoi")
             return {'success': False, 'message': 'Pas encore programmée'}
@@ -0,0 +1,44 @@
+"""
+Tâches Celery pour les envois directs vers le stockage
+"""
+import logging
+from celery import shared_task
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def cleanup_direct_uploads(batch_size=200):
+    """
+    Supprime les envois directs expirés: les envois inachevés sont annulés
+    (morceaux temporaires, envoi multipart S3) et les fichiers terminés mais
+    jamais rattachés à un modèle sont supprimés du stockage
+    """
+    from content_management.models import DirectUpload
+    from content_management.uploads import get_upload_backend
+
+    expired = DirectUpload.objects.filter(
+        status__in=['pending', 'completed', 'failed'], expires_at__lt=timezone.now()
+    ).order_by('pk')
+    deleted_count = 0
+
+    try:
+        while True:
+            batch = list(expired[:batch_size])
+            if not batch:
+                break
+            for upload in batch:
+                try:
+                    get_upload_backend(upload.backend).discard(upload, delete_file=True)
+                except Exception as e:
+                    logger.warning(f"Envoi {upload.token}: nettoyage du stockage impossible ({str(e)})")
+            DirectUpload.objects.filter(pk__in=[upload.pk for upload in batch]).delete()
+            deleted_count += len(batch)
+
+        logger.info(f"Nettoyage des envois directs: {deleted_count} supprimés")
+        return {'deleted': deleted_count}
+
+    except Exception as e:
+        logger.error(f"Erreur lors du nettoyage des envois directs: {str(e)}")
+        return {'deleted': deleted_count, 'error': str(e)}
@@ -52,6 +52,14 @@ urlpatterns = [
     path('api/personnas/<slug:slug>/blogs/', views.persona_blogs_api, name='personna_blogs_api'),
     path('api/blogs/<slug:slug>/', views.blog_detail_api, name='blog_detail_api'),
     
+    # API du programme des événements
+    path('api/evenements/<slug:slug>/programme/', views.event_agenda_api, name='event_agenda_api'),
+    
+    # Flux iCalendar
+    path('calendrier/evenements.ics', views.events_ics, name='events_ics'),
+    path('calendrier/evenements/<slug:slug>.ics', views.event_ics, name='event_ics'),
+    path('calendrier/salles/<slug:slug>.ics', views.room_ics, name='room_ics'),
+    
     # API pour la newsletter
     path('api/newsletter/subscribe/', views.newsletter_subscribe, name='newsletter_subscribe'),
     path('api/newsletter/unsubscribe/', views.newsletter_unsubscribe, name='newsletter_unsubscribe'),
@@ -2,13 +2,18 @@ from django.shortcuts import render, get_object_or_404
 from django.contrib import messages
 from django.db.models import Q
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from content_management.agenda import filter_agenda, get_event_agenda, make_etag
+from content_management.calendars import ICS_CONTENT_TYPE, event_feed, events_feed, room_feed
+from content_management.facets import browse_events
 from content_management.models import (
     Article, Event, Program, Project, Partner, TeamMember, 
     Personna, Blog, SiteSettings, AboutPage, CityDistrict, CoreValue, Newsletter,
-    Category, HeroStatistic, Achievement
+    Category, HeroStatistic, Achievement, ConferenceRoom
 )
 
 def home(request):
@@ -274,11 +279,11 @@ def article_detail(request, slug):
     return render(request, 'sfront/article_detail.html', context)
 
 def events(request):
-    """Page Événements"""
-    events_list = Event.objects.filter(status='published').order_by('-start_date')
+    """Page Événements, filtrable par facettes"""
+    browse = browse_events(request.GET)
     
     # Pagination
-    paginator = Paginator(events_list, 12)
+    paginator = Paginator(browse['events'], 12)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
@@ -286,6 +291,10 @@ def events(request):
         'page_title': 'Événements',
         'page_obj': page_obj,
         'events': page_obj,
+        'facets': browse['facets'],
+        'filters': browse['filters'],
+        'total_events': browse['total'],
+        'now': timezone.localdate(),
     }
     return render(request, 'sfront/events.html', context)
 
@@ -609,6 +618,70 @@ def personnas_api(request):
         }, status=500)
 
 
+@require_http_methods(["GET", "HEAD"])
+def event_agenda_api(request, slug):
+    """API du programme d'un événement (jours, activités, intervenants)
+
+    Filtres optionnels: ?day=<numéro du jour ou AAAA-MM-JJ>&type=<type>[,<type>...]
+    """
+    event = get_object_or_404(
+        Event.objects.only('pk', 'slug', 'title', 'start_date', 'end_date', 'location'),
+        slug=slug, status='published'
+    )
+    cached = get_event_agenda(event)
+    
+    day = request.GET.get('day', '').strip()
+    activity_types = [value for value in request.GET.get('type', '').split(',') if value]
+    etag = cached['etag']
+    if day or activity_types:
+        etag = make_etag(f"{etag}:{day}:{','.join(sorted(activity_types))}".encode())
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        if day or activity_types:
+            response = JsonResponse(filter_agenda(cached['agenda'], day, activity_types))
+        else:
+            response = HttpResponse(cached['content'], content_type='application/json')
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Language'])
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def calendar_response(request, feed, filename):
+    """Réponse ICS en flux, ou 304 si le client possède déjà cette version"""
+    last_modified = int(feed.last_modified.timestamp()) if feed.last_modified else None
+    response = get_conditional_response(request, etag=feed.etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(feed.chunks(), content_type=ICS_CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = feed.etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=300)
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def events_ics(request):
+    """Flux iCalendar de tous les événements publics"""
+    return calendar_response(request, events_feed(), 'evenements-csig.ics')
+
+
+@require_http_methods(["GET", "HEAD"])
+def event_ics(request, slug):
+    """Flux iCalendar d'un événement et de son programme"""
+    event = get_object_or_404(Event, slug=slug, status='published', is_public=True)
+    return calendar_response(request, event_feed(event), f'{event.slug}.ics')
+
+
+@require_http_methods(["GET", "HEAD"])
+def room_ics(request, slug):
+    """Flux iCalendar des réservations confirmées d'une salle"""
+    room = get_object_or_404(ConferenceRoom, slug=slug, is_active=True)
+    return calendar_response(request, room_feed(room), f'salle-{room.slug}.ics')
+
+
 @require_http_methods(["GET"])
 def persona_blogs_api(request, slug):
     """API pour récupérer les blogs d'une personnalité"""
@@ -0,0 +1,172 @@
+/**
+ * Envoi direct des fichiers vers le stockage (S3 ou remplaçant local).
+ *
+ * Les champs fichier portant l'attribut data-direct-upload sont envoyés dès
+ * leur sélection, par morceaux, sans passer par la soumission du formulaire.
+ * Le jeton de l'envoi terminé est placé dans le champ caché indiqué par
+ * data-upload-input et le champ fichier est vidé. Un envoi interrompu reprend
+ * aux morceaux manquants.
+ */
+(function () {
+    'use strict';
+
+    const MAX_ATTEMPTS = 3;
+
+    function csrfToken(form) {
+        const input = form && form.querySelector('[name=csrfmiddlewaretoken]');
+        if (input) {
+            return input.value;
+        }
+        const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+        return match ? decodeURIComponent(match[1]) : '';
+    }
+
+    function resumeKey(input, file) {
+        return ['direct-upload', input.dataset.directUpload, file.name, file.size, file.lastModified].join(':');
+    }
+
+    async function postJSON(url, payload, form) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', 'X-CSRFToken': csrfToken(form)},
+            body: JSON.stringify(payload || {}),
+            credentials: 'same-origin',
+        });
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || response.status);
+        }
+        return data;
+    }
+
+    async function withRetry(action) {
+        for (let attempt = 1; ; attempt++) {
+            try {
+                return await action();
+            } catch (error) {
+                if (attempt >= MAX_ATTEMPTS) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+            }
+        }
+    }
+
+    async function sendParts(session, file, uploaded, onProgress) {
+        let sent = uploaded.length * session.chunk_size;
+        for (const part of session.parts) {
+            if (uploaded.includes(part.number)) {
+                continue;
+            }
+            const start = (part.number - 1) * session.chunk_size;
+            const chunk = file.slice(start, Math.min(start + session.chunk_size, file.size));
+            await withRetry(async () => {
+                const response = await fetch(part.url, {method: 'PUT', body: chunk});
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+            });
+            sent += chunk.size;
+            onProgress(Math.min(sent, file.size));
+        }
+    }
+
+    async function sendPost(session, file) {
+        const body = new FormData();
+        Object.entries(session.fields).forEach(([name, value]) => body.append(name, value));
+        body.append('file', file);
+        await withRetry(async () => {
+            const response = await fetch(session.url, {method: 'POST', body: body});
+            if (!response.ok) {
+                throw new Error(response.status);
+            }
+        });
+    }
+
+    async function upload(input, file, onProgress) {
+        const form = input.form;
+        const key = resumeKey(input, file);
+        let session = JSON.parse(sessionStorage.getItem(key) || 'null');
+        let uploaded = [];
+
+        if (session) {
+            // Reprise: on ne renvoie que les morceaux manquants
+            try {
+                const status = await (await fetch(session.status_url, {credentials: 'same-origin'})).json();
+                if (status.status === 'completed') {
+                    return session.token;
+                }
+                uploaded = status.status === 'pending' ? status.uploaded_parts : null;
+            } catch (error) {
+                uploaded = null;
+            }
+            if (uploaded === null) {
+                session = null;
+                uploaded = [];
+            }
+        }
+        if (!session) {
+            session = await postJSON(input.dataset.uploadStartUrl, {
+                target: input.dataset.directUpload,
+                filename: file.name,
+                content_type: file.type || 'application/octet-stream',
+                size: file.size,
+            }, form);
+            if (session.method === 'put') {
+                sessionStorage.setItem(key, JSON.stringify(session));
+            }
+        }
+
+        if (session.method === 'post') {
+            await sendPost(session, file);
+        } else {
+            await sendParts(session, file, uploaded, onProgress);
+        }
+        await withRetry(() => postJSON(session.complete_url, {}, form));
+        sessionStorage.removeItem(key);
+        return session.token;
+    }
+
+    function setup(input) {
+        const hidden = document.getElementById(input.dataset.uploadInput);
+        const status = document.createElement('div');
+        status.className = 'form-text direct-upload-status';
+        input.insertAdjacentElement('afterend', status);
+        let pending = null;
+
+        input.addEventListener('change', function () {
+            const file = input.files[0];
+            if (!file || !hidden) {
+                return;
+            }
+            hidden.value = '';
+            status.textContent = 'Envoi en cours… 0 %';
+            pending = upload(input, file, sent => {
+                status.textContent = 'Envoi en cours… ' + Math.round(sent * 100 / file.size) + ' %';
+            }).then(token => {
+                hidden.value = token;
+                // Le fichier est déjà stocké: il ne doit pas être renvoyé avec le formulaire
+                input.value = '';
+                input.required = false;
+                status.textContent = 'Fichier envoyé : ' + file.name;
+            }).catch(error => {
+                status.textContent = "Échec de l'envoi (" + error.message + '). Sélectionnez à nouveau le fichier pour reprendre.';
+            }).finally(() => {
+                pending = null;
+            });
+        });
+
+        if (input.form) {
+            input.form.addEventListener('submit', function (event) {
+                if (pending) {
+                    event.preventDefault();
+                    status.textContent = "Veuillez patienter jusqu'à la fin de l'envoi.";
+                }
+            });
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('input[type=file][data-direct-upload]').forEach(setup);
+    });
+})();
@@ -0,0 +1,73 @@
+/**
+ * Sélecteur d'organisation avec recherche à la saisie.
+ *
+ * Les listes portant l'attribut data-search-url ne contiennent que
+ * l'organisation choisie. Un champ de recherche est ajouté au-dessus: les
+ * organisations correspondant à la saisie remplacent les options de la
+ * liste, l'organisation choisie restant en tête.
+ */
+(function () {
+    'use strict';
+
+    const MIN_LENGTH = 2;
+    const DELAY = 200;
+
+    function option(value, label) {
+        const element = document.createElement('option');
+        element.value = value;
+        element.textContent = label;
+        return element;
+    }
+
+    function setup(select) {
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'form-control mb-2 organization-picker-search';
+        search.placeholder = 'Rechercher une organisation…';
+        search.autocomplete = 'off';
+        select.insertAdjacentElement('beforebegin', search);
+        let timer = null;
+        let controller = null;
+
+        async function lookup(query) {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            const url = select.dataset.searchUrl + '?' + new URLSearchParams({q: query});
+            const response = await fetch(url, {credentials: 'same-origin', signal: controller.signal});
+            const data = await response.json();
+            const selected = select.selectedIndex > 0 ? select.options[select.selectedIndex] : null;
+            const options = [option('', '---------')];
+            if (selected) {
+                options.push(option(selected.value, selected.textContent));
+            }
+            data.results.forEach(result => {
+                if (!selected || String(result.id) !== selected.value) {
+                    options.push(option(result.id, result.name));
+                }
+            });
+            select.replaceChildren(...options);
+            select.value = selected ? selected.value : '';
+        }
+
+        search.addEventListener('input', function () {
+            clearTimeout(timer);
+            const query = search.value.trim();
+            if (query.length < MIN_LENGTH) {
+                return;
+            }
+            timer = setTimeout(() => {
+                lookup(query).catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Recherche des organisations', error);
+                    }
+                });
+            }, DELAY);
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-search-url]').forEach(setup);
+    });
+})();